@@ -14,20 +14,37 @@ fi
 
 LOG_PATH=$HOME/cronlogs/cron_aux_refresh_$(/bin/date +%d-%m-%Y).log
 
+# All stages of this run write their records into the
+# same run report (see src/canvas_utils/run_record.py):
+export CANVAS_RUN_ID=$(/bin/date +%Y-%m-%d_%H-%M-%S)
+
 # Run the canvas raw data refresh into canvasdata_prd.  If that
 # succeeds, activate the proper anaconda environment; if that
 # succeeds, run canvas_prep.py, creating a new log file for its
-# output:
+# output. The --exportdir option has canvas_prep.py export each
+# table to the pickup dir as soon as the table is built, rather
+# than running copy_aux_tables.py after all tables are done:
+
 
+# The raw data refresh is not Python; its start, end,
+# and exit code are recorded after it finishes.
 
 # <Karen's invocation of raw data refresh goes here> && \
+IMPORT_START=$(/bin/date +%s)
+$HOME/Code/canvasdata/run/import_canvas_data.sh
+IMPORT_EXIT_CODE=$?
+
 # To the canvas_utils project root:
-$HOME/Code/canvasdata/run/import_canvas_data.sh && \
 cd $SCRIPT_DIR/.. && \
 $HOME/anaconda3/bin/activate canvas_utils && \
-    $HOME/anaconda3/envs/canvas_utils/bin/python src/canvas_utils/canvas_prep.py > $LOG_PATH 2>&1 && \
-    $HOME/anaconda3/envs/canvas_utils/bin/python src/canvas_utils/copy_aux_tables.py \
-                                                 --destdir ${PICKUP_DIR} >> $LOG_PATH 2>&1 && \
+    { $HOME/anaconda3/envs/canvas_utils/bin/python src/canvas_utils/run_record.py \
+                                                 --stage raw_import \
+                                                 --start ${IMPORT_START} \
+                                                 --end $(/bin/date +%s) \
+                                                 --exitcode ${IMPORT_EXIT_CODE} ; \
+      [[ ${IMPORT_EXIT_CODE} -eq 0 ]] ; } && \
+    $HOME/anaconda3/envs/canvas_utils/bin/python src/canvas_utils/canvas_prep.py \
+                                                 --exportdir ${PICKUP_DIR} > $LOG_PATH 2>&1 && \
     $HOME/anaconda3/envs/canvas_utils/bin/python src/canvas_utils/final_sanity_check.py >> $LOG_PATH 2>&1
 
 
@@ -0,0 +1,37 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import threading
+
+#-------------------------
+# atomic_write
+#--------------
+
+def atomic_write(path, text):
+    '''
+    Replace the file at path with the given text. The text
+    goes to a temporary file next to path first, which is
+    then renamed to path. Readers therefore see either the
+    old or the new content, never a partial file. The
+    temporary name is unique to the writing process and
+    thread, so concurrent writers of the same file do not
+    write into each other's temporary file.
+
+    @param path: file to write
+    @type path: str
+    @param text: the file's new content
+    @type text: str
+    @raise IOError: if the file cannot be written
+    '''
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as fd:
+            fd.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
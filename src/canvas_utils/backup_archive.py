@@ -0,0 +1,305 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from row_encoder import RowEncoder
+
+class BackupArchive(object):
+    '''
+    A backup table archived to disk. Each archive is a
+    directory named like the table, holding three files:
+
+        Terms_2019_01_10_14_14_40_123456/
+            create_table.sql   the SHOW CREATE TABLE statement
+            data.tsv.gz        the rows, gzip compressed
+            manifest.json      what the archive holds
+
+    The manifest looks like:
+
+        {"table"            : "Terms_2019_01_10_14_14_40_123456",
+         "db_schema"        : "canvasdata_aux",
+         "archived"         : "2026-10-19T02:13:10",
+         "columns"          : ["term_id", "term_name", ...],
+         "col_types"        : ["bigint", "varchar", ...],
+         "hex_columns"      : [],
+         "session_settings" : ["SET @@session.time_zone = \"+00:00\"", ...],
+         "rows"             : 2103,
+         "data_bytes"       : 20311,
+         "sha256"           : "9f86d0..."
+         }
+
+    Rows are written in the format LOAD DATA INFILE reads by
+    default: tab separated, backslash escapes, and \\N for NULL.
+    So an archive can be bulk-loaded by piping the decompressed
+    data file into LOAD DATA LOCAL INFILE (see load_statement()).
+    Values of binary columns are written as hex strings, and
+    turned back into bytes with UNHEX() while loading, so they
+    survive the round trip unchanged.
+
+    Temporal values depend on the time zone and sql_mode of
+    the session that read them. The session's settings are
+    recorded in the manifest, and the load script applies
+    them before loading.
+
+    Archives are written into a temporary directory, which is
+    renamed once all files are complete. A directory with a
+    manifest is therefore always a complete archive.
+    '''
+
+    manifest_file_name = 'manifest.json'
+    create_file_name   = 'create_table.sql'
+    data_file_name     = 'data.tsv.gz'
+
+    # How to write NULL so that LOAD DATA INFILE
+    # reads it back as NULL:
+    NULL_STR = '\\N'
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, archive_path):
+        '''
+        Open an existing archive.
+
+        @param archive_path: the archive's directory
+        @type archive_path: str
+        @raise ValueError: if the directory holds no complete archive
+        '''
+        self.archive_path = archive_path
+        manifest_path = os.path.join(archive_path, BackupArchive.manifest_file_name)
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"No backup archive at {archive_path}")
+        with open(manifest_path, 'r') as fd:
+            self.manifest = json.load(fd)
+
+    #-------------------------
+    # write
+    #--------------
+
+    @classmethod
+    def write(cls, archive_dir, table_name, create_stmt, col_names, col_types, rows,
+              db_schema=None, session_settings=(), compresslevel=6):
+        '''
+        Archive one table's rows and definition into a new
+        directory below archive_dir.
+
+        @param archive_dir: directory holding archives
+        @type archive_dir: str
+        @param table_name: name of the archived table
+        @type table_name: str
+        @param create_stmt: statement that recreates the table
+        @type create_stmt: str
+        @param col_names: names of the columns, in the order
+            of the values in each row
+        @type col_names: [str]
+        @param col_types: data types of the columns, as in
+            information_schema.COLUMNS
+        @type col_types: [str]
+        @param rows: iterable of row tuples, or of bare values
+            for single column tables, as query results deliver them
+        @type rows: iter((<any>) | <any>)
+        @param db_schema: schema the table came from; only recorded
+        @type db_schema: str
+        @param session_settings: SET statements that were applied
+            to the session from which the rows were read
+        @type session_settings: [str]
+        @param compresslevel: gzip compression level
+        @type compresslevel: int
+        @return: the new archive
+        @rtype: BackupArchive
+        @raise FileExistsError: if an archive of the table exists
+        '''
+        archive_path = cls.archive_path_for(archive_dir, table_name)
+        if os.path.exists(archive_path):
+            raise FileExistsError(f"Archive {archive_path} already exists")
+
+        tmp_path = archive_path + '.partial'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        try:
+            with open(os.path.join(tmp_path, cls.create_file_name), 'w') as fd:
+                fd.write(create_stmt.rstrip(';\n ') + ';\n')
+
+            encoder   = RowEncoder(col_types, null_str=cls.NULL_STR, binary_as_hex=True)
+            hex_columns = [col_name for (col_name, col_type) in zip(col_names, col_types)
+                           if RowEncoder.is_binary_type(col_type)]
+            data_path = os.path.join(tmp_path, cls.data_file_name)
+            with gzip.open(data_path, 'wb', compresslevel=compresslevel) as out_fd:
+                num_rows = encoder.write_rows(rows, out_fd)
+
+            manifest = {'table'            : table_name,
+                        'db_schema'        : db_schema,
+                        'archived'         : datetime.now().isoformat(timespec='seconds'),
+                        'columns'          : list(col_names),
+                        'col_types'        : list(col_types),
+                        'hex_columns'      : hex_columns,
+                        'session_settings' : list(session_settings),
+                        'rows'             : num_rows,
+                        'data_bytes'       : os.path.getsize(data_path),
+                        'sha256'           : cls.file_digest(data_path)
+                        }
+            with open(os.path.join(tmp_path, cls.manifest_file_name), 'w') as fd:
+                json.dump(manifest, fd, indent=2)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        os.rename(tmp_path, archive_path)
+        return cls(archive_path)
+
+    #-------------------------
+    # archive_path_for
+    #--------------
+
+    @staticmethod
+    def archive_path_for(archive_dir, table_name):
+        return os.path.join(archive_dir, table_name)
+
+    #-------------------------
+    # list_archives
+    #--------------
+
+    @staticmethod
+    def list_archives(archive_dir):
+        '''
+        Paths of all complete archives in archive_dir,
+        sorted by name.
+
+        @param archive_dir: directory holding archives
+        @type archive_dir: str
+        @return: archive directory paths
+        @rtype: [str]
+        '''
+        if not os.path.isdir(archive_dir):
+            return []
+        return [os.path.join(archive_dir, entry)
+                for entry in sorted(os.listdir(archive_dir))
+                if os.path.exists(os.path.join(archive_dir, entry, BackupArchive.manifest_file_name))]
+
+    #-------------------------
+    # file_digest
+    #--------------
+
+    @staticmethod
+    def file_digest(file_path):
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as fd:
+            for chunk in iter(lambda: fd.read(1024 * 1024), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    #-------------------------
+    # Properties
+    #--------------
+
+    @property
+    def table_name(self):
+        return self.manifest['table']
+
+    @property
+    def col_names(self):
+        return self.manifest['columns']
+
+    @property
+    def num_rows(self):
+        return self.manifest['rows']
+
+    @property
+    def data_path(self):
+        return os.path.join(self.archive_path, BackupArchive.data_file_name)
+
+    #-------------------------
+    # create_statement
+    #--------------
+
+    def create_statement(self, db_schema=None):
+        '''
+        The statement that recreates the archived table,
+        optionally qualified with a schema name.
+
+        @param db_schema: schema in which to create the table
+        @type db_schema: str
+        @return: CREATE TABLE statement
+        @rtype: str
+        '''
+        with open(os.path.join(self.archive_path, BackupArchive.create_file_name), 'r') as fd:
+            create_stmt = fd.read()
+        if db_schema is not None:
+            create_stmt = create_stmt.replace(f"CREATE TABLE `{self.table_name}`",
+                                              f"CREATE TABLE `{db_schema}`.`{self.table_name}`",
+                                              1)
+        return create_stmt
+
+    #-------------------------
+    # data_stream
+    #--------------
+
+    def data_stream(self):
+        '''
+        File-like object that delivers the decompressed
+        rows. Caller closes.
+        '''
+        return gzip.open(self.data_path, 'rb')
+
+    #-------------------------
+    # verify
+    #--------------
+
+    def verify(self):
+        '''
+        Return True if the data file is unchanged since
+        the archive was written.
+        '''
+        return BackupArchive.file_digest(self.data_path) == self.manifest['sha256']
+
+    #-------------------------
+    # load_statement
+    #--------------
+
+    def load_statement(self, db_schema, infile='/dev/stdin'):
+        '''
+        The LOAD DATA statement that reads the decompressed
+        data into the recreated table, preceded by the session
+        settings under which the rows were archived. By default 
+        the data is expected on the mysql client's stdin. 
+        Hex encoded binary columns are read into user variables,
+        and decoded with UNHEX().
+
+        @param db_schema: schema of the recreated table
+        @type db_schema: str
+        @param infile: client side file to load from
+        @type infile: str
+        @return: SET statements, if any, and the LOAD DATA
+            LOCAL INFILE statement
+        @rtype: str
+        '''
+        # Archives written before these entries existed
+        # have neither:
+        hex_columns = self.manifest.get('hex_columns', [])
+        settings    = ''.join([f"{setting.rstrip(';')}; "
+                               for setting in self.manifest.get('session_settings', [])])
+        
+        col_list = ', '.join([f"@`{col_name}`" if col_name in hex_columns else f"`{col_name}`"
+                              for col_name in self.col_names])
+        set_clause = ''
+        if len(hex_columns) > 0:
+            set_clause = ' SET ' + ', '.join([f"`{col_name}` = UNHEX(@`{col_name}`)"
+                                              for col_name in hex_columns])
+        return (f"{settings}"
+                f"LOAD DATA LOCAL INFILE '{infile}' "
+                f"INTO TABLE `{db_schema}`.`{self.table_name}` "
+                f"CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' "
+                f"({col_list}){set_clause};")
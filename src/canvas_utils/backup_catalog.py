@@ -0,0 +1,416 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from bisect import bisect_left, insort
+import datetime
+import re
+
+class BackupCatalog(object):
+    '''
+    In-memory index of the backup tables in one schema.
+    Backup tables are aux tables that were renamed by
+    CanvasPrep.backup_tables() to have the backup time
+    appended:
+
+        Terms_2019_01_10_14_14_40_123456
+
+    The catalog is built from a single list of table names,
+    usually obtained by one query against information_schema.tables
+    (see from_db()). Each name is parsed once, with one
+    precompiled pattern. Names whose root is not one of the
+    given aux tables are ignored.
+
+    Backups are indexed by root table name, sorted by date,
+    and additionally kept in one list sorted by date across
+    all roots. So:
+
+        latest(root)        is O(1)
+        keep_n(root, n)     is O(k) for root's k backups
+        older_than(date)    is O(log N) to find the cut point
+
+    Admin commands therefore stay fast when thousands of
+    backups accumulate.
+    '''
+
+    # Recognize '<root>_2019_11_02_11_02_03' and
+    # '<root>_2019_11_02_11_02_03_123456'. The root
+    # is matched greedily, so roots may contain underscores:
+    backup_name_pat = re.compile(r'^(.+)_([0-9]{4})_([0-9]{2})_([0-9]{2})_([0-9]{2})_([0-9]{2})_([0-9]{2})(?:_([0-9]{1,6}))?$')
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, root_names, table_names=[], table_sizes=None):
+        '''
+        @param root_names: names of the aux tables whose
+            backups are to be cataloged
+        @type root_names: [str]
+        @param table_names: names of tables in the schema. May
+            be a mix of aux tables, backups, and unrelated tables.
+        @type table_names: [str]
+        @param table_sizes: optional map from table name to 
+            bytes on disk (data plus indexes)
+        @type table_sizes: {str : int}
+        '''
+        self.root_names = frozenset(root_names)
+        self._sizes = {} if table_sizes is None else table_sizes
+
+        # Root name --> [(datetime, backup name)], oldest first:
+        self._by_root = {}
+        # Backup name --> (root name, datetime str, datetime):
+        self._components = {}
+        # [(datetime, backup name)] across all roots, oldest first:
+        self._by_date = []
+
+        for table_name in table_names:
+            self.add(table_name)
+
+    #-------------------------
+    # from_db
+    #--------------
+
+    @classmethod
+    def from_db(cls, db_obj, db_schema, root_names):
+        '''
+        Build a catalog from the tables in db_schema,
+        using a single information_schema query.
+
+        @param db_obj: database connection
+        @type db_obj: MySQLDB
+        @param db_schema: schema in which backups reside
+        @type db_schema: str
+        @param root_names: aux table names
+        @type root_names: [str]
+        @return: new catalog
+        @rtype: BackupCatalog
+        '''
+        table_sizes = cls.read_table_sizes(db_obj, db_schema)
+        return cls(root_names, list(table_sizes.keys()), table_sizes)
+
+    #-------------------------
+    # read_table_sizes
+    #--------------
+
+    @staticmethod
+    def read_table_sizes(db_obj, db_schema):
+        '''
+        Return a map from the name of each table in db_schema
+        to the number of bytes its data and indexes occupy.
+        For InnoDB tables the numbers are estimates.
+
+        @param db_obj: database connection
+        @type db_obj: MySQLDB
+        @param db_schema: schema whose tables to list
+        @type db_schema: str
+        @return: table name --> bytes
+        @rtype: {str : int}
+        '''
+        res = db_obj.query(f'''
+                           SELECT table_name,
+                                  COALESCE(data_length, 0) + COALESCE(index_length, 0)
+                             FROM information_schema.tables
+                            WHERE table_schema = '{db_schema}';
+                           ''')
+        table_sizes = {}
+        for row in res:
+            # Connections opened with a dict cursor
+            # deliver dicts:
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            (table_name, num_bytes) = row
+            table_sizes[table_name] = int(num_bytes)
+        return table_sizes
+
+    #-------------------------
+    # parse_backup_name
+    #--------------
+
+    @classmethod
+    def parse_backup_name(cls, table_name, root_names=None):
+        '''
+        Given a backup table name, return the root table
+        name, the datetime string, and the datetime object.
+
+            input:  Terms_2019_05_09_11_51_03
+            return: ('Terms', '2019_05_09_11_51_03', datetime.datetime(2019, 5, 9, 11, 51, 3))
+
+        @param table_name: name to parse
+        @type table_name: str
+        @param root_names: if provided, the root must be
+            one of these names
+        @type root_names: {set | frozenset}
+        @return: root name, datetime string, and datetime object,
+            or None if table_name is not a backup name
+        @rtype: {None | (str, str, datetime.datetime)}
+        '''
+        match = cls.backup_name_pat.match(table_name)
+        if match is None:
+            return None
+        (root, year, month, day, hour, minute, sec, frac) = match.groups()
+        if root_names is not None and root not in root_names:
+            return None
+        # Like strptime's %f, '12' means 120000 microseconds:
+        microsec = 0 if frac is None else int(frac.ljust(6, '0'))
+        try:
+            dt_obj = datetime.datetime(int(year), int(month), int(day),
+                                       int(hour), int(minute), int(sec),
+                                       microsec)
+        except ValueError:
+            # Digits in the right places, but not a date:
+            return None
+        return (root, table_name[len(root) + 1:], dt_obj)
+
+    #-------------------------
+    # add
+    #--------------
+
+    def add(self, table_name):
+        '''
+        Add one table name to the catalog. Names that
+        are not backups of one of the root tables are
+        ignored.
+
+        @param table_name: name of a table in the schema
+        @type table_name: str
+        @return: True if table_name was cataloged as a backup
+        @rtype: bool
+        '''
+        if table_name in self._components:
+            return True
+        components = self.parse_backup_name(table_name, self.root_names)
+        if components is None:
+            return False
+        (root, _dt_str, dt_obj) = components
+        self._components[table_name] = components
+
+        entry = (dt_obj, table_name)
+        insort(self._by_root.setdefault(root, []), entry)
+        insort(self._by_date, entry)
+        return True
+
+    #-------------------------
+    # remove
+    #--------------
+
+    def remove(self, backup_name):
+        '''
+        Remove a backup from the catalog, for instance
+        after it was dropped or restored. Unknown names
+        are ignored.
+
+        @param backup_name: backup table name
+        @type backup_name: str
+        '''
+        components = self._components.pop(backup_name, None)
+        if components is None:
+            return
+        (root, _dt_str, dt_obj) = components
+        entry = (dt_obj, backup_name)
+        backups = self._by_root[root]
+        del backups[bisect_left(backups, entry)]
+        if len(backups) == 0:
+            del self._by_root[root]
+        del self._by_date[bisect_left(self._by_date, entry)]
+
+    #-------------------------
+    # roots
+    #--------------
+
+    @property
+    def roots(self):
+        '''
+        Root names that have at least one backup.
+        '''
+        return list(self._by_root.keys())
+
+    #-------------------------
+    # components
+    #--------------
+
+    def components(self, backup_name):
+        '''
+        Return (root name, datetime str, datetime obj)
+        of a cataloged backup, or None.
+        '''
+        return self._components.get(backup_name, None)
+
+    #-------------------------
+    # backups
+    #--------------
+
+    def backups(self, root):
+        '''
+        All backup names of the given root table,
+        newest first.
+
+        @param root: aux table name
+        @type root: str
+        @return: possibly empty list of backup names
+        @rtype: [str]
+        '''
+        return [backup_name for (_dt, backup_name) in reversed(self._by_root.get(root, []))]
+
+    #-------------------------
+    # latest
+    #--------------
+
+    def latest(self, root):
+        '''
+        Name of the most recent backup of root,
+        or None if root has no backup.
+
+        @param root: aux table name
+        @type root: str
+        @rtype: {None | str}
+        '''
+        backups = self._by_root.get(root, None)
+        if not backups:
+            return None
+        return backups[-1][1]
+
+    #-------------------------
+    # keep_n
+    #--------------
+
+    def keep_n(self, root, n):
+        '''
+        Partition the backups of root into the n newest,
+        which a retention policy of n keeps, and the rest,
+        which it removes.
+
+        @param root: aux table name
+        @type root: str
+        @param n: number of backups to keep
+        @type n: int
+        @return: names to keep, and names to remove, both newest first
+        @rtype: ([str], [str])
+        '''
+        names = self.backups(root)
+        n = max(n, 0)
+        return (names[:n], names[n:])
+
+    #-------------------------
+    # older_than
+    #--------------
+
+    def older_than(self, datetime_obj, root=None):
+        '''
+        Names of backups taken before the given time,
+        oldest first.
+
+        @param datetime_obj: cutoff time; a datetime.date
+            is taken to mean midnight of that day
+        @type datetime_obj: {datetime.datetime | datetime.date}
+        @param root: if provided, only backups of that table
+        @type root: str
+        @return: backup names
+        @rtype: [str]
+        '''
+        if not isinstance(datetime_obj, datetime.datetime):
+            datetime_obj = datetime.datetime.combine(datetime_obj, datetime.time())
+        # Every entry at the cutoff time sorts after this tuple:
+        cut = bisect_left(self._by_date, (datetime_obj, ''))
+        return [backup_name for (_dt, backup_name) in self._by_date[:cut]
+                if root is None or self._components[backup_name][0] == root]
+
+    #-------------------------
+    # size
+    #--------------
+
+    def size(self, table_name):
+        '''
+        Bytes occupied by the given table, or 0
+        if its size is unknown.
+        '''
+        return self._sizes.get(table_name, 0)
+
+    #-------------------------
+    # total_size
+    #--------------
+
+    def total_size(self, backup_names=None):
+        '''
+        Bytes occupied by the given backups. Default: 
+        by all cataloged backups.
+
+        @param backup_names: names of backups to add up
+        @type backup_names: [str]
+        @rtype: int
+        '''
+        if backup_names is None:
+            backup_names = self._components.keys()
+        return sum([self.size(backup_name) for backup_name in backup_names])
+
+    #-------------------------
+    # keep_bytes
+    #--------------
+
+    def keep_bytes(self, root, max_bytes):
+        '''
+        Partition the backups of root into the newest ones
+        that together occupy no more than max_bytes, and
+        the older rest. Note that all backups are removed
+        if even the newest exceeds max_bytes.
+
+        @param root: aux table name
+        @type root: str
+        @param max_bytes: space allowed for root's backups
+        @type max_bytes: int
+        @return: names to keep, and names to remove, both newest first
+        @rtype: ([str], [str])
+        '''
+        names = self.backups(root)
+        total = 0
+        for (idx, backup_name) in enumerate(names):
+            total += self.size(backup_name)
+            if total > max_bytes:
+                return (names[:idx], names[idx:])
+        return (names, [])
+
+    #-------------------------
+    # schema_excess
+    #--------------
+
+    def schema_excess(self, max_bytes, already_removed=set()):
+        '''
+        Return the oldest backups, regardless of their root,
+        whose removal brings the space occupied by all backups
+        down to max_bytes. Backups in already_removed, such as
+        ones removed by other retention policies, are not
+        counted, and not returned.
+
+        @param max_bytes: space allowed for all backups in the schema
+        @type max_bytes: int
+        @param already_removed: names of backups that will be
+            removed anyway
+        @type already_removed: {str}
+        @return: backup names, oldest first
+        @rtype: [str]
+        '''
+        excess = self.total_size() - self.total_size(already_removed) - max_bytes
+        to_remove = []
+        for (_dt, backup_name) in self._by_date:
+            if excess <= 0:
+                break
+            if backup_name in already_removed:
+                continue
+            to_remove.append(backup_name)
+            excess -= self.size(backup_name)
+        return to_remove
+
+    #-------------------------
+    # __len__
+    #--------------
+
+    def __len__(self):
+        return len(self._components)
+
+    #-------------------------
+    # __contains__
+    #--------------
+
+    def __contains__(self, backup_name):
+        return backup_name in self._components
@@ -5,9 +5,9 @@
 # database name, the full path to the mysql executable, and the
 # statement.
 #
-# **** The following maybe obsolete, subject to testing:
-# The TSV output is filtered as follows to make the Informatica
-# tool happy:
+# The TSV output is not filtered here. To make the Informatica
+# tool happy, run copy_aux_tables.py with --sanitize, which
+# post-processes only the free text columns (see tsv_sanitizer.py):
 #
 #   o Escaped TAB char in columns with free text are replaced
 #     by eight spaces.
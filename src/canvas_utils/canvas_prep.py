@@ -8,19 +8,29 @@ Created on Jan 1, 2019
 import argparse
 import datetime
 import logging
+import multiprocessing
 from os import getenv
 import os
 import pickle
 import re
 import shutil
 import stat
-import subprocess
 import sys
+import time
 
-from canvas_utils_exceptions import DatabaseError, ExploreCoursesError
+from backup_catalog import BackupCatalog
+from canvas_utils_exceptions import DatabaseError, ExploreCoursesError, TableExportError
 from clear_old_backups import BackupRemover
 from config_info import ConfigInfo
+from copy_aux_tables import AuxTableCopier
+from load_log import LoadLog
+from prom_metrics import MetricsFile
 from pull_explore_courses import ECPuller
+from query_sorter import QuerySorter
+from refresh_history import LoadHistoryLister
+from routine_installer import RoutineInstaller
+from run_record import StageRecord
+from stage_profiler import StageProfiler
 from utilities import Utilities
 
 
@@ -66,6 +76,16 @@ class CanvasPrep(object):
     # Filled in constructor
     tbl_creation_paths = []
     
+    # Values noted for each table in the stage
+    # record that are exported as metrics:
+    table_metrics = {'build_secs'  : ('canvas_utils_table_build_seconds', 'Seconds it took to build the table.'),
+                     'rows'        : ('canvas_utils_table_rows', 'Rows in the table when it was built.'),
+                     'data_bytes'  : ('canvas_utils_table_data_bytes', 'Bytes of table data when it was built.'),
+                     'index_bytes' : ('canvas_utils_table_index_bytes', 'Bytes of indexes when the table was built.')
+                     }
+    table_success_metric = ('canvas_utils_table_build_last_success_timestamp_seconds',
+                            'When the table was last built successfully.')
+    
     # datetime format used for appending to table names
     # for backups:
     datetime_format              = '%Y_%m_%d_%H_%M_%S_%f'
@@ -94,6 +114,8 @@ class CanvasPrep(object):
                  excludes=[],
                  new_only=False,
                  skip_backups=False,
+                 export_dir=None,
+                 export_options=None,
                  dryrun=False, 
                  logging_level=logging.INFO,
                  unittests=False):
@@ -123,6 +145,15 @@ class CanvasPrep(object):
             an existing table, that existing table is backed up. With False here, 
             no backup is created.
         @type skip_backups: bool
+        @param export_dir: if provided, run in pipeline mode: each table
+            is exported as .tsv into this directory as soon as it is
+            built, while later tables are still being created.
+        @type export_dir: {None | str}
+        @param export_options: in pipeline mode, keyword arguments for
+            the exporter's AuxTableCopier, such as max_shard_size, or
+            sanitize_text. See AuxTableCopier.export_options_from_args()
+            Default: no options
+        @type export_options: {None | {str : <any>}}
 #        @param dryrun: only print what would be done, make no changes
 #        @type dryrun: bool
         @param logging_level: how much logging to do.
@@ -160,7 +191,19 @@ class CanvasPrep(object):
         
         self.new_only = new_only
         self.skip_backups = skip_backups
+        self.export_dir = export_dir
+        self.export_options = {} if export_options is None else dict(export_options)
         self.dryrun = dryrun
+        self.logging_level = logging_level
+        
+        # In pipeline mode: queue through which create_tables()
+        # announces finished tables to the exporter process.
+        # Created in run():
+        self.table_done_queue = None
+        
+        # Structured record of this run's timings, rows, 
+        # and errors. Created in run():
+        self.stage_record = None
         if user is None:
             user = CanvasPrep.default_user
 
@@ -184,6 +227,10 @@ class CanvasPrep(object):
             target_db = target_db
             
         self.target_db = target_db
+        # Schema where backups of the aux tables are kept:
+        self.backup_db = self.utils.get_backup_db(target_db)
+        # Tags the LoadLog entries of this run:
+        self.run_id = datetime.datetime.utcnow().strftime(CanvasPrep.datetime_format_no_subsecond)
         self.excludes = excludes
             
         self.pwd_file_pointer = config_info.canvas_pwd_file
@@ -255,6 +302,10 @@ class CanvasPrep(object):
         
     def run(self):
         
+        if not self.dryrun:
+            self.stage_record = StageRecord('canvas_prep')
+            self.stage_record.start()
+        
         # Determine how many tables need to be done.
         # If self.new_only is true, then only non-existing
         # tables are to be done, else all of them:
@@ -270,7 +321,8 @@ class CanvasPrep(object):
                 print(f"Would back up tables {existing_tables}")
             else:
                 # Backup the tables that are in the db:
-                self.backup_tables(existing_tables) 
+                with StageProfiler.stage('backup_tables'):
+                    self.backup_tables(existing_tables) 
         
         if self.new_only:
             completed_tables = existing_tables
@@ -290,31 +342,87 @@ class CanvasPrep(object):
             print("Would fetch fresh copy of explore-courses.")
         else:
             try:
-                self.pull_explore_courses()
+                with StageProfiler.stage('pull_explore_courses'):
+                    self.pull_explore_courses()
             except ExploreCoursesError as e:
                 self.log_err(e.message)
+                self.stage_record.note_error(e.message, table='ExploreCourses')
             
+        # In pipeline mode, start the exporter, which will
+        # copy each table as soon as create_tables() announces
+        # that it is done:
+        exporter = None
+        if self.export_dir is not None:
+            if self.dryrun:
+                print(f"Would export each table to {self.export_dir} as soon as it is built.")
+            else:
+                exporter = self.start_pipeline_exporter()
+
         # Create the other tables that are needed.
         try:
             if self.dryrun:
                 print("Would create fresh copies of the other courses.")
-                print(f"Would remove all but {BackupRemover.num_to_keep} backups")
+                print(f"Would remove all but {BackupRemover.default_num_backups_to_keep} backups")
 
             else:
-                completed_tables = self.create_tables(completed_tables=completed_tables)
-                BackupRemover(user=self.user,
-                              db_pwd=self.pwd,
-                              target_db=self.target_db,
-                              host=self.host
-                              )
+                with StageProfiler.stage('create_tables'):
+                    completed_tables = self.create_tables(completed_tables=completed_tables)
+                with StageProfiler.stage('rollup_load_log'):
+                    self.rollup_load_log()
+                with StageProfiler.stage('clear_old_backups'):
+                    BackupRemover(user=self.user,
+                                  db_pwd=self.pwd,
+                                  target_db=self.target_db,
+                                  host=self.host
+                                  )
+        except DatabaseError as e:
+            if self.stage_record is not None:
+                self.stage_record.note_error(e.message)
+            raise
         finally:
+            if exporter is not None:
+                with StageProfiler.stage('wait_exporter'):
+                    self.finish_pipeline_exporter(exporter)
+            self.finish_stage_record()
             self.close()
         
+        # Tables that were built, but not exported,
+        # fail the run just the same:
+        if exporter is not None and exporter.exitcode != 0:
+            raise TableExportError(f"Exporter process ended with exit code {exporter.exitcode}; " +
+                                   f"not all tables were exported to {self.export_dir}.")
+        
         if self.dryrun:
             print(f"Would be done creating {len(completed_tables)} tables.")
         else:
             self.log_info(f"(Re)created {len(completed_tables)} tables. Done")
 
+    #-------------------------
+    # finish_stage_record 
+    #--------------
+    
+    def finish_stage_record(self):
+        '''
+        Write this run's stage record and metrics, and
+        update the run's report. A report that cannot be
+        written is no reason to fail the refresh.
+        '''
+        if self.stage_record is None:
+            return
+        try:
+            record_path = self.stage_record.finish()
+            self.log_info(f"Wrote run record {record_path}.")
+        except (IOError, OSError) as e:
+            self.log_warn(f"Could not write run record: {repr(e)}")
+        try:
+            metrics_path = MetricsFile.from_stage_record(self.stage_record,
+                                                         CanvasPrep.table_metrics,
+                                                         CanvasPrep.table_success_metric).write()
+            if metrics_path is not None:
+                self.log_info(f"Wrote metrics {metrics_path}.")
+        except (IOError, OSError) as e:
+            self.log_warn(f"Could not write metrics: {repr(e)}")
+
     #------------------------------------
     # close 
     #-------------------    
@@ -346,6 +454,10 @@ class CanvasPrep(object):
         single str. The microseconds part of the datetime
         object will be set to 0.
         
+        The backups are moved into self.backup_db, which is 
+        created if needed. Renaming across schemas is still
+        a metadata-only operation.
+        
         @param table_names: list of aux tables to back up
         @type table_names: [str]
         @return: datetime object whose string representation was
@@ -370,9 +482,14 @@ class CanvasPrep(object):
         #   RENAME TABLE tb1 TO tb2, tb3 TO tb4;
         # Build the "tb_nm TO tb_backup_nm" snippets:
         
-        tbl_rename_snippets = [f" {tbl_nm} TO {self.get_backup_table_name(tbl_nm, curr_time)} " 
+        tbl_rename_snippets = [f" {self.target_db}.{tbl_nm} TO {self.backup_db}.{tbl_name_map[tbl_nm]} " 
                                for tbl_nm in table_names]
         
+        if self.backup_db != self.target_db:
+            (errors, _warns) = self.db.execute(f"CREATE DATABASE IF NOT EXISTS {self.backup_db};")
+            if errors is not None:
+                raise RuntimeError(f"Could not create backup database {self.backup_db}: {repr(errors)}")
+        
         # Stitch it all together into "RENAME TABLE foo TO foo_backup bar TO bar_backup;"
         # by combining the string snippets with spaces:
 
@@ -380,10 +497,11 @@ class CanvasPrep(object):
 
         # Do it!
         
-        self.log_info(f"Renaming {len(table_names)} tables to backup names...")
+        self.log_info(f"Renaming {len(table_names)} tables to backup names in {self.backup_db}...")
         (errors, _warns) = self.db.execute(rename_cmd, doCommit=False)
         if errors is not None:
             raise RuntimeError(f"Could not rename at least some of tables {str(table_names)}: {repr(errors)}")
+        self.utils.schema_cache.note_statement(rename_cmd, self.target_db)
             
         self.log_info(f"Done renaming {len(table_names)} tables to backup names.")
         return curr_time
@@ -409,33 +527,27 @@ class CanvasPrep(object):
         @return: number of actually deleted tables
         '''
         
-        # Find all backup tables:
-        lst_tbl_cmd = f'''
-                       SELECT table_name
-                         FROM information_schema.tables
-                        WHERE table_name REGEXP '{table_root}_{CanvasPrep.datetime_regx}'
-                          AND table_schema = '{self.db.dbName()}';
-                       '''
-        tbl_names_res = self.db.query(lst_tbl_cmd)
-        backup_table_names = [table_name for table_name in tbl_names_res]
-        self.log_info(f"Found {len(backup_table_names)} backed up tables for {table_root}." )
-        
-        # Sort the backups by age, most recent first:
-        # Method backup_table_name_components() returns a triplet:
-        # (root_table_name, datetime_str, datetime_obj). Sort
-        # using datetime obj by using sorted()'s 'key' function: 
-        backup_table_names_sorted = sorted(backup_table_names,
-                                           reverse=True,
-                                           key=lambda tbl_name: self.utils.backup_table_name_components(tbl_name)[2])
-        
-        num_deleted = 0
-        # Remove tables beyond the desired number of keepers:
-        for table_name in backup_table_names_sorted[num_to_keep:]:
-            try:
-                self.db.dropTable(table_name)
-                num_deleted += 1
-            except Exception as e:
-                self.log_err(f"Could not drop backup table {table_name}: {repr(e)}")
+        # Find all backup tables in the metadata cache;
+        # the catalog keeps them sorted by age:
+        backup_db = self.utils.get_backup_db(self.db.dbName())
+        catalog = BackupCatalog([table_root], self.utils.schema_cache.table_names(self.db, backup_db))
+        self.log_info(f"Found {len(catalog)} backed up tables for {table_root}." )
+        
+        # Remove tables beyond the desired number of keepers,
+        # all in one DROP statement:
+        (_to_keep, to_delete) = catalog.keep_n(table_root, num_to_keep)
+        if len(to_delete) == 0:
+            return 0
+        qualified_names = [f"{backup_db}.{table_name}" for table_name in to_delete]
+        drop_cmd = f"DROP TABLE IF EXISTS {', '.join(qualified_names)};"
+        (err, _warn) = self.db.execute(drop_cmd)
+        if err is not None:
+            self.log_err(f"Could not drop backup tables {to_delete}: {repr(err)}")
+            # Some may be gone:
+            self.utils.schema_cache.invalidate(backup_db)
+            return 0
+        self.utils.schema_cache.note_statement(drop_cmd, backup_db)
+        num_deleted = len(to_delete)
           
         return num_deleted
                                       
@@ -503,8 +615,13 @@ class CanvasPrep(object):
                 continue
                       
             self.log_info('Working on table %s...' % tbl_nm)
-            (errors, _warns) = self.db.execute(query, doCommit=False)
+            start_time = time.time()
+            (errors, num_rows) = self.build_table(query, tbl_nm)
+            duration_secs = time.time() - start_time
             if errors is not None:
+                # The failed query may have dropped or
+                # created some tables already:
+                self.utils.schema_cache.invalidate()
                 # Include in error msg the tables that are not
                 # yet done, so user can recover more easily:
                 tbls_to_do = [tbl_name for tbl_name in CanvasPrep.tables if tbl_name not in completed_tables]
@@ -517,48 +634,234 @@ class CanvasPrep(object):
             # the aux tables one again:
             self.db.execute(f'USE {self.target_db}')
             # Make entry in table_refresh_log table:
-            self.log_table_creation(tbl_nm)
+            (data_bytes, index_bytes) = self.log_table_creation(tbl_nm, num_rows, duration_secs)
+            if self.stage_record is not None:
+                self.stage_record.note_table(tbl_nm,
+                                             build_secs=round(duration_secs, 3),
+                                             rows=num_rows,
+                                             data_bytes=data_bytes,
+                                             index_bytes=index_bytes)
             self.log_info('Done working on table %s' % tbl_nm)
+            
+            # In pipeline mode: let the exporter know that
+            # this table is ready to be copied:
+            if self.table_done_queue is not None:
+                self.table_done_queue.put(tbl_nm)
         return completed_tables
         
+    #-------------------------
+    # build_table 
+    #--------------
+    
+    def build_table(self, query, tbl_nm):
+        '''
+        Run the statements of one table creation script,
+        one at a time. After each statement that inserts 
+        rows into, or deletes rows from tbl_nm, ask the 
+        server how many rows it affected. The sum is the 
+        new table's number of rows, so the finished table 
+        need not be counted again.
+        
+        @param query: content of the table's .sql file
+        @type query: str
+        @param tbl_nm: the table the script builds
+        @type tbl_nm: str
+        @return: error of the first failing statement, or None;
+            and the number of rows in the new table
+        @rtype: ({None | str}, int)
+        '''
+        curr_db  = self.target_db
+        num_rows = 0
+        for statement in RoutineInstaller.split_statements(query):
+            sign = LoadLog.row_change_sign(statement, tbl_nm, self.target_db, curr_db)
+            (errors, _warns) = self.db.execute(statement, doCommit=False)
+            if errors is not None:
+                return (errors, num_rows)
+            if sign != 0:
+                num_rows += sign * self.db.query('SELECT ROW_COUNT()').next()
+            # Creation files drop and create tables, possibly
+            # after USEing another db:
+            curr_db = self.utils.schema_cache.note_statement(statement, curr_db)
+        return (None, num_rows)
+
+    #-------------------------
+    # start_pipeline_exporter 
+    #--------------
+    
+    def start_pipeline_exporter(self):
+        '''
+        Start a separate process that exports aux tables
+        to self.export_dir while this process builds them.
+        Creates self.table_done_queue, through which 
+        create_tables() passes the name of each finished
+        table.
+        
+        @return: the started exporter process
+        @rtype: multiprocessing.Process
+        '''
+        self.table_done_queue = multiprocessing.Queue()
+        exporter = multiprocessing.Process(target=CanvasPrep.run_pipeline_exporter,
+                                           args=(self.table_done_queue,
+                                                 self.user,
+                                                 self.pwd,
+                                                 self.host,
+                                                 self.export_dir,
+                                                 CanvasPrep.tables,
+                                                 self.logging_level,
+                                                 self.export_options
+                                                 ),
+                                           name='AuxTableExporter'
+                                           )
+        exporter.start()
+        self.log_info(f"Started exporter; tables will be copied to {self.export_dir} as they are built.")
+        return exporter
+
+    #-------------------------
+    # finish_pipeline_exporter 
+    #--------------
+    
+    def finish_pipeline_exporter(self, exporter):
+        '''
+        Tell the exporter that no more tables are
+        coming, and wait for it to copy the tables
+        it already received. A nonzero exit code of the
+        exporter is noted in the run's stage record; run()
+        raises TableExportError for it.
+        
+        @param exporter: process started by start_pipeline_exporter()
+        @type exporter: multiprocessing.Process
+        '''
+        # The None is the end-of-tables signal:
+        self.table_done_queue.put(None)
+        self.log_info("Waiting for exporter to finish copying tables...")
+        exporter.join()
+        self.table_done_queue = None
+        if exporter.exitcode != 0:
+            msg = f"Exporter process ended with exit code {exporter.exitcode}."
+            self.log_err(msg)
+            if self.stage_record is not None:
+                self.stage_record.note_error(msg)
+        else:
+            self.log_info("Done waiting for exporter.")
+
+    #-------------------------
+    # run_pipeline_exporter 
+    #--------------
+    
+    @staticmethod
+    def run_pipeline_exporter(table_queue, user, db_pwd, host, export_dir, tables, logging_level, export_options):
+        '''
+        Body of the exporter process. Copies tables whose
+        names arrive in table_queue until a None arrives.
+        Exits with code 1 if any table could not be copied.
+        
+        @param table_queue: queue of freshly built table names
+        @type table_queue: multiprocessing.Queue
+        @param user: MySQL user
+        @type user: str
+        @param db_pwd: MySQL password
+        @type db_pwd: str
+        @param host: MySQL host
+        @type host: str
+        @param export_dir: directory for the .tsv and schema files
+        @type export_dir: str
+        @param tables: tables that are being built
+        @type tables: [str]
+        @param logging_level: how much logging to do.
+        @type logging_level: logging.{INFO|WARNING|ERROR|DEBUG|CRITICAL|NOTSET}
+        @param export_options: keyword arguments for the AuxTableCopier
+        @type export_options: {str : <any>}
+        '''
+        # The metadata cache inherited from the builder
+        # predates the tables it is about to build:
+        Utilities.schema_cache.clear()
+        copier = AuxTableCopier(user=user,
+                                db_pwd=db_pwd,
+                                host=host,
+                                dest_dir=export_dir,
+                                tables=tables,
+                                logging_level=logging_level,
+                                **export_options
+                                )
+        copy_result = copier.copy_tables_as_built(table_queue)
+        if not copy_result.no_errors():
+            sys.exit(1)
+        
     #-------------------------
     # log_table_creation 
     #--------------
     
-    def log_table_creation(self, tbl_nm):
+    def log_table_creation(self, tbl_nm, num_rows=None, duration_secs=None):
         '''
-        Make an entry in table table_refresh_log, indicating
+        Make an entry in the LoadLog table, indicating
         that the given table name was refreshed at the given
-        date and time. Also adds the new table's number of rows.
+        date and time. Also records the new table's number of rows,
+        how long the build took, the table's data and index
+        sizes, and this run's id.
         
         @param tbl_nm: name of table that was refreshed
         @type tbl_nm: str
+        @param num_rows: rows in the table, usually counted by 
+            build_table(). If None, the rows are counted here.
+        @type num_rows: {None | int}
+        @param duration_secs: time it took to build the table
+        @type duration_secs: {None | float}
+        @return: the table's data and index bytes
+        @rtype: (int, int)
         '''
 
         # For convenience:
         load_log_tbl_nm = CanvasPrep.log_table_name
         curr_db_schema = self.db.dbName()
         
-        # The information schema is updated lazily. Any
-        # changes, such as addition of rows, or table creation
-        # won't show in information_schema, unless one first
-        # runs 'ANALYZE TABLE <tbl_name'
-        
-        self.db.execute(f'ANALYZE TABLE {tbl_nm}')
-        
         self.utils.ensure_load_log_table_existence(load_log_tbl_nm, self.db)
         
-        # Find number of rows in table:
-        res = self.db.query(f'''SELECT COUNT(*) FROM {tbl_nm}''')
-        num_rows = res.next()
+        if num_rows is None:
+            res = self.db.query(f'''SELECT COUNT(*) FROM {tbl_nm}''')
+            num_rows = res.next()
+        
+        # Sizes are the server's statistics; exact for the 
+        # MyISAM aux tables, estimates for InnoDB. They are
+        # current, b/c the session does not cache them (see
+        # Utilities.optional_session_settings):
+        (data_bytes, index_bytes) = self.db.query(f'''SELECT data_length, index_length
+                                                        FROM information_schema.tables
+                                                       WHERE table_schema = '{curr_db_schema}'
+                                                         AND table_name = '{tbl_nm}'
+                                                   ''').next()
              
         # Make the entry:
-        (err, _warn) = self.db.execute(f'''INSERT INTO {curr_db_schema}.{load_log_tbl_nm} (tbl_name, num_rows)
-                                                VALUES('{tbl_nm}', {num_rows})
-                                                ''')
+        (err, _warn) = self.db.execute(LoadLog.insert_cmd(curr_db_schema,
+                                                          tbl_nm,
+                                                          num_rows,
+                                                          duration_secs=duration_secs,
+                                                          data_bytes=data_bytes,
+                                                          index_bytes=index_bytes,
+                                                          run_id=self.run_id))
         if err is not None:
             raise DatabaseError(f"Cannot insert {tbl_nm}'s entry into load log {load_log_tbl_nm}: {repr(err)}")
+        return (data_bytes, index_bytes)
         
+    #-------------------------
+    # rollup_load_log 
+    #--------------
+    
+    def rollup_load_log(self, days=None):
+        '''
+        Condense LoadLog entries older than the given number
+        of days into daily summaries in LoadLogDaily.
+        
+        @param days: age of entries to roll up. Default: 
+            LoadLog.ROLLUP_AFTER_DAYS
+        @type days: int
+        '''
+        for rollup_cmd in LoadLog.rollup_cmds(self.target_db, days):
+            (err, _warn) = self.db.execute(rollup_cmd)
+            if err is not None:
+                self.log_warn(f"Could not roll up old load log entries: {repr(err)}")
+                return
+        self.utils.schema_cache.table_created(self.target_db, LoadLog.daily_table_name)
+
     #-------------------------
     # pull_explore_courses 
     #--------------
@@ -683,42 +986,26 @@ class CanvasPrep(object):
 #             self.log_warn(f"Cannot set global log_bin_trus_function_creators: {repr(err)}")
         
         
-        # At least for MySQL 8.x we need to allow zero dates,
-        # like '0000-00-00 00:00:00', which is found in the Canvas db:
-        
-        (err, _warn) = self.db.execute('SET sql_mode="ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES,ERROR_FOR_DIVISION_BY_ZERO,NO_ENGINE_SUBSTITUTION";')
-        if err is not None:
-            self.log_warn(f"Cannot set sql_mode: {repr(err)}")
+        # The time zone and sql_mode (which must allow zero 
+        # dates, like '0000-00-00 00:00:00', which are found in 
+        # the Canvas db) are set for every session by
+        # Utilities.log_into_mysql(). 
         
         
         # Ensure that all the handy SQL functions are available.
-        # They are in file canvasMysqlProcs.sql. The file is imported
-        # into a db (a.k.a. MySQL schema) via "SOURCE <path-to-sql-file>" 
-        # We cannot use the usual self.db.execute(), b/c SOURCE is a
-        # MySQL shell directive, not an SQL command. So must use the
-        # call_mysql.sh script for the call
+        # They are in file canvasMysqlProcs.sql. RoutineInstaller
+        # splits the file into statements the way the mysql client
+        # would for a SOURCE directive, and runs them through our
+        # own session. It skips the work if the file is unchanged
+        # since the last install, and all its routines still exist:
         
-        # Location of .sql file, and command string:
         funcs_file = os.path.join(self.curr_dir, 'canvasMysqlProcs.sql')
-        source_cmd = f'SOURCE {funcs_file}'
-        
-        # Location of call_mysql.sh script:
-        shell_script = os.path.join(os.path.dirname(__file__), 'call_mysql.sh')
-        
-        # Get full path to mysql command:
-        mysql_path = self.utils.get_mysql_path()
-        src_load_stmt_arr =[shell_script,
-                            self.host,
-                            self.user, 
-                            self.pwd_file_pointer,
-                            self.target_db,
-                            mysql_path,
-                            '/dev/null',
-                            source_cmd
-                            ] 
-        _completed_process = subprocess.run(src_load_stmt_arr, 
-                                            #capture_output=True, # Only for debugging 
-                                            shell=False)
+        installer  = RoutineInstaller(self.db, self.target_db, funcs_file)
+        if installer.install():
+            self.utils.schema_cache.table_created(self.target_db, RoutineInstaller.version_table)
+            self.log_info(f"Installed {len(installer.routines)} routines from {installer.script_name}.")
+        else:
+            self.log_info(f"Routines from {installer.script_name} are current; not re-installed.")
 
     #-------------------------
     # save_table_done_dict 
@@ -779,6 +1066,85 @@ class CanvasPrep(object):
         
         utils.print_columns(tables, '\nTables that can be created:')
     
+    #------------------------------------
+    # list_impacted_tables 
+    #-------------------    
+
+    @classmethod
+    def list_impacted_tables(cls, raw_spec, user, db_pwd, host, target_db, out_fd=sys.stdout):
+        '''
+        Print the aux tables that must be rebuilt when the 
+        given raw Canvas table (or table column) changed, in
+        build order, with the estimated time for each, and in 
+        total. Estimates come from the LoadLog history. If the
+        database cannot be reached, the tables are listed 
+        without estimates.
+        
+        @param raw_spec: raw table, such as 'submission_fact', or
+            table and column, such as 'submission_fact.score'
+        @type raw_spec: str
+        @param user: mysql user
+        @type user: str
+        @param db_pwd: mysql password, True to ask for it, or None
+            to read it from the password file
+        @type db_pwd: {None | bool | str}
+        @param host: MySQL host
+        @type host: str
+        @param target_db: database holding LoadLog
+        @type target_db: str
+        @param out_fd: where to write the report
+        @type out_fd: file-like
+        '''
+        (impacted, direct) = QuerySorter().tables_impacted_by(raw_spec)
+        if len(impacted) == 0:
+            out_fd.write(f"No aux table reads {raw_spec}.\n")
+            return
+        
+        utils = Utilities()
+        estimates = {}
+        try:
+            if db_pwd is None or db_pwd == True:
+                db_pwd = utils.get_db_pwd(host, ask_user=db_pwd == True)
+            db = utils.log_into_mysql(user, db_pwd, db=target_db, host=host)
+            try:
+                if utils.table_exists(CanvasPrep.log_table_name, db):
+                    # Load logs written before build durations were 
+                    # recorded lack the duration_secs column:
+                    col_names = [col[0] for col in utils.schema_cache.columns(db, target_db, CanvasPrep.log_table_name)]
+                    duration_col = 'duration_secs' if 'duration_secs' in col_names else 'NULL'
+                    load_log_content = [{'tbl_name' : tbl_name, 
+                                         'time_refreshed' : time_refreshed,
+                                         'duration_secs' : duration_secs}
+                                        for (tbl_name, time_refreshed, duration_secs) 
+                                        in db.query(f'''SELECT tbl_name, time_refreshed, {duration_col}
+                                                          FROM {CanvasPrep.log_table_name}''')]
+                    estimates = LoadHistoryLister.estimate_table_durations(load_log_content)
+            finally:
+                db.close()
+        except Exception as e:
+            out_fd.write(f"No time estimates (cannot read load log: {repr(e)})\n")
+            
+        out_fd.write(f"\nAux tables to rebuild after changes to {raw_spec}:\n\n")
+        out_fd.write(f"{'Table Name':>30} {'Reads it':^10} {'Est. Time':>10}\n")
+        total_secs = 0
+        num_unknown = 0
+        for tbl_nm in impacted:
+            reads_it = 'yes' if tbl_nm in direct else ''
+            secs = estimates.get(tbl_nm, None)
+            if secs is None:
+                num_unknown += 1
+                time_str = '?'
+            else:
+                total_secs += secs
+                time_str = str(datetime.timedelta(seconds=round(secs)))
+            out_fd.write(f"{tbl_nm:>30} {reads_it:^10} {time_str:>10}\n")
+        
+        total_str = str(datetime.timedelta(seconds=round(total_secs)))
+        out_fd.write(f"\n{len(impacted)} table(s); estimated total: {total_str}")
+        if num_unknown > 0:
+            out_fd.write(f" plus {num_unknown} table(s) without timing history")
+        out_fd.write("\n")
+
     #-------------------------
     # get_queries_dir 
     #--------------
@@ -915,6 +1281,13 @@ if __name__ == '__main__':
                         action='store_true',
                         default=False);
                         
+    parser.add_argument('-i', '--impacted-by',
+                        dest='impacted_by',
+                        help='list the aux tables that need rebuilding after the given\n' +
+                             'raw Canvas table (or table.column) changed, with estimated\n' +
+                             'build times. Example: --impacted-by submission_fact',
+                        default=None)
+                        
     parser.add_argument('-n', '--newonly',
                         help="only create tables that don't already exist; default: false",
                         action='store_true',
@@ -963,11 +1336,21 @@ if __name__ == '__main__':
                         action='store_true',
                         default=False);
                         
+    parser.add_argument('-x', '--exportdir',
+                        help='if present, export each table as .tsv to this directory\n' +
+                             'as soon as it is built (pipeline mode). Default: no export',
+                        default=None)
+    
+    # How --exportdir exports the tables:
+    AuxTableCopier.add_export_arguments(parser, short_options=False)
+                        
 #     parser.add_argument('-y', '--dryrun',
 #                         help='if present, only print what would be done. Default: False',
 #                         action='store_true',
 #                         default=False);
 
+    StageProfiler.add_arguments(parser)
+
     args = parser.parse_args();
 
     # Just wants list of tables?
@@ -975,17 +1358,34 @@ if __name__ == '__main__':
         CanvasPrep.list_tables()
         sys.exit()
 
+    # Just wants to know what a raw table change affects?
+    if args.impacted_by is not None:
+        CanvasPrep.list_impacted_tables(args.impacted_by,
+                                        args.user,
+                                        args.password,
+                                        args.host,
+                                        args.database)
+        sys.exit()
+
+    profiler = StageProfiler.from_args(parser.prog, args)
     try:
-        CanvasPrep(user=args.user,
-                   db_pwd=args.password,
-                   host=args.host,
-                   target_db=args.database,
-                   tables=args.table,
-                   excludes=args.excludes,
-                   new_only=args.newonly,
-                   skip_backups=args.skipbackup,
-                   #dryrun=args.dryrun,
-                   logging_level=logging.ERROR if args.quiet else logging.INFO  
-                   ).run()
+        with StageProfiler.stage('setup'):
+            canvas_prep = CanvasPrep(user=args.user,
+                                     db_pwd=args.password,
+                                     host=args.host,
+                                     target_db=args.database,
+                                     tables=args.table,
+                                     excludes=args.excludes,
+                                     new_only=args.newonly,
+                                     skip_backups=args.skipbackup,
+                                     export_dir=args.exportdir,
+                                     export_options=AuxTableCopier.export_options_from_args(args),
+                                     #dryrun=args.dryrun,
+                                     logging_level=logging.ERROR if args.quiet else logging.INFO  
+                                     )
+        canvas_prep.run()
     except KeyboardInterrupt:
-        print("\nCanvas aux table generation stopped by user.")
\ No newline at end of file
+        print("\nCanvas aux table generation stopped by user.")
+    finally:
+        if profiler is not None:
+            profiler.finish()
\ No newline at end of file
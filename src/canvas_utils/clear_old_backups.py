@@ -9,7 +9,14 @@ import argparse
 import logging
 import os
 import sys
+import time
 
+from pymysql_utils.pymysql_utils import Cursors
+
+from backup_archive import BackupArchive
+from backup_catalog import BackupCatalog
+from prom_metrics import MetricsFile
+from size_spec import SizeSpec
 from utilities import Utilities
 from config_info import ConfigInfo
 
@@ -21,6 +28,10 @@ class BackupRemover(object):
     '''
 
     default_num_backups_to_keep = 2
+    
+    # Max number of tables named in one DROP TABLE statement:
+    drop_batch_size = 100
+    
     #------------------------------------
     # Constructor 
     #-------------------    
@@ -32,6 +43,11 @@ class BackupRemover(object):
                  target_db=None, 
                  host=None,
                  tables=[],
+                 max_table_bytes=None,
+                 max_schema_bytes=None,
+                 dryrun=False,
+                 archive_dir=None,
+                 backup_db=None,
                  logging_level=logging.INFO,
                  unittests=False):
         '''
@@ -42,6 +58,21 @@ class BackupRemover(object):
         The num_to_keep integer value declares how many
         of the newest backup tables to keep for each table.
         
+        Optionally, space is limited as well: max_table_bytes
+        limits the space taken by the backups of each table,
+        and max_schema_bytes limits the space taken by all
+        backups together. The oldest backups are removed first.
+        A backup is removed if any of the policies calls for it.
+        Sizes are taken from information_schema (data_length
+        plus index_length).
+        
+        If archive_dir is provided, backups are not simply
+        dropped: each is first written to a compressed archive
+        with its CREATE TABLE statement and a manifest (see
+        backup_archive.py). Only successfully archived backups
+        are dropped. Archives can be restored with 
+        restore_tables.py --archive.
+        
         The tables list of table names may contain a mix
         of table root names (e.g. AssignmentSubmission, Terms),
         and backup table names (e.g. Terms_2019_01_10_14_14_40_123456)
@@ -65,6 +96,22 @@ class BackupRemover(object):
         @param tables: list of specific tables to consider. If None,
             backups for all aux tables are trimmed. 
         @type tables: [str]
+        @param max_table_bytes: if provided, the maximum number of
+            bytes the backups of each table may occupy
+        @type max_table_bytes: int
+        @param max_schema_bytes: if provided, the maximum number of
+            bytes all backups together may occupy
+        @type max_schema_bytes: int
+        @param dryrun: if True, only print how much space each 
+            retention policy would reclaim. Nothing is removed.
+        @type dryrun: bool
+        @param archive_dir: if provided, directory where backups
+            are archived before they are dropped
+        @type archive_dir: str
+        @param backup_db: schema where the backups reside. Default:
+            the backup db configured for target_db. See 
+            Utilities.get_backup_db()
+        @type backup_db: str
         @param logging_level: how much information to provide during runtime
         @type logging_level: logging.loglevel
         @param unittests: whether this instantiation is from a unittest
@@ -93,11 +140,20 @@ class BackupRemover(object):
 
         self.target_db = target_db
         
+        if backup_db is None:
+            backup_db = self.utils.get_backup_db(target_db)
+        self.backup_db = backup_db
+        
         if num_to_keep is None:
             self.num_to_keep = BackupRemover.default_num_backups_to_keep
         else:
             self.num_to_keep = num_to_keep
             
+        self.max_table_bytes  = max_table_bytes
+        self.max_schema_bytes = max_schema_bytes
+        self.dryrun           = dryrun
+        self.archive_dir      = archive_dir
+            
         # Better name for tables to consider removing:
         tables_to_consider = tables
         
@@ -111,14 +167,16 @@ class BackupRemover(object):
             self.db_name = target_db
             return
         
-        # Get names of all tables in the target_db
-        all_tables = self.utils.get_existing_tables_in_dir(self.db_obj, return_all=True, target_db=target_db)
+        # Get names and sizes of all tables in the backup db
+        # with a single information_schema query:
+        table_sizes = BackupCatalog.read_table_sizes(self.db_obj, self.backup_db)
+        all_tables  = list(table_sizes.keys())
         
         # If caller specified only specific tables/backup tables to 
         # remove, week out all table names not in caller's list:
         all_tables_to_consider = self.find_tables_to_consider(all_tables, tables_to_consider)
         
-        self.remove_old_backups(all_tables_to_consider)
+        self.remove_old_backups(all_tables_to_consider, table_sizes)
         self.close()
 
     #-------------------------
@@ -176,65 +234,257 @@ class BackupRemover(object):
     # remove_old_backups 
     #--------------
         
-    def remove_old_backups(self, all_table_names):
+    def remove_old_backups(self, all_table_names, table_sizes=None):
         '''
         Given a list of aux table names, find the backup 
         tables among them. Then delete all but the newest
-        self.num_to_keep backup tables from the database. 
+        self.num_to_keep backup tables from the database.
+        If space limits were specified, more old backups
+        may be removed to meet those limits.
+        
+        In dryrun mode, only print a report of what each
+        retention policy would reclaim.
         
         @param all_table_names: list of table names to consider removing.
         @type all_table_names: [str]
+        @param table_sizes: map from table name to bytes occupied.
+            Needed if space limits are to be enforced.
+        @type table_sizes: {str : int}
+        @return: names of removed backup tables, or of tables that
+            would be removed in dryrun mode
+        @rtype: [str]
+        '''
+        
+        # Parse all names once, indexing backups
+        # by their root table, sorted by date:
+        catalog = BackupCatalog(self.utils.tables, all_table_names, table_sizes)
+        
+        policy_removals = self.plan_removals(catalog)
+        to_delete = policy_removals['combined']
+        
+        if self.dryrun:
+            self.print_space_report(catalog, policy_removals)
+            return to_delete
+        
+        if self.archive_dir is not None:
+            # Only drop what made it to the archive:
+            to_delete = self.archive_tables(to_delete)
+        
+        num_dropped = self.drop_tables(to_delete)
+        self.utils.log_info(f"In {self.backup_db}: removed {num_dropped} old backup tables, " +
+                            f"{SizeSpec.human_readable(catalog.total_size(to_delete))}; " +
+                            f"no more than {self.num_to_keep} backup tables left per table.")
+        self.write_metrics(num_dropped, catalog.total_size(to_delete), succeeded=num_dropped == len(to_delete))
+        return to_delete
+
+    #-------------------------
+    # write_metrics
+    #--------------
+    
+    def write_metrics(self, num_dropped, dropped_bytes, succeeded=True):
         '''
+        Write the number and bytes of the backups left for
+        each table, and what this run removed, for node_exporter's
+        textfile collector (see prom_metrics.py). The backups
+        left are read anew, since some drops may have failed.
+        Metrics that cannot be written are only logged.
         
-        # Map table name --> list of its backups
-        backup_tables = {}
+        @param num_dropped: number of backups removed by this run
+        @type num_dropped: int
+        @param dropped_bytes: bytes the removed backups occupied
+        @type dropped_bytes: int
+        @param succeeded: whether all planned removals succeeded,
+            which updates the last-success timestamp
+        @type succeeded: bool
+        '''
+        metrics = MetricsFile('clear_old_backups')
+        if metrics.metrics_dir is None:
+            return
+        try:
+            catalog = BackupCatalog.from_db(self.db_obj, self.backup_db, self.utils.tables)
+            for root_nm in catalog.roots:
+                backups = catalog.backups(root_nm)
+                metrics.add('canvas_utils_backup_tables', len(backups),
+                            'Backups kept of the table.', table=root_nm)
+                metrics.add('canvas_utils_backup_bytes', catalog.total_size(backups),
+                            'Bytes occupied by the backups of the table.', table=root_nm)
+            metrics.add('canvas_utils_backups_removed', num_dropped,
+                        'Backups removed by the latest cleanup.')
+            metrics.add('canvas_utils_backup_bytes_removed', dropped_bytes,
+                        'Bytes reclaimed by the latest cleanup.')
+            if succeeded:
+                metrics.add('canvas_utils_backup_cleanup' + MetricsFile.LAST_SUCCESS_SUFFIX, time.time(),
+                            'When backups were last cleaned up without errors.')
+            metrics_path = metrics.write()
+        except (IOError, OSError) as e:
+            self.utils.log_warn(f"Could not write backup metrics: {repr(e)}")
+            return
+        if metrics_path is not None:
+            self.utils.log_info(f"Wrote metrics {metrics_path}.")
+
+    #-------------------------
+    # plan_removals
+    #--------------
+    
+    def plan_removals(self, catalog):
+        '''
+        Determine which backups each active retention policy 
+        would remove by itself, and which would be removed
+        when all policies are applied together. The schema-wide 
+        space limit is applied last, to the backups that the
+        other policies retain.
+        
+        @param catalog: backups under consideration
+        @type catalog: BackupCatalog
+        @return: map from policy name to backup names. Policies
+            are 'count', 'table bytes', 'schema bytes', and 'combined'.
+            The inactive size policies are absent.
+        @rtype: {str : [str]}
+        '''
+        removals = {'count' : []}
+        if self.max_table_bytes is not None:
+            removals['table bytes'] = []
+        
+        for root_nm in catalog.roots:
+            removals['count'].extend(catalog.keep_n(root_nm, self.num_to_keep)[1])
+            if self.max_table_bytes is not None:
+                removals['table bytes'].extend(catalog.keep_bytes(root_nm, self.max_table_bytes)[1])
+
+        combined = set(removals['count'])
+        if self.max_table_bytes is not None:
+            combined.update(removals['table bytes'])
+        
+        if self.max_schema_bytes is not None:
+            removals['schema bytes'] = catalog.schema_excess(self.max_schema_bytes)
+            combined.update(catalog.schema_excess(self.max_schema_bytes, already_removed=combined))
         
-        for tbl_nm in all_table_names:
-            if self.utils.is_aux_table(tbl_nm):
-                # Found root of an official table name.
-                # (as apposed to a backup table)
-                if tbl_nm not in backup_tables:
-                    # Initialize an entry for this tbl:
-                    backup_tables[tbl_nm] = []
+        # Oldest first, so that an interrupted run leaves
+        # the newest backups in place:
+        removals['combined'] = sorted(combined, key=lambda backup_nm: catalog.components(backup_nm)[2])
+        return removals
+
+    #-------------------------
+    # archive_tables
+    #--------------
+    
+    def archive_tables(self, table_names):
+        '''
+        Write each of the given tables to a compressed
+        archive in self.archive_dir. Rows are streamed from
+        the server with an unbuffered cursor, so even large
+        backups are not held in memory. Failures are logged,
+        and the table is left out of the returned list.
+        
+        @param table_names: backup tables to archive
+        @type table_names: [str]
+        @return: names of the tables that were archived
+        @rtype: [str]
+        '''
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archived = []
+        for table_name in table_names:
+            try:
+                (_tbl, create_stmt) = self.db_obj.query(f"SHOW CREATE TABLE {self.backup_db}.{table_name}").next()
+                col_info = [(col_name, col_type) for (col_name, col_type) in self.db_obj.query(f'''
+                                SELECT column_name, data_type
+                                  FROM information_schema.columns
+                                 WHERE table_schema = '{self.backup_db}'
+                                   AND table_name = '{table_name}'
+                                 ORDER BY ordinal_position;
+                                ''')]
+                col_names = [col_name for (col_name, _col_type) in col_info]
+                col_types = [col_type for (_col_name, col_type) in col_info]
+                rows = self.db_obj.query(f"SELECT * FROM {self.backup_db}.{table_name}",
+                                         cursor_class=Cursors.SS_CURSOR)
+                archive = BackupArchive.write(self.archive_dir,
+                                              table_name,
+                                              create_stmt,
+                                              col_names,
+                                              col_types,
+                                              rows,
+                                              db_schema=self.backup_db,
+                                              session_settings=self.utils.session_settings)
+            except Exception as e:
+                self.utils.log_err(f"Could not archive backup table {table_name}; not removing it: {repr(e)}")
                 continue
-            # Is it a backup table name?
-            if self.utils.is_backup_name(tbl_nm):
-                # Get root of the backup table name:
-                root_nm = self.utils.get_root_name(tbl_nm)
-                # Add to dict:
-                try:
-                    backup_tables[root_nm].append(tbl_nm)
-                except KeyError:
-                    # Hadn't seen this root table yet:
-                    backup_tables[root_nm] = [tbl_nm]
-        
-        # Go through dict; for each table, sort its existing backup tables
-        # by their dates, which are part of the names:
+            self.utils.log_info(f"Archived {archive.num_rows} rows of {table_name} to {archive.archive_path}")
+            archived.append(table_name)
+        return archived
 
-        # We'll modify backup_tables in the following
-        # loop, so use a copy:
-        backup_tables_copy = backup_tables.copy()
-        
-        for (tbl_nm, backup_names_list) in backup_tables_copy.items():
-            # Sort the backup tbl names by their date, newest first:
-            sorted_backups = sorted(backup_names_list, 
-                                    key=lambda name: self.get_date(name),
-                                    reverse=True)
-            backup_tables[tbl_nm] = sorted_backups
-            
-        # Go through, and remove all but the first num_to_keep 
-        # backup tables in each list:
-        for backup_nm_list in backup_tables.values():
-            # Chop off all names after the first num_to_keep names,
-            # unless the name list is shorter than num_to_keep,
-            # in which case we keep what we have:
-            if len(backup_nm_list) <= self.num_to_keep:
+    #-------------------------
+    # drop_tables
+    #--------------
+    
+    def drop_tables(self, table_names):
+        '''
+        Drop the given tables, naming up to drop_batch_size
+        of them in each DROP TABLE statement, rather than 
+        issuing one statement per table.
+        
+        @param table_names: tables to drop
+        @type table_names: [str]
+        @return: number of tables dropped
+        @rtype: int
+        '''
+        num_dropped = 0
+        for batch in self.utils.list_chopper(table_names, BackupRemover.drop_batch_size):
+            qualified_names = [f"{self.backup_db}.{table_name}" for table_name in batch]
+            drop_cmd = f"DROP TABLE IF EXISTS {', '.join(qualified_names)};"
+            (err, _warn) = self.db_obj.execute(drop_cmd)
+            if err is not None:
+                self.utils.log_err(f"Could not remove backup tables {batch}: {repr(err)}")
+                self.utils.schema_cache.invalidate(self.backup_db)
                 continue
-            for to_delete in backup_nm_list[self.num_to_keep:]:
-                self.db_obj.dropTable(to_delete)
-                self.utils.log_info(f"Removing old backup table {to_delete}")
+            self.utils.schema_cache.note_statement(drop_cmd, self.backup_db)
+            num_dropped += len(batch)
+            self.utils.log_info(f"Removed old backup tables {', '.join(batch)}")
+        return num_dropped
+
+    #-------------------------
+    # print_space_report
+    #--------------
+    
+    def print_space_report(self, catalog, policy_removals, out_fd=sys.stdout):
+        '''
+        Print, for each table with backups, how many backups
+        and bytes each retention policy would remove:
         
-        self.utils.log_info(f"In {self.target_db}: no more than {self.num_to_keep} backup tables left per table.")
+          Table                  Backups      Size    count          table bytes    combined
+          AssignmentSubmissions        5    41.2G     3 /  24.7G     4 /  33.0G     4 /  33.0G
+          ...
+          All tables                  40    45.1G    ...
+        
+        @param catalog: backups under consideration
+        @type catalog: BackupCatalog
+        @param policy_removals: result of plan_removals()
+        @type policy_removals: {str : [str]}
+        @param out_fd: where to write the report
+        @type out_fd: file-like
+        '''
+        policies = list(policy_removals.keys())
+        
+        out_fd.write(f"Backup space in {self.backup_db}; nothing was removed (dry run):\n")
+        if self.archive_dir is not None:
+            out_fd.write(f"Backups in the 'combined' column would first be archived to {self.archive_dir}.\n")
+        out_fd.write('\n')
+        header = f"{'Table':<30}{'Backups':>8}{'Size':>10}"
+        for policy in policies:
+            header += f"   {policy:<16}"
+        out_fd.write(header + '\n')
+        
+        removal_sets = {policy : set(names) for (policy, names) in policy_removals.items()}
+        for root_nm in sorted(catalog.roots) + [None]:
+            if root_nm is None:
+                row_label = 'All tables'
+                backups = [backup_nm for root in catalog.roots for backup_nm in catalog.backups(root)]
+            else:
+                row_label = root_nm
+                backups = catalog.backups(root_nm)
+            row = f"{row_label:<30}{len(backups):>8}{SizeSpec.human_readable(catalog.total_size(backups)):>10}"
+            for policy in policies:
+                removed = [backup_nm for backup_nm in backups if backup_nm in removal_sets[policy]]
+                row += f"   {len(removed):>5} / {SizeSpec.human_readable(catalog.total_size(removed)):>8}"
+            out_fd.write(row + '\n')
 
     #-------------------------
     # get_date
@@ -298,7 +548,42 @@ if __name__ == '__main__':
                              f'to be placed. Default: {config_info.canvas_db_aux}',
                         default=f'{config_info.canvas_db_aux}')
     
+    parser.add_argument('-b', '--backupdb',
+                        help='MySQL/Aurora database (schema) where the backups reside.\n' +
+                             f'Default: {config_info.canvas_db_backup}',
+                        default=None)
+    
+    parser.add_argument('-s', '--maxtablesize',
+                        help='Maximum space the backups of each table may occupy, such as 20G\n' +
+                             f'({SizeSpec.UNITS_HELP}). Oldest backups beyond that\n' +
+                             'size are removed. Default: no limit',
+                        default=None)
+    
+    parser.add_argument('-a', '--maxallsize',
+                        help='Maximum space all backups together may occupy, such as 200G\n' +
+                             f'({SizeSpec.UNITS_HELP}). Oldest backups beyond that\n' +
+                             'size are removed. Default: no limit',
+                        default=None)
+    
+    parser.add_argument('-y', '--dryrun',
+                        help='Only report how much space each policy would reclaim; remove nothing.',
+                        action='store_true',
+                        default=False)
+    
+    parser.add_argument('-r', '--archive',
+                        help='Archive mode: before removing backups, write each to a compressed\n' +
+                             'archive in the given directory. Restore with restore_tables.py --archive.',
+                        default=None)
+    
     args = parser.parse_args();
+    
+    try:
+        max_table_bytes  = None if args.maxtablesize is None else SizeSpec.parse(args.maxtablesize)
+        max_schema_bytes = None if args.maxallsize is None else SizeSpec.parse(args.maxallsize)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+        
     try:    
         BackupRemover(args.num_to_keep,
                       user=args.user,
@@ -306,6 +591,11 @@ if __name__ == '__main__':
                       target_db=args.database, 
                       host=args.host,
                       tables=args.table,
+                      max_table_bytes=max_table_bytes,
+                      max_schema_bytes=max_schema_bytes,
+                      dryrun=args.dryrun,
+                      archive_dir=args.archive,
+                      backup_db=args.backupdb,
                       logging_level=logging.INFO,
                       unittests=False)
     except KeyboardInterrupt:
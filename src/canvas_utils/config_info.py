@@ -63,6 +63,10 @@ class ConfigInfo(object):
     def canvas_db_aux(self):
         return self._canvas_db_aux
     
+    @property
+    def canvas_db_backup(self):
+        return self._canvas_db_backup
+    
     @property
     def raw_data_db(self):
         return self._raw_data_db
@@ -87,6 +91,14 @@ class ConfigInfo(object):
     def oracle_tbl_dest_dir(self):
         return self._oracle_tbl_dest_dir
 
+    @property
+    def run_report_dir(self):
+        return self._run_report_dir
+
+    @property
+    def metrics_dir(self):
+        return self._metrics_dir
+
     #-------------------------
     # read_config_file 
     #--------------
@@ -122,6 +134,13 @@ class ConfigInfo(object):
         except KeyError:
             raise ConfigurationError(f"Cannot read DATABASE:canvas_auxiliary_db_name from {setup_file_name}")  
 
+        try:
+            self._canvas_db_backup = config_parser['DATABASE']['canvas_backup_db_name']
+        except KeyError:
+            # For this we have a default: backups live
+            # next to the aux tables:
+            self._canvas_db_backup = self._canvas_db_aux
+
         try:
             self._raw_data_db = config_parser['DATABASE']['raw_data_db']
         except KeyError:
@@ -153,6 +172,18 @@ class ConfigInfo(object):
             # For this we have a default:
             self._oracle_tbl_dest_dir = '/tmp'
             
+        try:
+            self._run_report_dir = config_parser['REPORTS']['run_report_dir']
+        except KeyError:
+            # For this we have a default:
+            self._run_report_dir = os.path.join(os.path.expanduser('~'), 'run_reports')
+            
+        try:
+            self._metrics_dir = config_parser['REPORTS']['metrics_dir']
+        except KeyError:
+            # No metrics unless asked for:
+            self._metrics_dir = None
+            
         try:
             self._admin_email_recipient = config_parser['EMAIL']['admin_email_recipient']
         except KeyError:
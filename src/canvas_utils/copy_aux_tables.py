@@ -10,14 +10,26 @@ import collections.abc
 import datetime
 import logging
 import os
+import socket
 import sys
 from subprocess import PIPE
 import subprocess
+import time
 from pathlib import Path
 
 from canvas_utils_exceptions import DatabaseError
 from config_info import ConfigInfo
+from export_manifest import ExportManifest, TsvSharder
+from load_log import LoadLog
+from prom_metrics import MetricsFile
 from query_sorter import TableError
+from row_encoder import RowEncoder
+from run_record import StageRecord
+from run_stats import RunStats
+from session_pool import SessionPool
+from size_spec import SizeSpec
+from stage_profiler import StageProfiler
+from tsv_sanitizer import TsvSanitizer
 from utilities import Utilities
 
 class AuxTableCopier(object):
@@ -40,6 +52,21 @@ class AuxTableCopier(object):
     # when a table needs to be pulled in batches
     # via an auto-increment seq number:
     SEQ_NUM_BATCH_SIZE = 50000
+    
+    # Host names under which the MySQL server is on
+    # this machine, and can thus write into dest_dir
+    # with SELECT ... INTO OUTFILE:
+    LOCAL_HOST_NAMES = ['localhost', '127.0.0.1', '::1']
+    
+    # Values noted for each table in the stage
+    # record that are exported as metrics:
+    table_metrics = {'export_secs'   : ('canvas_utils_export_seconds', 'Seconds it took to export the table.'),
+                     'rows'          : ('canvas_utils_export_rows', 'Rows exported.'),
+                     'bytes'         : ('canvas_utils_export_bytes', 'Bytes of the export file(s).'),
+                     'bytes_per_sec' : ('canvas_utils_export_bytes_per_second', 'Export throughput.')
+                     }
+    table_success_metric = ('canvas_utils_export_last_success_timestamp_seconds',
+                            'When the table was last exported successfully.')
         
     #-------------------------
     # Constructor 
@@ -53,6 +80,12 @@ class AuxTableCopier(object):
                  overwrite_existing=True,
                  tables=None,    # Default: all tables are copied 
                  copy_format='csv', 
+                 server_side_export=None,
+                 python_export=False,
+                 max_shard_size=None,
+                 header_in_all_shards=True,
+                 sanitize_text=False,
+                 null_replacement=None,
                  logging_level=logging.INFO,
                  unittests=False,
                  unittest_db_name=None
@@ -74,6 +107,34 @@ class AuxTableCopier(object):
         @type tables: [str]
         @param copy_format: whether to copy as mysqldump or csv
         @type copy_format: {'sql' | 'csv'}
+        @param server_side_export: whether to have the MySQL server write
+            the .tsv files itself via SELECT ... INTO OUTFILE, rather than
+            streaming rows through the mysql client. None: use server side
+            export if the server runs on this machine, and its secure_file_priv
+            setting allows writing to dest_dir. True: always try server side
+            export first. False: never use it. Whenever the server refuses,
+            the copier falls back to client side streaming.
+        @type server_side_export: {None | bool}
+        @param python_export: if True, and the server does not write the
+            export itself, rows are pulled through this process's database
+            connection, and written by a RowEncoder, rather than by the
+            mysql client via call_mysql.sh.
+        @type python_export: bool
+        @param max_shard_size: if provided, tables whose .tsv file exceeds
+            this size are split into <table>.part-00001.tsv, ... Either
+            bytes, as in '500M', '2G', '1000000' (units are powers of 1024), 
+            or rows, as in '200000rows'.
+            All parts are listed in export_manifest.json in dest_dir. 
+        @type max_shard_size: {None | str}
+        @param header_in_all_shards: if True, every part starts with the
+            header line. Else only the first part has a header.
+        @type header_in_all_shards: bool
+        @param sanitize_text: if True, escaped tabs and newlines in text
+            columns of the exported files are replaced by spaces.
+        @type sanitize_text: bool
+        @param null_replacement: if sanitizing, and this value is not None,
+            NULL values in text columns are replaced with this string.
+        @type null_replacement: {None | str}
         @param logging_level: how much of the run to document
         @type logging_level: logging.INFO/DEBUG/ERROR/...
         @param unittests: set to True to do nothing significant, and let 
@@ -120,6 +181,26 @@ class AuxTableCopier(object):
             raise ValueError(f"Only copy_format 'csv', and 'sql' are allowed; not {copy_format}")
         self.overwrite_existing = overwrite_existing
         
+        # Whether to export via SELECT ... INTO OUTFILE. If
+        # None, determined when the first table is copied:
+        self.server_side_export = server_side_export
+        self.python_export      = python_export
+        
+        # Splitting of large exports into parts:
+        if max_shard_size is None:
+            self.sharder = None
+        else:
+            self.sharder = TsvSharder.from_spec(max_shard_size, 
+                                                header_in_all_parts=header_in_all_shards)
+        
+        # Cleanup of free-text columns in the exports:
+        self.sanitize_text    = sanitize_text
+        self.null_replacement = null_replacement
+        
+        # Structured record of the export timings, rows,
+        # and bytes. Created when copying starts:
+        self.stage_record = None
+        
         if host is None:
             if self.unittests:
                 self.host = self.config_info.test_default_host
@@ -200,12 +281,98 @@ class AuxTableCopier(object):
         
         return self.__schema
 
+    #-------------------------
+    # add_export_arguments
+    #--------------
+
+    @staticmethod
+    def add_export_arguments(parser, short_options=True):
+        '''
+        Add the options that control how tables are exported
+        to a program's argparse parser. Shared by this module's
+        main and canvas_prep.py's pipeline mode.
+
+        @param parser: the program's parser
+        @type parser: argparse.ArgumentParser
+        @param short_options: if False, only the long option
+            names are added, e.g. b/c the program uses -s and -m
+            for other options
+        @type short_options: bool
+        '''
+        server_export_flags = ['-s', '--serverexport'] if short_options else ['--serverexport']
+        max_shard_flags     = ['-m', '--maxshardsize'] if short_options else ['--maxshardsize']
+        
+        parser.add_argument(*server_export_flags,
+                            choices=['auto', 'always', 'never'],
+                            help="have MySQL server write the files via SELECT INTO OUTFILE:\n" +
+                                 "'auto': if server is on this machine, and may write to destdir.\n" +
+                                 "Falls back to client side copying if refused. Default: 'auto'",
+                            default='auto')
+        
+        parser.add_argument('--pythonexport',
+                            help="pull rows through Python and format them with a compiled\n" +
+                                 "per-table encoder, instead of running the mysql client.\n" +
+                                 "Default: use the mysql client",
+                            action='store_true',
+                            default=False)
+        
+        parser.add_argument(*max_shard_flags,
+                            help="split larger table exports into <table>.part-00001.tsv, ...\n" +
+                                 f"Bytes (500M, 2G, 1000000; {SizeSpec.UNITS_HELP}),\n" +
+                                 "or rows (200000rows). Default: no splitting",
+                            default=None)
+        
+        parser.add_argument('--headerfirstonly',
+                            help="when splitting table exports, only put the header line\n" +
+                                 "into the first part. Default: header in every part",
+                            action='store_true',
+                            default=False)
+        
+        parser.add_argument('--sanitize',
+                            help="replace escaped tabs and newlines in text columns\n" +
+                                 "of the exports with spaces. Default: leave them escaped",
+                            action='store_true',
+                            default=False)
+        
+        parser.add_argument('--nullas',
+                            help="with --sanitize: replace NULL in text columns with this string,\n" +
+                                 "e.g. --nullas ''. Default: keep NULL",
+                            default=None)
+
+    #-------------------------
+    # export_options_from_args
+    #--------------
+
+    @staticmethod
+    def export_options_from_args(args):
+        '''
+        Constructor keyword arguments for the export
+        options of a command line parsed with the options
+        of add_export_arguments().
+
+        @param args: parsed command line
+        @type args: argparse.Namespace
+        @return: keyword arguments for AuxTableCopier()
+        @rtype: {str : <any>}
+        '''
+        return {'server_side_export'   : {'auto'   : None,
+                                          'always' : True,
+                                          'never'  : False}[args.serverexport],
+                'python_export'        : args.pythonexport,
+                'max_shard_size'       : args.maxshardsize,
+                'header_in_all_shards' : not args.headerfirstonly,
+                'sanitize_text'        : args.sanitize,
+                'null_replacement'     : args.nullas
+                }
+
     #------------------------------------
     # copy_tables 
     #-------------------    
         
     def copy_tables(self, table_names=None, overwrite_existing=None):
         
+        copy_result = None
+        self.start_stage_record('copy_aux_tables')
         try:
             if table_names is None:
                 table_names = self.tables
@@ -257,11 +424,119 @@ class AuxTableCopier(object):
                 
             return copy_result
         finally:
+            self.finish_stage_record(copy_result)
             if self.db is not None:
                 self.db.close()
 
     #------------------------------------
-    # copy_to_sql_files 
+    # copy_tables_as_built
+    #-------------------
+
+    def copy_tables_as_built(self, table_queue):
+        '''
+        Pipeline mode: export tables as they are announced
+        by CanvasPrep, rather than waiting for all tables to be
+        built. CanvasPrep puts the name of each table into
+        table_queue after the table is created and entered into
+        the load log. A None in the queue signals that no more
+        tables are coming.
+
+        Each table is copied regardless of whether its .tsv file
+        already exists in the destination dir, because the
+        table was just rebuilt.
+
+        @param table_queue: queue from which to read names of
+            freshly built tables.
+        @type table_queue: {multiprocessing.Queue | queue.Queue}
+        @return: a CopyResult instance with tables copied, and errors encountered.
+        @rtype CopyResult
+        '''
+
+        copy_result = CopyResult()
+        prev_db     = self.db
+        self.start_stage_record('pipeline_export')
+        # The builder may take hours between tables. Each table
+        # gets a session from a pool, which replaces sessions
+        # the server dropped in the meantime, and retries a
+        # table's export after transient errors:
+        pool = self.utils.session_pool(self.user,
+                                       self.pwd,
+                                       db=self.src_db,
+                                       host=self.host,
+                                       size=1)
+        try:
+            while True:
+                table_name = table_queue.get()
+                if table_name is None:
+                    # Builder is done:
+                    break
+                self.log_info(f"Pipeline: table {table_name} was built; exporting...")
+                # The table was (re)built after this process may
+                # have cached the schema's metadata:
+                self.utils.schema_cache.table_created(self.src_db, table_name)
+                one_result = self.copy_with_session_pool(pool, table_name)
+                if one_result.errors is not None:
+                    for (err_table, err_msg) in one_result.errors.items():
+                        self.utils.log_err(f"Error copying table {err_table}: {err_msg}")
+                copy_result.merge(one_result)
+
+            self.log_info(f"Pipeline: exported {len(copy_result.completed_tables)} tables to {self.dest_dir}. Done.")
+            self.log_info(pool.wait_report())
+            return copy_result
+        finally:
+            self.finish_stage_record(copy_result)
+            self.db = prev_db
+            pool.close()
+
+    #------------------------------------
+    # copy_with_session_pool
+    #-------------------
+
+    def copy_with_session_pool(self, pool, table_name):
+        '''
+        Export one table to .tsv, using a session from
+        the given pool as self.db. If the export fails
+        because of a transient database error, such as
+        a lost connection, it is repeated on a fresh session.
+        Errors that retries do not cure, as well as failures
+        to get a session at all, are reported in the returned
+        CopyResult. Afterwards self.db is the connection it
+        was before.
+        
+        @param pool: pool from which to borrow sessions
+        @type pool: SessionPool
+        @param table_name: table to export
+        @type table_name: str
+        @return: a CopyResult instance for the table
+        @rtype CopyResult
+        '''
+        def copy_one(session):
+            prev_db = self.db
+            self.db = session
+            try:
+                one_result = self.copy_to_csv_files({table_name : self.file_nm_from_tble(table_name)})
+            finally:
+                self.db = prev_db
+            # Let the pool retry after transient errors:
+            if one_result.errors is not None:
+                for err_msg in one_result.errors.values():
+                    if SessionPool.is_transient_error(err_msg):
+                        raise DatabaseError(err_msg)
+            return one_result
+        
+        try:
+            return pool.run(copy_one)
+        except (DatabaseError, TimeoutError, OSError) as e:
+            # Retries did not help, no session became free,
+            # or none could be opened:
+            if not isinstance(e, DatabaseError):
+                e = DatabaseError(f"No database session for {table_name}: {repr(e)}")
+            one_result = CopyResult()
+            one_result.add_error(table_name, e)
+            return one_result
+
+    #------------------------------------
+    # copy_to_sql_files
     #-------------------
     
     def copy_to_sql_files(self, table_to_file_map):
@@ -328,14 +603,17 @@ class AuxTableCopier(object):
         # Have to get schema for each table to make
         # the CSV header.
         
-        table_schemas = [self.populate_table_schema(table_name) for table_name in table_names]
+        with StageProfiler.stage('read_schemas'):
+            table_schemas = [self.populate_table_schema(table_name) for table_name in table_names]
         copy_result = CopyResult()
         for table_schema in table_schemas:
             table_name = table_schema.table_name
             
             self.log_info(f"Copying {table_name} to {self.dest_dir}/{table_name}.tsv...")
+            start_time = time.time()
             try:
-                self.copy_one_table_to_csv(table_schema)
+                with StageProfiler.stage('export'):
+                    exported_rows = self.copy_one_table_to_csv(table_schema)
             except DatabaseError as e:
                 # Rather than reporting each error spread out
                 # across the log, report them all in the caller:
@@ -344,13 +622,227 @@ class AuxTableCopier(object):
                 continue
             self.log_info(f"Done copying {table_schema.table_name}.")
             copy_result.add_completed_table(table_schema.table_name)
+            
+            if self.sanitize_text:
+                with StageProfiler.stage('sanitize'):
+                    self.sanitize_export(table_schema)
+            with StageProfiler.stage('record_export'):
+                (built_rows, build_secs) = self.latest_build(table_name)
+                if exported_rows is None:
+                    exported_rows = built_rows
+                parts = self.record_export(table_name, source_rows=exported_rows)
+                self.record_run_stats(table_name, parts, exported_rows, build_secs)
+                export_secs = time.time() - start_time
+                self.log_export_duration(table_name, export_secs)
+            if self.stage_record is not None:
+                num_bytes = sum([part['bytes'] for part in parts])
+                self.stage_record.note_table(table_name,
+                                             export_secs=round(export_secs, 3),
+                                             rows=exported_rows,
+                                             bytes=num_bytes,
+                                             bytes_per_sec=round(num_bytes / export_secs) if export_secs > 0 else None,
+                                             num_files=len(parts))
 
             self.log_info(f"Writing {table_name}'s schema to {self.dest_dir}/{table_name}_schema.sql")
-            self.write_table_schema(table_schema)
+            with StageProfiler.stage('write_schema'):
+                self.write_table_schema(table_schema)
             self.log_info(f"Done writing {table_name}'s schema to {self.dest_dir}/{table_name}_schema.sql")
 
         return copy_result
 
+    #-------------------------
+    # sanitize_export 
+    #--------------
+    
+    def sanitize_export(self, table_schema):
+        '''
+        Replace escaped tabs and newlines in the text columns
+        of a just exported .tsv file, and optionally NULL values.
+        Tables without text columns are left alone.
+        
+        @param table_schema: Schema instance of the exported table
+        @type table_schema: Schema
+        '''
+        sanitizer = TsvSanitizer.from_schema(table_schema, null_replacement=self.null_replacement)
+        if sanitizer is None:
+            return
+        tsv_path = os.path.join(self.dest_dir, table_schema.table_name) + '.tsv'
+        self.log_info(f"Sanitizing text columns in {tsv_path}...")
+        num_changed = sanitizer.sanitize_file(tsv_path)
+        self.log_info(f"Done sanitizing {tsv_path}; changed {num_changed} line(s).")
+
+    #-------------------------
+    # record_export 
+    #--------------
+    
+    def record_export(self, table_name, source_rows=None):
+        '''
+        Called after a table's .tsv file is complete. Shards
+        the file if a maximum shard size was specified, and 
+        enters the resulting file(s) into the export manifest.
+        
+        @param table_name: name of the table that was just exported
+        @type table_name: str
+        @param source_rows: number of rows that went into the
+            export, if known
+        @type source_rows: {None | int}
+        @return: the part dicts entered into the manifest
+        @rtype: [{str : <any>}]
+        '''
+        tsv_path = os.path.join(self.dest_dir, table_name) + '.tsv'
+        if self.sharder is None:
+            # Parts from an earlier, sharded export are stale:
+            TsvSharder.remove_parts(table_name, self.dest_dir)
+            parts  = [TsvSharder.single_part(tsv_path)]
+            header = 'all'
+        else:
+            self.log_info(f"Sharding {tsv_path}...")
+            parts  = self.sharder.shard(tsv_path, table_name)
+            header = 'all' if self.sharder.header_in_all_parts else 'first'
+            self.log_info(f"Done sharding {tsv_path} into {len(parts)} file(s).")
+            
+        ExportManifest(self.dest_dir).record_table(table_name, parts, header=header, source_rows=source_rows)
+        return parts
+        
+    #-------------------------
+    # latest_build 
+    #--------------
+    
+    def latest_build(self, table_name):
+        '''
+        Number of rows and build duration recorded in LoadLog 
+        when the table was last built. The row count serves as
+        the expected row count of exports that did not count 
+        their rows. Either is None if the table has no LoadLog
+        entry, or the entry lacks the value.
+        
+        @param table_name: the exported table
+        @type table_name: str
+        @return: the row count and the build seconds
+        @rtype: ({None | int}, {None | float})
+        '''
+        try:
+            if not self.utils.table_exists(LoadLog.table_name, self.db):
+                return (None, None)
+            # Older load logs lack the duration_secs column:
+            self.utils.ensure_load_log_table_existence(LoadLog.table_name, self.db)
+            (num_rows, duration_secs) = self.db.query(LoadLog.latest_build_query(self.db.dbName(), table_name)).next()
+        except Exception as e:
+            self.log_debug(f"Cannot read {table_name}'s latest build from load log: {repr(e)}")
+            return (None, None)
+        if table_name == 'GradingProcess':
+            # Only part of the table is exported:
+            num_rows = None
+        return (num_rows, duration_secs)
+        
+    #-------------------------
+    # record_run_stats 
+    #--------------
+    
+    def record_run_stats(self, table_name, parts, num_rows, build_secs):
+        '''
+        Append the export's row count, size, and build time
+        to the table's series in the run statistics store
+        that the sanity checker examines for anomalies.
+        
+        @param table_name: name of the table that was just exported
+        @type table_name: str
+        @param parts: the part dicts of the table's export
+        @type parts: [{str : <any>}]
+        @param num_rows: number of rows exported, if known
+        @type num_rows: {None | int}
+        @param build_secs: time the table took to build, if known
+        @type build_secs: {None | float}
+        '''
+        try:
+            RunStats(self.dest_dir).record_run(table_name,
+                                               rows=num_rows,
+                                               num_bytes=sum([part['bytes'] for part in parts]),
+                                               build_secs=build_secs)
+        except (IOError, ValueError) as e:
+            self.utils.log_warn(f"Could not record run statistics of {table_name}: {repr(e)}")
+        
+    #-------------------------
+    # start_stage_record 
+    #--------------
+    
+    def start_stage_record(self, stage):
+        '''
+        Start recording the export for the run report,
+        unless running unittests.
+        
+        @param stage: name of the export stage
+        @type stage: str
+        '''
+        if self.unittests:
+            return
+        self.stage_record = StageRecord(stage)
+        self.stage_record.start()
+
+    #-------------------------
+    # finish_stage_record 
+    #--------------
+    
+    def finish_stage_record(self, copy_result):
+        '''
+        Add the export errors to the stage record, and
+        write it and the export's metrics. A report that
+        cannot be written is no reason to fail the export.
+        
+        @param copy_result: outcome of the export; None if
+            the export failed before copying any table
+        @type copy_result: {None | CopyResult}
+        '''
+        if self.stage_record is None:
+            return
+        if copy_result is None:
+            self.stage_record.note_error("Export ended before copying tables; see log.")
+        elif copy_result.errors is not None:
+            for (table_name, err_msg) in copy_result.errors.items():
+                self.stage_record.note_error(str(err_msg), table=table_name)
+        try:
+            record_path = self.stage_record.finish()
+            self.log_info(f"Wrote run record {record_path}.")
+        except (IOError, OSError) as e:
+            self.utils.log_warn(f"Could not write run record: {repr(e)}")
+        try:
+            metrics_path = MetricsFile.from_stage_record(self.stage_record,
+                                                         AuxTableCopier.table_metrics,
+                                                         AuxTableCopier.table_success_metric).write()
+            if metrics_path is not None:
+                self.log_info(f"Wrote metrics {metrics_path}.")
+        except (IOError, OSError) as e:
+            self.utils.log_warn(f"Could not write metrics: {repr(e)}")
+        self.stage_record = None
+
+    #-------------------------
+    # log_export_duration 
+    #--------------
+    
+    def log_export_duration(self, table_name, export_secs):
+        '''
+        Add the time it took to export a table to the table's
+        latest LoadLog entry, for the refresh trend report. Tables
+        that were never built by CanvasPrep have no entry, and
+        are left alone.
+        
+        @param table_name: name of the table that was just exported
+        @type table_name: str
+        @param export_secs: time from start of the export until
+            the table's files were complete
+        @type export_secs: float
+        '''
+        try:
+            if not self.utils.table_exists(LoadLog.table_name, self.db):
+                return
+            # Older load logs lack the export_secs column:
+            self.utils.ensure_load_log_table_existence(LoadLog.table_name, self.db)
+            (err, _warn) = self.db.execute(LoadLog.export_update_cmd(self.db.dbName(), table_name, export_secs))
+        except Exception as e:
+            err = e
+        if err is not None:
+            self.utils.log_warn(f"Could not record export time of {table_name} in load log: {repr(err)}")
+
     #-------------------------
     # write_table_schema 
     #--------------
@@ -390,6 +882,9 @@ class AuxTableCopier(object):
         again with a different table name, and then call
         this method again.
 
+        @return: number of rows written, if the export method
+            counted them, else None
+        @rtype: {None | int}
         @raise TableError: if cannot retrieve table schema.
         '''
         
@@ -408,6 +903,22 @@ class AuxTableCopier(object):
             raise TableError((table_name,None),
                              f"Table {table_schema.table_name} has no metadata " +
                              f"(likely does not exist in db {self.config_info.canvas_db_aux}).")
+        # If the MySQL server can write into dest_dir, have
+        # it write the whole table in one bulk operation:
+        if self.server_side_export is None:
+            self.server_side_export = self.server_can_write_dest_dir()
+        if self.server_side_export:
+            try:
+                return self.export_table_server_side(table_schema, out_file_name)
+            except DatabaseError as e:
+                # Don't try again for the following tables:
+                self.server_side_export = False
+                self.utils.log_warn(f"Server side export of {table_name} failed; " +
+                                    f"falling back to client side copying: {e.message}")
+        
+        if self.python_export:
+            return self.export_table_via_python(table_schema, out_file_name)
+        
         shell_script = os.path.join(os.path.dirname(__file__), 'call_mysql.sh')
         
         # Tell shell script where to find the MySQL pwd:
@@ -476,7 +987,227 @@ class AuxTableCopier(object):
         tsv_path = Path(tsv_file_name)
         if tsv_path.stat().st_size == 0:
             raise DatabaseError(f"Destination file {tsv_path} is empty; table {table_name} retrieval failed.")
+        # The mysql client does not report row counts:
+        return None
+        
+    #-------------------------
+    # server_can_write_dest_dir 
+    #--------------
+    
+    def server_can_write_dest_dir(self):
+        '''
+        Return True if the MySQL server runs on this machine,
+        and its secure_file_priv setting allows SELECT ... INTO OUTFILE
+        to write into self.dest_dir. An empty secure_file_priv
+        allows writing anywhere; NULL disables INTO OUTFILE.
+        
+        Assumption: self.db holds a MySQLDB instance.
+        
+        @return: whether the server can write the .tsv files itself
+        @rtype: bool
+        '''
+        local_names = AuxTableCopier.LOCAL_HOST_NAMES + [socket.gethostname(), socket.getfqdn()]
+        if self.host not in local_names:
+            return False
+        
+        try:
+            secure_file_priv = self.db.query("SELECT @@secure_file_priv").next()
+        except Exception as e:
+            self.log_debug(f"Cannot read secure_file_priv: {repr(e)}")
+            return False
+        
+        if secure_file_priv is None:
+            # INTO OUTFILE is disabled altogether:
+            return False
+        if len(secure_file_priv) == 0:
+            # Server may write anywhere:
+            return True
+        
+        allowed_dir = os.path.realpath(secure_file_priv)
+        dest_dir    = os.path.realpath(self.dest_dir)
+        return os.path.commonpath([allowed_dir, dest_dir]) == allowed_dir
+
+    #-------------------------
+    # export_table_server_side 
+    #--------------
+    
+    def export_table_server_side(self, table_schema, out_file_name):
+        '''
+        Have the MySQL server write the given table, header
+        line included, to out_file_name with a single 
+        SELECT ... INTO OUTFILE. The output format matches 
+        that of the mysql client's --batch mode: tab separated 
+        fields, backslash escapes, and NULL values as 'NULL'.
+        
+        INTO OUTFILE's own escaping would write a backslash
+        followed by the raw tab or newline. So the SELECT
+        escapes backslashes, tabs, and newlines itself as
+        '\\\\', '\\t', and '\\n', and the server is told not 
+        to escape anything (ESCAPED BY '').
+        
+        Since no rows travel through a client connection,
+        the tables that are pulled in chunks otherwise are
+        written in one statement. For GradingProcess only rows
+        since AuxTableCopier.GRADING_PROCESS_START_YEAR are 
+        exported, as in pull_by_term_year().
+        
+        @param table_schema: Schema instance of the table to export
+        @type table_schema: Schema
+        @param out_file_name: path to the .tsv file; must not exist.
+        @type out_file_name: str
+        @return: number of data rows written
+        @rtype: int
+        @raise DatabaseError: if the server refuses, e.g. b/c of
+            its secure_file_priv setting, or missing FILE privilege.
+        '''
+        table_name = table_schema.table_name
+        col_names  = table_schema.col_names(quoted=False)
         
+        # First SELECT of the UNION produces the header line:
+        header_cols = ', '.join([f"'{col_name}'" for col_name in col_names])
+        data_cols   = ', '.join([f"IFNULL({self.batch_escaped(col_name)}, 'NULL')" for col_name in col_names])
+        
+        where_clause = ''
+        if table_name == 'GradingProcess':
+            start_year = AuxTableCopier.GRADING_PROCESS_START_YEAR
+            where_clause = f'''WHERE enrollment_term_id IN (SELECT term_id
+                                                               FROM Terms
+                                                              WHERE SUBSTRING_INDEX(term_name, ' ', -1) >= {start_year})'''
+        
+        # INTO OUTFILE refuses to overwrite:
+        if os.path.exists(out_file_name):
+            os.remove(out_file_name)
+        
+        mysql_cmd = f'''SELECT {header_cols}
+                        UNION ALL
+                        SELECT {data_cols}
+                          FROM {table_name}
+                          {where_clause}
+                          INTO OUTFILE '{out_file_name}'
+                          FIELDS TERMINATED BY '\\t' ESCAPED BY ''
+                          LINES TERMINATED BY '\\n';
+                     '''
+        self.log_info(f"Server side export of {table_name} to {out_file_name}...")
+        (err, _warn) = self.db.execute(mysql_cmd, doCommit=False)
+        if err is not None:
+            raise DatabaseError(f"Server cannot write {out_file_name}: {repr(err)}")
+        # For INTO OUTFILE, ROW_COUNT() is the number of 
+        # lines written, header line included:
+        num_rows = self.db.query('SELECT ROW_COUNT()').next() - 1
+        # Sanity check: even an empty table yields the header line:
+        if num_rows < 0 or not os.path.exists(out_file_name) or os.path.getsize(out_file_name) == 0:
+            raise DatabaseError(f"Destination file {out_file_name} is empty; table {table_name} retrieval failed.")
+        self.log_info(f"Done server side export of {table_name} ({num_rows} rows).")
+        return num_rows
+
+    #-------------------------
+    # batch_escaped 
+    #--------------
+    
+    def batch_escaped(self, col_name):
+        '''
+        SQL expression that escapes backslashes, tabs, and 
+        newlines in the given column the way the mysql client 
+        does in --batch mode. NULL values stay NULL.
+        
+        @param col_name: name of the column
+        @type col_name: str
+        @return: SQL expression
+        @rtype: str
+        '''
+        return (f"REPLACE(REPLACE(REPLACE({col_name}, "
+                f"'\\\\', '\\\\\\\\'), "
+                f"'\\t', '\\\\t'), "
+                f"'\\n', '\\\\n')"
+                )
+
+    #-------------------------
+    # export_table_via_python 
+    #--------------
+    
+    def export_table_via_python(self, table_schema, out_file_name):
+        '''
+        Pull the given table's rows through self.db, and
+        write them, header line first, to out_file_name. The
+        values are formatted by a RowEncoder compiled from the 
+        table's schema, so the result looks like the output 
+        of the mysql client.
+        
+        The large tables are retrieved in the same chunks
+        as by the call_mysql.sh based methods. See
+        python_export_queries().
+        
+        @param table_schema: Schema instance of the table to export
+        @type table_schema: Schema
+        @param out_file_name: path to the .tsv file
+        @type out_file_name: str
+        @return: number of data rows written
+        @rtype: int
+        @raise DatabaseError: if retrieval fails
+        '''
+        table_name = table_schema.table_name
+        encoder    = RowEncoder.from_schema(table_schema)
+        header     = '\t'.join(table_schema.col_names(quoted=False)) + '\n'
+        num_rows   = 0
+        
+        with open(out_file_name, 'wb') as out_fd:
+            out_fd.write(header.encode('utf-8'))
+            for mysql_cmd in self.python_export_queries(table_schema):
+                try:
+                    num_rows += encoder.write_rows(self.db.query(mysql_cmd), out_fd)
+                except Exception as e:
+                    raise DatabaseError(f"Query '{mysql_cmd.strip()[:40]}...' failed: {repr(e)}")
+        self.log_info(f"Wrote {num_rows} rows of {table_name} to {out_file_name}.")
+        return num_rows
+
+    #-------------------------
+    # python_export_queries 
+    #--------------
+    
+    def python_export_queries(self, table_schema):
+        '''
+        Generator of the SELECT statements that together
+        retrieve the rows of the given table: AllUsers is 
+        pulled in ranges of seq_num, AssignmentSubmissions 
+        and GradingProcess by groups of account_id, and 
+        GradingProcess only since GRADING_PROCESS_START_YEAR. 
+        All other tables are pulled with a single SELECT.
+        
+        @param table_schema: Schema instance of the table to export
+        @type table_schema: Schema
+        @return: SELECT statements
+        @rtype: iter(str)
+        '''
+        table_name = table_schema.table_name
+        col_names  = ','.join(table_schema.col_names(quoted=False))
+        
+        if table_name == 'AllUsers':
+            max_row = self.db.query("SELECT MAX(seq_num) FROM AllUsers").next()
+            batch_size = AuxTableCopier.SEQ_NUM_BATCH_SIZE
+            for seq_num in range(1, (max_row or 0) + 1, batch_size):
+                yield f'''SELECT {col_names}
+                            FROM {table_name}
+                           WHERE seq_num BETWEEN {seq_num} AND {seq_num + batch_size-1};
+                        '''
+        elif table_name in ['AssignmentSubmissions', 'GradingProcess']:
+            and_clause = ''
+            if table_name == 'GradingProcess':
+                start_year = AuxTableCopier.GRADING_PROCESS_START_YEAR
+                and_clause = f'''AND enrollment_term_id IN (SELECT term_id
+                                                              FROM Terms
+                                                             WHERE SUBSTRING_INDEX(term_name, ' ', -1) >= {start_year})'''
+            for account_id_seq_obj in self.utils.get_account_ids_from_table(self.db, table_name):
+                range_str = ','.join([str(account_id) for account_id in account_id_seq_obj.account_ids])
+                yield f'''SELECT {col_names}
+                            FROM {table_name}
+                           WHERE account_id IN ({range_str})
+                           {and_clause};
+                        '''
+        else:
+            yield f'''SELECT {col_names}
+                        FROM {table_name};
+                    '''
+
     #-------------------------
     # pull_by_seq_num
     #--------------
@@ -721,18 +1452,14 @@ class AuxTableCopier(object):
         @rtype: Schema
         @raise RuntimeError: when MySQL database cannot be contacted. 
         '''
-        # Ensure that the information schema is updated
-        # for table table_name:
-        self.db.execute(f'ANALYZE TABLE {table_name}')
+        # Columns and indexes of all tables in self.src_db
+        # are read in bulk on the first call, and are
+        # answered from the metadata cache after that:
+        schema_cache = self.utils.schema_cache
         
-        table_metadata_cmd = f'''SELECT column_name, data_type, character_maximum_length, column_default, ordinal_position, extra 
-                                   FROM information_schema.COLUMNS 
-                                  WHERE table_schema = '{self.src_db}' 
-                                    AND table_name = '{table_name}';
-                            '''
         schema_obj = Schema(table_name)
         
-        table_metadata = self.db.query(table_metadata_cmd)
+        table_metadata = schema_cache.columns(self.db, self.src_db, table_name)
         for (col_name, col_type, col_max_len, col_default, position, is_auto_increment) in table_metadata:
             # Add info about one column to this schema:
             schema_obj.push(col_name, 
@@ -749,12 +1476,7 @@ class AuxTableCopier(object):
         # The data types 'text' and 'blob' require specifying a
         # length if an index is built on them.
         
-        index_metadata_cmd = f'''SELECT index_name, column_name, seq_in_index, sub_part
-                                   FROM information_schema.statistics
-                                  WHERE TABLE_SCHEMA = '{self.src_db}'
-                                    AND TABLE_NAME   = '{table_name}';  
-                              '''
-        idx_info = self.db.query(index_metadata_cmd)
+        idx_info = schema_cache.indexes(self.db, self.src_db, table_name)
         
         for (index_name, col_name, seq_in_index, index_length) in idx_info:
             
@@ -893,6 +1615,21 @@ class CopyResult(object):
         '''
         self._errors[tbl_name] = error_obj.message
 
+    #-------------------------
+    # merge
+    #--------------
+
+    def merge(self, other_copy_result):
+        '''
+        Add the completed tables and errors of another
+        CopyResult to this one.
+
+        @param other_copy_result: result whose content to absorb
+        @type other_copy_result: CopyResult
+        '''
+        self._completed_tables.extend(other_copy_result.completed_tables)
+        self._errors.update(other_copy_result._errors)
+
     #-------------------------
     # add_completed_table
     #--------------
@@ -1383,6 +2120,8 @@ if __name__ == '__main__':
                         help='format for local file.',
                         default='csv')
     
+    AuxTableCopier.add_export_arguments(parser)
+    
     parser.add_argument('-r', '--remove',
                         help='if set, remove already locally existing files. Default: do remove existing files',
                         action='store_true',
@@ -1400,6 +2139,8 @@ if __name__ == '__main__':
                         default=logging.INFO
                         )
 
+    StageProfiler.add_arguments(parser)
+
     args = parser.parse_args()
 
     # Translate the logging level to official
@@ -1412,20 +2153,26 @@ if __name__ == '__main__':
     if isinstance(args.loglevel, str):
         args.loglevel = log_levels[args.loglevel]
         
+    profiler = StageProfiler.from_args(parser.prog, args)
     # copier = AuxTableCopier(tables=['Terms'])
     try:
-        copier = AuxTableCopier(user=args.user,
-                                db_pwd=args.password,
-                                host=args.host,
-                                dest_dir=args.destdir,
-                                tables=args.table,
-                                copy_format=args.format,
-                                overwrite_existing=args.remove,
-                                logging_level=args.loglevel    
-                                )
+        with StageProfiler.stage('setup'):
+            copier = AuxTableCopier(user=args.user,
+                                    db_pwd=args.password,
+                                    host=args.host,
+                                    dest_dir=args.destdir,
+                                    tables=args.table,
+                                    copy_format=args.format,
+                                    overwrite_existing=args.remove,
+                                    logging_level=args.loglevel,
+                                    **AuxTableCopier.export_options_from_args(args)
+                                    )
         copy_result = copier.copy_tables()
     except KeyboardInterrupt:
         print("\nCanvas aux table copy stopped by user.")    
+    finally:
+        if profiler is not None:
+            profiler.finish()
     
     
         
@@ -0,0 +1,310 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from collections import namedtuple, OrderedDict
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+
+from atomic_file import atomic_write
+
+# An error entry of a log. Table and stage are None
+# if they cannot be told from the log. Context holds
+# the lines that followed the entry without a log
+# prefix, such as a traceback:
+LogError    = namedtuple('LogError', ['table', 'stage', 'time', 'level', 'message', 'line', 'context'])
+
+# Time a table spent in one stage of a refresh:
+StageTiming = namedtuple('StageTiming', ['stage', 'table', 'start', 'secs'])
+
+class LogScan(object):
+    '''
+    What one scan found in the new part of a log.
+    '''
+
+    def __init__(self, log_path, start_offset, end_offset):
+        self.log_path     = log_path
+        self.start_offset = start_offset
+        self.end_offset   = end_offset
+        self.errors  = []
+        self.timings = []
+
+    #-------------------------
+    # errors_by_table_and_stage
+    #--------------
+
+    def errors_by_table_and_stage(self):
+        '''
+        @return: map from (table, stage) to the errors logged
+            for that table in that stage, in log order
+        @rtype: {(str, str) : [LogError]}
+        '''
+        grouped = OrderedDict()
+        for error in self.errors:
+            grouped.setdefault((error.table, error.stage), []).append(error)
+        return grouped
+
+    #-------------------------
+    # error_report
+    #--------------
+
+    def error_report(self):
+        '''
+        Errors as text, one paragraph per table and stage.
+        '''
+        report = ''
+        for ((table, stage), errors) in self.errors_by_table_and_stage().items():
+            report += f"{table or 'No table'}, {stage or 'no stage'}:\n"
+            for error in errors:
+                report += f"   {error.message}\n"
+                report += ''.join([f"      {line}\n" for line in error.context])
+        return report
+
+# -------------------------- Class CronlogScanner ---------------
+
+class CronlogScanner(object):
+    '''
+    Scans the cron logs of refresh runs incrementally. For
+    each log file, the scanner remembers the file's inode, the
+    byte offset up to which it scanned, and a checksum of the
+    bytes just before that offset, in a JSON state file. The
+    next scan of the file only reads what was appended since.
+    If the log was replaced, truncated, or rewritten, which
+    shows in the inode, size, or checksum, the file is scanned
+    from the beginning.
+
+    Log entries are lines as written by Utilities.setup_logging():
+
+        2026-10-19 02:00:03,123;INFO: Working on table Terms...
+
+    optionally preceded by '<logger name>: '. In the same pass,
+    the scanner collects:
+
+        o Errors: entries of level ERROR or CRITICAL, and lines
+          without a log prefix that contain 'ERROR', such as
+          output of the mysql client. Each error is attributed
+          to the table it names, or to the stage and table that
+          was started last and not finished.
+        o Stage timings: the time between the start and end
+          messages of each stage in STAGES, per table.
+
+    Stages that are unfinished at the end of a scan are kept
+    in the state file, so their timing is completed by the next
+    scan.
+    '''
+
+    log_line_pat = re.compile(r'^(?:(?P<name>[\w.\-]+): )?' +
+                              r'(?P<asctime>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3});' +
+                              r'(?P<level>[A-Z]+): (?P<message>.*)$')
+    time_format = '%Y-%m-%d %H:%M:%S,%f'
+
+    # Stage name, and patterns of its start and end messages:
+    STAGES = [
+        ('connect',  r"^Connecting to db ", r"^Done connecting to db"),
+        ('backup',   r"^Renaming \d+ tables to backup names", r"^Done renaming \d+ tables"),
+        ('build',    r"^Working on table (?P<table>\w+)", r"^Done working on table (?P<table>\w+)"),
+        ('export',   r"^Copying (?P<table>\w+) to ", r"^Done copying (?:table )?(?P<table>\w+)\."),
+        ('sanitize', r"^Sanitizing text columns in (?:.*/)?(?P<table>\w+)\.tsv",
+                     r"^Done sanitizing (?:.*/)?(?P<table>\w+)\.tsv"),
+        ('shard',    r"^Sharding (?:.*/)?(?P<table>\w+)\.tsv", r"^Done sharding (?:.*/)?(?P<table>\w+)\.tsv"),
+        ('schema',   r"^Writing (?P<table>\w+)'s schema", r"^Done writing (?P<table>\w+)'s schema"),
+        ('wait_exporter', r"^Waiting for exporter", r"^Done waiting for exporter"),
+        ]
+
+    # Table named in an error message:
+    table_pat = re.compile(r'\btable (?P<table>\w+)')
+
+    ERROR_LEVELS = ['ERROR', 'CRITICAL']
+
+    # Bytes before the scan offset whose checksum
+    # tells whether the file was rewritten:
+    FINGERPRINT_BYTES = 256
+
+    MAX_CONTEXT_LINES = 5
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, state_path):
+        '''
+        @param state_path: JSON file where scan positions are
+            kept between runs. Created if it does not exist.
+        @type state_path: str
+        '''
+        self.state_path = state_path
+        try:
+            with open(state_path, 'r') as fd:
+                self.state = json.load(fd)
+        except FileNotFoundError:
+            self.state = {}
+        self.stage_pats = [(stage, re.compile(start_pat), re.compile(end_pat))
+                           for (stage, start_pat, end_pat) in CronlogScanner.STAGES]
+
+    #-------------------------
+    # scan
+    #--------------
+
+    def scan(self, log_path):
+        '''
+        Scan what was added to the log since the previous scan,
+        and remember how far this scan got. A final line without
+        newline is left for the next scan, since it may still
+        be in the making.
+
+        @param log_path: path to the cron log
+        @type log_path: str
+        @return: errors and stage timings in the new content
+        @rtype: LogScan
+        '''
+        log_path  = os.path.abspath(log_path)
+        file_info = os.stat(log_path)
+        start_offset = self.resume_offset(log_path, file_info)
+        file_state   = self.state.get(log_path, {}) if start_offset > 0 else {}
+
+        # Stages begun, and not yet finished: {(stage, table) : start time}
+        open_stages = OrderedDict()
+        for (stage, table, start_time) in file_state.get('open_stages', []):
+            open_stages[(stage, table)] = datetime.strptime(start_time, CronlogScanner.time_format)
+
+        with open(log_path, 'rb') as fd:
+            fd.seek(start_offset)
+            new_content = fd.read(file_info.st_size - start_offset)
+        # Only complete lines:
+        new_content = new_content[:new_content.rfind(b'\n') + 1]
+        end_offset  = start_offset + len(new_content)
+
+        log_scan = LogScan(log_path, start_offset, end_offset)
+        last_error = None
+        for line in new_content.decode('utf-8', errors='replace').splitlines():
+            match = CronlogScanner.log_line_pat.match(line)
+            if match is None:
+                last_error = self.scan_other_line(line, last_error, open_stages, log_scan)
+                continue
+            when    = datetime.strptime(match.group('asctime'), CronlogScanner.time_format)
+            level   = match.group('level')
+            message = match.group('message')
+            last_error = None
+            if level in CronlogScanner.ERROR_LEVELS:
+                last_error = self.make_error(when, level, message, line + '\n', open_stages)
+                log_scan.errors.append(last_error)
+            else:
+                self.note_stage(when, message, open_stages, log_scan)
+
+        self.state[log_path] = {'inode'       : file_info.st_ino,
+                                'offset'      : end_offset,
+                                'fingerprint' : self.fingerprint(log_path, end_offset),
+                                'open_stages' : [[stage, table, start_time.strftime(CronlogScanner.time_format)]
+                                                 for ((stage, table), start_time) in open_stages.items()]
+                                }
+        self.save()
+        return log_scan
+
+    #-------------------------
+    # resume_offset
+    #--------------
+
+    def resume_offset(self, log_path, file_info):
+        '''
+        Offset where the previous scan of the log ended,
+        or 0 if the log is new, or was replaced or rewritten.
+        '''
+        try:
+            file_state = self.state[log_path]
+        except KeyError:
+            return 0
+        offset = file_state['offset']
+        if file_state['inode'] != file_info.st_ino or file_info.st_size < offset:
+            return 0
+        if self.fingerprint(log_path, offset) != file_state['fingerprint']:
+            return 0
+        return offset
+
+    #-------------------------
+    # note_stage
+    #--------------
+
+    def note_stage(self, when, message, open_stages, log_scan):
+        '''
+        If message starts or ends a stage, update open_stages,
+        and, for ends, add the stage's timing to log_scan.
+        '''
+        for (stage, start_pat, end_pat) in self.stage_pats:
+            match = start_pat.match(message)
+            if match is not None:
+                open_stages[(stage, match.groupdict().get('table'))] = when
+                return
+            match = end_pat.match(message)
+            if match is not None:
+                table = match.groupdict().get('table')
+                start_time = open_stages.pop((stage, table), None)
+                if start_time is not None:
+                    log_scan.timings.append(StageTiming(stage, table, start_time,
+                                                        (when - start_time).total_seconds()))
+                return
+
+    #-------------------------
+    # make_error
+    #--------------
+
+    def make_error(self, when, level, message, line, open_stages):
+        '''
+        Create a LogError, attributed to the table the message
+        names, or else to the most recently started open stage.
+        '''
+        (curr_stage, curr_table) = next(reversed(open_stages)) if len(open_stages) > 0 else (None, None)
+        match = CronlogScanner.table_pat.search(message)
+        if match is None:
+            return LogError(curr_table, curr_stage, when, level, message, line, [])
+        table = match.group('table')
+        stages_of_table = [stage for (stage, open_table) in open_stages.keys() if open_table == table]
+        stage = stages_of_table[-1] if len(stages_of_table) > 0 else curr_stage
+        return LogError(table, stage, when, level, message, line, [])
+
+    #-------------------------
+    # scan_other_line
+    #--------------
+
+    def scan_other_line(self, line, last_error, open_stages, log_scan):
+        '''
+        Handle a line without log prefix. It is either context
+        of the preceding error, or, if it contains 'ERROR', an
+        error itself.
+
+        @return: the error to which following lines belong, if any
+        @rtype: {None | LogError}
+        '''
+        if 'ERROR' in line:
+            error = self.make_error(None, 'ERROR', line.strip(), line + '\n', open_stages)
+            log_scan.errors.append(error)
+            return error
+        if last_error is not None and len(last_error.context) < CronlogScanner.MAX_CONTEXT_LINES:
+            last_error.context.append(line)
+        return last_error
+
+    #-------------------------
+    # fingerprint
+    #--------------
+
+    def fingerprint(self, log_path, offset):
+        '''
+        Checksum of the bytes just before offset.
+        '''
+        with open(log_path, 'rb') as fd:
+            start = max(0, offset - CronlogScanner.FINGERPRINT_BYTES)
+            fd.seek(start)
+            return hashlib.md5(fd.read(offset - start)).hexdigest()
+
+    #-------------------------
+    # save
+    #--------------
+
+    def save(self):
+        '''
+        Replace the state file as a whole.
+        '''
+        atomic_write(self.state_path, json.dumps(self.state, indent=2))
@@ -13,6 +13,7 @@ import sys
 from lxml import etree
 import lxml
 from canvas_utils_exceptions import ExploreCoursesError
+from stage_profiler import StageProfiler
 
 
 class ECXMLExtractor(object):
@@ -55,7 +56,8 @@ class ECXMLExtractor(object):
         '''
         sys.stderr.write('Building xml tree in memory...\n')
         try:
-            self.root = etree.parse(xml_file)
+            with StageProfiler.stage('parse_xml'):
+                self.root = etree.parse(xml_file)
         except lxml.etree.XMLSyntaxError as e:
             # Could not parse the file as XML. Is
             # it an HTML formatted message from the
@@ -68,7 +70,8 @@ class ECXMLExtractor(object):
                 return
             
         sys.stderr.write('Done building xml tree in memory.\n')
-        self.print_explore_courses_table(self.root)
+        with StageProfiler.stage('write_csv'):
+            self.print_explore_courses_table(self.root)
 
     #-------------------------
     # try_parse_html_msg 
@@ -248,8 +251,15 @@ if __name__ == '__main__':
     parser.add_argument('input',
                         help='fully qualified file name of the Explore Courses XML file.'
                         )
+    StageProfiler.add_arguments(parser)
 
     args = parser.parse_args();
 
-    ECXMLExtractor(args.input)
+    profiler = StageProfiler.from_args(parser.prog, args)
+    try:
+        ECXMLExtractor(args.input)
+    finally:
+        # Summary goes to stderr, away from the csv:
+        if profiler is not None:
+            profiler.finish()
     
\ No newline at end of file
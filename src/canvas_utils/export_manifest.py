@@ -0,0 +1,399 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime
+import json
+import os
+import re
+
+from atomic_file import atomic_write
+from size_spec import SizeSpec
+
+class ExportManifest(object):
+    '''
+    Maintains file export_manifest.json in the table export
+    directory. The manifest lists, for each exported table,
+    the files that hold the table's rows. Consumers, such as
+    loaders that can only read one file per worker, use the
+    manifest to find all the parts of sharded tables:
+
+      {"created" : "2019-10-20T02:13:10",
+       "tables"  : {"Terms" : {"header" : "all",
+                               "parts"  : [{"file"  : "Terms.tsv",
+                                            "rows"  : 2103,
+                                            "bytes" : 61233,
+                                            "has_header" : true
+                                            }]
+                               },
+                    "AssignmentSubmissions" : {"header" : "first",
+                                               "parts" : [{"file" : "AssignmentSubmissions.part-00001.tsv",
+                                                           ...
+                                                           },
+                                                          {"file" : "AssignmentSubmissions.part-00002.tsv",
+                                                           ...
+                                                           }
+                                                          ]
+                                               }
+                    }
+       }
+
+    The "rows" entries count data rows, i.e. exclude header lines.
+    They are None where the exporter did not count rows.
+
+    A table entry may also hold "source_rows": the number of rows
+    the exporter pulled from the database, or if it could not
+    tell, the number of rows recorded in LoadLog when the table
+    was built. SanityChecker compares the exported lines with it.
+
+    Each update is written right away, and atomically, so
+    that the manifest is consistent even while tables are still
+    being exported.
+    '''
+
+    manifest_file_name = 'export_manifest.json'
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, export_dir):
+        '''
+        Load the manifest in export_dir, if one exists.
+
+        @param export_dir: directory where the .tsv files are exported
+        @type export_dir: str
+        '''
+        self.export_dir    = export_dir
+        self.manifest_path = os.path.join(export_dir, ExportManifest.manifest_file_name)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as fd:
+                self.manifest = json.load(fd)
+        else:
+            self.manifest = {'created' : datetime.now().isoformat(timespec='seconds'),
+                             'tables'  : {}
+                             }
+
+    #-------------------------
+    # table_names
+    #--------------
+
+    @property
+    def table_names(self):
+        return list(self.manifest['tables'].keys())
+
+    #-------------------------
+    # parts
+    #--------------
+
+    def parts(self, table_name):
+        '''
+        Return the list of part dicts for the given
+        table, or an empty list if the table is not
+        in the manifest.
+
+        @param table_name: name of exported table
+        @type table_name: str
+        @return: list of dicts with keys 'file', 'rows', 'bytes', 'has_header'
+        @rtype: [{str : <any>}]
+        '''
+        try:
+            return self.manifest['tables'][table_name]['parts']
+        except KeyError:
+            return []
+
+    #-------------------------
+    # part_paths
+    #--------------
+
+    def part_paths(self, table_name):
+        '''
+        Return full paths of all files that hold
+        the given table's rows.
+
+        @param table_name: name of exported table
+        @type table_name: str
+        @return: list of paths
+        @rtype: [str]
+        '''
+        return [os.path.join(self.export_dir, part['file']) for part in self.parts(table_name)]
+
+    #-------------------------
+    # record_table
+    #--------------
+
+    def record_table(self, table_name, parts, header='all', source_rows=None):
+        '''
+        Replace the manifest entry of one table, and
+        save the manifest.
+
+        @param table_name: name of exported table
+        @type table_name: str
+        @param parts: list of part dicts, as in the class comment
+        @type parts: [{str : <any>}]
+        @param header: 'all' if every part starts with a header line,
+            'first' if only the first part does.
+        @type header: str
+        @param source_rows: number of rows the export should hold,
+            if known
+        @type source_rows: {None | int}
+        '''
+        self.manifest['tables'][table_name] = {'header' : header,
+                                               'parts'  : parts
+                                               }
+        if source_rows is not None:
+            self.manifest['tables'][table_name]['source_rows'] = source_rows
+        self.save()
+
+    #-------------------------
+    # source_rows
+    #--------------
+
+    def source_rows(self, table_name):
+        '''
+        Number of rows the table's export should hold, or
+        None if the exporter did not record it.
+        '''
+        try:
+            return self.manifest['tables'][table_name].get('source_rows', None)
+        except KeyError:
+            return None
+
+    #-------------------------
+    # save
+    #--------------
+
+    def save(self):
+        '''
+        Replace the manifest file as a whole, so readers
+        never see a partially written manifest.
+        '''
+        atomic_write(self.manifest_path, json.dumps(self.manifest, indent=2))
+
+
+# -------------------------- Class TsvSharder ---------------
+
+class TsvSharder(object):
+    '''
+    Splits an exported .tsv file into parts that are at most
+    a given number of bytes or rows large:
+
+        AssignmentSubmissions.tsv ==> AssignmentSubmissions.part-00001.tsv
+                                      AssignmentSubmissions.part-00002.tsv
+                                               ...
+
+    The header line is repeated at the top of every part, or
+    only placed into the first part. Files that do not exceed
+    the limit are left alone.
+
+    Exported lines never contain raw newlines, because both
+    the mysql client and the server side export escape them.
+    So lines can be distributed to parts without parsing.
+    '''
+
+    # Recognize part file names: 'Terms.part-00012.tsv':
+    part_pat = re.compile(r'^(.+)\.part-([0-9]{5})\.tsv$')
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, max_size, unit='bytes', header_in_all_parts=True):
+        '''
+        @param max_size: maximum number of bytes or data rows per part
+        @type max_size: int
+        @param unit: whether max_size counts 'bytes' or 'rows'
+        @type unit: {'bytes' | 'rows'}
+        @param header_in_all_parts: if True, each part starts with
+            the header line. Else only the first part does.
+        @type header_in_all_parts: bool
+        @raise ValueError: for non-positive max_size, or unknown unit
+        '''
+        if max_size <= 0:
+            raise ValueError(f"Maximum shard size must be positive, not {max_size}")
+        if unit not in ('bytes', 'rows'):
+            raise ValueError(f"Shard size unit must be 'bytes' or 'rows', not '{unit}'")
+
+        self.max_size = max_size
+        self.unit     = unit
+        self.header_in_all_parts = header_in_all_parts
+
+    #-------------------------
+    # from_spec
+    #--------------
+
+    @classmethod
+    def from_spec(cls, size_spec, header_in_all_parts=True):
+        '''
+        Create a TsvSharder from a command line spec such
+        as '500M', '2G', '1000000' (bytes), or '200000rows'.
+        Byte sizes are parsed by SizeSpec, so their units
+        are powers of 1024.
+
+        @param size_spec: maximum shard size with optional unit
+        @type size_spec: str
+        @param header_in_all_parts: see constructor
+        @type header_in_all_parts: bool
+        @return: a new TsvSharder
+        @rtype: TsvSharder
+        @raise ValueError: if size_spec is ill-formed.
+        '''
+        match = re.match(r'^\s*([0-9]+)\s*rows\s*$', str(size_spec), re.IGNORECASE)
+        if match is not None:
+            return cls(int(match.group(1)), unit='rows', header_in_all_parts=header_in_all_parts)
+        try:
+            max_bytes = SizeSpec.parse(size_spec)
+        except ValueError:
+            raise ValueError(f"Bad shard size '{size_spec}'; use e.g. 500M, 2G, 1000000, or 200000rows")
+        return cls(max_bytes, unit='bytes', header_in_all_parts=header_in_all_parts)
+
+    #-------------------------
+    # part_file_name
+    #--------------
+
+    @staticmethod
+    def part_file_name(table_name, part_num):
+        return f"{table_name}.part-{part_num:05d}.tsv"
+
+    #-------------------------
+    # table_name_from_file
+    #--------------
+
+    @staticmethod
+    def table_name_from_file(file_name):
+        '''
+        Given an export file name, such as Terms.tsv
+        or Terms.part-00003.tsv, return the table name.
+
+        @param file_name: base name of an exported file
+        @type file_name: str
+        @return: table name
+        @rtype: str
+        '''
+        match = TsvSharder.part_pat.match(file_name)
+        if match is not None:
+            return match.group(1)
+        return os.path.splitext(file_name)[0]
+
+    #-------------------------
+    # remove_parts
+    #--------------
+
+    @staticmethod
+    def remove_parts(table_name, dir_path):
+        '''
+        Remove part files of the given table left over
+        from an earlier export.
+
+        @param table_name: table whose parts to remove
+        @type table_name: str
+        @param dir_path: export directory
+        @type dir_path: str
+        '''
+        for file_name in os.listdir(dir_path):
+            match = TsvSharder.part_pat.match(file_name)
+            if match is not None and match.group(1) == table_name:
+                os.remove(os.path.join(dir_path, file_name))
+
+    #-------------------------
+    # shard
+    #--------------
+
+    def shard(self, tsv_path, table_name):
+        '''
+        Split tsv_path into parts in the same directory.
+        If the file does not exceed the maximum size, it is
+        left alone. Else it is removed after the parts are
+        written.
+
+        @param tsv_path: path to the exported .tsv file,
+            header line first
+        @type tsv_path: str
+        @param table_name: name of the exported table
+        @type table_name: str
+        @return: list of part dicts for ExportManifest.record_table()
+        @rtype: [{str : <any>}]
+        '''
+        dir_path = os.path.dirname(tsv_path)
+        self.remove_parts(table_name, dir_path)
+
+        if self.unit == 'bytes' and os.path.getsize(tsv_path) <= self.max_size:
+            return [TsvSharder.single_part(tsv_path)]
+
+        parts    = []
+        part_fd  = None
+        part_num = 0
+
+        with open(tsv_path, 'rb') as in_fd:
+            header = in_fd.readline()
+            try:
+                for line in in_fd:
+                    if part_fd is None or self.part_is_full(parts[-1], len(line)):
+                        if part_fd is not None:
+                            part_fd.close()
+                        part_num += 1
+                        file_name = TsvSharder.part_file_name(table_name, part_num)
+                        part_fd   = open(os.path.join(dir_path, file_name), 'wb')
+                        has_header = self.header_in_all_parts or part_num == 1
+                        if has_header:
+                            part_fd.write(header)
+                        parts.append({'file'  : file_name,
+                                      'rows'  : 0,
+                                      'bytes' : len(header) if has_header else 0,
+                                      'has_header' : has_header
+                                      })
+                    part_fd.write(line)
+                    parts[-1]['rows']  += 1
+                    parts[-1]['bytes'] += len(line)
+            finally:
+                if part_fd is not None:
+                    part_fd.close()
+
+        if part_num <= 1:
+            # Table fit into a single part after all
+            # (only possible for row limits). Keep the
+            # original file instead:
+            self.remove_parts(table_name, dir_path)
+            return [TsvSharder.single_part(tsv_path)]
+
+        os.remove(tsv_path)
+        return parts
+
+    #-------------------------
+    # part_is_full
+    #--------------
+
+    def part_is_full(self, part_dict, next_line_len):
+        '''
+        Return True if the next line does not fit into the part
+        described by part_dict. A part always receives at least
+        one data row, even if that row alone exceeds a byte limit.
+
+        @param part_dict: the part currently being filled
+        @type part_dict: {str : <any>}
+        @param next_line_len: length in bytes of the next line
+        @type next_line_len: int
+        '''
+        if part_dict['rows'] == 0:
+            return False
+        if self.unit == 'rows':
+            return part_dict['rows'] >= self.max_size
+        return part_dict['bytes'] + next_line_len > self.max_size
+
+    #-------------------------
+    # single_part
+    #--------------
+
+    @staticmethod
+    def single_part(tsv_path):
+        '''
+        Part dict for an unsharded .tsv file. Rows are
+        not counted, to avoid reading the file.
+        '''
+        return {'file'  : os.path.basename(tsv_path),
+                'rows'  : None,
+                'bytes' : os.path.getsize(tsv_path),
+                'has_header' : True
+                }
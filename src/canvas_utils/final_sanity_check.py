@@ -10,13 +10,19 @@ from enum import Enum
 import json
 import os
 from pathlib import Path
-import re
 import smtplib
 import socket
 import sys
 
 from canvas_utils_exceptions import TableExportError, DatabaseError
 from config_info import ConfigInfo
+from cronlog_scanner import CronlogScanner
+from export_manifest import ExportManifest, TsvSharder
+from line_counter import LineCounter
+from prom_metrics import MetricsFile
+from run_record import StageRecord
+from run_stats import AnomalyDetector, RunStats
+from tsv_validator import TableLayout, TsvValidator
 from utilities import Utilities
 
 
@@ -31,16 +37,29 @@ class SanityChecker(object):
        o Ensures that all tables have a .tsv file in 
          the table copy dir, and that 
        o none of those have less data than last time
+       o each export holds as many lines as rows were
+         recorded in the export manifest
+       o the latest row counts, export sizes, and build times
+         are in line with earlier runs (see AnomalyDetector)
+       o the exports can be parsed: headers match the schema
+         files, and every line has one field per column 
+         (see TsvValidator)
        
     Maintains a json file Data/typical_table_tsv_file_sizes.json.
     If a new table is added to the Queries subdir, this JSON is
-    updated.
+    updated. Since the sizes in that file only ever grow, it 
+    is only consulted for tables whose run statistics are too
+    short for anomaly detection.
     '''
     
     # The machine where table refreshes usually run.
     # An SMTP server is available there:
     DEVMACHINE_HOSTNAME = 'dmrapptooldev71.stanford.edu'
     CRONLOG_DIR         = Path(Path.home(), 'cronlogs')
+    CRONLOG_SCAN_STATE  = 'cronlog_scan_state.json'
+    
+    # Checks whose failures are exported as metrics:
+    CHECKS = ['num_files', 'file_lengths', 'row_counts', 'tsv_structure', 'run_stats', 'cronlog']
     
     #-------------------------
     # constructor 
@@ -68,29 +87,65 @@ class SanityChecker(object):
         if unittest:
             # Let unittests redefine table_export_dir and do their thing:
             return
+        stage_record = StageRecord('final_sanity_check')
+        stage_record.start()
         self.init_table_vars()
         
         detected_errors = []
+        # Number of problems each check found:
+        failures = {check : 0 for check in SanityChecker.CHECKS}
         try:
             self.check_num_files()
         except TableExportError as e:
+            failures['num_files'] = len(e.table_list)
             print(f"*****ERROR: {e.message} ({e.table_list})")
             # This error will be picked up in the cronlog analysis:
             # detected_errors.append(e)
             
         try:
-            self.check_exported_file_lengths()
+            self.check_exported_file_lengths(self.tables_without_history())
         except TableExportError as e:
+            failures['file_lengths'] = len(e.table_list)
             print(f"*****ERROR: {e.message} ({e.table_list})")
             # This error will be picked up in the cronlog analysis:
             # detected_errors.append(e)
                     
-        # Check latest cronlog for errors:
-        cronlog_error_lines = self.check_cronlog_errors()
-        if cronlog_error_lines is not None:
-            msg = f"Error(s) in cronlog: {''.join(cronlog_error_lines)} ({str(self.get_latest_cronlog())})"
+        # Exact row counts; mismatches go into the email:
+        try:
+            self.check_exported_row_counts()
+        except TableExportError as e:
+            failures['row_counts'] = len(e.table_list)
+            print(f"*****ERROR: {e.message} ({e.table_list})")
+            detected_errors.append(e)
+                    
+        # Exports that would shift columns for
+        # Informatica go into the email:
+        try:
+            self.check_tsv_structure()
+        except TableExportError as e:
+            failures['tsv_structure'] = len(e.table_list)
+            print(f"*****ERROR: {e.message} ({e.table_list})")
+            detected_errors.append(e)
+                    
+        # Sizes, row counts, and build times out
+        # of the ordinary go into the email:
+        try:
+            self.check_run_stats()
+        except TableExportError as e:
+            failures['run_stats'] = len(e.table_list)
+            print(f"*****ERROR: {e.message} ({e.table_list})")
+            detected_errors.append(e)
+                    
+        # Check what was added to the latest 
+        # cronlog since last time for errors:
+        log_scan = self.scan_cronlog()
+        failures['cronlog'] = len(log_scan.errors)
+        if len(log_scan.errors) > 0:
+            msg = f"Error(s) in cronlog ({log_scan.log_path}):\n{log_scan.error_report()}"
             detected_errors.append(DatabaseError(msg))
           
+        self.finish_stage_record(stage_record, detected_errors, failures)
+          
         if len(detected_errors) > 0:
             # If we are running on the dev machine,
             # we can send email, b/c it has an SMTP service:
@@ -103,6 +158,43 @@ class SanityChecker(object):
             self.maybe_send_mail(f"Ran fine; check time {time_now}", reason=EmailReason.HAPPY)
             sys.exit(0)
             
+    #-------------------------
+    # finish_stage_record
+    #--------------
+    
+    def finish_stage_record(self, stage_record, detected_errors, failures):
+        '''
+        Add the errors this check found to the run's report,
+        and write the number of problems per check as metrics.
+        
+        @param stage_record: record started in the constructor
+        @type stage_record: StageRecord
+        @param detected_errors: errors that go into the email
+        @type detected_errors: [{TableExportError | DatabaseError}]
+        @param failures: number of problems each check found
+        @type failures: {str : int}
+        '''
+        for err in detected_errors:
+            if isinstance(err, TableExportError):
+                stage_record.note_error(f"{err.message} ({err.table_list})")
+            else:
+                stage_record.note_error(err.message)
+        try:
+            record_path = stage_record.finish()
+            print(f"Wrote run record {record_path}.")
+        except (IOError, OSError) as e:
+            print(f"*****WARNING: could not write run record: {repr(e)}")
+        metrics = MetricsFile.from_stage_record(stage_record)
+        for (check, num_failures) in failures.items():
+            metrics.add('canvas_utils_sanity_failures', num_failures,
+                        'Problems found by a sanity check.', check=check)
+        try:
+            metrics_path = metrics.write()
+            if metrics_path is not None:
+                print(f"Wrote metrics {metrics_path}.")
+        except (IOError, OSError) as e:
+            print(f"*****WARNING: could not write metrics: {repr(e)}")
+
     #-------------------------
     # check_num_files
     #--------------
@@ -154,9 +246,10 @@ class SanityChecker(object):
         # Create dict: Table name==>.tsv-file-date
         tbl_age_dict = {}
         for tbl_nm in self.copied_tables_set:
-            tbl_path = os.path.join(self.table_export_dir_path, tbl_nm + '.tsv')
-            # Last modified time in seconds since epoch:
-            last_mod_time = os.path.getctime(tbl_path)
+            # Last modified time in seconds since epoch;
+            # for sharded exports the newest part counts:
+            last_mod_time = max(os.path.getctime(tbl_path) 
+                                for tbl_path in self.exported_file_paths(tbl_nm))
             tbl_age_dict[tbl_nm] = last_mod_time
             
         # Newest file:
@@ -173,7 +266,7 @@ class SanityChecker(object):
     # check_exported_file_lengths 
     #--------------
 
-    def check_exported_file_lengths(self):
+    def check_exported_file_lengths(self, table_names=None):
         '''
         Ensure none of the export files is
         less than what is stated as expected in file
@@ -186,6 +279,8 @@ class SanityChecker(object):
         add the table's current file size as the desirable one,
         unless it's zero.
         
+        @param table_names: tables to check. Default: all tables
+        @type table_names: [str]
         @return: True if all is well.
         @rtype: bool
         @raise TableExportError: if missing tables are found. 
@@ -194,15 +289,18 @@ class SanityChecker(object):
             in the exception's table_list property.
         '''
         shrunken_tables  = []
+        if table_names is None:
+            table_names = self.all_tables
 
-        for table_name in self.all_tables:
-            file_path  = os.path.join(self.table_export_dir_path, table_name + '.tsv')
-            try:
-                file_stats = os.stat(file_path)
-            except IOError:
-                file_len = 0
-            else:
-                file_len   = file_stats.st_size
+        for table_name in table_names:
+            # Sharded exports: the parts together must
+            # be as large as the expected size:
+            file_len = 0
+            for file_path in self.exported_file_paths(table_name):
+                try:
+                    file_len += os.stat(file_path).st_size
+                except IOError:
+                    pass
             try:
                 expected_minimal_file_len = self.putative_file_sizes_dict[table_name]
             except KeyError:
@@ -226,30 +324,214 @@ class SanityChecker(object):
 
         return True
 
+    #-------------------------
+    # check_exported_row_counts 
+    #--------------
+    
+    def check_exported_row_counts(self, line_counter=None):
+        '''
+        Compare the number of data lines in each table's
+        export with the number of rows the exporter recorded
+        in the export manifest: either the rows it pulled from
+        the database, or the rows LoadLog recorded when the
+        table was built. Tables without a recorded count are 
+        skipped. The lines of all export files are counted 
+        in one parallel pass (see LineCounter).
+        
+        @param line_counter: counter to use. Default: one with
+            a worker per CPU
+        @type line_counter: LineCounter
+        @return: map from table name to (lines exported, rows expected)
+            for the tables that were checked
+        @rtype: {str : (int, int)}
+        @raise TableExportError: if any table's counts differ. The 
+            exception's table_list holds one entry per table with
+            both counts.
+        '''
+        if line_counter is None:
+            line_counter = LineCounter()
+        manifest = ExportManifest(self.table_export_dir_path)
+        
+        # Tables with a recorded count, and their files:
+        table_paths = {}
+        for table_name in self.all_tables:
+            if manifest.source_rows(table_name) is not None:
+                table_paths[table_name] = self.exported_file_paths(table_name)
+        
+        all_paths = [path for paths in table_paths.values() for path in paths]
+        line_counts = line_counter.count_lines_in_files(all_paths)
+        
+        counts     = {}
+        mismatches = []
+        for (table_name, paths) in table_paths.items():
+            parts = manifest.parts(table_name)
+            num_headers = len([part for part in parts if part['has_header']]) if len(parts) > 0 else len(paths)
+            num_lines = sum([line_counts[path] for path in paths]) - num_headers
+            expected  = manifest.source_rows(table_name)
+            counts[table_name] = (num_lines, expected)
+            if num_lines != expected:
+                mismatches.append(f"{table_name}: {num_lines} rows exported, {expected} recorded")
+                
+        if len(mismatches) > 0:
+            raise TableExportError("Exported row counts differ from recorded counts", mismatches)
+        return counts
+
+    #-------------------------
+    # check_tsv_structure 
+    #--------------
+    
+    def check_tsv_structure(self, validator=None):
+        '''
+        Check that each table's export files can be parsed:
+        the header lines name the columns of the table's
+        <table>_schema.sql file, every line has one field per
+        column, and sampled values conform to their column
+        types. All files are checked in one parallel pass.
+        Tables without schema file are skipped.
+        
+        @param validator: validator to use. Default: one with
+            a worker per CPU
+        @type validator: TsvValidator
+        @return: True if all is well.
+        @rtype: bool
+        @raise TableExportError: if any file has problems. The
+            exception's table_list holds one entry per problem,
+            with file name, line number, and byte offset.
+        '''
+        if validator is None:
+            validator = TsvValidator()
+        manifest = ExportManifest(self.table_export_dir_path)
+        
+        files = []
+        for table_name in self.all_tables:
+            schema_path = os.path.join(self.table_export_dir_path, table_name + '_schema.sql')
+            if not os.path.exists(schema_path):
+                continue
+            layout = TableLayout.from_schema_file(schema_path)
+            # Parts after the first may lack the header. Without
+            # manifest entry, all files have one:
+            headerless_files = {part['file'] for part in manifest.parts(table_name) if not part['has_header']}
+            for path in self.exported_file_paths(table_name):
+                files.append((path, layout, os.path.basename(path) not in headerless_files))
+                
+        problems = []
+        for file_problems in validator.validate(files).values():
+            problems.extend(file_problems)
+        if len(problems) > 0:
+            raise TableExportError("Export file(s) cannot be parsed", problems)
+        return True
+
+    #-------------------------
+    # check_run_stats 
+    #--------------
+    
+    def check_run_stats(self, detector=None):
+        '''
+        Judge each table's latest row count, export size, and
+        build time against the table's earlier runs, as recorded
+        by the exporter in the run statistics store. Tables and
+        values with too little history are skipped.
+        
+        @param detector: detector to use. Default: AnomalyDetector()
+        @type detector: AnomalyDetector
+        @return: True if all is well.
+        @rtype: bool
+        @raise TableExportError: if any value is out of the ordinary.
+            The exception's table_list holds one entry per value,
+            with the baseline median and the modified z-score.
+        '''
+        if detector is None:
+            detector = AnomalyDetector()
+        run_stats = RunStats(self.table_export_dir_path)
+        anomalies = []
+        for table_name in self.all_tables:
+            samples = run_stats.samples(table_name)
+            for metric in RunStats.metrics:
+                score = detector.score(samples, metric)
+                if score is None:
+                    continue
+                (value, median, z) = score
+                if detector.is_anomaly(value, median, z):
+                    anomalies.append(f"{table_name} {metric}: {value:g} (median {median:g}, z={z:.1f})")
+                    
+        if len(anomalies) > 0:
+            raise TableExportError("Table statistics out of the ordinary", anomalies)
+        return True
+
+    #-------------------------
+    # tables_without_history 
+    #--------------
+    
+    def tables_without_history(self):
+        '''
+        Tables whose export sizes cannot yet be judged
+        by check_run_stats().
+        
+        @return: names of those tables
+        @rtype: [str]
+        '''
+        run_stats = RunStats(self.table_export_dir_path)
+        detector  = AnomalyDetector()
+        return [table_name for table_name in self.all_tables
+                if detector.score(run_stats.samples(table_name), 'bytes') is None]
+
     #-------------------------
     # check_cronlog_errors
     #--------------
 
     def check_cronlog_errors(self):
         '''
-        Finds latest cronlog, and searches is for string 'ERROR'
-        Collects those lines, and returns them as a list if any
-        are found, else returns None
+        Finds latest cronlog, and scans what was added to it
+        since the previous scan for errors (see scan_cronlog()).
+        Returns the error lines as a list if any are found, 
+        else returns None
         
-        @return: list of lines containing str 'ERROR' from most recent cronlog,
+        @return: list of error lines from most recent cronlog,
             or None
         @rtype: {None | [str]}
         '''
+        error_lines = [error.line for error in self.scan_cronlog().errors]
+        return None if len(error_lines) == 0 else error_lines
+
+    #-------------------------
+    # scan_cronlog
+    #--------------
+
+    def scan_cronlog(self):
+        '''
+        Scan the part of the latest cronlog that was added
+        since the previous scan. Scan positions are kept in
+        CRONLOG_SCAN_STATE in the cronlog directory.
         
-        latest_log_path_obj = self.get_latest_cronlog()
-        error_lines = []
-        
-        with open(latest_log_path_obj, 'r') as fd:
-            for line in fd:
-                if re.findall(r'ERROR', line):
-                    error_lines.append(line)
+        @return: errors grouped by table and stage, and
+            stage timings
+        @rtype: LogScan
+        '''
+        scanner = CronlogScanner(os.path.join(SanityChecker.CRONLOG_DIR, SanityChecker.CRONLOG_SCAN_STATE))
+        return scanner.scan(self.get_latest_cronlog())
 
-        return None if len(error_lines) == 0 else error_lines
+    #-------------------------
+    # exported_file_paths 
+    #--------------
+    
+    def exported_file_paths(self, table_name):
+        '''
+        Return paths to the files holding the given table's
+        export: either <table>.tsv, or the part files
+        <table>.part-00001.tsv, ... of a sharded export.
+        
+        @param table_name: name of aux table
+        @type table_name: str
+        @return: list of paths, possibly empty
+        @rtype: [str]
+        '''
+        single_path = os.path.join(self.table_export_dir_path, table_name + '.tsv')
+        if os.path.exists(single_path):
+            return [single_path]
+        part_names = [file_name for file_name in os.listdir(self.table_export_dir_path)
+                      if TsvSharder.part_pat.match(file_name) and 
+                         TsvSharder.table_name_from_file(file_name) == table_name]
+        return [os.path.join(self.table_export_dir_path, part_name) for part_name in sorted(part_names)]
 
     #-------------------------
     # update_reasonable_file_sizes 
@@ -287,8 +569,9 @@ class SanityChecker(object):
         all_copied_table_files = os.listdir(self.table_export_dir_path)
         # Don't want the schema files:
         tsv_files = filter(lambda file_name: file_name.endswith('.tsv'), all_copied_table_files)
-        # Get the table names:
-        self.copied_tables = [Path(file_name).stem for file_name in tsv_files]
+        # Get the table names; the parts of sharded
+        # exports all count for their table:
+        self.copied_tables = list({TsvSharder.table_name_from_file(file_name) for file_name in tsv_files})
 
         self.all_tables_set = set(self.all_tables)
         self.copied_tables_set   = set(self.copied_tables)
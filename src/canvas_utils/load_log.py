@@ -0,0 +1,280 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import re
+
+from sql_dependencies import SqlDependencyExtractor
+
+
+class LoadLog(object):
+    '''
+    Schema of, and statements against the LoadLog table.
+    CanvasPrep adds one row each time it builds an aux
+    table:
+
+        tbl_name        : the aux table
+        time_refreshed  : when the build finished (UTC)
+        num_rows        : rows in the new table
+        duration_secs   : how long the build took
+        data_bytes      : size of the table data
+        index_bytes     : size of the table's indexes
+        run_id          : same for all tables built by one
+                             CanvasPrep run
+        export_secs     : how long AuxTableCopier took to export
+                             this build of the table; filled in
+                             after the export (export_update_cmd())
+
+    The index on (tbl_name, time_refreshed) lets the server
+    find each table's latest entry (latest_per_table_query())
+    without reading the whole log.
+
+    Entries older than a number of days are condensed into one
+    row per table and day in LoadLogDaily (rollup_cmds()), so
+    the log does not grow without bounds.
+    '''
+
+    table_name       = 'LoadLog'
+    daily_table_name = 'LoadLogDaily'
+    index_name       = 'tbl_time_idx'
+
+    # Default age in days after which entries are rolled up:
+    ROLLUP_AFTER_DAYS = 90
+
+    # Columns and their types, in table order:
+    columns = [('tbl_name',       'varchar(255)'),
+               ('time_refreshed', 'DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'),
+               ('num_rows',       'bigint'),
+               ('duration_secs',  'double'),
+               ('data_bytes',     'bigint'),
+               ('index_bytes',    'bigint'),
+               ('run_id',         'varchar(40)'),
+               ('export_secs',    'double')
+               ]
+
+    # Statements that change the row count of the table
+    # they write, and the direction of the change. UPDATE,
+    # ALTER, CREATE INDEX, etc. leave the count alone:
+    row_change_pat = re.compile(r'^\s*(INSERT|REPLACE|LOAD\s+DATA|DELETE|CREATE\s+(?:TEMPORARY\s+)?TABLE)\b',
+                                re.IGNORECASE)
+
+    #-------------------------
+    # create_cmd
+    #--------------
+
+    @classmethod
+    def create_cmd(cls, db_schema, table_name=None):
+        '''
+        Statement that creates the LoadLog table, if
+        it does not exist.
+        '''
+        if table_name is None:
+            table_name = cls.table_name
+        col_defs = ',\n    '.join([f"{col_name} {col_type}" for (col_name, col_type) in cls.columns])
+        return (f"CREATE TABLE IF NOT EXISTS {db_schema}.{table_name} (\n    {col_defs},\n" +
+                f"    INDEX {cls.index_name} (tbl_name, time_refreshed)\n    )")
+
+    #-------------------------
+    # upgrade_cmds
+    #--------------
+
+    @classmethod
+    def upgrade_cmds(cls, db_schema, existing_columns, existing_indexes, table_name=None):
+        '''
+        Statements that bring an older LoadLog, which only
+        had tbl_name, time_refreshed, and num_rows, up to the
+        current schema.
+
+        @param db_schema: schema holding the LoadLog
+        @type db_schema: str
+        @param existing_columns: names of the table's columns
+        @type existing_columns: [str]
+        @param existing_indexes: names of the table's indexes
+        @type existing_indexes: [str]
+        @param table_name: name of the log table. Default: LoadLog
+        @type table_name: str
+        @return: ALTER TABLE statements; empty if nothing to do
+        @rtype: [str]
+        '''
+        if table_name is None:
+            table_name = cls.table_name
+        existing_columns = [col_name.lower() for col_name in existing_columns]
+        clauses = [f"ADD COLUMN {col_name} {col_type}"
+                   for (col_name, col_type) in cls.columns
+                   if col_name.lower() not in existing_columns]
+        if cls.index_name.lower() not in [index_name.lower() for index_name in existing_indexes]:
+            clauses.append(f"ADD INDEX {cls.index_name} (tbl_name, time_refreshed)")
+        if len(clauses) == 0:
+            return []
+        return [f"ALTER TABLE {db_schema}.{table_name} {', '.join(clauses)}"]
+
+    #-------------------------
+    # insert_cmd
+    #--------------
+
+    @classmethod
+    def insert_cmd(cls, db_schema, tbl_name, num_rows,
+                   duration_secs=None, data_bytes=None, index_bytes=None, run_id=None):
+        '''
+        Statement that records one table build.
+        '''
+        values = [f"'{tbl_name}'", num_rows, duration_secs, data_bytes, index_bytes,
+                  None if run_id is None else f"'{run_id}'"]
+        value_strs = ['NULL' if value is None else str(value) for value in values]
+        return (f"INSERT INTO {db_schema}.{cls.table_name} " +
+                 "(tbl_name, num_rows, duration_secs, data_bytes, index_bytes, run_id) " +
+                f"VALUES ({', '.join(value_strs)})")
+
+    #-------------------------
+    # export_update_cmd
+    #--------------
+
+    @classmethod
+    def export_update_cmd(cls, db_schema, tbl_name, export_secs):
+        '''
+        Statement that records the export duration in the
+        table's latest entry. Keeps time_refreshed from being
+        bumped by its ON UPDATE clause.
+        '''
+        return (f"UPDATE {db_schema}.{cls.table_name} " +
+                f"SET export_secs = {export_secs}, time_refreshed = time_refreshed " +
+                f"WHERE tbl_name = '{tbl_name}' ORDER BY time_refreshed DESC LIMIT 1")
+
+    #-------------------------
+    # latest_build_query
+    #--------------
+
+    @classmethod
+    def latest_build_query(cls, db_schema, tbl_name):
+        '''
+        Query for the row count and duration of the 
+        table's most recent build. One index lookup.
+        '''
+        return (f"SELECT num_rows, duration_secs FROM {db_schema}.{cls.table_name} " +
+                f"WHERE tbl_name = '{tbl_name}' ORDER BY time_refreshed DESC LIMIT 1")
+
+    #-------------------------
+    # latest_per_table_query
+    #--------------
+
+    @classmethod
+    def latest_per_table_query(cls, db_schema):
+        '''
+        Query for the most recent entry of each table. The
+        inner GROUP BY is answered from the (tbl_name, time_refreshed)
+        index, and each outer row is one index lookup.
+        '''
+        return f'''SELECT log.*
+                     FROM {db_schema}.{cls.table_name} AS log
+                     JOIN (SELECT tbl_name, MAX(time_refreshed) AS time_refreshed
+                             FROM {db_schema}.{cls.table_name}
+                            GROUP BY tbl_name
+                          ) AS latest
+                    USING (tbl_name, time_refreshed)
+                    ORDER BY log.tbl_name'''
+
+    #-------------------------
+    # create_daily_cmd
+    #--------------
+
+    @classmethod
+    def create_daily_cmd(cls, db_schema):
+        '''
+        Statement that creates the table of daily summaries.
+        '''
+        return f'''CREATE TABLE IF NOT EXISTS {db_schema}.{cls.daily_table_name} (
+                     day date,
+                     tbl_name varchar(255),
+                     num_refreshes int,
+                     total_duration_secs double,
+                     max_duration_secs double,
+                     max_rows bigint,
+                     max_data_bytes bigint,
+                     max_index_bytes bigint,
+                     PRIMARY KEY (tbl_name, day)
+                     )'''
+
+    #-------------------------
+    # rollup_cmds
+    #--------------
+
+    @classmethod
+    def rollup_cmds(cls, db_schema, days=None):
+        '''
+        Statements that summarize LoadLog entries older than
+        the given number of days into LoadLogDaily, and then
+        remove them from LoadLog. Whole days are rolled up,
+        and summaries of a day that was rolled up before
+        are merged.
+
+        @param db_schema: schema holding the LoadLog
+        @type db_schema: str
+        @param days: age in days of entries to roll up.
+            Default: ROLLUP_AFTER_DAYS
+        @type days: int
+        @return: statements to run in order
+        @rtype: [str]
+        '''
+        if days is None:
+            days = cls.ROLLUP_AFTER_DAYS
+        cutoff = f"UTC_DATE() - INTERVAL {int(days)} DAY"
+        return [cls.create_daily_cmd(db_schema),
+                f'''INSERT INTO {db_schema}.{cls.daily_table_name}
+                    SELECT DATE(time_refreshed), tbl_name, COUNT(*),
+                           SUM(duration_secs), MAX(duration_secs),
+                           MAX(num_rows), MAX(data_bytes), MAX(index_bytes)
+                      FROM {db_schema}.{cls.table_name}
+                     WHERE time_refreshed < {cutoff}
+                     GROUP BY DATE(time_refreshed), tbl_name
+                    ON DUPLICATE KEY UPDATE
+                       num_refreshes       = num_refreshes + VALUES(num_refreshes),
+                       total_duration_secs = IFNULL(total_duration_secs, 0) + IFNULL(VALUES(total_duration_secs), 0),
+                       max_duration_secs   = GREATEST(IFNULL(max_duration_secs, 0), IFNULL(VALUES(max_duration_secs), 0)),
+                       max_rows            = GREATEST(IFNULL(max_rows, 0), IFNULL(VALUES(max_rows), 0)),
+                       max_data_bytes      = GREATEST(IFNULL(max_data_bytes, 0), IFNULL(VALUES(max_data_bytes), 0)),
+                       max_index_bytes     = GREATEST(IFNULL(max_index_bytes, 0), IFNULL(VALUES(max_index_bytes), 0))''',
+                f"DELETE FROM {db_schema}.{cls.table_name} WHERE time_refreshed < {cutoff}"
+                ]
+
+    #-------------------------
+    # row_change_sign
+    #--------------
+
+    @classmethod
+    def row_change_sign(cls, statement, tbl_name, target_db, curr_db=None):
+        '''
+        Whether a table creation statement adds rows to
+        tbl_name (1), removes rows from it (-1), or leaves
+        its row count alone (0). The number of rows is then
+        the statement's affected-row count, i.e. ROW_COUNT().
+
+        @param statement: one SQL statement
+        @type statement: str
+        @param tbl_name: the aux table being built
+        @type tbl_name: str
+        @param target_db: database that holds the aux table
+        @type target_db: str
+        @param curr_db: database USEd when the statement runs.
+            Default: target_db
+        @type curr_db: str
+        @rtype: int
+        '''
+        match = cls.row_change_pat.match(statement)
+        if match is None:
+            return 0
+        if curr_db is None:
+            curr_db = target_db
+        written = [ref for ref in SqlDependencyExtractor(curr_db).extract_refs(statement)
+                   if ref.role == 'written'
+                   and ref.table.lower() == tbl_name.lower()
+                   and ref.db.lower() == target_db.lower()]
+        if len(written) == 0:
+            return 0
+        verb = match.group(1).upper()
+        if verb == 'DELETE':
+            return -1
+        if verb.startswith('CREATE') and re.search(r'\bSELECT\b', statement, re.IGNORECASE) is None:
+            # Plain CREATE TABLE, or CREATE TABLE ... LIKE:
+            return 0
+        return 1
@@ -0,0 +1,42 @@
+#!/usr/bin/env bash
+
+# Used only internally by restore_tables.py. Invoke the command line
+# mysql client with LOCAL INFILE enabled, given host, user, pointer
+# to file where pwd is stored, the database name, the full path to
+# the mysql executable, and a LOAD DATA LOCAL INFILE '/dev/stdin'
+# statement, preceded by the SET statements for the session's time
+# zone and sql_mode. The data to load arrives on this script's stdin,
+# usually straight from a decompression stream of a backup archive
+# (see backup_archive.py). So no decompressed copy is ever written
+# to disk.
+#
+# Returns the exit code of the mysql call.
+
+
+HOST=$1
+USER=$2
+PWD_FILE_POINTER=$3
+DB=$4
+MYSQL_PATH=$5
+LOAD_STATEMENT=$6
+
+if [[ -z $PWD_FILE_POINTER ]]
+then
+    ${MYSQL_PATH} -h $HOST -u $USER --local-infile=1 $DB -e " ${LOAD_STATEMENT}"
+    exit $?
+fi
+
+# Is pwd file pointer absolute?
+if [[ ! $PWD_FILE_POINTER == /* ]]
+then
+    # Nope, make it so:
+    PWD_FILE_POINTER=${HOME}/.ssh/${PWD_FILE_POINTER}
+fi
+
+PWD=$(<${PWD_FILE_POINTER})
+
+# See call_mysql.sh for the --defaults-extra-file trick:
+
+${MYSQL_PATH} --defaults-extra-file=<(printf "[client]\nhost = %s\nuser = %s\npassword = %s" "$HOST" "$USER" "$PWD")\
+              --local-infile=1 $DB -e " ${LOAD_STATEMENT}"
+exit $?
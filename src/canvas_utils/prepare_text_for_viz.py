@@ -13,6 +13,8 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import TreebankWordTokenizer
 
+from stage_profiler import StageProfiler
+
 
 class TextPreprocessor(object):
     '''
@@ -126,6 +128,7 @@ if __name__ == '__main__':
                             'such as a course : "AA110",One text line.',
                         action='store_true',
                         default=False)
+    StageProfiler.add_arguments(parser)
 
     args = parser.parse_args();
     
@@ -136,7 +139,14 @@ if __name__ == '__main__':
         
     #text_file = '/Users/paepcke/tmp/april89.txt'
     #text_file = None
-    tp = TextPreprocessor(text_file, has_attributes=args.attributes)
+    profiler = StageProfiler.from_args(parser.prog, args)
+    try:
+        with StageProfiler.stage('count_words'):
+            tp = TextPreprocessor(text_file, has_attributes=args.attributes)
+    finally:
+        # Summary goes to stderr, away from the csv:
+        if profiler is not None:
+            profiler.finish()
     print(tp)            
             
         
\ No newline at end of file
@@ -0,0 +1,272 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from collections import OrderedDict
+import math
+import os
+import re
+
+from atomic_file import atomic_write
+from config_info import ConfigInfo
+
+class MetricsFile(object):
+    '''
+    Metrics of one stage of a refresh run, in the text format
+    that node_exporter's textfile collector reads:
+
+        # HELP canvas_utils_table_build_seconds Seconds it took to build the table.
+        # TYPE canvas_utils_table_build_seconds gauge
+        canvas_utils_table_build_seconds{stage="canvas_prep",table="Terms"} 1.3
+
+    Each stage writes its own file, <prefix><stage>.prom, into
+    the metrics_dir configured in setup.cfg. If no metrics_dir
+    is configured, nothing is written. The file is replaced
+    as a whole, so the collector never reads a partial file.
+
+    Samples of metrics whose names end in LAST_SUCCESS_SUFFIX
+    are carried over from the stage's previous file unless
+    they are set anew. So a table that failed tonight keeps
+    the timestamp of its last successful night, which lets
+    alerts fire on stale tables.
+
+        metrics = MetricsFile('clear_old_backups')
+        metrics.add('canvas_utils_backup_tables', 3, 'Backups kept.', table='Terms')
+        metrics.write()
+    '''
+
+    file_prefix = 'canvas_utils_'
+    file_suffix = '.prom'
+
+    LAST_SUCCESS_SUFFIX = '_last_success_timestamp_seconds'
+
+    # Sample lines as written by to_text():
+    sample_pat = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$')
+    label_pat  = re.compile(r'(?P<label>[a-zA-Z_]\w*)="(?P<value>(?:[^"\\]|\\.)*)"')
+
+    # Per-stage metrics, from a StageRecord:
+    stage_metrics = OrderedDict([
+        ('wall_secs', ('canvas_utils_stage_duration_seconds', 'Wall clock seconds the stage took.')),
+        ('cpu_secs',  ('canvas_utils_stage_cpu_seconds', 'CPU seconds the stage process used.')),
+        ('errors',    ('canvas_utils_stage_errors', 'Errors noted by the stage.')),
+        ('end',       ('canvas_utils_stage_last_run_timestamp_seconds', 'When the stage last ended.')),
+        ])
+    stage_success_metric = ('canvas_utils_stage' + LAST_SUCCESS_SUFFIX,
+                            'When the stage last ended without errors.')
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, stage, metrics_dir=None):
+        '''
+        @param stage: name of the stage, such as canvas_prep
+        @type stage: str
+        @param metrics_dir: directory read by the textfile
+            collector. Default: metrics_dir from setup.cfg
+        @type metrics_dir: {None | str}
+        '''
+        self.stage = stage
+        self.metrics_dir = ConfigInfo().metrics_dir if metrics_dir is None else metrics_dir
+        # Metric name ==> [help, type, {label tuple : value}]:
+        self.metrics = OrderedDict()
+
+    #-------------------------
+    # from_stage_record
+    #--------------
+
+    @classmethod
+    def from_stage_record(cls, stage_record, table_metrics={}, table_success_metric=None, metrics_dir=None):
+        '''
+        Metrics of a finished stage: its duration, CPU time,
+        errors, and, if it had none, its success timestamp.
+        Per-table values of the record become samples labeled
+        with the table.
+
+        @param stage_record: record on which finish() was called
+        @type stage_record: StageRecord
+        @param table_metrics: map from the names of table values in
+            the record, such as 'build_secs', to (metric name, help)
+        @type table_metrics: {str : (str, str)}
+        @param table_success_metric: if provided, (metric name, help)
+            of a timestamp set for each table without errors
+        @type table_success_metric: {None | (str, str)}
+        @param metrics_dir: see constructor
+        @type metrics_dir: {None | str}
+        @return: the stage's metrics, not yet written
+        @rtype: MetricsFile
+        '''
+        metrics = cls(stage_record.stage, metrics_dir=metrics_dir)
+        end_time = stage_record.end_time.timestamp()
+        start_time = end_time if stage_record.start_time is None else stage_record.start_time.timestamp()
+        resources = stage_record.resources or {}
+        stage_values = {'wall_secs' : end_time - start_time,
+                        'cpu_secs'  : resources.get('cpu_secs'),
+                        'errors'    : len(stage_record.errors),
+                        'end'       : end_time
+                        }
+        for (value_name, (metric_name, help_text)) in cls.stage_metrics.items():
+            metrics.add(metric_name, stage_values[value_name], help_text)
+        if len(stage_record.errors) == 0:
+            (metric_name, help_text) = cls.stage_success_metric
+            metrics.add(metric_name, end_time, help_text)
+
+        failed_tables = set([error['table'] for error in stage_record.errors])
+        for (table_name, values) in stage_record.tables.items():
+            for (value_name, (metric_name, help_text)) in table_metrics.items():
+                metrics.add(metric_name, values.get(value_name), help_text, table=table_name)
+            if table_success_metric is not None and table_name not in failed_tables:
+                metrics.add(table_success_metric[0], end_time, table_success_metric[1], table=table_name)
+        return metrics
+
+    #-------------------------
+    # add
+    #--------------
+
+    def add(self, name, value, help_text, metric_type='gauge', **labels):
+        '''
+        Set one sample. All samples carry a stage label
+        in addition to the given labels. Samples whose
+        value is None are left out.
+
+        @param name: metric name
+        @type name: str
+        @param value: sample value
+        @type value: {None | int | float}
+        @param help_text: description of the metric
+        @type help_text: str
+        @param metric_type: 'gauge' or 'counter'
+        @type metric_type: str
+        '''
+        if value is None:
+            return
+        labels = OrderedDict([('stage', self.stage)] + sorted(labels.items()))
+        metric = self.metrics.setdefault(name, [help_text, metric_type, OrderedDict()])
+        metric[2][tuple(labels.items())] = value
+
+    #-------------------------
+    # to_text
+    #--------------
+
+    def to_text(self):
+        '''
+        All metrics in the textfile collector's format.
+        '''
+        text = ''
+        for (name, (help_text, metric_type, samples)) in self.metrics.items():
+            text += f"# HELP {name} {MetricsFile.escape(help_text, quotes=False)}\n"
+            text += f"# TYPE {name} {metric_type}\n"
+            for (labels, value) in samples.items():
+                label_str = ','.join([f'{label}="{MetricsFile.escape(str(label_value))}"'
+                                      for (label, label_value) in labels])
+                text += f"{name}{{{label_str}}} {MetricsFile.format_value(value)}\n"
+        return text
+
+    #-------------------------
+    # write
+    #--------------
+
+    def write(self):
+        '''
+        Add the last-success samples of the previous file
+        that were not set anew, then replace the file.
+
+        @return: path of the written file, or None if
+            no metrics_dir is configured
+        @rtype: {None | str}
+        @raise IOError: if the file cannot be written
+        '''
+        if self.metrics_dir is None:
+            return None
+        path = os.path.join(self.metrics_dir, MetricsFile.file_prefix + self.stage + MetricsFile.file_suffix)
+        (help_texts, prev_samples) = MetricsFile.read_file(path)
+        for (name, labels, value) in prev_samples:
+            if not name.endswith(MetricsFile.LAST_SUCCESS_SUFFIX):
+                continue
+            metric = self.metrics.setdefault(name, [help_texts.get(name, name), 'gauge', OrderedDict()])
+            if labels not in metric[2]:
+                metric[2][labels] = value
+
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        # The collector only reads files ending in .prom,
+        # so it skips the temporary file:
+        atomic_write(path, self.to_text())
+        return path
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # read_file
+    #--------------
+
+    @staticmethod
+    def read_file(path):
+        '''
+        Help texts and samples of a file written earlier.
+        Both are empty if the file does not exist.
+
+        @return: map from metric name to help text, and
+            (metric name, label tuple, value) of each sample
+        @rtype: ({str : str}, [(str, ((str, str)), float)])
+        '''
+        try:
+            with open(path, 'r') as fd:
+                lines = fd.read().splitlines()
+        except FileNotFoundError:
+            return ({}, [])
+        help_texts = {}
+        samples = []
+        for line in lines:
+            if line.startswith('# HELP '):
+                (name, _sep, help_text) = line[len('# HELP '):].partition(' ')
+                help_texts[name] = MetricsFile.unescape(help_text)
+                continue
+            match = MetricsFile.sample_pat.match(line)
+            if match is None:
+                continue
+            labels = tuple([(label_match.group('label'), MetricsFile.unescape(label_match.group('value')))
+                            for label_match in MetricsFile.label_pat.finditer(match.group('labels') or '')])
+            try:
+                value = float(match.group('value'))
+            except ValueError:
+                continue
+            samples.append((match.group('name'), labels, value))
+        return (help_texts, samples)
+
+    #-------------------------
+    # format_value
+    #--------------
+
+    @staticmethod
+    def format_value(value):
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, int):
+            return str(value)
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(float(value))
+
+    #-------------------------
+    # escape
+    #--------------
+
+    @staticmethod
+    def escape(text, quotes=True):
+        '''
+        Escape backslashes, newlines, and, in label
+        values, double quotes.
+        '''
+        text = text.replace('\\', '\\\\').replace('\n', '\\n')
+        return text.replace('"', '\\"') if quotes else text
+
+    #-------------------------
+    # unescape
+    #--------------
+
+    @staticmethod
+    def unescape(text):
+        return re.sub(r'\\(.)', lambda match: '\n' if match.group(1) == 'n' else match.group(1), text)
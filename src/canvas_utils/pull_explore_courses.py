@@ -4,6 +4,7 @@ Created on Jan 2, 2019
 
 @author: Andreas Paepcke
 '''
+import argparse
 from contextlib import contextmanager
 import logging
 import os
@@ -12,6 +13,7 @@ import sys
 import requests
 from explore_courses_etl import ECXMLExtractor
 from canvas_utils_exceptions import ExploreCoursesError
+from stage_profiler import StageProfiler
 
 
 class ECPuller(object):
@@ -261,7 +263,21 @@ def stdout_redirected(new_stdout):
         
 if __name__ == '__main__':
     
-    ec_puller = ECPuller('/tmp/ec.xml', log_level='info', overwrite_existing=True)
-    ec_puller.pull_ec()
-    ec_puller.ec_xml_to_csv('/tmp/ec.xml', '/tmp/ec.csv')
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Pull Explore Courses XML into /tmp/ec.xml, and convert it to /tmp/ec.csv."
+                                     )
+    StageProfiler.add_arguments(parser)
+    args = parser.parse_args()
+    
+    profiler = StageProfiler.from_args(parser.prog, args)
+    try:
+        with StageProfiler.stage('pull_ec'):
+            ec_puller = ECPuller('/tmp/ec.xml', log_level='info', overwrite_existing=True)
+            ec_puller.pull_ec()
+        with StageProfiler.stage('ec_xml_to_csv'):
+            ec_puller.ec_xml_to_csv('/tmp/ec.xml', '/tmp/ec.csv')
+    finally:
+        if profiler is not None:
+            profiler.finish()
     #print("EC size: {}".format(ec_puller.bytes_pulled(human_readable=True)))   
\ No newline at end of file
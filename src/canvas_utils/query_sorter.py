@@ -6,10 +6,15 @@ Created on Aug 14, 2019
 '''
 from _io import StringIO
 import copy
+import hashlib
+import inspect
+import json
 import os
-import re
 import sys
 
+from atomic_file import atomic_write
+from sql_dependencies import SqlDependencyExtractor
+
 # NOTE: don't import utilities module here.
 #       would lead to circular import.
       
@@ -24,8 +29,44 @@ class QuerySorter(object):
     of MySQL running the table X sql on other tables having
     been created first are satisfied.
     
-    Raises ValueError if circular dependency is detected.
+    Raises TableError if circular dependency is detected.
+    
+    Besides the flat order, the tables are available as
+    'generations': lists of tables that only depend on tables
+    in earlier generations, and could thus be created concurrently.
+    Property raw_tables maps each aux table to the tables of the 
+    raw Canvas db (canvasdata_prd) that its script reads. Property
+    lineage maps the other way: from raw tables and their columns
+    to the aux tables, and script statements that read them.
+    
+    The dependency graph is cached, both in memory and in 
+    file .query_sorter_cache.json next to this module. The 
+    cache is valid as long as the set of .sql files in Queries, 
+    and their content hashes are unchanged. Files whose 
+    modification time and size are unchanged are not re-read 
+    to compute their hash. The cache file also records a hash
+    of the code that computes the graph (this module, and
+    sql_dependencies.py). A cache file written by different
+    code is discarded.
     '''
+    
+    CACHE_FILE_NAME = '.query_sorter_cache.json'
+    
+    # Directory of the cache file. None: next to this
+    # module. Unittests point it elsewhere:
+    cache_dir = None
+    
+    # Databases as hard coded in the .sql files
+    # (see CanvasPrep.create_tables()):
+    AUX_DB = 'canvasdata_aux'
+    RAW_DB = 'canvasdata_prd'
+    
+    # Graphs computed in this process:
+    #    {fingerprint : graph dict; see get_dependency_graph()}
+    _graph_cache = {}
+    
+    # Hash of the graph computing code; see analyzer_hash():
+    _analyzer_hash = None
 
     #-------------------------
     # Constructor 
@@ -50,10 +91,16 @@ class QuerySorter(object):
             # in isolation:
             return
         
-        self.query_texts = self.get_query_texts(self.query_file_names)
-        
-        self.precedence_dict = self.build_precedence_dict(self.query_texts) 
-        self._sorted_table_names = self.sort(self.precedence_dict)
+        # Copy, b/c the cached graph is shared
+        # by all instances in this process:
+        graph = copy.deepcopy(self.get_dependency_graph())
+        self.precedence_dict = graph['precedence_dict']
+        self._generations    = graph['generations']
+        self._raw_tables     = graph['raw_tables']
+        self._lineage        = graph['lineage']
+        self._sorted_table_names = [table_name 
+                                    for generation in self._generations 
+                                    for table_name in generation]
 
     #-------------------------
     # property sorted_table_names 
@@ -63,6 +110,163 @@ class QuerySorter(object):
     def sorted_table_names(self):
         return self._sorted_table_names
         
+    #-------------------------
+    # property generations 
+    #--------------
+
+    @property
+    def generations(self):
+        return self._generations
+        
+    #-------------------------
+    # property raw_tables 
+    #--------------
+
+    @property
+    def raw_tables(self):
+        return self._raw_tables
+        
+    #-------------------------
+    # property lineage 
+    #--------------
+
+    @property
+    def lineage(self):
+        return self._lineage
+        
+    #-------------------------
+    # get_dependency_graph 
+    #--------------
+    
+    def get_dependency_graph(self):
+        '''
+        Return the dependency graph of the tables in Queries.
+        Taken from the in-memory cache, the cache file, or, if 
+        neither is current, computed from the query files:
+        
+            {'precedence_dict' : see build_precedence_dict(),
+             'generations'     : see compute_generations(),
+             'raw_tables'      : {aux_table : [raw_table, ...]},
+             'lineage'         : see analyze_queries()
+             }
+        
+        @return: graph dict
+        @rtype: {str : <any>}
+        '''
+        graph_keys = ['precedence_dict', 'generations', 'raw_tables', 'lineage']
+        
+        file_stats = self.query_file_stats()
+        mem_key    = tuple(sorted(file_stats.items()))
+        try:
+            return QuerySorter._graph_cache[mem_key]
+        except KeyError:
+            pass
+        
+        cache_dir  = self.curr_dir if QuerySorter.cache_dir is None else QuerySorter.cache_dir
+        cache_path = os.path.join(cache_dir, QuerySorter.CACHE_FILE_NAME)
+        try:
+            with open(cache_path, 'r') as fd:
+                cache = json.load(fd)
+        except (IOError, ValueError):
+            cache = {'files' : {}}
+        # Graphs computed by other code may differ:
+        analyzer_hash = QuerySorter.analyzer_hash()
+        if cache.get('analyzer', None) != analyzer_hash:
+            cache = {'files' : {}}
+        
+        # Fingerprint: {file_name : [mtime_ns, size, sha1]}. Only
+        # hash files whose mtime or size differ from the cache:
+        cached_files = cache['files']
+        fingerprint  = {}
+        for (file_name, (mtime_ns, size)) in file_stats.items():
+            cached_entry = cached_files.get(file_name, None)
+            if cached_entry is not None and cached_entry[:2] == [mtime_ns, size]:
+                file_hash = cached_entry[2]
+            else:
+                with open(os.path.join(self.query_dir, file_name), 'rb') as fd:
+                    file_hash = hashlib.sha1(fd.read()).hexdigest()
+            fingerprint[file_name] = [mtime_ns, size, file_hash]
+        
+        hashes_unchanged = {file_name : entry[2] for (file_name, entry) in fingerprint.items()} == \
+                           {file_name : entry[2] for (file_name, entry) in cached_files.items()}
+        
+        cache_complete = all([key in cache for key in graph_keys])
+        if hashes_unchanged and cache_complete:
+            graph = {key : cache[key] for key in graph_keys}
+        else:
+            query_texts = self.get_query_texts(self.query_file_names)
+            (precedence_dict, raw_tables, lineage) = self.analyze_queries(query_texts)
+            graph = {'precedence_dict' : precedence_dict,
+                     'generations'     : self.compute_generations(precedence_dict),
+                     'raw_tables'      : raw_tables,
+                     'lineage'         : lineage
+                     }
+            
+        if fingerprint != cached_files or not hashes_unchanged or not cache_complete:
+            self.save_graph_cache(cache_path, fingerprint, analyzer_hash, graph)
+            
+        QuerySorter._graph_cache[mem_key] = graph
+        return graph
+
+    #-------------------------
+    # query_file_stats 
+    #--------------
+    
+    def query_file_stats(self):
+        '''
+        Return modification time and size of each
+        .sql file in the Queries directory.
+        
+        @return: {file_name : (mtime_ns, size)}
+        @rtype: {str : (int, int)}
+        '''
+        file_stats = {}
+        for file_name in self.query_file_names:
+            if not file_name.endswith('.sql'):
+                continue
+            stat_res = os.stat(os.path.join(self.query_dir, file_name))
+            file_stats[file_name] = (stat_res.st_mtime_ns, stat_res.st_size)
+        return file_stats
+
+    #-------------------------
+    # analyzer_hash 
+    #--------------
+    
+    @staticmethod
+    def analyzer_hash():
+        '''
+        Return the sha1 of the source files of the code 
+        that computes the dependency graph. Computed once
+        per process.
+        
+        @return: hex digest
+        @rtype: str
+        '''
+        if QuerySorter._analyzer_hash is None:
+            sha = hashlib.sha1()
+            for source_path in [inspect.getfile(QuerySorter), inspect.getfile(SqlDependencyExtractor)]:
+                with open(source_path, 'rb') as fd:
+                    sha.update(fd.read())
+            QuerySorter._analyzer_hash = sha.hexdigest()
+        return QuerySorter._analyzer_hash
+
+    #-------------------------
+    # save_graph_cache 
+    #--------------
+    
+    def save_graph_cache(self, cache_path, fingerprint, analyzer_hash, graph):
+        '''
+        Write the cache file. Failure to write, e.g. b/c
+        the package is installed read-only, only means that 
+        the graph is recomputed in the next process.
+        '''
+        # Other processes, such as the pipeline exporter,
+        # may write the cache at the same time:
+        try:
+            atomic_write(cache_path, json.dumps(dict(graph, files=fingerprint, analyzer=analyzer_hash), indent=1))
+        except IOError:
+            pass
+
     #-------------------------
     # get_query_texts 
     #--------------
@@ -111,7 +315,7 @@ class QuerySorter(object):
 
     def build_precedence_dict(self, text_dict):
         '''
-        Given a dict: {<table_name> : <query_text_StringIO_buf},
+        Given a dict: {<table_name> : <query_text>},
         construct a dict:
         
            {<table_name> : [table_name, table_name, ...]}
@@ -119,61 +323,174 @@ class QuerySorter(object):
         where the array contains names of tables that must
         be processed before the table_name in the key.
         
-        Strategy:
-        
-        1. Build a regular expression that will find every
-           table name in a string, and makes a regegx group
-           out of it. Ex: r"(tbl1_name)|(tbl2_name)|(tbl3_name)"
-        
-        2. For each query string that creates a table, apply
-           the search pattern to get tuples of groups. For 
-           string "I am tbl1_name\nAnd you are tbl3_name"
-           We get:
-                [('tbl2_name','',''),('','','tbl3_name')]
-                
-        3. Pick the non-empty table names out from each tuple
-           to get a list of mentioned table names.  
-        
-        @param text_dict: dict table_name to query text StringIO buffer
+        @param text_dict: dict table_name to query text
         @type text_dict: {str : str}
         @return: dict mapping a table name to an array of
             table names that need to be processed earlier.
         @rtype: {str : [str]}
         '''
+        return self.analyze_queries(text_dict)[0]
+    
+    #-------------------------
+    # analyze_queries 
+    #--------------
+    
+    def analyze_queries(self, text_dict):
+        '''
+        Tokenize each query text, and collect the tables it
+        reads, writes, or builds indexes on. Mentions in comments,
+        string literals, or as part of longer identifiers don't 
+        count, except for the table arguments of the index 
+        procedures, such as createIndexIfNotExists().
         
-        precedence_dict = {}
+        A table depends on every other aux table its script
+        mentions in any role: reading, writing, and indexing
+        all need the other table to exist. Tables qualified 
+        with the raw Canvas db are never aux dependencies.
+        Raw tables that a script creates itself, such as helper
+        tables, are not listed as raw tables.
         
-        # Build a regular expression that makes a group out
-        # of every occurrence of a table name in a multi-line
-        # string: r"(<tablename1>)|(<tablename2>)|..."
+        The lineage dict maps each raw table to the aux tables 
+        whose scripts read it, with the (0-based) numbers of the
+        reading statements in the script, and each column to the
+        aux tables that reference it:
         
-        table_names = text_dict.keys()
-        # Convert ['table1', 'table2', ...] to ['(table1)', '(table2)', ...]:
-        table_name_grps = [f"({table_name})" for table_name in table_names]
-        # Put the regex OR operator between each group:
-        search_pattern = re.compile('|'.join(table_name_grps))
+            {'submission_fact' : {'aux_tables' : {'AssignmentSubmissions' : [7, 12]},
+                                  'columns'    : {'score' : ['AssignmentSubmissions'],
+                                                  ...
+                                                  }
+                                  },
+             ...
+             }
+             
+        Columns are only known where the script qualifies them,
+        as in canvasdata_prd.submission_fact.score, submission_fact.score,
+        or sf.score with sf an alias of the table.
         
-        for (table_name, query_str) in text_dict.items():
-            precedence_set = set()
-            
-            # Get a list of groups of table names:
-            # [('','Table3', ''), ('','', 'Table10'),
-            # where each table name is one found in the
-            # query string:
-            group_tuples = search_pattern.findall(query_str)
-            
-            # Go through each tuple and find the group that is
-            # not empty, and is not the name of the table whose
-            # dependencies we are trying to find:
+        @param text_dict: dict table_name to query text
+        @type text_dict: {str : str}
+        @return: precedence dict, as in build_precedence_dict(),
+            dict mapping each table to the sorted names of 
+            the raw tables it reads, and the lineage dict
+        @rtype: ({str : [str]}, {str : [str]}, {str : {str : <any>}})
+        '''
+        extractor = SqlDependencyExtractor()
+        precedence_dict = {}
+        raw_tables = {}
+        lineage    = {}
+        
+        for table_name in sorted(text_dict.keys()):
+            statements = extractor.extract(text_dict[table_name])
+            refs = [ref for statement in statements for ref in statement.refs]
             
-            for group_tuple in group_tuples: 
-                found_tbl_names = [found_table_name for found_table_name in group_tuple 
-                                   if len(found_table_name) > 0 and found_table_name != table_name] 
-                precedence_set = precedence_set.union(set(found_tbl_names))
-
-            precedence_dict[table_name] = list(precedence_set)
+            precedence_dict[table_name] = sorted({ref.table for ref in refs
+                                                  if ref.db != QuerySorter.RAW_DB and 
+                                                     ref.table in text_dict and
+                                                     ref.table != table_name
+                                                  })
+            raw_written = {ref.table for ref in refs 
+                           if ref.db == QuerySorter.RAW_DB and ref.role == 'written'}
+            raw_tables[table_name] = sorted({ref.table for ref in refs
+                                             if ref.db == QuerySorter.RAW_DB and 
+                                                ref.table not in raw_written
+                                             })
+            for statement in statements:
+                self.add_statement_lineage(lineage, table_name, statement, raw_written)
+                
+        return (precedence_dict, raw_tables, lineage)
+    
+    #-------------------------
+    # add_statement_lineage 
+    #--------------
+    
+    def add_statement_lineage(self, lineage, table_name, statement, raw_written):
+        '''
+        Enter the raw tables and columns that one statement of 
+        table_name's script reads into the lineage dict.
+        
+        @param lineage: lineage dict being built; see analyze_queries()
+        @type lineage: {str : {str : <any>}}
+        @param table_name: aux table whose script holds the statement
+        @type table_name: str
+        @param statement: the analyzed statement
+        @type statement: SqlStatement
+        @param raw_written: helper tables the script creates in the raw db
+        @type raw_written: {str}
+        '''
+        raw_read = {ref.table for ref in statement.refs 
+                    if ref.db == QuerySorter.RAW_DB and ref.table not in raw_written}
+        for raw_table in raw_read:
+            statement_nums = lineage.setdefault(raw_table, {'aux_tables' : {}, 'columns' : {}})\
+                                    ['aux_tables'].setdefault(table_name, [])
+            if statement.statement_num not in statement_nums:
+                statement_nums.append(statement.statement_num)
+        
+        for name_parts in statement.qualified_names:
+            col_name = name_parts[-1]
+            if col_name == '*':
+                continue
+            if len(name_parts) == 3 and name_parts[0] == QuerySorter.RAW_DB:
+                raw_table = name_parts[1]
+            elif len(name_parts) == 2 and name_parts[0] in statement.aliases:
+                (db, raw_table) = statement.aliases[name_parts[0]]
+                if db != QuerySorter.RAW_DB:
+                    continue
+            elif len(name_parts) == 2 and name_parts[0] in raw_read:
+                raw_table = name_parts[0]
+            else:
+                continue
+            if raw_table not in raw_read:
+                continue
+            aux_tables = lineage[raw_table]['columns'].setdefault(col_name, [])
+            if table_name not in aux_tables:
+                aux_tables.append(table_name)
 
-        return precedence_dict
+    #-------------------------
+    # tables_impacted_by 
+    #--------------
+    
+    def tables_impacted_by(self, raw_spec):
+        '''
+        Return the aux tables that need to be rebuilt when
+        the given raw table, or raw table column changes: the
+        tables whose scripts read it, and all tables that 
+        depend on those, directly or indirectly. 
+        
+        raw_spec may be 'submission_fact', 'submission_fact.score', 
+        or either one prefixed by the raw db name. For columns, only
+        qualified column references in the scripts are known (see
+        analyze_queries()). 
+        
+        @param raw_spec: raw table, or raw table and column
+        @type raw_spec: str
+        @return: tables to rebuild in build order, and the subset
+            that reads raw_spec directly
+        @rtype: ([str], {str})
+        '''
+        parts = raw_spec.split('.')
+        if parts[0] == QuerySorter.RAW_DB:
+            parts = parts[1:]
+        raw_table = parts[0]
+        try:
+            table_lineage = self.lineage[raw_table]
+        except KeyError:
+            return ([], set())
+        
+        if len(parts) > 1:
+            direct = set(table_lineage['columns'].get(parts[1], []))
+        else:
+            direct = set(table_lineage['aux_tables'].keys())
+            
+        # Add dependents of impacted tables. Tables in
+        # later generations only depend on earlier ones,
+        # so one pass in build order suffices:
+        impacted = set(direct)
+        for table_name in self.sorted_table_names:
+            if any([dependency in impacted for dependency in self.precedence_dict[table_name]]):
+                impacted.add(table_name)
+        
+        return ([table_name for table_name in self.sorted_table_names if table_name in impacted], 
+                direct)
     
     #-------------------------
     # sort 
@@ -199,25 +516,128 @@ class QuerySorter(object):
             or if any table in the queries has not corresponding 
             .sql file in Queries.
         '''
-        # Check for cycles: tables that mutually require the
-        # other one to be loaded first: Throws a value
-        # errors with informative msg if dicovers a conflict.
-        # Else returns True:
-        ordered_tables = self.detect_mutual_table_dependencies(precedence_dict)
-        return ordered_tables
+        return [table_name 
+                for generation in self.compute_generations(precedence_dict) 
+                for table_name in generation]
         
+    #-------------------------
+    # compute_generations 
+    #--------------
+    
+    def compute_generations(self, precedence_dict):
+        '''
+        Layered topological sort (Kahn's algorithm). Given 
+        a precedence dict: {table : [table1, table2, ...]},
+        return a list of generations:
+        
+            [['Accounts', 'Terms'],             # No dependencies
+             ['CourseEnrollment', 'Courses'],   # Depend only on gen 0
+             ['AssignmentSubmissions'],         # Depend on gens 0 and 1
+             ...
+             ]
+             
+        All tables of one generation only depend on tables
+        in earlier generations, so they could be created
+        concurrently. Within a generation, tables are sorted
+        by name to make the result deterministic.
+        
+        Runs in time linear in the number of tables plus
+        dependencies.
+        
+        @param precedence_dict: dict of table interdependencies
+        @type precedence_dict: {str : [str]}
+        @return: list of generations, each a list of table names
+        @rtype: [[str]]
+        @raise TableError: if a table depends on a table that has no
+            .sql file in Queries, or if there is a dependency cycle.
+            For cycles, the table_tuple is the cycle path, with
+            the first table repeated at the end: (T1, T2, T3, T1)
+            means T1 needs T2, which needs T3, which needs T1.
+        '''
+        # Number of unmet dependencies of each table,
+        # and for each table, the tables that wait for it:
+        num_unmet  = {}
+        dependents = {table_name : [] for table_name in precedence_dict.keys()}
+        
+        for (table_name, dependencies) in precedence_dict.items():
+            num_unmet[table_name] = len(dependencies)
+            for dependency in dependencies:
+                try:
+                    dependents[dependency].append(table_name)
+                except KeyError:
+                    raise TableError((table_name, dependency), 
+                                     f"Missing table file {dependency}.sql in Queries directory")
+        
+        generations = []
+        curr_generation = sorted([table_name for (table_name, num) in num_unmet.items() if num == 0])
+        num_placed = 0
+        
+        while len(curr_generation) > 0:
+            generations.append(curr_generation)
+            num_placed += len(curr_generation)
+            next_generation = []
+            for table_name in curr_generation:
+                for dependent in dependents[table_name]:
+                    num_unmet[dependent] -= 1
+                    if num_unmet[dependent] == 0:
+                        next_generation.append(dependent)
+            curr_generation = sorted(next_generation)
+            
+        if num_placed < len(precedence_dict):
+            # Tables with unmet dependencies left over 
+            # are on, or wait for a cycle:
+            stuck_tables = {table_name for (table_name, num) in num_unmet.items() if num > 0}
+            cycle = self.find_cycle(precedence_dict, stuck_tables)
+            raise TableError(tuple(cycle), "Mutual load order dependency")
+        
+        return generations
+
+    #-------------------------
+    # find_cycle 
+    #--------------
+    
+    def find_cycle(self, precedence_dict, stuck_tables):
+        '''
+        Given tables that Kahn's algorithm could not place,
+        return one dependency cycle among them as a list
+        that starts and ends with the same table.
+        
+        Every stuck table has at least one stuck dependency.
+        So following stuck dependencies from any stuck table
+        must eventually revisit a table; the path from that
+        table's first visit on is a cycle. The walk starts at
+        the stuck table listed last in precedence_dict, and
+        follows the first stuck dependency of each table.
+        
+        @param precedence_dict: dict of table interdependencies
+        @type precedence_dict: {str : [str]}
+        @param stuck_tables: tables with unmet dependencies
+        @type stuck_tables: {str}
+        @return: cycle path, e.g. ['Terms', 'Courses', 'Terms']
+        @rtype: [str]
+        '''
+        path = []
+        position_in_path = {}
+        curr_table = [table_name for table_name in precedence_dict.keys() 
+                      if table_name in stuck_tables][-1]
+        while curr_table not in position_in_path:
+            position_in_path[curr_table] = len(path)
+            path.append(curr_table)
+            curr_table = [dependency for dependency in precedence_dict[curr_table] 
+                          if dependency in stuck_tables][0]
+        return path[position_in_path[curr_table]:] + [curr_table]
+
     #-------------------------
     # detect_mutual_table_dependencies 
     #--------------
     
-    def detect_mutual_table_dependencies(self, precedence_dict, table_list_todo=None, tables_done=[], tables_being_considered=[]):
+    def detect_mutual_table_dependencies(self, precedence_dict):
         '''
         Given a precedence dict: {table : [table1, table2, ...]} of
-        tables and their dependencies, return True if there are
-        no mutual dependencies. Else raise ValueError with informative
-        message.
+        tables and their dependencies, return the tables in the order
+        in which they can be loaded. Raise TableError with the 
+        offending cycle if there are mutual dependencies:
         
-        A mutual dependency occurs when:
              {table1 : [table2],
               table2 : [table1]
               }
@@ -229,111 +649,15 @@ class QuerySorter(object):
               table3 : [table1]
               }
               
-        The method is recursive, diving depth-first into the
-        dependencies.              
-        
-        From the top level, only the precedence_dict is typically
-        provided. The remaining args are for recursive calls.
-        
         @param precedence_dict: dict of table interdependencies
         @type precedence_dict: {str : [str]}
-        @param table_list_todo: list of table names that are to
-            be examined for conflicts.
-        @type table_list_todo: [str]
-        @param tables_done: list of tables that are already processed
-        @type tables_done: [str]
-        @param tables_being_considered: list of tables that are being
-            processed in the current layers of recursion
-        @type tables_being_considered: [str]
         @return: list of tables in the order in which they can be loaded.
         @rtype: [str]
         @raise: TableError if mutual dependency is found, or a table name
             appears in the queries that does not have a corresponding .sql
             file in Queries.
         '''
-
-        if table_list_todo is None:
-            # First time in (i.e top level) 
-            top_level = True
-            # Copy the passed-in precedence_dict, b/c belo we pop 
-            # values off some of its entries.            
-            precedence_dict = copy.deepcopy(precedence_dict)
-            
-            # Total number of tables to examine:
-            table_list_todo = list(precedence_dict.keys())
-            
-            # Right off the bat: declare all tables without
-            # dependencies winners: Transfer them to tables_done:
-            no_precedence_table_it = filter(lambda tname: len(precedence_dict[tname]) == 0, table_list_todo)
-            tables_done = [tname for tname in no_precedence_table_it]
-            # Remove the done ones from the todos:
-            table_list_todo = [tbl_name for tbl_name in table_list_todo if tbl_name not in tables_done]
-            
-            # Sort tables todo by decreasing number of 
-            # dependencies that each table needs. The
-            # array pop() in the while loop will therefore 
-            # do as many low dependency tables as possible:
-            table_list_todo = sorted(table_list_todo, 
-                                    key=lambda tbl_name: len(precedence_dict[tbl_name]), 
-                                    reverse=True)
-            # No dependency chain yet:
-            tables_being_considered = []
-            # No error encountered yet:
-            original_error = None
-            
-        else:
-            # This is a recursive call:
-            top_level = False
-            
-        while True:
-            try:
-                curr_table = table_list_todo.pop()
-            except IndexError:
-                # All done:
-                return tables_done
-            
-            if curr_table in tables_done:
-                # Satisfied this table's dependencies
-                # earlier, or has none:
-                continue
-            
-            if curr_table in tables_being_considered:
-                raise InternalTableError(curr_table, "Mutual load order dependency")
-            
-            try: 
-                curr_dependencies = precedence_dict[curr_table]
-            except KeyError as e:
-                raise InternalTableError(curr_table, f"Missing table file {curr_table}.sql in Queries directory")
-                
-            satisfied = [dep for dep in curr_dependencies if dep in tables_done]
-            curr_dependencies = [unfilled for unfilled in curr_dependencies if unfilled not in satisfied] 
-            
-            if len(curr_dependencies) > 0:
-                try:
-                    tables_being_considered.append(curr_table)
-                    tables_done = self.detect_mutual_table_dependencies(precedence_dict, 
-                                                                        table_list_todo=curr_dependencies, 
-                                                                        tables_done=tables_done, 
-                                                                        tables_being_considered=tables_being_considered
-                                                                        )
-                    tables_being_considered.pop()
-                except InternalTableError as e:
-                    original_error = e
-                    # Unwind the recursion:
-                    if not top_level:
-                        raise e
-                    
-                # Recursion unwound, check for error:
-                if original_error:
-                    # Add the current table to the end of
-                    # the dependency chain. That will be 
-                    # the same as the list head. Ex:
-                    #   [CourseEnrollment, Terms, Student, CourseEnrollment]
-                    tables_being_considered.append(curr_table)
-                    # Build nice error message
-                    raise TableError(tuple(tables_being_considered), original_error.message)
-
-            tables_done.append(curr_table)
+        return self.sort(precedence_dict)
 
 # --------------------- Exception Classes --------------------
 
@@ -431,4 +755,7 @@ if __name__ == '__main__':
         sys.exit()
     
     sorter = QuerySorter()
-    print (f"Table order:\n{sorter.sorted_table_names}")
\ No newline at end of file
+    print (f"Table order:\n{sorter.sorted_table_names}")
+    print("Tables that can be created concurrently:")
+    for (gen_num, generation) in enumerate(sorter.generations):
+        print(f"  {gen_num}: {generation}")
\ No newline at end of file
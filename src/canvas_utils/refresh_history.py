@@ -6,13 +6,18 @@ Created on Aug 24, 2019
 '''
 from _collections import OrderedDict
 import argparse
-from datetime import timezone
+from datetime import timezone, timedelta
 import os
+import statistics
 import sys
 
 from pymysql_utils.pymysql_utils import Cursors
 
+from backup_catalog import BackupCatalog
 from config_info import ConfigInfo
+from copy_aux_tables import AuxTableCopier
+from load_log import LoadLog
+from refresh_trends import RefreshTrends
 from utilities import Utilities
 
 
@@ -25,13 +30,44 @@ class LoadHistoryLister(object):
 
     load_table_name = 'LoadLog'
     
+    # LoadLog entries further apart than this are
+    # considered to belong to different refresh runs:
+    MAX_TABLE_BUILD_TIME = timedelta(hours=6)
+    
+    # Time available each night for building and 
+    # exporting all aux tables:
+    DEFAULT_BUDGET_HOURS = 6
+    
+    # Tables that are exported in account chunks and have a
+    # load history to forecast from. GradingProcess is chunked
+    # by account as well, but has no Queries/*.sql file, so
+    # LoadLog never records it:
+    ACCOUNT_CHUNKED_TABLES = ['AssignmentSubmissions']
+    
     #-------------------------
     # Constructor 
     #--------------
 
-    def __init__(self, latest_only=False, unittests=False):
+    def __init__(self, 
+                 latest_only=False, 
+                 trends=False, 
+                 csv_path=None,
+                 budget_hours=None,
+                 unittests=False):
         '''
         Constructor
+        
+        @param latest_only: only list the most recent refresh
+            of each table
+        @type latest_only: bool
+        @param trends: instead of the refresh list, print each
+            table's growth, and forecasts (see print_trends())
+        @type trends: bool
+        @param csv_path: with trends: also write them to this CSV file
+        @type csv_path: {None | str}
+        @param budget_hours: with trends: nightly time budget. 
+            Default: DEFAULT_BUDGET_HOURS
+        @type budget_hours: {None | float}
         '''
         config_info = ConfigInfo()
         self.utils  = Utilities()
@@ -64,10 +100,13 @@ class LoadHistoryLister(object):
                                                     )
             
         try:
+            if trends:
+                self.print_trends(csv_path=csv_path, budget_hours=budget_hours)
+                return
             success = self.print_latest_refresh(latest_only)
             if success:
                 self.print_missing_tables()
-            # self.backup_availability()
+            self.backup_availability()
         finally:
             self.db_obj.close()
         
@@ -108,7 +147,12 @@ class LoadHistoryLister(object):
             #  ]
             if load_log_content is None:
                 self.utils.ensure_load_log_table_existence(self.load_table_name, self.db_obj)
-                load_log_content = self.db_obj.query(f"SELECT * FROM {self.aux_db}.{self.load_table_name}")
+                if latest_only:
+                    # Let the server pick each table's latest
+                    # entry from the (tbl_name, time_refreshed) index:
+                    load_log_content = self.db_obj.query(LoadLog.latest_per_table_query(self.aux_db))
+                else:
+                    load_log_content = self.db_obj.query(f"SELECT * FROM {self.aux_db}.{self.load_table_name}")
         except ValueError as e:
             out_fd.write(f"Cannot list tables: {repr(e)}\n")
             return False
@@ -188,6 +232,124 @@ class LoadHistoryLister(object):
         res = [newest_refresh_dict for newest_refresh_dict in latest_dicts.values()]
         return res        
       
+    #-------------------------
+    # estimate_table_durations 
+    #--------------
+    
+    @staticmethod
+    def estimate_table_durations(load_log_content, num_recent=5):
+        '''
+        Estimate how long building each table takes from
+        LoadLog. Entries that recorded the build's duration_secs
+        are used as is. For older entries: tables are built one 
+        after the other, so a table's build time is the time 
+        between its LoadLog entry and the preceding entry of 
+        the same run. The first table of each such run therefore 
+        has no measurement. The estimate is the median of the 
+        table's num_recent most recent measurements.
+        
+        @param load_log_content: LoadLog rows as dicts with at
+            least keys 'tbl_name' and 'time_refreshed', and
+            optionally 'duration_secs'
+        @type load_log_content: [{str : <any>}]
+        @param num_recent: number of most recent builds to consider
+        @type num_recent: int
+        @return: dict mapping table names to estimated build seconds
+        @rtype: {str : float}
+        '''
+        entries = sorted(load_log_content, key=lambda entry: entry['time_refreshed'])
+        durations = {}
+        for (prev_entry, entry) in zip([None] + entries, entries):
+            if entry.get('duration_secs', None) is not None:
+                durations.setdefault(entry['tbl_name'], []).append(entry['duration_secs'])
+                continue
+            if prev_entry is None:
+                continue
+            build_time = entry['time_refreshed'] - prev_entry['time_refreshed']
+            if build_time > LoadHistoryLister.MAX_TABLE_BUILD_TIME:
+                # First table of a new run:
+                continue
+            durations.setdefault(entry['tbl_name'], []).append(build_time.total_seconds())
+            
+        return {tbl_name : statistics.median(secs_list[-num_recent:])
+                for (tbl_name, secs_list) in durations.items()}
+
+    #-------------------------
+    # print_trends 
+    #--------------
+    
+    def print_trends(self,
+                     out_fd=sys.stdout,
+                     csv_path=None,
+                     budget_hours=None,
+                     load_log_content=None,
+                     account_volumes=None):
+        '''
+        Print each table's growth in rows and bytes, and
+        the change of its build and export times across the
+        runs in LoadLog. Forecast when tables will cross the
+        exporter's chunking thresholds, and when the nightly 
+        refresh will outgrow its time budget. See RefreshTrends.
+        
+        @param out_fd: where to write the text report
+        @type out_fd: file-like
+        @param csv_path: if provided, also write the trends 
+            to this CSV file
+        @type csv_path: {None | str}
+        @param budget_hours: hours available for each nightly
+            refresh. Default: DEFAULT_BUDGET_HOURS
+        @type budget_hours: {None | float}
+        @param load_log_content: LoadLog rows as dicts. Only
+            used by unittests!
+        @type load_log_content: [{}]
+        @param account_volumes: number of rows per account for
+            each account-chunked table. Only used by unittests!
+        @type account_volumes: {str : [int]}
+        @return: the computed trends
+        @rtype: RefreshTrends
+        '''
+        if budget_hours is None:
+            budget_hours = LoadHistoryLister.DEFAULT_BUDGET_HOURS
+        if load_log_content is None:
+            self.utils.ensure_load_log_table_existence(self.load_table_name, self.db_obj)
+            load_log_content = self.db_obj.query(f"SELECT * FROM {self.aux_db}.{self.load_table_name}")
+        trends = RefreshTrends(list(load_log_content))
+        
+        # Forecast when the exporter has to pull the
+        # tables in more pieces:
+        trends.forecast_batches('AllUsers', AuxTableCopier.SEQ_NUM_BATCH_SIZE)
+        for table_name in LoadHistoryLister.ACCOUNT_CHUNKED_TABLES:
+            if table_name not in trends.trends:
+                continue
+            if account_volumes is None:
+                volumes = self.account_volumes(table_name)
+            else:
+                volumes = account_volumes.get(table_name, [])
+            trends.forecast_accounts(table_name, volumes, Utilities.SINGLE_ACCOUNT_CHUNK_ROWS)
+            
+        trends.write_text(out_fd, budget_secs=budget_hours * 3600)
+        if csv_path is not None:
+            with open(csv_path, 'w', newline='') as csv_fd:
+                trends.write_csv(csv_fd)
+            out_fd.write(f"\nTrends written to {csv_path}.\n")
+        return trends
+
+    #-------------------------
+    # account_volumes 
+    #--------------
+    
+    def account_volumes(self, table_name):
+        '''
+        Number of rows of each account in the given table.
+        Empty list if the table does not exist.
+        '''
+        if not self.utils.table_exists(table_name, self.db_obj):
+            return []
+        return [row['num_entries'] for row in 
+                self.db_obj.query(f'''SELECT COUNT(*) AS num_entries
+                                        FROM {self.aux_db}.{table_name}
+                                       GROUP BY account_id''')]
+
     #-------------------------
     # print_missing_tables 
     #--------------
@@ -205,8 +367,7 @@ class LoadHistoryLister(object):
         '''
 
         all_tables     = set(self.utils.create_table_name_array())
-        tables_present = self.utils.get_tbl_names_in_schema(self.db_obj, self.aux_db)
-        tables_present = set([table_dict['TABLE_NAME'] for table_dict in tables_present])
+        tables_present = set(self.utils.schema_cache.table_names(self.db_obj, self.aux_db))
 
         missing_tables = all_tables - tables_present
         if len(missing_tables) == 0:
@@ -216,6 +377,49 @@ class LoadHistoryLister(object):
         self.utils.print_columns(missing_tables, 'Missing Tables:', num_cols=num_cols, alpha=True)        
          
         return True    
+
+    #-------------------------
+    # backup_availability 
+    #--------------
+
+    def backup_availability(self, out_fd=sys.stdout, catalog=None):
+        '''
+        Print for each aux table how many backups exist
+        in the backup db, and the date of the most recent
+        one.
+        
+        @param out_fd: file-like object to which output is 
+            written. Default: stdout.
+        @type out_fd: file-like
+        @param catalog: backups to list. Only used by unittests!
+        @type catalog: BackupCatalog
+        @return: True for success, False for failure
+        @rtype: bool
+        '''
+        backup_db = self.utils.get_backup_db(self.aux_db)
+        if catalog is None:
+            catalog = BackupCatalog.from_db(self.db_obj, backup_db, self.utils.tables)
+        
+        if len(catalog) == 0:
+            out_fd.write(f"\nNo backups in {backup_db}.\n")
+            return True
+        
+        out_fd.write(f"\nBackups in {backup_db}:\n\n")
+        
+        tbl_nm_header = 'Table Name'
+        count_header  = 'Backups'
+        latest_header = 'Latest Backup'
+        
+        roots = sorted(catalog.roots)
+        tbl_nm_width = max([len(root) for root in roots] + [len(tbl_nm_header)])
+        
+        out_fd.write(f"{tbl_nm_header:>{tbl_nm_width}}  {count_header:>7}  {latest_header}\n")
+        for root in roots:
+            (_root, _dt_str, latest_dt) = catalog.components(catalog.latest(root))
+            out_fd.write(f"{root:>{tbl_nm_width}}  {len(catalog.backups(root)):>7}  " +
+                         f"{latest_dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        return True
+
 # ----------------------- Utilities ---------------
 
 # ----------------------- Main -------------
@@ -231,10 +435,27 @@ if __name__ == '__main__':
                         help='list only the most recent load event for each table',
                         action='store_true',
                         default=False);
+    parser.add_argument('-t', '--trends',
+                        help='show growth of each table across runs, and forecast when the\n' +\
+                             'AllUsers and AssignmentSubmissions exports need more chunks,\n' +\
+                             'and nightly time budget overruns',
+                        action='store_true',
+                        default=False);
+    parser.add_argument('-c', '--csv',
+                        help='with --trends: also write the trends to this CSV file',
+                        default=None);
+    parser.add_argument('-b', '--budget',
+                        type=float,
+                        help=f'with --trends: hours available for the nightly refresh; ' +\
+                             f'default: {LoadHistoryLister.DEFAULT_BUDGET_HOURS}',
+                        default=None);
     args = parser.parse_args();
 
     try:    
-        LoadHistoryLister(args.latest)
+        LoadHistoryLister(args.latest, 
+                          trends=args.trends, 
+                          csv_path=args.csv, 
+                          budget_hours=args.budget)
     except KeyboardInterrupt:
         print("\nLoad history listing stopped by user.")    
          
@@ -0,0 +1,412 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import csv
+import math
+from datetime import datetime, timedelta
+
+class TableTrend(object):
+    '''
+    Growth of one aux table across past refresh runs:
+    latest values, and their linear change per day.
+    Quantities that were never recorded are None.
+    '''
+
+    def __init__(self, table_name, num_runs):
+        self.table_name = table_name
+        self.num_runs   = num_runs
+
+        self.rows         = None
+        self.rows_per_day = None
+        self.bytes         = None
+        self.bytes_per_day = None
+        self.build_secs         = None
+        self.build_secs_per_day = None
+        self.export_secs         = None
+        self.export_secs_per_day = None
+
+        # Nearest forecast chunking threshold:
+        self.threshold_name = None
+        self.threshold_date = None
+
+# -------------------------- Class RefreshTrends ---------------
+
+class RefreshTrends(object):
+    '''
+    Computes, from LoadLog entries, how fast each aux table
+    grows in rows and bytes, and how its build and export
+    times change from run to run. Rates are least squares
+    slopes over the entries' refresh dates.
+
+    From the rates, forecasts when a table will cross a
+    chunking threshold, i.e. a row count at which the
+    exporter pulls the table differently:
+
+        forecast_rows()     : table crosses a fixed row count
+        forecast_batches()  : table needs one more batch, such
+                                 as the AllUsers seq_num batches
+                                 of AuxTableCopier.SEQ_NUM_BATCH_SIZE
+        forecast_accounts() : the largest account that is still
+                                 pulled together with others grows
+                                 beyond the single-account chunk size
+                                 of Utilities.get_account_ids_from_table()
+
+    and when the sum of all build and export times will exceed
+    the nightly time budget (forecast_budget()).
+
+    Reports are written as text (write_text()) or CSV (write_csv()).
+    '''
+
+    csv_header = ['table_name', 'runs',
+                  'rows', 'rows_per_day',
+                  'bytes', 'bytes_per_day',
+                  'build_secs', 'build_secs_per_day',
+                  'export_secs', 'export_secs_per_day',
+                  'threshold', 'threshold_date'
+                  ]
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, load_log_content, now=None):
+        '''
+        @param load_log_content: LoadLog rows as dicts with at least
+            keys 'tbl_name', 'time_refreshed', and 'num_rows'. Keys
+            'data_bytes', 'index_bytes', 'duration_secs', and 'export_secs'
+            are used if present.
+        @type load_log_content: [{str : <any>}]
+        @param now: date from which forecasts count. Default: the
+            latest refresh time in the log
+        @type now: datetime.datetime
+        '''
+        entries_by_table = {}
+        for entry in sorted(load_log_content, key=lambda entry: entry['time_refreshed']):
+            entries_by_table.setdefault(entry['tbl_name'], []).append(entry)
+
+        if now is None:
+            all_times = [entry['time_refreshed'] for entry in load_log_content]
+            now = max(all_times) if len(all_times) > 0 else datetime.utcnow()
+        self.now = now
+
+        self.trends = {}
+        for (table_name, entries) in sorted(entries_by_table.items()):
+            self.trends[table_name] = self.table_trend(table_name, entries)
+
+    #-------------------------
+    # table_trend
+    #--------------
+
+    def table_trend(self, table_name, entries):
+        '''
+        Compute one table's TableTrend from its
+        LoadLog entries, sorted by time.
+        '''
+        trend = TableTrend(table_name, len(entries))
+
+        def sizes(entry):
+            if entry.get('data_bytes', None) is None:
+                return None
+            return entry['data_bytes'] + (entry.get('index_bytes', None) or 0)
+
+        (trend.rows, trend.rows_per_day) = \
+            self.latest_and_slope(entries, lambda entry: entry.get('num_rows', None))
+        (trend.bytes, trend.bytes_per_day) = \
+            self.latest_and_slope(entries, sizes)
+        (trend.build_secs, trend.build_secs_per_day) = \
+            self.latest_and_slope(entries, lambda entry: entry.get('duration_secs', None))
+        (trend.export_secs, trend.export_secs_per_day) = \
+            self.latest_and_slope(entries, lambda entry: entry.get('export_secs', None))
+        return trend
+
+    #-------------------------
+    # forecast_rows
+    #--------------
+
+    def forecast_rows(self, table_name, threshold_name, threshold_rows):
+        '''
+        Forecast when a table reaches threshold_rows rows.
+
+        @param table_name: the aux table
+        @type table_name: str
+        @param threshold_name: description for the report
+        @type threshold_name: str
+        @param threshold_rows: row count to forecast
+        @type threshold_rows: int
+        @return: the forecast date; now if already crossed;
+            None if the table does not grow, or is unknown.
+        @rtype: {None | datetime.datetime}
+        '''
+        trend = self.trends.get(table_name, None)
+        if trend is None or trend.rows is None:
+            return None
+        if trend.rows >= threshold_rows:
+            crossing = self.now
+        else:
+            crossing = self.date_when(trend.rows, trend.rows_per_day, threshold_rows)
+        self.note_threshold(trend, threshold_name, crossing)
+        return crossing
+
+    #-------------------------
+    # forecast_batches
+    #--------------
+
+    def forecast_batches(self, table_name, batch_size):
+        '''
+        Forecast when a table that is exported in batches
+        of batch_size rows will need one more batch: the
+        current ceil(rows / batch_size) batches hold at most
+        that many multiples of batch_size, so one more row
+        needs another batch.
+
+        @return: the forecast date, or None
+        @rtype: {None | datetime.datetime}
+        '''
+        trend = self.trends.get(table_name, None)
+        if trend is None or trend.rows is None:
+            return None
+        num_batches = math.ceil(trend.rows / batch_size)
+        return self.forecast_rows(table_name,
+                                  f"{num_batches + 1} batches of {batch_size}",
+                                  num_batches * batch_size + 1)
+
+    #-------------------------
+    # forecast_accounts
+    #--------------
+
+    def forecast_accounts(self, table_name, account_volumes, chunk_rows):
+        '''
+        Tables such as AssignmentSubmissions are exported one
+        account at a time for accounts with at least chunk_rows
+        rows, and all smaller accounts together. Assuming that
+        accounts grow in proportion to the table, forecast when
+        the largest of the smaller accounts reaches chunk_rows,
+        and thus becomes a chunk of its own.
+
+        @param table_name: the aux table
+        @type table_name: str
+        @param account_volumes: number of rows of each account
+        @type account_volumes: [int]
+        @param chunk_rows: single-account chunk size
+        @type chunk_rows: int
+        @return: the forecast date, or None
+        @rtype: {None | datetime.datetime}
+        '''
+        trend = self.trends.get(table_name, None)
+        small_volumes = [volume for volume in account_volumes if 0 < volume < chunk_rows]
+        if trend is None or not trend.rows or len(small_volumes) == 0:
+            return None
+        largest = max(small_volumes)
+        # Table size at which that account reaches chunk_rows:
+        table_rows = trend.rows * chunk_rows / largest
+        crossing = self.date_when(trend.rows, trend.rows_per_day, table_rows)
+        self.note_threshold(trend, f"account of {largest} rows reaches {chunk_rows}", crossing)
+        return crossing
+
+    #-------------------------
+    # forecast_budget
+    #--------------
+
+    def forecast_budget(self, budget_secs):
+        '''
+        Forecast when the sum of the latest build and export
+        times of all tables will exceed the nightly budget.
+
+        @param budget_secs: time available for one refresh
+        @type budget_secs: float
+        @return: total seconds now, growth in seconds per day,
+            and the forecast date (now if already exceeded; None
+            if the total does not grow)
+        @rtype: (float, float, {None | datetime.datetime})
+        '''
+        total_secs = 0.0
+        secs_per_day = 0.0
+        for trend in self.trends.values():
+            for (secs, slope) in [(trend.build_secs, trend.build_secs_per_day),
+                                  (trend.export_secs, trend.export_secs_per_day)]:
+                total_secs   += secs or 0.0
+                secs_per_day += slope or 0.0
+        if total_secs > budget_secs:
+            return (total_secs, secs_per_day, self.now)
+        return (total_secs, secs_per_day, self.date_when(total_secs, secs_per_day, budget_secs))
+
+    #-------------------------
+    # write_text
+    #--------------
+
+    def write_text(self, out_fd, budget_secs=None):
+        '''
+        Write the trends, forecasts, and optionally the
+        budget forecast as a table.
+
+        @param out_fd: file-like object to write to
+        @type out_fd: file-like
+        @param budget_secs: nightly time budget; None to omit
+            the budget line
+        @type budget_secs: {None | float}
+        '''
+        header = (f"{'Table Name':>25} {'Runs':>4} {'Rows':>11} {'Rows/Day':>9} " +
+                  f"{'MB':>8} {'MB/Day':>7} {'Build':>8} {'s/Day':>6} " +
+                  f"{'Export':>8} {'s/Day':>6}  Next Threshold")
+        out_fd.write(f"\nRefresh trends as of {self.now.strftime('%Y-%m-%d')}:\n\n")
+        out_fd.write(header + '\n')
+        for trend in self.trends.values():
+            if trend.threshold_name is None:
+                threshold_str = '-'
+            else:
+                date_str = 'not growing' if trend.threshold_date is None \
+                           else trend.threshold_date.strftime('%Y-%m-%d')
+                threshold_str = f"{trend.threshold_name}: {date_str}"
+            out_fd.write(f"{trend.table_name:>25} {trend.num_runs:>4} " +
+                         f"{self.num_str(trend.rows, 0):>11} {self.num_str(trend.rows_per_day, 0):>9} " +
+                         f"{self.num_str(trend.bytes, 1, 1e6):>8} {self.num_str(trend.bytes_per_day, 2, 1e6):>7} " +
+                         f"{self.duration_str(trend.build_secs):>8} {self.num_str(trend.build_secs_per_day, 1):>6} " +
+                         f"{self.duration_str(trend.export_secs):>8} {self.num_str(trend.export_secs_per_day, 1):>6}  " +
+                         f"{threshold_str}\n")
+
+        if budget_secs is None:
+            return
+        (total_secs, secs_per_day, crossing) = self.forecast_budget(budget_secs)
+        out_fd.write(f"\nBuild plus export: {self.duration_str(total_secs)} of " +
+                     f"{self.duration_str(budget_secs)} nightly budget; " +
+                     f"changing by {secs_per_day:.1f} s/day. ")
+        if crossing is None:
+            out_fd.write("Not forecast to exceed the budget.\n")
+        elif crossing <= self.now:
+            out_fd.write("Budget already exceeded.\n")
+        else:
+            out_fd.write(f"Forecast to exceed the budget around {crossing.strftime('%Y-%m-%d')}.\n")
+
+    #-------------------------
+    # write_csv
+    #--------------
+
+    def write_csv(self, out_fd):
+        '''
+        Write one CSV row per table, with the columns
+        of csv_header. Unknown values are empty.
+        '''
+        writer = csv.writer(out_fd)
+        writer.writerow(RefreshTrends.csv_header)
+        for trend in self.trends.values():
+            threshold_date = None if trend.threshold_date is None \
+                             else trend.threshold_date.strftime('%Y-%m-%d')
+            writer.writerow([trend.table_name, trend.num_runs,
+                             trend.rows, self.rounded(trend.rows_per_day),
+                             trend.bytes, self.rounded(trend.bytes_per_day),
+                             self.rounded(trend.build_secs), self.rounded(trend.build_secs_per_day),
+                             self.rounded(trend.export_secs), self.rounded(trend.export_secs_per_day),
+                             trend.threshold_name, threshold_date
+                             ])
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # latest_and_slope
+    #--------------
+
+    @classmethod
+    def latest_and_slope(cls, entries, get_value):
+        '''
+        Return the latest recorded value of one quantity,
+        and its least squares change per day. Either is None
+        where too few values were recorded.
+
+        @param entries: LoadLog entries sorted by time
+        @type entries: [{str : <any>}]
+        @param get_value: function that returns the quantity
+            of one entry, or None
+        @type get_value: callable
+        @rtype: ({None | float}, {None | float})
+        '''
+        points = [(entry['time_refreshed'], get_value(entry)) for entry in entries]
+        points = [(when, value) for (when, value) in points if value is not None]
+        if len(points) == 0:
+            return (None, None)
+        latest = points[-1][1]
+        start  = points[0][0]
+        days   = [(when - start).total_seconds() / 86400. for (when, _value) in points]
+        values = [value for (_when, value) in points]
+        return (latest, cls.slope(days, values))
+
+    #-------------------------
+    # slope
+    #--------------
+
+    @staticmethod
+    def slope(xs, ys):
+        '''
+        Least squares slope of ys over xs. None if the
+        xs don't vary.
+        '''
+        if len(xs) < 2:
+            return None
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x  = sum([(x - mean_x)**2 for x in xs])
+        if var_x == 0:
+            return None
+        return sum([(x - mean_x) * (y - mean_y) for (x, y) in zip(xs, ys)]) / var_x
+
+    #-------------------------
+    # date_when
+    #--------------
+
+    def date_when(self, value, per_day, target):
+        '''
+        Date at which value, changing by per_day, reaches
+        target. None if it never does.
+        '''
+        if per_day is None or per_day <= 0:
+            return None
+        days = (target - value) / per_day
+        # Too far out to be useful, and beyond what datetime holds:
+        if days > 365 * 100:
+            return None
+        return self.now + timedelta(days=days)
+
+    #-------------------------
+    # note_threshold
+    #--------------
+
+    @staticmethod
+    def note_threshold(trend, threshold_name, crossing):
+        '''
+        Keep the earliest forecast threshold in the
+        table's trend.
+        '''
+        if trend.threshold_name is not None:
+            if crossing is None or (trend.threshold_date is not None and trend.threshold_date <= crossing):
+                return
+        trend.threshold_name = threshold_name
+        trend.threshold_date = crossing
+
+    #-------------------------
+    # num_str
+    #--------------
+
+    @staticmethod
+    def num_str(value, decimals, divisor=1):
+        if value is None:
+            return '?'
+        return f"{value / divisor:,.{decimals}f}"
+
+    #-------------------------
+    # duration_str
+    #--------------
+
+    @staticmethod
+    def duration_str(secs):
+        if secs is None:
+            return '?'
+        return str(timedelta(seconds=round(secs)))
+
+    #-------------------------
+    # rounded
+    #--------------
+
+    @staticmethod
+    def rounded(value):
+        return None if value is None else round(value, 3)
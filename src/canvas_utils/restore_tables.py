@@ -7,8 +7,13 @@ Created on May 13, 2019
 import argparse
 import logging
 import os
+import shutil
+import subprocess
+from subprocess import PIPE
 import sys
 
+from backup_archive import BackupArchive
+from backup_catalog import BackupCatalog
 from canvas_utils_exceptions import DatabaseError
 from utilities import Utilities
 from config_info import ConfigInfo
@@ -47,6 +52,8 @@ class TableRestorer(object):
                  host=None,
                  tables=[],
                  force=False,
+                 archives=[],
+                 backup_db=None,
                  logging_level=logging.INFO,
                  unittests=False):
         '''
@@ -65,6 +72,15 @@ class TableRestorer(object):
             with their backups. Else, only restore backups
             to create none-existing tables.
         @type force: bool
+        @param archives: paths to backup archives written by
+            clear_old_backups.py --archive. If provided, these
+            archives are restored, and the tables parameter
+            is ignored.
+        @type archives: [str]
+        @param backup_db: schema where the backups reside. Default:
+            the backup db configured for target_db. See 
+            Utilities.get_backup_db()
+        @type backup_db: str
         @param logging_level: how much of the run to document
         @type logging_level: logging.INFO/DEBUG/ERROR/...
         @param unittests: set to True to have this instance do 
@@ -85,6 +101,14 @@ class TableRestorer(object):
         # Unittests expect a db name in self.db:
         self.db = target_db
         
+        if backup_db is None:
+            backup_db = self.utils.get_backup_db(target_db)
+        self.backup_db = backup_db
+        
+        self.host = self.config_info.default_host if host is None else host
+        self.user = self.config_info.default_user if user is None else user
+        self.unittests = unittests
+        
         if db_pwd is None:
             db_pwd = self.utils.get_db_pwd(host, unittests=unittests)
         elif db_pwd == True:
@@ -97,10 +121,19 @@ class TableRestorer(object):
             self.db_name = target_db
             return
         
-        # Get names of all tables in the target_db
+        if len(archives) > 0:
+            self.restore_from_archive(archives, db_schema=target_db, backup_db=backup_db)
+            return
+        
+        # Get names of all tables in the target_db, and
+        # of the backups in the backup db:
         all_tables = self.utils.get_existing_tables_in_dir(self.db_obj, 
                                                            return_all=True, 
                                                            target_db=target_db)
+        if backup_db != target_db:
+            all_tables.extend(self.utils.get_existing_tables_in_dir(self.db_obj, 
+                                                                    return_all=True, 
+                                                                    target_db=backup_db))
         
         # If only explicitly named tables are to be restored,
         # remove all others from the all_tables list. Also
@@ -117,7 +150,7 @@ class TableRestorer(object):
                 # At least some of the tbles requested to be
                 # restored don't exist:
                 bad_tables = requested_tbls_set - existing_tbls_set
-                print(f"Table(s) {bad_tables} not present in db {target_db}")
+                print(f"Table(s) {bad_tables} not present in db {target_db} or {backup_db}")
                 sys.exit(1)
             all_tbls_copy = all_tables.copy()
             for candidate_tbl in all_tbls_copy:
@@ -152,15 +185,17 @@ did not exist, it would be created from its latest backup.
     def restore_tables(self, table_names=None, target_db=None):
         '''
         Restores tables from backups. Backup tables are assumed to be
-        in the same db schema as the root tables. I.e. Terms.2019_...
-        is in the same db as Terms.
+        in self.backup_db if target_db is the aux db this restorer
+        was created for. For other target_db schemas they are assumed 
+        to be in the backup db configured for that schema (see 
+        Utilities.get_backup_db()).
         
         @param table_names: list of table names to restore. List may
             be a mix of root and backup tables names. See restore_from_backup
             in CanvasPrep.
             If None, all tables with backup tables will be restored.
         @type table_names: [str]
-        @param target_db: name of db where backup and root tables reside.
+        @param target_db: name of db where root tables reside.
         @type target_db: str
         @return: list of tables
         @rtype: [str]
@@ -171,7 +206,8 @@ did not exist, it would be created from its latest backup.
         if table_names is None:
             table_names = self.utils.tables
         
-        self.restore_from_backup(table_names, db_schema=target_db)
+        backup_db = self.backup_db if target_db == self.db else None
+        self.restore_from_backup(table_names, db_schema=target_db, backup_db=backup_db)
         
         # Get the aux table names that exist now, after the restore:
         tbls_now = self.utils.get_existing_tables_in_dir(self.db_obj, 
@@ -243,7 +279,7 @@ did not exist, it would be created from its latest backup.
     # restore_from_backup 
     #------------------- 
     
-    def restore_from_backup(self, table_root_or_backup_names, db_schema=None):
+    def restore_from_backup(self, table_root_or_backup_names, db_schema=None, backup_db=None):
         '''
         Restores backup tables to be the 
         'current' tables. The parameter may be a single
@@ -253,7 +289,7 @@ did not exist, it would be created from its latest backup.
         Example 1 a backup table name: 
             Given Terms_2019_02_10_14_34_10 this method will
                1. Check that Terms_2019_02_10_14_34_10 exiss.
-               2. If table Terms exists, drop table Terms
+               2. If table Terms exists, rename it out of the way
                3. Rename table Terms_2019_02_10_14_34_10 to Terms 
             If Terms_2019_02_10_14_34_10 does not exist: error
         
@@ -263,17 +299,34 @@ did not exist, it would be created from its latest backup.
                   say Terms_2019_02_10_14_34_10.
                2. If no backup is found, nothing is done.
                3. Check whether table Terms exists. If
-                  so, Terms is dropped.
+                  so, it is renamed out of the way.
                4. Table Terms_2019_02_10_14_34_10 is renamed
                   to 'Terms'.
         
         Backup tables and non-backup tables may be mixed in
-        the table_root_or_backup_names list parameter
+        the table_root_or_backup_names list parameter.
+        
+        The whole restore set is planned first, from the
+        metadata cache's table names. All renames are then done 
+        in one multi-clause RENAME TABLE statement, which MySQL
+        executes atomically: either all tables are restored, or
+        none is. Readers never see a mix of restored and 
+        unrestored tables. The replaced tables are dropped 
+        afterwards.
         
         @param table_root_or_backup_names: list or singleton 
-        @type table_root_or_backup_names:
+        @type table_root_or_backup_names: {str | [str]}
         @param db_schema: the MySQL schema (i.e. database). Default: CanvasPrep.canvas_db_aux
         @type db_schema: str
+        @param backup_db: schema where the backups reside. Default: the
+            backup db configured for db_schema
+        @type backup_db: str
+        @return: list of (backup name, restored table name) pairs
+        @rtype: [(str, str)]
+        @raise ValueError: if a named backup does not exist, or several
+            backups of one table are to be restored.
+        @raise DatabaseError: if the renames fail. No table is changed
+            in that case.
         '''
     
         if db_schema is None:
@@ -282,47 +335,273 @@ did not exist, it would be created from its latest backup.
         if type(table_root_or_backup_names) != list:
             table_root_or_backup_names = [table_root_or_backup_names]
         
+        if backup_db is None:
+            backup_db = self.utils.get_backup_db(db_schema)
+              
+        # Table names come from the metadata cache, which
+        # needs at most one information_schema query per 
+        # schema, rather than queries per table:
+        schema_cache    = self.utils.schema_cache
+        existing_tables = schema_cache.table_names(self.db_obj, db_schema)
+        catalog = BackupCatalog(self.utils.tables, schema_cache.table_names(self.db_obj, backup_db))
+        
+        restore_plan = self.plan_restore(table_root_or_backup_names, catalog)
+        if len(restore_plan) == 0:
+            return restore_plan
+        
+        (rename_cmd, replaced_tables) = self.restore_rename_cmd(restore_plan, 
+                                                                existing_tables,
+                                                                db_schema=db_schema,
+                                                                backup_db=backup_db)
+        
+        self.utils.log_info(f"Restoring {len(restore_plan)} tables from backups...")
+        (err, _warn) = self.db_obj.execute(rename_cmd, doCommit=False)
+        if err is not None:
+            raise DatabaseError(f"Cannot restore tables {[root for (_backup, root) in restore_plan]}: {repr(err)}")
+        schema_cache.note_statement(rename_cmd, db_schema)
+        self.utils.log_info(f"Done restoring {len(restore_plan)} tables from backups.")
+        
+        # The restore is complete; now get rid of
+        # the replaced tables:
+        if len(replaced_tables) > 0:
+            qualified_names = [f"{db_schema}.{table_name}" for table_name in replaced_tables]
+            drop_cmd = f"DROP TABLE IF EXISTS {', '.join(qualified_names)};"
+            (err, _warn) = self.db_obj.execute(drop_cmd)
+            if err is not None:
+                self.utils.log_warn(f"Tables were restored, but could not drop replaced tables {replaced_tables}: {repr(err)}")
+                schema_cache.invalidate(db_schema)
+            else:
+                schema_cache.note_statement(drop_cmd, db_schema)
+        return restore_plan
+
+    #------------------------------------
+    # plan_restore 
+    #------------------- 
+    
+    def plan_restore(self, table_root_or_backup_names, catalog):
+        '''
+        Determine which backup table is to replace which 
+        table. Root names are paired with their latest backup;
+        roots without backups are skipped with a warning. Names
+        that are neither aux tables nor their backups are ignored.
+        
+        @param table_root_or_backup_names: root and backup table names
+        @type table_root_or_backup_names: [str]
+        @param catalog: backups in the schema
+        @type catalog: BackupCatalog
+        @return: list of (backup name, root name) pairs
+        @rtype: [(str, str)]
+        @raise ValueError: if a named backup does not exist, or
+            several backups of one table are to be restored.
+        '''
+        restore_plan = []
+        # Root name --> backup chosen for it:
+        chosen = {}
         for table_name in table_root_or_backup_names:
             
             # Get (aux_tbl_name, data-str, datetime obj) if 
-            # table_name is an aux table backup; else get False:
-            tbl_nm_components = self.utils.is_backup_name(table_name) 
-            if tbl_nm_components:
-                
-                # Got an explicit backup filename to restore:
-                (root_name, _date_str, _datetime_obj) = tbl_nm_components
-                
-                if not self.utils.table_exists(table_name, self.db_obj):
+            # table_name is an aux table backup; else get None:
+            tbl_nm_components = BackupCatalog.parse_backup_name(table_name, catalog.root_names)
+            if tbl_nm_components is not None:
+                # Got an explicit backup table name to restore:
+                root_name = tbl_nm_components[0]
+                if table_name not in catalog:
                     raise ValueError(f"Table {table_name} does not exist, so cannot be restored to the working copy.")
-                
-                self.db_obj.dropTable(root_name)
-                (err, _warn) = self.db_obj.execute(f"RENAME TABLE {table_name} TO {root_name};")
-                if err is not None:
-                    raise DatabaseError(f"Cannot restore table {table_name} to table {root_name}: {repr(err)}")
-                
-                continue
-            elif table_name in self.utils.tables:
+                backup_name = table_name
+            elif table_name in catalog.root_names:
                 # Table is a root name; find the most recent backup:
-                info_query = f'''
-                                         select table_name 
-                                           from information_schema.tables
-                                          where table_schema = '{db_schema}'
-                                            AND table_name like '{table_name}%';'''
-                res = self.db_obj.query(info_query)
-                backup_tbl_names = [tbl_name for tbl_name in res if self.utils.is_backup_name(tbl_name)]
-
-                if len(backup_tbl_names) == 0:
+                root_name   = table_name
+                backup_name = catalog.latest(table_name)
+                if backup_name is None:
                     # No backup table available.
                     self.utils.log_warn(f"No backup table found for table '{table_name}'.")
-                    # Next table name to restore:
                     continue
-                
-                backup_tbl_names = self.utils.sort_backup_table_names(backup_tbl_names)
-                
-                # Do the rename using the first (and therefore youngest backup 
-                # table name:
-                self.db_obj.dropTable(table_name)
-                self.db_obj.execute(f'''RENAME TABLE {backup_tbl_names[0]} TO {table_name};''')
+            else:
+                continue
+            
+            if root_name in chosen:
+                if chosen[root_name] == backup_name:
+                    continue
+                raise ValueError(f"Cannot restore both {chosen[root_name]} and {backup_name} to table {root_name}.")
+            chosen[root_name] = backup_name
+            restore_plan.append((backup_name, root_name))
+        return restore_plan
+
+    #------------------------------------
+    # restore_rename_cmd 
+    #------------------- 
+    
+    def restore_rename_cmd(self, restore_plan, existing_tables, db_schema=None, backup_db=None):
+        '''
+        Build the single RENAME TABLE statement that executes
+        a restore plan. Existing tables are first renamed to
+        <table>_replaced_by_restore, then the backups take their
+        place:
+        
+            RENAME TABLE Terms TO Terms_replaced_by_restore,
+                         Terms_2019_02_10_14_34_10 TO Terms,
+                         Courses_2019_02_10_14_34_10 TO Courses;
+        
+        Leftovers from an earlier, interrupted restore are 
+        not an obstacle: their name is simply extended.
+        
+        If the schemas are provided, table names are qualified,
+        so that backups can be moved from the backup db into
+        the aux db. The replaced tables stay in db_schema.
+        
+        @param restore_plan: (backup name, root name) pairs from plan_restore()
+        @type restore_plan: [(str, str)]
+        @param existing_tables: names of all tables in the schema
+        @type existing_tables: {str}
+        @param db_schema: schema of the tables to restore
+        @type db_schema: str
+        @param backup_db: schema of the backups
+        @type backup_db: str
+        @return: the RENAME TABLE statement, and the names under
+            which the replaced tables end up
+        @rtype: (str, [str])
+        '''
+        aux_prefix    = '' if db_schema is None else f"{db_schema}."
+        backup_prefix = '' if backup_db is None else f"{backup_db}."
+        
+        existing_tables = set(existing_tables)
+        rename_snippets = []
+        replaced_tables = []
+        for (backup_name, root_name) in restore_plan:
+            if root_name in existing_tables:
+                replaced_name = f"{root_name}_replaced_by_restore"
+                while replaced_name in existing_tables:
+                    replaced_name += '_'
+                existing_tables.add(replaced_name)
+                rename_snippets.append(f"{aux_prefix}{root_name} TO {aux_prefix}{replaced_name}")
+                replaced_tables.append(replaced_name)
+            rename_snippets.append(f"{backup_prefix}{backup_name} TO {aux_prefix}{root_name}")
+        return (f"RENAME TABLE {', '.join(rename_snippets)};", replaced_tables)
+
+    #------------------------------------
+    # restore_from_archive 
+    #------------------- 
+    
+    def restore_from_archive(self, archive_paths, db_schema=None, backup_db=None, promote=True):
+        '''
+        Bring archived backup tables back into the database,
+        and by default make them the current tables.
+        
+        For each archive the table is recreated under its 
+        backup name in the backup db from the archived 
+        CREATE TABLE statement.
+        The rows are then bulk loaded with LOAD DATA LOCAL INFILE:
+        the compressed data file is decompressed on the fly, and 
+        streamed into the mysql client's stdin via load_mysql.sh.
+        Finally, the restored backups replace the current
+        tables in one atomic rename (see restore_from_backup()).
+        
+        @param archive_paths: archive directories
+        @type archive_paths: [str]
+        @param db_schema: schema into which to restore. 
+            Default: the aux db
+        @type db_schema: str
+        @param backup_db: schema where backups reside. Default:
+            the backup db configured for db_schema
+        @type backup_db: str
+        @param promote: if True, the restored backups replace the
+            current tables. Else they are left as backup tables.
+        @type promote: bool
+        @return: names of the restored backup tables
+        @rtype: [str]
+        @raise ValueError: if an archive is incomplete or corrupted, or
+            its table already exists
+        @raise DatabaseError: if the table cannot be created or loaded 
+        '''
+        if db_schema is None:
+            db_schema = self.config_info.canvas_db_aux
+        
+        if backup_db is None:
+            backup_db = self.utils.get_backup_db(db_schema)
+        
+        archives = [BackupArchive(archive_path) for archive_path in archive_paths]
+        existing_tables = set(self.utils.schema_cache.table_names(self.db_obj, backup_db))
+        
+        # Check all archives before changing anything:
+        for archive in archives:
+            if archive.table_name in existing_tables:
+                raise ValueError(f"Table {archive.table_name} already exists in {backup_db}; not restoring {archive.archive_path}")
+            if not archive.verify():
+                raise ValueError(f"Data in archive {archive.archive_path} does not match its manifest checksum")
+        
+        if backup_db != db_schema:
+            (err, _warn) = self.db_obj.execute(f"CREATE DATABASE IF NOT EXISTS {backup_db};")
+            if err is not None:
+                raise DatabaseError(f"Could not create backup database {backup_db}: {repr(err)}")
+        
+        restored = []
+        for archive in archives:
+            self.load_archive(archive, backup_db)
+            restored.append(archive.table_name)
+        
+        if promote:
+            self.restore_from_backup(restored, db_schema=db_schema, backup_db=backup_db)
+        return restored
+
+    #------------------------------------
+    # load_archive 
+    #------------------- 
+    
+    def load_archive(self, archive, db_schema):
+        '''
+        Recreate one archived table, and bulk load its rows.
+        If loading fails, the partially loaded table is dropped.
+        
+        @param archive: the archive to load
+        @type archive: BackupArchive
+        @param db_schema: schema in which to create the table
+        @type db_schema: str
+        @raise DatabaseError: if the table cannot be created or loaded
+        '''
+        table_name = archive.table_name
+        (err, _warn) = self.db_obj.execute(archive.create_statement(db_schema))
+        if err is not None:
+            raise DatabaseError(f"Cannot create table {table_name} from archive: {repr(err)}")
+        self.utils.schema_cache.table_created(db_schema, table_name)
+        
+        # Tell shell script where to find the MySQL pwd:
+        if self.unittests and self.host == 'localhost':
+            pwd_file_pointer = ''
+        else:
+            pwd_file_pointer = self.config_info.canvas_pwd_file
+        
+        shell_script = os.path.join(os.path.dirname(__file__), 'load_mysql.sh')
+        load_cmd = [shell_script,
+                    self.host,
+                    self.user,
+                    pwd_file_pointer,
+                    db_schema,
+                    self.utils.get_mysql_path(),
+                    archive.load_statement(db_schema)
+                    ]
+        
+        self.utils.log_info(f"Loading {archive.num_rows} rows into {table_name}...")
+        proc = subprocess.Popen(load_cmd, stdin=PIPE, shell=False)
+        try:
+            with archive.data_stream() as data_fd:
+                shutil.copyfileobj(data_fd, proc.stdin, 1024 * 1024)
+        except BrokenPipeError:
+            # The mysql client quit early; its exit code tells:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = proc.wait()
+        
+        num_rows = self.db_obj.query(f"SELECT COUNT(*) FROM {db_schema}.{table_name}").next()
+        if returncode != 0 or num_rows != archive.num_rows:
+            self.db_obj.execute(f"DROP TABLE IF EXISTS {db_schema}.{table_name};")
+            self.utils.schema_cache.table_dropped(db_schema, table_name)
+            raise DatabaseError(f"Loading {table_name} from archive failed: " +
+                                f"mysql exit code {returncode}, {num_rows} of {archive.num_rows} rows loaded")
+        self.utils.log_info(f"Done loading {table_name}.")
 
     #-------------------------
     # close  
@@ -376,12 +655,24 @@ if __name__ == '__main__':
                             f'Default: {config_info.canvas_db_aux}',
                         default=config_info.canvas_db_aux)
     
+    parser.add_argument('-b', '--backupdb',
+                        help='MySQL/Aurora database (schema) where the backups reside.\n' +
+                            f'Default: {config_info.canvas_db_backup}',
+                        default=None)
+    
     parser.add_argument('-q', '--quiet',
                         help='if present, only error conditions are shown on screen. Default: False',
                         action='store_true',
                         default=False);
                         
 
+    parser.add_argument('-a', '--archive',
+                        nargs='+',
+                        help='Restore from one or more backup archive directories, as written by\n' +
+                             'clear_old_backups.py --archive. The archived backups replace the current tables.',
+                        default=[]
+                        )
+
     args = parser.parse_args();
     
     try:
@@ -391,6 +682,8 @@ if __name__ == '__main__':
                       host=args.host,
                       tables=args.table,
                       force=args.force,
+                      archives=args.archive,
+                      backup_db=args.backupdb,
                       logging_level=logging.INFO,
                       unittests=False)
     except KeyboardInterrupt:
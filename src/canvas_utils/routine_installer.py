@@ -0,0 +1,248 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import hashlib
+import os
+import re
+
+from canvas_utils_exceptions import DatabaseError
+
+class RoutineInstaller(object):
+    '''
+    Installs the stored procedures and functions of an
+    .sql script, such as canvasMysqlProcs.sql, through
+    an open MySQLDB session, rather than by SOURCEing the
+    script in the mysql command line client.
+
+    The script is split into statements the way the mysql
+    client does it, honoring DELIMITER directives, quotes,
+    and comments. Statements are then executed one by one.
+
+    The SHA-256 digest of the installed script is recorded
+    in a small version table in the target schema. When the
+    script has not changed since, and all its routines still
+    exist, is_current() says so with a single query, and
+    install() does nothing.
+    '''
+
+    version_table = 'RoutineVersions'
+
+    delimiter_pat = re.compile(r'^\s*DELIMITER\s+(\S+)\s*$', re.IGNORECASE)
+
+    # With a non-standard delimiter in force, the mysql client sends
+    # 'DROP FUNCTION IF EXISTS foo; CREATE FUNCTION foo ...' as one
+    # statement. Split such leading DROPs off:
+    leading_drop_pat = re.compile(r'^(DROP\s+(?:FUNCTION|PROCEDURE)\s+(?:IF\s+EXISTS\s+)?[`\w$.]+)\s*;\s*(.+)$',
+                                  re.IGNORECASE | re.DOTALL)
+
+    create_routine_pat = re.compile(r'CREATE\s+(?:DEFINER\s*=\s*\S+\s+)?(PROCEDURE|FUNCTION)\s+`?([\w$]+)`?',
+                                    re.IGNORECASE)
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, db_obj, db_schema, script_path):
+        '''
+        @param db_obj: session through which to install. Its
+            current database must be db_schema.
+        @type db_obj: MySQLDB
+        @param db_schema: schema that receives the routines
+        @type db_schema: str
+        @param script_path: the .sql file
+        @type script_path: str
+        '''
+        self.db_obj      = db_obj
+        self.db_schema   = db_schema
+        self.script_path = script_path
+        self.script_name = os.path.basename(script_path)
+
+        with open(script_path, 'r') as fd:
+            script = fd.read()
+        self.digest     = hashlib.sha256(script.encode('utf-8')).hexdigest()
+        self.statements = RoutineInstaller.split_statements(script)
+        self.routines   = RoutineInstaller.routine_names(self.statements)
+
+    #-------------------------
+    # split_statements
+    #--------------
+
+    @classmethod
+    def split_statements(cls, script):
+        '''
+        Split the text of an .sql script into statements.
+        DELIMITER lines change the statement terminator
+        for the lines that follow. Terminators inside quotes
+        and comments don't count. Statements that hold only
+        comments are dropped.
+
+        @param script: content of the .sql file
+        @type script: str
+        @return: the statements, without terminators
+        @rtype: [str]
+        '''
+        statements = []
+        delimiter  = ';'
+        buf        = []
+        quote_char = None
+        in_comment = False
+
+        for line in script.splitlines(keepends=True):
+            if quote_char is None and not in_comment:
+                match = cls.delimiter_pat.match(line)
+                if match is not None:
+                    cls._add_statement(statements, ''.join(buf))
+                    buf = []
+                    delimiter = match.group(1)
+                    continue
+
+            pos = 0
+            while pos < len(line):
+                char = line[pos]
+                if in_comment:
+                    if line.startswith('*/', pos):
+                        in_comment = False
+                        buf.append('*/')
+                        pos += 2
+                        continue
+                elif quote_char is not None:
+                    if char == '\\' and quote_char != '`':
+                        buf.append(line[pos:pos + 2])
+                        pos += 2
+                        continue
+                    if char == quote_char:
+                        quote_char = None
+                elif char in ("'", '"', '`'):
+                    quote_char = char
+                elif line.startswith('/*', pos):
+                    in_comment = True
+                    buf.append('/*')
+                    pos += 2
+                    continue
+                elif char == '#' or line.startswith('-- ', pos) or line.startswith('--\n', pos):
+                    # Comment to end of line:
+                    buf.append(line[pos:])
+                    break
+                elif line.startswith(delimiter, pos):
+                    cls._add_statement(statements, ''.join(buf))
+                    buf = []
+                    pos += len(delimiter)
+                    continue
+                buf.append(char)
+                pos += 1
+
+        cls._add_statement(statements, ''.join(buf))
+        return statements
+
+    #-------------------------
+    # routine_names
+    #--------------
+
+    @classmethod
+    def routine_names(cls, statements):
+        '''
+        Names of the procedures and functions the given
+        statements create.
+
+        @return: routine names in order of creation
+        @rtype: [str]
+        '''
+        names = []
+        for statement in statements:
+            match = cls.create_routine_pat.match(statement)
+            if match is not None:
+                names.append(match.group(2))
+        return names
+
+    #-------------------------
+    # is_current
+    #--------------
+
+    def is_current(self):
+        '''
+        Return True if the script's digest is recorded in the
+        version table, and all its routines exist. Uses a
+        single query. A missing version table means 'not current'.
+
+        @rtype: bool
+        '''
+        routine_list = ', '.join([f"'{routine}'" for routine in self.routines])
+        try:
+            (digest, num_routines) = self.db_obj.query(f'''
+                SELECT (SELECT sha256
+                          FROM {self.db_schema}.{RoutineInstaller.version_table}
+                         WHERE script_name = '{self.script_name}'),
+                       (SELECT COUNT(DISTINCT routine_name)
+                          FROM information_schema.routines
+                         WHERE routine_schema = '{self.db_schema}'
+                           AND routine_name IN ({routine_list}))
+                ''').next()
+        except Exception:
+            # No version table yet:
+            return False
+        return digest == self.digest and num_routines == len(set(self.routines))
+
+    #-------------------------
+    # install
+    #--------------
+
+    def install(self, force=False):
+        '''
+        Execute the script's statements, unless is_current().
+        Then record the script's digest.
+
+        @param force: install even if current
+        @type force: bool
+        @return: True if the routines were installed, False if
+            they were current
+        @rtype: bool
+        @raise DatabaseError: if a statement fails
+        '''
+        if not force and self.is_current():
+            return False
+
+        for statement in self.statements:
+            (err, _warn) = self.db_obj.execute(statement)
+            if err is not None:
+                raise DatabaseError(f"Cannot install routines from {self.script_name}; " +
+                                    f"'{statement.strip()[:60]}...' failed: {repr(err)}")
+
+        (err, _warn) = self.db_obj.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.db_schema}.{RoutineInstaller.version_table} (
+                script_name varchar(255) PRIMARY KEY,
+                sha256 char(64),
+                num_routines int,
+                installed DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                )''')
+        if err is None:
+            (err, _warn) = self.db_obj.execute(f'''
+                REPLACE INTO {self.db_schema}.{RoutineInstaller.version_table} (script_name, sha256, num_routines)
+                VALUES ('{self.script_name}', '{self.digest}', {len(set(self.routines))})''')
+        if err is not None:
+            raise DatabaseError(f"Routines were installed, but cannot record version of {self.script_name}: {repr(err)}")
+        return True
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # _add_statement
+    #--------------
+
+    @classmethod
+    def _add_statement(cls, statements, statement):
+        # Drop comment lines ahead of the statement; skip
+        # statements that are only comments:
+        lines = statement.strip().splitlines()
+        while len(lines) > 0 and (len(lines[0].strip()) == 0 or lines[0].strip().startswith(('#', '--'))):
+            lines.pop(0)
+        if len(lines) == 0:
+            return
+        statement = '\n'.join(lines).strip()
+        match = cls.leading_drop_pat.match(statement)
+        if match is not None:
+            statements.append(match.group(1))
+            cls._add_statement(statements, match.group(2))
+            return
+        statements.append(statement)
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import argparse
+from collections import OrderedDict
+from datetime import datetime
+import html
+import json
+import os
+import socket
+import sys
+
+from atomic_file import atomic_write
+from config_info import ConfigInfo
+
+class ResourceUsage(object):
+    '''
+    Resource usage of this process, read from /proc where
+    available. Values that cannot be read on this platform,
+    or are not readable for the process, are None.
+    '''
+
+    #-------------------------
+    # snapshot
+    #--------------
+
+    @staticmethod
+    def snapshot():
+        '''
+        @return: dict with CPU seconds of this process and of
+            its waited-for children, current and peak resident
+            set size in KB, and bytes read from and written to
+            storage.
+        @rtype: {str : {None | float | int}}
+        '''
+        times = os.times()
+        usage = {'cpu_secs'          : times.user + times.system,
+                 'children_cpu_secs' : times.children_user + times.children_system,
+                 'rss_kb'            : None,
+                 'peak_rss_kb'       : None,
+                 'read_bytes'        : None,
+                 'write_bytes'       : None
+                 }
+        status = ResourceUsage.read_proc_file('/proc/self/status', ':')
+        for (field, key) in (('VmRSS', 'rss_kb'), ('VmHWM', 'peak_rss_kb')):
+            if field in status:
+                # Like '  12345 kB':
+                usage[key] = int(status[field].split()[0])
+        io = ResourceUsage.read_proc_file('/proc/self/io', ':')
+        for key in ('read_bytes', 'write_bytes'):
+            if key in io:
+                usage[key] = int(io[key])
+        return usage
+
+    #-------------------------
+    # difference
+    #--------------
+
+    @staticmethod
+    def difference(start_usage, end_usage):
+        '''
+        Resources used between two snapshots. Sizes of
+        resident memory are those at the end.
+        '''
+        used = {}
+        for (key, end_value) in end_usage.items():
+            if key in ('rss_kb', 'peak_rss_kb'):
+                used[key] = end_value
+            elif end_value is None or start_usage.get(key) is None:
+                used[key] = None
+            else:
+                used[key] = end_value - start_usage[key]
+        return used
+
+    #-------------------------
+    # read_proc_file
+    #--------------
+
+    @staticmethod
+    def read_proc_file(path, separator):
+        '''
+        Read a /proc file of 'name<separator> value' lines.
+
+        @return: map from name to value string; empty if
+            the file cannot be read
+        @rtype: {str : str}
+        '''
+        try:
+            with open(path, 'r') as fd:
+                lines = fd.readlines()
+        except (IOError, OSError):
+            return {}
+        fields = {}
+        for line in lines:
+            (name, _sep, value) = line.partition(separator)
+            fields[name.strip()] = value.strip()
+        return fields
+
+
+# -------------------------- Class StageRecord ---------------
+
+class StageRecord(object):
+    '''
+    Structured record of one stage of a nightly refresh run,
+    such as canvas_prep or final_sanity_check. Collects start
+    and end time, per-table values such as build seconds, rows,
+    and bytes, errors, and the resources the stage's process
+    used. When the stage finishes, the record is written to
+
+        <report root>/<run id>/<stage>.json
+
+    and the run's combined report is regenerated (see RunReport).
+
+    All stages of one run share a run id. The cron script sets
+    it in environment variable CANVAS_RUN_ID. Without it, the
+    run id is the day's date.
+
+        record = StageRecord('canvas_prep')
+        record.start()
+        record.note_table('Terms', build_secs=1.2, rows=2104)
+        record.note_error('Could not create table Courses', table='Courses')
+        record.finish()
+    '''
+
+    RUN_ID_ENV = 'CANVAS_RUN_ID'
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, stage, run_id=None, report_root=None):
+        '''
+        @param stage: name of the stage
+        @type stage: str
+        @param run_id: id of the run. Default: see class comment
+        @type run_id: str
+        @param report_root: directory that holds one subdirectory
+            per run. Default: run_report_dir from setup.cfg
+        @type report_root: str
+        '''
+        self.stage  = stage
+        self.run_id = StageRecord.current_run_id() if run_id is None else run_id
+        self.report_root = ConfigInfo().run_report_dir if report_root is None else report_root
+        self.host   = socket.gethostname()
+        self.pid    = os.getpid()
+
+        self.start_time  = None
+        self.end_time    = None
+        self.start_usage = None
+        self.status      = None
+        self.resources   = None
+        self.tables = OrderedDict()
+        self.errors = []
+
+    #-------------------------
+    # current_run_id
+    #--------------
+
+    @staticmethod
+    def current_run_id():
+        return os.environ.get(StageRecord.RUN_ID_ENV, datetime.now().strftime('%Y-%m-%d'))
+
+    #-------------------------
+    # start
+    #--------------
+
+    def start(self, start_time=None):
+        '''
+        Note the stage's start time and resource usage so far.
+
+        @param start_time: when the stage started. Default: now
+        @type start_time: datetime
+        '''
+        self.start_time  = datetime.now() if start_time is None else start_time
+        self.start_usage = ResourceUsage.snapshot()
+
+    #-------------------------
+    # note_table
+    #--------------
+
+    def note_table(self, table_name, **values):
+        '''
+        Add values for one table, such as build_secs=1.2,
+        or rows=2104. Values of the same name replace
+        earlier ones.
+        '''
+        self.tables.setdefault(table_name, OrderedDict()).update(values)
+
+    #-------------------------
+    # note_error
+    #--------------
+
+    def note_error(self, message, table=None):
+        self.errors.append({'table' : table, 'message' : message})
+
+    #-------------------------
+    # finish
+    #--------------
+
+    def finish(self, status=None, end_time=None, resources=None):
+        '''
+        Write the record, and regenerate the run's report.
+
+        @param status: 'ok' or 'failed'. Default: 'failed'
+            if errors were noted, else 'ok'
+        @type status: str
+        @param end_time: when the stage ended. Default: now
+        @type end_time: datetime
+        @param resources: resources used by the stage. Default:
+            those used by this process since start()
+        @type resources: {str : <any>}
+        @return: path of the written record
+        @rtype: str
+        @raise IOError: if record or report cannot be written
+        '''
+        self.end_time = datetime.now() if end_time is None else end_time
+        if status is None:
+            status = 'failed' if len(self.errors) > 0 else 'ok'
+        self.status = status
+        if resources is None and self.start_usage is not None:
+            resources = ResourceUsage.difference(self.start_usage, ResourceUsage.snapshot())
+        self.resources = resources
+
+        run_dir = os.path.join(self.report_root, self.run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        record_path = os.path.join(run_dir, self.stage + '.json')
+        RunReport.write_json(record_path, self.as_dict())
+        RunReport(self.report_root, self.run_id).write()
+        return record_path
+
+    #-------------------------
+    # as_dict
+    #--------------
+
+    def as_dict(self):
+        start_time = self.start_time if self.start_time is not None else self.end_time
+        return OrderedDict([('stage',     self.stage),
+                            ('run_id',    self.run_id),
+                            ('host',      self.host),
+                            ('pid',       self.pid),
+                            ('start',     start_time.isoformat(timespec='seconds')),
+                            ('end',       self.end_time.isoformat(timespec='seconds')),
+                            ('wall_secs', round((self.end_time - start_time).total_seconds(), 3)),
+                            ('status',    self.status),
+                            ('resources', self.resources),
+                            ('load_avg',  os.getloadavg() if hasattr(os, 'getloadavg') else None),
+                            ('tables',    self.tables),
+                            ('errors',    self.errors)
+                            ])
+
+
+# -------------------------- Class RunReport ---------------
+
+class RunReport(object):
+    '''
+    Combines the stage records of one run into run_report.json
+    and a static run_report.html in the run's directory, and
+    refreshes index.html in the report root, which lists all
+    runs with each stage's wall clock time and error count.
+    Reports of earlier runs are kept, so a slowdown can be
+    traced to the night it started, then to the stage, and
+    in the run's report to the table.
+    '''
+
+    report_name = 'run_report'
+    index_name  = 'index.html'
+
+    # Style of the HTML pages:
+    css = '''body {font-family: sans-serif; font-size: 90%}
+             table {border-collapse: collapse; margin-bottom: 1.5em}
+             th, td {border: 1px solid #bbb; padding: 2px 8px; text-align: right}
+             th:first-child, td:first-child {text-align: left}
+             .failed {color: #b00}'''
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, report_root, run_id):
+        self.report_root = report_root
+        self.run_id      = run_id
+        self.run_dir     = os.path.join(report_root, run_id)
+
+    #-------------------------
+    # stage_records
+    #--------------
+
+    def stage_records(self):
+        '''
+        @return: the run's stage records, in the order the
+            stages started
+        @rtype: [{str : <any>}]
+        '''
+        records = []
+        for file_name in os.listdir(self.run_dir):
+            if not file_name.endswith('.json') or file_name == RunReport.report_name + '.json':
+                continue
+            with open(os.path.join(self.run_dir, file_name), 'r') as fd:
+                records.append(json.load(fd, object_pairs_hook=OrderedDict))
+        return sorted(records, key=lambda record: record['start'])
+
+    #-------------------------
+    # combined
+    #--------------
+
+    def combined(self):
+        '''
+        The run's report: all stage records, and the
+        run's overall start, end, and error count.
+        '''
+        records = self.stage_records()
+        return OrderedDict([('run_id',     self.run_id),
+                            ('start',      min([record['start'] for record in records], default=None)),
+                            ('end',        max([record['end'] for record in records], default=None)),
+                            ('num_errors', sum([len(record['errors']) for record in records])),
+                            ('stages',     records)
+                            ])
+
+    #-------------------------
+    # write
+    #--------------
+
+    def write(self):
+        '''
+        Write run_report.json and run_report.html, and
+        refresh the index of all runs.
+        '''
+        report = self.combined()
+        RunReport.write_json(os.path.join(self.run_dir, RunReport.report_name + '.json'), report)
+        atomic_write(os.path.join(self.run_dir, RunReport.report_name + '.html'), self.to_html(report))
+        self.write_index()
+
+    #-------------------------
+    # to_html
+    #--------------
+
+    def to_html(self, report):
+        '''
+        Summary table of the stages, then, for each stage,
+        its tables, slowest first, and its errors.
+        '''
+        body = f"<h1>Refresh run {html.escape(report['run_id'])}</h1>\n"
+        rows = []
+        for record in report['stages']:
+            resources = record['resources'] or {}
+            rows.append([record['stage'],
+                         record['host'],
+                         record['start'],
+                         record['wall_secs'],
+                         resources.get('cpu_secs'),
+                         resources.get('children_cpu_secs'),
+                         resources.get('peak_rss_kb'),
+                         resources.get('read_bytes'),
+                         resources.get('write_bytes'),
+                         len(record['errors'])
+                         ])
+        body += RunReport.html_table(['Stage', 'Host', 'Start', 'Wall secs', 'CPU secs', 'Child CPU secs',
+                                      'Peak RSS KB', 'Bytes read', 'Bytes written', 'Errors'],
+                                     rows)
+        for record in report['stages']:
+            css_class = ' class="failed"' if record['status'] != 'ok' else ''
+            body += f"<h2{css_class}>{html.escape(record['stage'])}: {html.escape(str(record['status']))}</h2>\n"
+            if len(record['tables']) > 0:
+                columns = []
+                for values in record['tables'].values():
+                    columns.extend([column for column in values.keys() if column not in columns])
+                slowest_first = sorted(record['tables'].items(),
+                                       key=lambda item: RunReport.table_secs(item[1]),
+                                       reverse=True)
+                body += RunReport.html_table(['Table'] + columns,
+                                             [[table_name] + [values.get(column) for column in columns]
+                                              for (table_name, values) in slowest_first])
+            if len(record['errors']) > 0:
+                body += '<ul class="failed">\n'
+                body += ''.join([f"<li>{html.escape(str(error['table'] or ''))} {html.escape(error['message'])}</li>\n"
+                                 for error in record['errors']])
+                body += '</ul>\n'
+        return RunReport.html_page(f"Refresh run {report['run_id']}", body)
+
+    #-------------------------
+    # write_index
+    #--------------
+
+    def write_index(self):
+        '''
+        Refresh index.html: one row per run, newest first,
+        with the wall clock seconds of each stage.
+        '''
+        reports = []
+        for run_id in os.listdir(self.report_root):
+            report_path = os.path.join(self.report_root, run_id, RunReport.report_name + '.json')
+            if os.path.exists(report_path):
+                with open(report_path, 'r') as fd:
+                    reports.append(json.load(fd))
+        reports.sort(key=lambda report: report['run_id'], reverse=True)
+
+        stages = []
+        for report in reports:
+            stages.extend([record['stage'] for record in report['stages'] if record['stage'] not in stages])
+        rows = []
+        for report in reports:
+            wall_secs = {record['stage'] : record['wall_secs'] for record in report['stages']}
+            link = f"<a href=\"{html.escape(report['run_id'])}/{RunReport.report_name}.html\">" + \
+                   f"{html.escape(report['run_id'])}</a>"
+            rows.append([link] + [wall_secs.get(stage) for stage in stages] + [report['num_errors']])
+        body = '<h1>Refresh runs</h1>\n' + \
+               RunReport.html_table(['Run'] + [f"{stage} secs" for stage in stages] + ['Errors'],
+                                    rows,
+                                    escape_first=False)
+        atomic_write(os.path.join(self.report_root, RunReport.index_name),
+                     RunReport.html_page('Refresh runs', body))
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # table_secs
+    #--------------
+
+    @staticmethod
+    def table_secs(values):
+        '''
+        Total seconds a table spent in a stage: the sum
+        of its values whose names end in '_secs'.
+        '''
+        return sum([value for (name, value) in values.items()
+                    if name.endswith('_secs') and isinstance(value, (int, float))])
+
+    #-------------------------
+    # html_table
+    #--------------
+
+    @staticmethod
+    def html_table(header, rows, escape_first=True):
+        table = '<table>\n<tr>' + ''.join([f"<th>{html.escape(col_name)}</th>" for col_name in header]) + '</tr>\n'
+        for row in rows:
+            cells = []
+            for (col_num, value) in enumerate(row):
+                if value is None:
+                    value = ''
+                elif isinstance(value, float):
+                    value = f"{value:.1f}"
+                if col_num > 0 or escape_first:
+                    value = html.escape(str(value))
+                cells.append(f"<td>{value}</td>")
+            table += '<tr>' + ''.join(cells) + '</tr>\n'
+        return table + '</table>\n'
+
+    #-------------------------
+    # html_page
+    #--------------
+
+    @staticmethod
+    def html_page(title, body):
+        return ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n' +
+                f"<title>{html.escape(title)}</title>\n<style>{RunReport.css}</style>\n" +
+                f"</head>\n<body>\n{body}</body>\n</html>\n")
+
+    #-------------------------
+    # write_json
+    #--------------
+
+    @staticmethod
+    def write_json(path, content):
+        atomic_write(path, json.dumps(content, indent=2))
+
+
+# -------------------------- Main ------------------
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Record a stage of a refresh run that ran outside\n" +
+                                                 "of Python, such as the raw data import."
+                                     )
+    parser.add_argument('-s', '--stage',
+                        help='name of the stage',
+                        required=True)
+    parser.add_argument('--start',
+                        type=float,
+                        help='start of the stage in seconds since the epoch',
+                        required=True)
+    parser.add_argument('--end',
+                        type=float,
+                        help='end of the stage in seconds since the epoch',
+                        required=True)
+    parser.add_argument('--exitcode',
+                        type=int,
+                        help="the stage's exit code",
+                        default=0)
+
+    args = parser.parse_args()
+
+    record = StageRecord(args.stage)
+    record.start(datetime.fromtimestamp(args.start))
+    if args.exitcode != 0:
+        record.note_error(f"{args.stage} exited with code {args.exitcode}")
+    # This process's resources are not the stage's:
+    record.finish(end_time=datetime.fromtimestamp(args.end), resources={})
@@ -0,0 +1,249 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime
+import json
+import math
+import os
+import statistics
+
+from atomic_file import atomic_write
+
+class RunStats(object):
+    '''
+    Small time series store of per-table export statistics.
+    After each table export, the number of rows, the bytes
+    of the .tsv file(s), and the time the table took to build
+    are appended to the table's series. The store is a JSON
+    file in the export directory, next to the export manifest:
+
+        {"tables" : {"Terms" : [{"time"       : "2026-10-19T02:14:05",
+                                 "rows"       : 2104,
+                                 "bytes"      : 162313,
+                                 "build_secs" : 1.3
+                                 },
+                                   ...
+                                ],
+                       ...
+                     }
+        }
+
+    Values that were not known at the time are null. Only the
+    most recent MAX_SAMPLES samples of each table are kept.
+    '''
+
+    file_name   = 'table_run_stats.json'
+    metrics     = ['rows', 'bytes', 'build_secs']
+    MAX_SAMPLES = 120
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, export_dir):
+        '''
+        Read the store in export_dir, if there is one.
+
+        @param export_dir: directory that holds the exported tables
+        @type export_dir: str
+        '''
+        self.store_path = os.path.join(export_dir, RunStats.file_name)
+        try:
+            with open(self.store_path, 'r') as fd:
+                self.stats = json.load(fd)
+        except FileNotFoundError:
+            self.stats = {'tables' : {}}
+
+    #-------------------------
+    # table_names
+    #--------------
+
+    @property
+    def table_names(self):
+        return sorted(self.stats['tables'].keys())
+
+    #-------------------------
+    # samples
+    #--------------
+
+    def samples(self, table_name):
+        '''
+        The table's samples, oldest first. Empty list
+        if the table was never recorded.
+
+        @return: list of dicts with keys 'time', and one key per metric
+        @rtype: [{str : <any>}]
+        '''
+        return self.stats['tables'].get(table_name, [])
+
+    #-------------------------
+    # record_run
+    #--------------
+
+    def record_run(self, table_name, when=None, rows=None, num_bytes=None, build_secs=None):
+        '''
+        Append one sample to the table's series, drop the
+        oldest samples beyond MAX_SAMPLES, and save the store.
+
+        @param table_name: name of exported table
+        @type table_name: str
+        @param when: time of the export. Default: now
+        @type when: datetime
+        @param rows: number of rows exported
+        @type rows: {None | int}
+        @param num_bytes: size of the table's export file(s)
+        @type num_bytes: {None | int}
+        @param build_secs: time it took to build the table
+        @type build_secs: {None | float}
+        '''
+        if when is None:
+            when = datetime.now()
+        sample = {'time'       : when.isoformat(timespec='seconds'),
+                  'rows'       : rows,
+                  'bytes'      : num_bytes,
+                  'build_secs' : build_secs
+                  }
+        samples = self.stats['tables'].setdefault(table_name, [])
+        samples.append(sample)
+        del samples[:-RunStats.MAX_SAMPLES]
+        self.save()
+
+    #-------------------------
+    # save
+    #--------------
+
+    def save(self):
+        '''
+        Replace the statistics file as a whole.
+        '''
+        atomic_write(self.store_path, json.dumps(self.stats, indent=2))
+
+
+# -------------------------- Class AnomalyDetector ---------------
+
+class AnomalyDetector(object):
+    '''
+    Judges the latest sample of a table's series against a
+    baseline of earlier samples, using robust statistics:
+    the distance from the baseline's median, measured in
+    median absolute deviations (MAD). The modified z-score
+
+            z = 0.6745 * (value - median) / MAD
+
+    is comparable to an ordinary z-score for normally
+    distributed values, but a few outliers in the baseline,
+    such as one unusually large export, do not shift it.
+
+    Tables grow in steps at the start of each academic
+    term. So when enough earlier samples fall into the same
+    term as the latest one, only those form the baseline.
+    Otherwise, the most recent samples do.
+
+    A value counts as anomalous if |z| exceeds Z_THRESHOLD,
+    and it differs from the median by more than MIN_RELATIVE_CHANGE.
+    The latter keeps tables that hardly ever change, such as
+    Terms, from being flagged for a single added row.
+    '''
+
+    WINDOW              = 28
+    MIN_BASELINE        = 5
+    Z_THRESHOLD         = 3.5
+    MIN_RELATIVE_CHANGE = 0.05
+
+    #-------------------------
+    # score
+    #--------------
+
+    def score(self, samples, metric):
+        '''
+        Compare the metric's value in the latest sample with
+        the baseline formed by the earlier samples.
+
+        @param samples: a table's samples, oldest first, as
+            returned by RunStats.samples()
+        @type samples: [{str : <any>}]
+        @param metric: one of RunStats.metrics
+        @type metric: str
+        @return: (latest value, baseline median, modified z-score),
+            or None if the latest sample lacks the metric, or
+            there are fewer than MIN_BASELINE earlier values.
+        @rtype: {None | (float, float, float)}
+        '''
+        if len(samples) == 0 or samples[-1][metric] is None:
+            return None
+        latest = samples[-1]
+        earlier = [sample for sample in samples[:-1] if sample[metric] is not None]
+
+        latest_term = AnomalyDetector.academic_term(latest['time'])
+        same_term = [sample for sample in earlier
+                     if AnomalyDetector.academic_term(sample['time']) == latest_term]
+        baseline = same_term if len(same_term) >= AnomalyDetector.MIN_BASELINE else earlier
+        baseline = [sample[metric] for sample in baseline[-AnomalyDetector.WINDOW:]]
+        if len(baseline) < AnomalyDetector.MIN_BASELINE:
+            return None
+
+        value  = latest[metric]
+        median = statistics.median(baseline)
+        return (value, median, AnomalyDetector.modified_z(value, median, baseline))
+
+    #-------------------------
+    # is_anomaly
+    #--------------
+
+    @staticmethod
+    def is_anomaly(value, median, z):
+        if abs(z) <= AnomalyDetector.Z_THRESHOLD:
+            return False
+        return abs(value - median) > AnomalyDetector.MIN_RELATIVE_CHANGE * abs(median)
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # modified_z
+    #--------------
+
+    @staticmethod
+    def modified_z(value, median, baseline):
+        '''
+        Modified z-score of value. When more than half of the
+        baseline equals the median, the MAD is zero; the mean
+        absolute deviation then takes its place. If that is
+        zero as well, any different value is infinitely far off.
+        '''
+        deviations = [abs(x - median) for x in baseline]
+        mad = statistics.median(deviations)
+        if mad > 0:
+            return 0.6745 * (value - median) / mad
+        mean_ad = statistics.mean(deviations)
+        if mean_ad > 0:
+            return (value - median) / (1.253314 * mean_ad)
+        if value == median:
+            return 0.0
+        return math.copysign(math.inf, value - median)
+
+    #-------------------------
+    # academic_term
+    #--------------
+
+    @staticmethod
+    def academic_term(iso_time):
+        '''
+        Academic quarter in which the given time falls.
+
+        @param iso_time: time as stored in the samples
+        @type iso_time: str
+        @return: year and term, as in (2026, 'Autumn')
+        @rtype: (int, str)
+        '''
+        when = datetime.fromisoformat(iso_time)
+        if when.month >= 9:
+            term = 'Autumn'
+        elif when.month >= 7:
+            term = 'Summer'
+        elif when.month >= 4:
+            term = 'Spring'
+        else:
+            term = 'Winter'
+        return (when.year, term)
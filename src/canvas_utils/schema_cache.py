@@ -0,0 +1,396 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import re
+
+class SchemaCache(object):
+    '''
+    Per-process cache of information_schema metadata:
+    table names, column definitions, and index definitions.
+    Queries against information_schema are slow on servers
+    with many schemas, and a refresh run used to issue
+    them for every table.
+
+    Metadata is loaded in bulk, one query per schema for
+    table names, and one each for the columns and indexes
+    of all tables in a schema. Later lookups are answered
+    from memory.
+
+    The cache only stays correct if code that creates,
+    renames, or drops tables tells it so. Either call
+    table_created(), table_dropped(), table_renamed() directly,
+    or pass the executed SQL to note_statement(), which
+    recognizes the DDL statements. Anything that changes
+    tables behind the cache's back (shell scripts, tests
+    using MySQLDB.createTable()) must call invalidate().
+
+    Table names are matched case insensitively, like
+    the information_schema queries this cache replaces.
+    '''
+
+    # Optionally backquoted name, optionally schema qualified:
+    _name_regx = r'`?[\w$]+`?(?:\s*\.\s*`?[\w$]+`?)?'
+
+    use_pat          = re.compile(r'^USE\s+`?([\w$]+)`?$', re.IGNORECASE)
+    create_table_pat = re.compile(r'^CREATE\s+(TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(' + _name_regx + ')',
+                                  re.IGNORECASE)
+    drop_table_pat   = re.compile(r'^DROP\s+(TEMPORARY\s+)?TABLES?\s+(?:IF\s+EXISTS\s+)?((?:' + _name_regx + r'\s*,?\s*)+)',
+                                  re.IGNORECASE)
+    rename_table_pat = re.compile(r'^RENAME\s+TABLES?\s+(.*)$', re.IGNORECASE | re.DOTALL)
+    rename_pair_pat  = re.compile(r'(' + _name_regx + r')\s+TO\s+(' + _name_regx + ')', re.IGNORECASE)
+    alter_table_pat  = re.compile(r'^ALTER\s+TABLE\s+(' + _name_regx + ')', re.IGNORECASE)
+    schema_ddl_pat   = re.compile(r'^(?:CREATE|DROP)\s+(?:DATABASE|SCHEMA)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?`?([\w$]+)`?',
+                                  re.IGNORECASE)
+    comment_pat      = re.compile(r'/\*.*?\*/|(?:--\s|#)[^\n]*', re.DOTALL)
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self):
+        self.clear()
+
+    #-------------------------
+    # clear
+    #--------------
+
+    def clear(self):
+        '''
+        Forget everything.
+        '''
+        # Schema --> {lower case table name : table name}:
+        self._tables  = {}
+        # Schema --> {lower case table name : [column tuple]}:
+        self._columns = {}
+        # Schema --> {lower case table name : [index tuple]}:
+        self._indexes = {}
+
+    #-------------------------
+    # table_names
+    #--------------
+
+    def table_names(self, db_obj, db_schema):
+        '''
+        Names of all tables in db_schema.
+
+        @param db_obj: database connection, only used
+            if the schema is not cached yet
+        @type db_obj: MySQLDB
+        @param db_schema: schema whose tables to list
+        @type db_schema: str
+        @return: table names
+        @rtype: [str]
+        '''
+        return list(self._schema_tables(db_obj, db_schema).values())
+
+    #-------------------------
+    # table_exists
+    #--------------
+
+    def table_exists(self, db_obj, db_schema, table_name):
+        '''
+        Return True if table_name exists in db_schema.
+        '''
+        return table_name.lower() in self._schema_tables(db_obj, db_schema)
+
+    #-------------------------
+    # columns
+    #--------------
+
+    def columns(self, db_obj, db_schema, table_name):
+        '''
+        Column definitions of one table, ordered by position.
+        Each definition is a tuple:
+
+           (column_name, data_type, character_maximum_length,
+            column_default, ordinal_position, extra)
+
+        @param db_obj: database connection
+        @type db_obj: MySQLDB
+        @param db_schema: the table's schema
+        @type db_schema: str
+        @param table_name: table whose columns to return
+        @type table_name: str
+        @return: column definitions; empty if table does not exist
+        @rtype: [(str, str, int, str, int, str)]
+        '''
+        return self._table_metadata(db_obj, db_schema, table_name, self._columns)
+
+    #-------------------------
+    # indexes
+    #--------------
+
+    def indexes(self, db_obj, db_schema, table_name):
+        '''
+        Index definitions of one table. Each definition
+        is a tuple:
+
+           (index_name, column_name, seq_in_index, sub_part)
+
+        @param db_obj: database connection
+        @type db_obj: MySQLDB
+        @param db_schema: the table's schema
+        @type db_schema: str
+        @param table_name: table whose indexes to return
+        @type table_name: str
+        @return: index definitions
+        @rtype: [(str, str, int, int)]
+        '''
+        return self._table_metadata(db_obj, db_schema, table_name, self._indexes)
+
+    #-------------------------
+    # invalidate
+    #--------------
+
+    def invalidate(self, db_schema=None, table_name=None):
+        '''
+        Drop cached metadata. Without arguments everything
+        is forgotten. With only db_schema, that schema is
+        reloaded on next use. With a table name, only
+        that table's columns and indexes are forgotten.
+        '''
+        if db_schema is None:
+            self.clear()
+            return
+        if table_name is None:
+            self._tables.pop(db_schema, None)
+            self._columns.pop(db_schema, None)
+            self._indexes.pop(db_schema, None)
+            return
+        for metadata in (self._columns, self._indexes):
+            try:
+                del metadata[db_schema][table_name.lower()]
+            except KeyError:
+                pass
+
+    #-------------------------
+    # table_created
+    #--------------
+
+    def table_created(self, db_schema, table_name):
+        '''
+        Record that table_name was (re)created in db_schema.
+        Its columns and indexes are loaded when next needed.
+        '''
+        self.invalidate(db_schema, table_name)
+        if db_schema in self._tables:
+            self._tables[db_schema][table_name.lower()] = table_name
+
+    #-------------------------
+    # table_dropped
+    #--------------
+
+    def table_dropped(self, db_schema, table_name):
+        self.invalidate(db_schema, table_name)
+        if db_schema in self._tables:
+            self._tables[db_schema].pop(table_name.lower(), None)
+
+    #-------------------------
+    # table_renamed
+    #--------------
+
+    def table_renamed(self, from_schema, from_name, to_schema, to_name):
+        '''
+        Record a rename, which may move the table to
+        another schema. Cached columns and indexes move
+        with the table.
+        '''
+        from_key = from_name.lower()
+        columns  = self._columns.get(from_schema, {}).get(from_key)
+        indexes  = self._indexes.get(from_schema, {}).get(from_key)
+        self.table_dropped(from_schema, from_name)
+        self.table_created(to_schema, to_name)
+        # Only keep the metadata if the destination
+        # schema's metadata is cached in bulk:
+        if columns is not None and to_schema in self._columns:
+            self._columns[to_schema][to_name.lower()] = columns
+        if indexes is not None and to_schema in self._indexes:
+            self._indexes[to_schema][to_name.lower()] = indexes
+
+    #-------------------------
+    # note_statement
+    #--------------
+
+    def note_statement(self, sql, default_schema):
+        '''
+        Update the cache after sql was executed successfully.
+        The sql may contain several statements, such as
+        the content of a table creation file in Queries.
+        USE statements change the schema of unqualified
+        table names for the remaining statements. Statements
+        other than DDL are ignored.
+
+        @param sql: executed statement(s)
+        @type sql: str
+        @param default_schema: schema that was current
+            when sql was executed
+        @type default_schema: str
+        @return: schema that is current after sql was executed
+        @rtype: str
+        '''
+        curr_schema = default_schema
+        sql = SchemaCache.comment_pat.sub(' ', sql)
+        for statement in sql.split(';'):
+            statement = statement.strip()
+            if len(statement) == 0:
+                continue
+
+            match = SchemaCache.use_pat.match(statement)
+            if match is not None:
+                curr_schema = match.group(1)
+                continue
+
+            match = SchemaCache.create_table_pat.match(statement)
+            if match is not None:
+                # Temporary tables don't show in information_schema:
+                if match.group(1) is None:
+                    self.table_created(*self._split_name(match.group(2), curr_schema))
+                continue
+
+            match = SchemaCache.drop_table_pat.match(statement)
+            if match is not None:
+                if match.group(1) is None:
+                    for name in match.group(2).split(','):
+                        self.table_dropped(*self._split_name(name, curr_schema))
+                continue
+
+            match = SchemaCache.rename_table_pat.match(statement)
+            if match is not None:
+                # Pairs are renamed left to right:
+                for (from_name, to_name) in SchemaCache.rename_pair_pat.findall(match.group(1)):
+                    self.table_renamed(*self._split_name(from_name, curr_schema),
+                                       *self._split_name(to_name, curr_schema))
+                continue
+
+            match = SchemaCache.alter_table_pat.match(statement)
+            if match is not None:
+                (db_schema, table_name) = self._split_name(match.group(1), curr_schema)
+                if re.search(r'\bRENAME\b', statement, re.IGNORECASE):
+                    # Too many forms to parse; reload the schema:
+                    self.invalidate(db_schema)
+                else:
+                    self.invalidate(db_schema, table_name)
+                continue
+
+            match = SchemaCache.schema_ddl_pat.match(statement)
+            if match is not None:
+                self.invalidate(match.group(1))
+
+        return curr_schema
+
+    #-------------------------
+    # load
+    #--------------
+
+    def load(self, db_obj, db_schema):
+        '''
+        Read the names of all tables in db_schema
+        with a single query.
+        '''
+        res = db_obj.query(f'''
+                           SELECT table_name
+                             FROM information_schema.tables
+                            WHERE table_schema = '{db_schema}';
+                           ''')
+        self._tables[db_schema] = {table_name.lower() : table_name
+                                   for (table_name,) in map(self._row_tuple, res)}
+
+    #-------------------------
+    # load_metadata
+    #--------------
+
+    def load_metadata(self, db_obj, db_schema, table_name=None):
+        '''
+        Read columns and indexes of all tables in db_schema,
+        or of only table_name, with one query each.
+        '''
+        table_cond = '' if table_name is None else f"AND table_name = '{table_name}'"
+
+        columns = {} if table_name is None else {table_name.lower() : []}
+        res = db_obj.query(f'''
+                           SELECT table_name, column_name, data_type, character_maximum_length,
+                                  column_default, ordinal_position, extra
+                             FROM information_schema.columns
+                            WHERE table_schema = '{db_schema}' {table_cond}
+                            ORDER BY table_name, ordinal_position;
+                           ''')
+        for row in map(self._row_tuple, res):
+            columns.setdefault(row[0].lower(), []).append(row[1:])
+
+        indexes = {} if table_name is None else {table_name.lower() : []}
+        res = db_obj.query(f'''
+                           SELECT table_name, index_name, column_name, seq_in_index, sub_part
+                             FROM information_schema.statistics
+                            WHERE table_schema = '{db_schema}' {table_cond}
+                            ORDER BY table_name, index_name, seq_in_index;
+                           ''')
+        for row in map(self._row_tuple, res):
+            indexes.setdefault(row[0].lower(), []).append(row[1:])
+        # Tables without indexes are known to have none:
+        for table_key in columns.keys():
+            indexes.setdefault(table_key, [])
+
+        if table_name is None:
+            self._columns[db_schema] = columns
+            self._indexes[db_schema] = indexes
+        else:
+            self._columns.setdefault(db_schema, {}).update(columns)
+            self._indexes.setdefault(db_schema, {}).update(indexes)
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # _schema_tables
+    #--------------
+
+    def _schema_tables(self, db_obj, db_schema):
+        if db_schema not in self._tables:
+            self.load(db_obj, db_schema)
+        return self._tables[db_schema]
+
+    #-------------------------
+    # _table_metadata
+    #--------------
+
+    def _table_metadata(self, db_obj, db_schema, table_name, metadata):
+        if db_schema not in metadata:
+            # First request for this schema: load all tables:
+            self.load_metadata(db_obj, db_schema)
+        table_key = table_name.lower()
+        if table_key not in metadata[db_schema]:
+            if table_key not in self._schema_tables(db_obj, db_schema):
+                return []
+            # Table created after the bulk load:
+            self.load_metadata(db_obj, db_schema, table_name)
+        return metadata[db_schema].get(table_key, [])
+
+    #-------------------------
+    # _split_name
+    #--------------
+
+    @staticmethod
+    def _split_name(name, default_schema):
+        '''
+        Turn 'tbl', '`tbl`', 'db.tbl', or '`db`.`tbl`'
+        into (db_schema, table_name).
+        '''
+        parts = [part.strip().strip('`') for part in name.strip().split('.')]
+        if len(parts) == 1:
+            return (default_schema, parts[0])
+        return (parts[0], parts[1])
+
+    #-------------------------
+    # _row_tuple
+    #--------------
+
+    @staticmethod
+    def _row_tuple(row):
+        # Single column queries deliver bare values,
+        # connections with a dict cursor deliver dicts:
+        if isinstance(row, dict):
+            return tuple(row.values())
+        if not isinstance(row, (tuple, list)):
+            return (row,)
+        return tuple(row)
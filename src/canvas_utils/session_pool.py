@@ -0,0 +1,401 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from contextlib import contextmanager
+import re
+import threading
+import time
+
+class SessionPool(object):
+    '''
+    A bounded pool of database sessions. Connections are
+    opened lazily through a caller supplied function, up
+    to a maximum number. Callers borrow a session:
+
+        with pool.session() as db:
+            db.query(...)
+
+    or hand the pool a function that does the work, which
+    is retried on a fresh session after transient errors:
+
+        pool.run(lambda db: copier.copy_one_table(db, 'Terms'))
+
+    Sessions that sat idle longer than check_after_secs
+    are checked with a trivial query before they are handed
+    out, and replaced if the server dropped them. Opening a
+    connection is retried with exponential backoff when the
+    error is transient (server gone away, too many connections,
+    lock wait timeout, etc.)
+
+    The pool keeps track of how long callers waited for a
+    session, so undersized pools show up in the logs (see
+    wait_stats()).
+    '''
+
+    # MySQL error codes after which trying again may succeed:
+    #    1040: too many connections
+    #    1205: lock wait timeout
+    #    1213: deadlock
+    #    2003: cannot connect to server
+    #    2006: server has gone away
+    #    2013: lost connection during query
+    #    2055: lost connection, system error
+    transient_error_codes = frozenset([1040, 1205, 1213, 2003, 2006, 2013, 2055])
+
+    # pymysql exceptions print as OperationalError(2013, 'Lost...'),
+    # also when MySQLDB wraps them into other exceptions:
+    error_code_pat = re.compile(r'(?:OperationalError|InternalError|InterfaceError)\(([0-9]+),')
+
+    default_size             = 4
+    default_max_retries      = 5
+    default_backoff_secs     = 1.0
+    default_max_backoff_secs = 30.0
+    default_check_after_secs = 60.0
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self,
+                 connect,
+                 size=None,
+                 max_retries=None,
+                 backoff_secs=None,
+                 max_backoff_secs=None,
+                 check_after_secs=None,
+                 log_warn=None):
+        '''
+        @param connect: function without arguments that returns
+            a new, fully configured session
+        @type connect: callable
+        @param size: maximum number of open sessions
+        @type size: int
+        @param max_retries: how often to retry after transient errors
+        @type max_retries: int
+        @param backoff_secs: wait before the first retry; doubled
+            for each further retry
+        @type backoff_secs: float
+        @param max_backoff_secs: longest wait between retries
+        @type max_backoff_secs: float
+        @param check_after_secs: idle time after which a session
+            is checked before it is handed out
+        @type check_after_secs: float
+        @param log_warn: function that logs warnings, such as Utilities.log_warn
+        @type log_warn: callable
+        '''
+        self.connect          = connect
+        self.size             = SessionPool.default_size if size is None else size
+        self.max_retries      = SessionPool.default_max_retries if max_retries is None else max_retries
+        self.backoff_secs     = SessionPool.default_backoff_secs if backoff_secs is None else backoff_secs
+        self.max_backoff_secs = SessionPool.default_max_backoff_secs if max_backoff_secs is None else max_backoff_secs
+        self.check_after_secs = SessionPool.default_check_after_secs if check_after_secs is None else check_after_secs
+        self.log_warn         = log_warn
+
+        if self.size < 1:
+            raise ValueError(f"Session pool size must be at least 1, not {self.size}")
+
+        # Idle sessions: [(session, time when returned to pool)]:
+        self._idle      = []
+        self._num_open  = 0
+        self._closed    = False
+        self._condition = threading.Condition()
+
+        # Statistics:
+        self.num_acquired   = 0
+        self.total_wait     = 0.0
+        self.max_wait       = 0.0
+        self.num_reconnects = 0
+        self.num_retries    = 0
+
+    #-------------------------
+    # is_transient_error
+    #--------------
+
+    @classmethod
+    def is_transient_error(cls, exc):
+        '''
+        Return True if exc reports a MySQL error after which
+        a new attempt may succeed.
+
+        @param exc: exception raised by a database operation
+        @type exc: Exception
+        @rtype: bool
+        '''
+        match = cls.error_code_pat.search(f"{str(exc)} {repr(exc)}")
+        return match is not None and int(match.group(1)) in cls.transient_error_codes
+
+    #-------------------------
+    # backoff_delays
+    #--------------
+
+    @staticmethod
+    def backoff_delays(max_retries, backoff_secs, max_backoff_secs):
+        '''
+        The waits before each of max_retries retries:
+        backoff_secs, doubling, capped at max_backoff_secs.
+        '''
+        return [min(backoff_secs * 2**retry, max_backoff_secs) for retry in range(max_retries)]
+
+    #-------------------------
+    # call_with_retries
+    #--------------
+
+    @classmethod
+    def call_with_retries(cls, func, max_retries, backoff_secs, max_backoff_secs,
+                          on_retry=None, sleep=time.sleep):
+        '''
+        Call func without arguments, and return its result.
+        If func raises a transient error, wait, and call again,
+        at most max_retries times. Other errors, and the last
+        transient one, are raised.
+
+        @param func: the function to call
+        @type func: callable
+        @param max_retries: number of retries
+        @type max_retries: int
+        @param backoff_secs: first wait
+        @type backoff_secs: float
+        @param max_backoff_secs: longest wait
+        @type max_backoff_secs: float
+        @param on_retry: called as on_retry(exc, delay) before
+            each wait
+        @type on_retry: callable
+        @param sleep: function that waits; replaceable for tests
+        @type sleep: callable
+        @return: whatever func returns
+        '''
+        delays = cls.backoff_delays(max_retries, backoff_secs, max_backoff_secs)
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if len(delays) == 0 or not cls.is_transient_error(e):
+                    raise
+                delay = delays.pop(0)
+                if on_retry is not None:
+                    on_retry(e, delay)
+                sleep(delay)
+
+    #-------------------------
+    # acquire
+    #--------------
+
+    def acquire(self, timeout=None):
+        '''
+        Borrow a session. Blocks while all sessions are
+        in use. Return the session with release().
+
+        @param timeout: seconds to wait at most. Default: forever
+        @type timeout: float
+        @return: an open session
+        @raise TimeoutError: if no session became free in time
+        '''
+        start_time = time.monotonic()
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Session pool is closed")
+                if len(self._idle) > 0:
+                    (session, idle_since) = self._idle.pop()
+                    break
+                if self._num_open < self.size:
+                    # Reserve a slot; open outside the lock:
+                    self._num_open += 1
+                    (session, idle_since) = (None, None)
+                    break
+                remaining = None if timeout is None else timeout - (time.monotonic() - start_time)
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No database session free after {timeout} seconds")
+                self._condition.wait(remaining)
+
+            wait_time = time.monotonic() - start_time
+            self.num_acquired += 1
+            self.total_wait   += wait_time
+            self.max_wait      = max(self.max_wait, wait_time)
+
+        try:
+            if session is None:
+                session = self._open()
+            elif time.monotonic() - idle_since > self.check_after_secs and not self.is_healthy(session):
+                self._close_quietly(session)
+                session = self._open()
+                self.num_reconnects += 1
+        except Exception:
+            with self._condition:
+                self._num_open -= 1
+                self._condition.notify()
+            raise
+        return session
+
+    #-------------------------
+    # release
+    #--------------
+
+    def release(self, session, discard=False):
+        '''
+        Return a borrowed session. Discarded sessions are
+        closed, and replaced by a new one when next needed.
+
+        @param session: session obtained from acquire()
+        @param discard: True if the session may be broken
+        @type discard: bool
+        '''
+        with self._condition:
+            if discard or self._closed:
+                self._num_open -= 1
+            else:
+                self._idle.append((session, time.monotonic()))
+            self._condition.notify()
+        if discard or self._closed:
+            self._close_quietly(session)
+
+    #-------------------------
+    # session
+    #--------------
+
+    @contextmanager
+    def session(self, timeout=None):
+        '''
+        Context manager that borrows a session, and returns
+        it when done. After a transient error the session
+        is discarded, and the error is raised.
+        '''
+        session = self.acquire(timeout)
+        try:
+            yield session
+        except Exception as e:
+            self.release(session, discard=self.is_transient_error(e))
+            raise
+        self.release(session)
+
+    #-------------------------
+    # run
+    #--------------
+
+    def run(self, func, timeout=None):
+        '''
+        Call func(session) with a borrowed session. After
+        transient errors, wait and call again with a fresh
+        session. The work done by func must therefore be
+        safe to repeat.
+
+        @param func: work to do
+        @type func: callable
+        @param timeout: seconds to wait at most for each session
+        @type timeout: float
+        @return: what func returns
+        '''
+        def attempt():
+            with self.session(timeout) as session:
+                return func(session)
+        return self.call_with_retries(attempt,
+                                      self.max_retries,
+                                      self.backoff_secs,
+                                      self.max_backoff_secs,
+                                      on_retry=self._note_retry)
+
+    #-------------------------
+    # is_healthy
+    #--------------
+
+    def is_healthy(self, session):
+        '''
+        Return True if the session still talks to the server.
+        '''
+        try:
+            if not session.isOpen():
+                return False
+            session.query('SELECT 1').next()
+            return True
+        except Exception:
+            return False
+
+    #-------------------------
+    # wait_stats
+    #--------------
+
+    def wait_stats(self):
+        '''
+        How long callers waited for sessions.
+
+        @return: dict with keys 'acquired', 'total_wait',
+            'mean_wait', 'max_wait' (seconds), 'reconnects',
+            and 'retries'
+        @rtype: {str : <num>}
+        '''
+        with self._condition:
+            return {'acquired'   : self.num_acquired,
+                    'total_wait' : self.total_wait,
+                    'mean_wait'  : self.total_wait / self.num_acquired if self.num_acquired > 0 else 0.0,
+                    'max_wait'   : self.max_wait,
+                    'reconnects' : self.num_reconnects,
+                    'retries'    : self.num_retries
+                    }
+
+    #-------------------------
+    # wait_report
+    #--------------
+
+    def wait_report(self):
+        '''
+        One line summary of wait_stats() for the logs.
+        '''
+        stats = self.wait_stats()
+        return (f"Session pool (size {self.size}): {stats['acquired']} sessions handed out; " +
+                f"waited {stats['total_wait']:.2f}s total, {stats['mean_wait']:.3f}s mean, " +
+                f"{stats['max_wait']:.2f}s max; {stats['reconnects']} reconnects, " +
+                f"{stats['retries']} retries.")
+
+    #-------------------------
+    # close
+    #--------------
+
+    def close(self):
+        '''
+        Close idle sessions. Sessions still borrowed
+        are closed when they are released.
+        '''
+        with self._condition:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._num_open -= len(idle)
+            self._condition.notify_all()
+        for (session, _idle_since) in idle:
+            self._close_quietly(session)
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # _open
+    #--------------
+
+    def _open(self):
+        return self.call_with_retries(self.connect,
+                                      self.max_retries,
+                                      self.backoff_secs,
+                                      self.max_backoff_secs,
+                                      on_retry=self._note_retry)
+
+    #-------------------------
+    # _note_retry
+    #--------------
+
+    def _note_retry(self, exc, delay):
+        with self._condition:
+            self.num_retries += 1
+        if self.log_warn is not None:
+            self.log_warn(f"Transient database error; retrying in {delay:.1f}s: {repr(exc)}")
+
+    #-------------------------
+    # _close_quietly
+    #--------------
+
+    @staticmethod
+    def _close_quietly(session):
+        try:
+            session.close()
+        except Exception:
+            pass
@@ -0,0 +1,68 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import re
+
+class SizeSpec(object):
+    '''
+    Sizes given on command lines, such as '500M', '1.5G',
+    or '1000000' (bytes), and sizes formatted for reports,
+    such as '1.5G'. All programs use the same units, which
+    are powers of 1024: K is 1024 bytes, M is 1024**2 bytes,
+    and so on. A trailing B is allowed, as in '500MB'.
+
+        max_bytes = SizeSpec.parse('20G')
+        print(SizeSpec.human_readable(max_bytes))
+    '''
+
+    # Multipliers for the units:
+    units = {'' : 1,
+             'K': 1024,
+             'M': 1024**2,
+             'G': 1024**3,
+             'T': 1024**4
+             }
+
+    # For the --help texts of size options:
+    UNITS_HELP = 'K, M, G, T are powers of 1024'
+
+    size_pat = re.compile(r'^\s*([0-9]+(?:\.[0-9]+)?)\s*([KMGT]?)B?\s*$', re.IGNORECASE)
+
+    #-------------------------
+    # parse
+    #--------------
+
+    @staticmethod
+    def parse(size_spec):
+        '''
+        Convert a size spec such as 500M, 20G, or
+        1000000 into a number of bytes.
+
+        @param size_spec: size with optional unit
+        @type size_spec: str
+        @return: number of bytes
+        @rtype: int
+        @raise ValueError: if size_spec is ill-formed
+        '''
+        match = SizeSpec.size_pat.match(str(size_spec))
+        if match is None:
+            raise ValueError(f"Bad size '{size_spec}'; use e.g. 500M, 20G, or 1000000")
+        (num, unit) = match.groups()
+        return int(float(num) * SizeSpec.units[unit.upper()])
+
+    #-------------------------
+    # human_readable
+    #--------------
+
+    @staticmethod
+    def human_readable(num_bytes):
+        '''
+        Format a number of bytes like 1.5G.
+        '''
+        for unit in ['', 'K', 'M', 'G']:
+            if abs(num_bytes) < 1024:
+                return f"{num_bytes:.1f}{unit}" if unit else f"{num_bytes}"
+            num_bytes /= 1024
+        return f"{num_bytes:.1f}T"
@@ -0,0 +1,525 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from collections import namedtuple
+import re
+
+# One table mention in a SQL script. The db is None if the
+# table name is unqualified, and no USE statement preceded it.
+# Role is one of 'read', 'written', or 'index_target':
+
+TableRef = namedtuple('TableRef', ['db', 'table', 'role', 'statement_num'])
+
+class SqlStatement(object):
+    '''
+    What the extractor learned about one statement:
+
+        statement_num   : position of the statement in its script, from 0
+        refs            : list of TableRef
+        aliases         : {alias : (db, table)} for the FROM/JOIN/UPDATE
+                             clauses of the statement
+        qualified_names : dotted names outside of table positions,
+                             such as ['canvasdata_prd', 'course_dim', 'id'],
+                             or ['c', 'name']. Usually column references.
+    '''
+
+    def __init__(self, statement_num):
+        self.statement_num   = statement_num
+        self.refs            = []
+        self.aliases         = {}
+        self.qualified_names = []
+
+    def __str__(self):
+        return f"<SqlStatement {self.statement_num}: {len(self.refs)} table refs>"
+
+# -------------------------- Class SqlTokenizer ---------------
+
+class SqlTokenizer(object):
+    '''
+    Lightweight tokenizer for the MySQL scripts in Queries.
+    Comments ('# ...', '-- ...', '/* ... */') are dropped,
+    string literals are returned as one token without their
+    quotes, and dotted names, such as canvasdata_prd.course_dim.id,
+    are returned as one token holding the list of name parts.
+
+    Tokens are tuples (kind, value), where kind is one of
+    'name', 'string', 'number', or 'punct'.
+    '''
+
+    token_pat = re.compile(r'''
+          (?P<ws>\s+)
+        | (?P<comment>\#[^\n]*|--(?=\s)[^\n]*|/\*.*?\*/)
+        | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+        | (?P<name>(?:`[^`]+`|[A-Za-z_][\w$]*)(?:\.(?:`[^`]+`|[A-Za-z_][\w$]*|\*))*)
+        | (?P<number>[0-9]+(?:\.[0-9]*)?(?:[eE][-+]?[0-9]+)?)
+        | (?P<punct>.)
+        ''', re.VERBOSE | re.DOTALL)
+
+    #-------------------------
+    # tokenize
+    #--------------
+
+    @staticmethod
+    def tokenize(sql_text):
+        '''
+        Generator of (kind, value) tuples. For kind 'name',
+        value is a list of name parts, with backticks removed.
+
+        @param sql_text: one or more SQL statements
+        @type sql_text: str
+        @return: tokens
+        @rtype: iter((str, <any>))
+        '''
+        for match in SqlTokenizer.token_pat.finditer(sql_text):
+            kind = match.lastgroup
+            if kind in ('ws', 'comment'):
+                continue
+            value = match.group(kind)
+            if kind == 'name':
+                value = [part.strip('`') for part in re.findall(r'`[^`]+`|[^.]+', value)]
+            elif kind == 'string':
+                value = value[1:-1]
+            yield (kind, value)
+
+# -------------------------- Class SqlDependencyExtractor ---------------
+
+class SqlDependencyExtractor(object):
+    '''
+    Finds the tables that SQL scripts read, write, or
+    build indexes on. Understands the statements used in
+    the Queries scripts:
+
+       USE db
+       CREATE TABLE [IF NOT EXISTS] t ... [LIKE t2 | AS SELECT ...]
+       CREATE [UNIQUE|FULLTEXT|SPATIAL] INDEX i ON t(...)
+       DROP TABLE [IF EXISTS] t1, t2, ...
+       DROP INDEX i ON t
+       ALTER TABLE t, TRUNCATE [TABLE] t, RENAME TABLE t1 TO t2, ...
+       INSERT/REPLACE [INTO] t ...
+       UPDATE t [JOIN ...] SET ...
+       DELETE FROM t ..., DELETE t1 FROM t1 JOIN t2 ...
+       LOAD DATA ... INTO TABLE t
+       CALL createIndexIfNotExists('i', 't', ...) and the other
+            index procedures of canvasMysqlProcs.sql
+
+    Tables after FROM and JOIN anywhere, including subqueries,
+    are read. FROM inside function calls, as in EXTRACT(YEAR FROM d),
+    is ignored.
+    '''
+
+    # Procedures in canvasMysqlProcs.sql that manage indexes,
+    # mapped to the position of their table name argument:
+    INDEX_PROCS = {'createindexifnotexists'         : 1,
+                   'createfulltextindexifnotexists' : 1,
+                   'dropindexifexists'              : 0,
+                   'addprimaryifnotexists'          : 0,
+                   'dropprimaryifexists'            : 0
+                   }
+
+    # Keywords that may follow a table name where
+    # an alias could otherwise be:
+    NOT_ALIASES = {'ON', 'USING', 'WHERE', 'SET', 'LEFT', 'RIGHT', 'INNER', 'OUTER',
+                   'CROSS', 'NATURAL', 'JOIN', 'STRAIGHT_JOIN', 'GROUP', 'ORDER',
+                   'LIMIT', 'HAVING', 'UNION', 'FOR', 'LOCK', 'WINDOW', 'PARTITION',
+                   'USE', 'IGNORE', 'FORCE', 'INTO', 'VALUES', 'SELECT', 'LIKE',
+                   'AS', 'TO', 'FROM'}
+
+    # Words before '(' that open a subquery or
+    # grouping, rather than a function call:
+    GROUPING_WORDS = {'IN', 'EXISTS', 'FROM', 'JOIN', 'AS', 'ON', 'ANY', 'ALL', 'SOME',
+                      'SELECT', 'WHERE', 'AND', 'OR', 'NOT', 'UNION', 'USING', 'SET',
+                      'INTO', 'TABLE', 'HAVING', 'WHEN', 'THEN', 'ELSE', 'LATERAL'}
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, default_db=None):
+        '''
+        @param default_db: database of unqualified table names
+            before the first USE statement
+        @type default_db: {None | str}
+        '''
+        self.default_db = default_db
+
+    #-------------------------
+    # extract_refs
+    #--------------
+
+    def extract_refs(self, sql_text):
+        '''
+        Return all table references of a script.
+
+        @param sql_text: SQL script
+        @type sql_text: str
+        @return: list of TableRef, in the order of their appearance
+        @rtype: [TableRef]
+        '''
+        return [ref for statement in self.extract(sql_text) for ref in statement.refs]
+
+    #-------------------------
+    # extract
+    #--------------
+
+    def extract(self, sql_text):
+        '''
+        Analyze a script statement by statement.
+
+        @param sql_text: SQL script
+        @type sql_text: str
+        @return: one SqlStatement per non-empty statement
+        @rtype: [SqlStatement]
+        '''
+        self.curr_db = self.default_db
+        statements   = []
+        tokens       = []
+        for token in SqlTokenizer.tokenize(sql_text):
+            if token == ('punct', ';'):
+                if len(tokens) > 0:
+                    statements.append(self.analyze_statement(tokens, len(statements)))
+                tokens = []
+            else:
+                tokens.append(token)
+        if len(tokens) > 0:
+            statements.append(self.analyze_statement(tokens, len(statements)))
+        return statements
+
+    #-------------------------
+    # analyze_statement
+    #--------------
+
+    def analyze_statement(self, tokens, statement_num):
+        '''
+        Find the table references in one statement.
+        Updates self.curr_db when the statement is a USE.
+
+        @param tokens: the statement's tokens, without the
+            terminating semicolon
+        @type tokens: [(str, <any>)]
+        @param statement_num: position of the statement in the script
+        @type statement_num: int
+        @return: what was learned about the statement
+        @rtype: SqlStatement
+        '''
+        self.statement = SqlStatement(statement_num)
+        self.tokens    = tokens
+
+        first_word = self.keyword_at(0)
+
+        # Index where generic FROM/JOIN scanning starts;
+        # the statement specific handlers may skip past
+        # the tokens they consumed:
+        pos = 0
+
+        if first_word == 'USE':
+            parts = self.name_at(1)
+            if parts is not None:
+                self.curr_db = parts[0]
+            return self.statement
+
+        elif first_word == 'CALL':
+            self.handle_call()
+            return self.statement
+
+        elif first_word == 'CREATE':
+            pos = self.handle_create()
+
+        elif first_word == 'DROP':
+            pos = self.handle_drop()
+
+        elif first_word in ('ALTER', 'TRUNCATE'):
+            pos = self.skip_keywords(1, ('TABLE', 'IGNORE', 'ONLINE'))
+            pos = self.add_table_at(pos, 'written')
+
+        elif first_word == 'RENAME':
+            pos = self.skip_keywords(1, ('TABLE', 'TABLES'))
+            while pos < len(tokens):
+                pos = self.add_table_at(pos, 'written')
+                if self.keyword_at(pos) in ('TO', ',') :
+                    pos += 1
+                else:
+                    break
+
+        elif first_word in ('INSERT', 'REPLACE'):
+            pos = self.skip_keywords(1, ('LOW_PRIORITY', 'DELAYED', 'HIGH_PRIORITY', 'IGNORE', 'INTO'))
+            pos = self.add_table_at(pos, 'written')
+
+        elif first_word == 'UPDATE':
+            pos = self.skip_keywords(1, ('LOW_PRIORITY', 'IGNORE'))
+            pos = self.add_table_list_at(pos, 'written')
+
+        elif first_word == 'DELETE':
+            pos = self.skip_keywords(1, ('LOW_PRIORITY', 'QUICK', 'IGNORE'))
+            if self.keyword_at(pos) == 'FROM':
+                # Single table DELETE FROM t:
+                pos = self.add_table_list_at(pos + 1, 'written')
+            else:
+                # Multi table: DELETE t1, t2 FROM t1 JOIN ...;
+                # The FROM tables are read by the generic scan:
+                while self.name_at(pos) is not None:
+                    self.add_ref(self.name_at(pos), 'written')
+                    pos += 1
+                    if self.keyword_at(pos) != ',':
+                        break
+                    pos += 1
+
+        elif first_word == 'LOAD':
+            while pos < len(tokens) - 2:
+                if self.keyword_at(pos) == 'INTO' and self.keyword_at(pos + 1) == 'TABLE':
+                    pos = self.add_table_at(pos + 2, 'written')
+                    break
+                pos += 1
+
+        self.scan_from_and_join(pos)
+        return self.statement
+
+    #-------------------------
+    # handle_call
+    #--------------
+
+    def handle_call(self):
+        '''
+        Handle CALL statements: calls to the index procedures
+        of canvasMysqlProcs.sql name the table whose index
+        they manage.
+        '''
+        proc_parts = self.name_at(1)
+        if proc_parts is None:
+            return
+        table_arg_pos = SqlDependencyExtractor.INDEX_PROCS.get(proc_parts[-1].lower(), None)
+        if table_arg_pos is None or self.keyword_at(2) != '(':
+            return
+
+        # Collect the top level arguments:
+        args  = [[]]
+        depth = 0
+        for token in self.tokens[3:]:
+            if token == ('punct', '(') :
+                depth += 1
+            elif token == ('punct', ')'):
+                if depth == 0:
+                    break
+                depth -= 1
+            elif token == ('punct', ',') and depth == 0:
+                args.append([])
+                continue
+            args[-1].append(token)
+
+        if table_arg_pos >= len(args) or len(args[table_arg_pos]) != 1:
+            return
+        (kind, value) = args[table_arg_pos][0]
+        if kind == 'string':
+            self.add_ref(value.split('.'), 'index_target')
+        elif kind == 'name':
+            self.add_ref(value, 'index_target')
+
+    #-------------------------
+    # handle_create
+    #--------------
+
+    def handle_create(self):
+        '''
+        Handle CREATE TABLE/VIEW and CREATE INDEX.
+
+        @return: position from which to scan for FROM/JOIN
+        @rtype: int
+        '''
+        pos  = self.skip_keywords(1, ('TEMPORARY', 'OR', 'REPLACE', 'UNIQUE', 'FULLTEXT', 'SPATIAL'))
+        what = self.keyword_at(pos)
+        if what in ('TABLE', 'VIEW'):
+            pos = self.skip_keywords(pos + 1, ('IF', 'NOT', 'EXISTS'))
+            pos = self.add_table_at(pos, 'written')
+            # CREATE TABLE t LIKE t2 and CREATE TABLE t (LIKE t2):
+            like_pos = pos + 1 if self.keyword_at(pos) == '(' else pos
+            if self.keyword_at(like_pos) == 'LIKE':
+                pos = self.add_table_at(like_pos + 1, 'read')
+        elif what == 'INDEX':
+            # CREATE INDEX i ON t(...):
+            if self.keyword_at(pos + 2) == 'ON':
+                pos = self.add_table_at(pos + 3, 'index_target')
+        return pos
+
+    #-------------------------
+    # handle_drop
+    #--------------
+
+    def handle_drop(self):
+        '''
+        Handle DROP TABLE and DROP INDEX.
+
+        @return: position from which to scan for FROM/JOIN
+        @rtype: int
+        '''
+        pos  = self.skip_keywords(1, ('TEMPORARY',))
+        what = self.keyword_at(pos)
+        if what in ('TABLE', 'TABLES', 'VIEW'):
+            pos = self.skip_keywords(pos + 1, ('IF', 'EXISTS'))
+            while self.name_at(pos) is not None:
+                self.add_ref(self.name_at(pos), 'written')
+                pos += 1
+                if self.keyword_at(pos) != ',':
+                    break
+                pos += 1
+        elif what == 'INDEX':
+            if self.keyword_at(pos + 2) == 'ON':
+                pos = self.add_table_at(pos + 3, 'index_target')
+        return pos
+
+    #-------------------------
+    # scan_from_and_join
+    #--------------
+
+    def scan_from_and_join(self, pos):
+        '''
+        From pos to the end of the statement, record tables
+        after FROM and JOIN as read. Also collect dotted
+        names that are not in table positions.
+
+        @param pos: index of first token to scan
+        @type pos: int
+        '''
+        tokens = self.tokens
+        # Stack of open parens; True for a function call's
+        # parens, False for subqueries and groupings:
+        paren_stack = []
+
+        while pos < len(tokens):
+            (kind, value) = tokens[pos]
+            if kind == 'punct':
+                if value == '(':
+                    prev_word = self.keyword_at(pos - 1) if pos > 0 else None
+                    is_func = tokens[pos - 1][0] == 'name' and \
+                              prev_word not in SqlDependencyExtractor.GROUPING_WORDS \
+                              if pos > 0 else False
+                    paren_stack.append(is_func)
+                elif value == ')' and len(paren_stack) > 0:
+                    paren_stack.pop()
+                pos += 1
+                continue
+
+            if kind != 'name':
+                pos += 1
+                continue
+
+            in_func = len(paren_stack) > 0 and paren_stack[-1]
+            word    = value[0].upper() if len(value) == 1 else None
+            if word == 'FROM' and not in_func:
+                pos = self.add_table_list_at(pos + 1, 'read')
+            elif word in ('JOIN', 'STRAIGHT_JOIN') and not in_func:
+                pos = self.add_table_at(pos + 1, 'read')
+            else:
+                if len(value) > 1:
+                    self.statement.qualified_names.append(value)
+                pos += 1
+
+    #-------------------------
+    # add_table_list_at
+    #--------------
+
+    def add_table_list_at(self, pos, role):
+        '''
+        Record a comma separated list of tables, each
+        with optional alias, as in FROM t1 a, t2 AS b.
+
+        @return: position after the list
+        @rtype: int
+        '''
+        pos = self.add_table_at(pos, role)
+        while self.keyword_at(pos) == ',' and self.name_at(pos + 1) is not None:
+            pos = self.add_table_at(pos + 1, role)
+        return pos
+
+    #-------------------------
+    # add_table_at
+    #--------------
+
+    def add_table_at(self, pos, role):
+        '''
+        If the token at pos is a name, record it as a
+        table with the given role. An alias that follows
+        is recorded as well.
+
+        @return: position after the table name and alias
+        @rtype: int
+        '''
+        parts = self.name_at(pos)
+        if parts is None:
+            # E.g. a subquery: FROM (SELECT ...
+            return pos
+        table_key = self.add_ref(parts, role)
+        pos += 1
+
+        # Optional alias, with or without AS:
+        if self.keyword_at(pos) == 'AS':
+            pos += 1
+        alias_parts = self.name_at(pos)
+        if alias_parts is not None and len(alias_parts) == 1 and \
+            alias_parts[0].upper() not in SqlDependencyExtractor.NOT_ALIASES:
+            self.statement.aliases[alias_parts[0]] = table_key
+            pos += 1
+        return pos
+
+    #-------------------------
+    # add_ref
+    #--------------
+
+    def add_ref(self, parts, role):
+        '''
+        Record a table reference given the parts of
+        its name: ['t'] or ['db', 't'].
+
+        @return: the (db, table) tuple that was recorded
+        @rtype: (str, str)
+        '''
+        if len(parts) >= 2:
+            (db, table) = (parts[-2], parts[-1])
+        else:
+            (db, table) = (self.curr_db, parts[0])
+        self.statement.refs.append(TableRef(db, table, role, self.statement.statement_num))
+        return (db, table)
+
+    #-------------------------
+    # name_at
+    #--------------
+
+    def name_at(self, pos):
+        '''
+        Return the name parts of the token at pos if it
+        is a name, else None.
+        '''
+        if pos < len(self.tokens) and self.tokens[pos][0] == 'name':
+            return self.tokens[pos][1]
+        return None
+
+    #-------------------------
+    # keyword_at
+    #--------------
+
+    def keyword_at(self, pos):
+        '''
+        Return the upper case word at pos if it is an
+        undotted name, the character if it is punctuation,
+        else None.
+        '''
+        if pos >= len(self.tokens):
+            return None
+        (kind, value) = self.tokens[pos]
+        if kind == 'name' and len(value) == 1:
+            return value[0].upper()
+        if kind == 'punct':
+            return value
+        return None
+
+    #-------------------------
+    # skip_keywords
+    #--------------
+
+    def skip_keywords(self, pos, keywords):
+        '''
+        Advance pos past any of the given keywords.
+        '''
+        while self.keyword_at(pos) in keywords:
+            pos += 1
+        return pos
@@ -0,0 +1,458 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import marshal
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+
+class StageStats(object):
+    '''
+    Time and profile data collected for one stage.
+    '''
+
+    def __init__(self, stage_name):
+        self.stage_name = stage_name
+        self.entries    = 0
+        self.wall_secs  = 0.0
+        self.cpu_secs   = 0.0
+        self.child_cpu_secs = 0.0
+        # Only used in cprofile mode:
+        self.profile = None
+        # Sampled stacks, root first: {((file, line, function), ...) : count}
+        self.stacks  = Counter()
+        # Wall clock seconds covered by the samples:
+        self.sampled_secs = 0.0
+
+    #-------------------------
+    # waiting_secs
+    #--------------
+
+    @property
+    def waiting_secs(self):
+        '''
+        Wall clock time in which neither this process nor
+        its child processes computed, such as time spent
+        waiting for MySQL.
+        '''
+        return max(0.0, self.wall_secs - self.cpu_secs - self.child_cpu_secs)
+
+
+# -------------------------- Class StackSampler ---------------
+
+class StackSampler(threading.Thread):
+    '''
+    Thread that periodically records the call stack of
+    another thread, attributing each sample to the stage
+    that is current in the StageProfiler. Sampling costs
+    little and sees time spent in C calls, such as waiting
+    on a socket for MySQL, which is what the collapsed
+    stacks for flame graphs are made of.
+    '''
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, profiler, thread_id, interval):
+        super().__init__(name='StackSampler', daemon=True)
+        self.profiler  = profiler
+        self.thread_id = thread_id
+        self.interval  = interval
+        self.stopped   = threading.Event()
+
+    #-------------------------
+    # run
+    #--------------
+
+    def run(self):
+        # The thread often wakes up later than asked, so
+        # samples are weighted by the time since the last one:
+        last_sample = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            (elapsed, last_sample) = (now - last_sample, now)
+            stage_stats = self.profiler.current_stats
+            if stage_stats is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if len(stack) > 0:
+                stage_stats.stacks[tuple(reversed(stack))] += 1
+                stage_stats.sampled_secs += elapsed
+
+    #-------------------------
+    # stop
+    #--------------
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# -------------------------- Class StageProfiler ---------------
+
+class StageProfiler(object):
+    '''
+    Profiling of the stages of one program run, switched on
+    with the --profile option that add_arguments() adds to
+    a program's command line:
+
+        parser = argparse.ArgumentParser(...)
+        StageProfiler.add_arguments(parser)
+        args = parser.parse_args()
+        profiler = StageProfiler.from_args(parser.prog, args)
+        ...
+        with StageProfiler.stage('create_tables'):
+            ...
+        ...
+        if profiler is not None:
+            profiler.finish()
+
+    Without --profile, StageProfiler.stage() does nothing, so
+    code can mark its stages unconditionally.
+
+    A stage may be entered many times, such as once per table;
+    its times and profiles accumulate. When stages are nested,
+    time goes to the innermost one. Only the thread and process
+    that created the profiler are profiled; in worker threads
+    and processes, stage() does nothing.
+
+    Profilers:
+
+       o cprofile: each stage is profiled with its own
+         cProfile.Profile, which counts every call, and the
+         call stack is sampled for flame graphs.
+       o sample: only the call stack is sampled. Costs less,
+         and does not slow down call-heavy code such as row
+         formatting. The .pstats are derived from the samples,
+         so call counts are sample counts.
+
+    For each stage, finish() writes into
+
+        <profile root>/<program>_<date>_<time>/
+
+    a <stage>.pstats file for pstats or snakeviz, and a
+    <stage>.collapsed file of 'frame;frame;frame count' lines
+    for flamegraph.pl or speedscope. Then it prints, and writes
+    to summary.txt, each stage's wall clock and CPU seconds.
+    '''
+
+    PROFILERS = ['cprofile', 'sample']
+
+    # Default: next to the cron logs:
+    PROFILE_ROOT = Path(Path.home(), 'cronlogs', 'profiles')
+
+    SAMPLE_INTERVAL = 0.005
+
+    # The profiler of this run, if profiling:
+    _active = None
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, prog_name, profiler='cprofile', profile_root=None, sample_interval=None):
+        '''
+        @param prog_name: name of the profiled program, such
+            as canvas_prep.py
+        @type prog_name: str
+        @param profiler: one of PROFILERS
+        @type profiler: str
+        @param profile_root: directory under which each run's
+            profiles go. Default: PROFILE_ROOT
+        @type profile_root: str
+        @param sample_interval: seconds between stack samples
+        @type sample_interval: float
+        '''
+        if profiler not in StageProfiler.PROFILERS:
+            raise ValueError(f"Profiler must be one of {StageProfiler.PROFILERS}, not '{profiler}'")
+        self.prog_name = prog_name
+        self.profiler  = profiler
+        profile_root   = StageProfiler.PROFILE_ROOT if profile_root is None else profile_root
+        run_name = f"{os.path.splitext(prog_name)[0]}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+        self.out_dir = os.path.join(profile_root, run_name)
+        self.sample_interval = StageProfiler.SAMPLE_INTERVAL if sample_interval is None else sample_interval
+
+        self.pid       = os.getpid()
+        self.thread_id = threading.get_ident()
+        self.stages    = OrderedDict()
+        # Stages entered and not yet exited, innermost last:
+        self.stage_stack   = []
+        self.current_stats = None
+        self.start_wall    = time.perf_counter()
+        self.last_switch   = self.clock()
+
+        self.sampler = StackSampler(self, self.thread_id, self.sample_interval)
+        self.sampler.start()
+        StageProfiler._active = self
+
+    #-------------------------
+    # add_arguments
+    #--------------
+
+    @staticmethod
+    def add_arguments(parser):
+        '''
+        Add the profiling options to a program's
+        argparse parser.
+        '''
+        parser.add_argument('--profile',
+                            help="profile each stage of the run; write .pstats and collapsed\n" +
+                                 "stacks, and print wall clock vs. CPU time per stage",
+                            action='store_true',
+                            default=False)
+        parser.add_argument('--profiler',
+                            choices=StageProfiler.PROFILERS,
+                            help="with --profile: 'cprofile' counts every call; 'sample' only\n" +
+                                 "samples call stacks, which costs less. Default: 'cprofile'",
+                            default='cprofile')
+        parser.add_argument('--profiledir',
+                            help="with --profile: directory for the profiles.\n" +
+                                 f"Default: {StageProfiler.PROFILE_ROOT}",
+                            default=None)
+
+    #-------------------------
+    # from_args
+    #--------------
+
+    @classmethod
+    def from_args(cls, prog_name, args):
+        '''
+        Start profiling if the command line asks for it.
+
+        @param prog_name: name of the program
+        @type prog_name: str
+        @param args: parsed command line, with the options
+            of add_arguments()
+        @type args: argparse.Namespace
+        @return: the run's profiler, or None if not profiling
+        @rtype: {None | StageProfiler}
+        '''
+        if not args.profile:
+            return None
+        return cls(prog_name, profiler=args.profiler, profile_root=args.profiledir)
+
+    #-------------------------
+    # stage
+    #--------------
+
+    @classmethod
+    @contextmanager
+    def stage(cls, stage_name):
+        '''
+        Context manager that attributes the time spent
+        in its body to the given stage.
+        '''
+        profiler = cls._active
+        if profiler is None or not profiler.in_profiled_thread():
+            yield
+            return
+        profiler.enter(stage_name)
+        try:
+            yield
+        finally:
+            profiler.exit()
+
+    #-------------------------
+    # enter
+    #--------------
+
+    def enter(self, stage_name):
+        self.switch_to(self.stages.setdefault(stage_name, StageStats(stage_name)))
+        self.current_stats.entries += 1
+        self.stage_stack.append(self.current_stats)
+
+    #-------------------------
+    # exit
+    #--------------
+
+    def exit(self):
+        self.stage_stack.pop()
+        self.switch_to(self.stage_stack[-1] if len(self.stage_stack) > 0 else None)
+
+    #-------------------------
+    # switch_to
+    #--------------
+
+    def switch_to(self, stage_stats):
+        '''
+        Charge the time since the last switch to the
+        current stage, and make stage_stats current.
+
+        @param stage_stats: stage to make current, or None
+        @type stage_stats: {None | StageStats}
+        '''
+        now = self.clock()
+        current = self.current_stats
+        if current is not None:
+            if current.profile is not None:
+                current.profile.disable()
+            current.wall_secs      += now[0] - self.last_switch[0]
+            current.cpu_secs       += now[1] - self.last_switch[1]
+            current.child_cpu_secs += now[2] - self.last_switch[2]
+        self.last_switch   = now
+        self.current_stats = stage_stats
+        if stage_stats is not None and self.profiler == 'cprofile':
+            if stage_stats.profile is None:
+                stage_stats.profile = cProfile.Profile()
+            stage_stats.profile.enable()
+
+    #-------------------------
+    # finish
+    #--------------
+
+    def finish(self, out_fd=sys.stderr):
+        '''
+        Stop profiling, write each stage's profiles, and
+        print the time summary.
+
+        @param out_fd: where to print the summary. Stderr by
+            default, since some programs write results to stdout.
+        @type out_fd: file
+        @return: directory with the profiles
+        @rtype: str
+        '''
+        while len(self.stage_stack) > 0:
+            self.exit()
+        self.sampler.stop()
+        StageProfiler._active = None
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        for stage_stats in self.stages.values():
+            pstats_path = os.path.join(self.out_dir, stage_stats.stage_name + '.pstats')
+            if stage_stats.profile is not None:
+                stage_stats.profile.dump_stats(pstats_path)
+            else:
+                with open(pstats_path, 'wb') as fd:
+                    marshal.dump(self.stats_from_samples(stage_stats), fd)
+            with open(os.path.join(self.out_dir, stage_stats.stage_name + '.collapsed'), 'w') as fd:
+                fd.write(self.collapsed_stacks(stage_stats.stacks))
+
+        summary = self.summary()
+        with open(os.path.join(self.out_dir, 'summary.txt'), 'w') as fd:
+            fd.write(summary)
+        out_fd.write(summary)
+        return self.out_dir
+
+    #-------------------------
+    # summary
+    #--------------
+
+    def summary(self):
+        '''
+        Table of wall clock, CPU, and waiting time per stage.
+        Child CPU is that of finished child processes, such
+        as the mysql client.
+        '''
+        total_wall = time.perf_counter() - self.start_wall
+        text  = f"Profile of {self.prog_name} ({self.profiler}) in {self.out_dir}:\n"
+        text += f"{'Stage':<28}{'Entries':>8}{'Wall secs':>12}{'CPU secs':>12}" + \
+                f"{'Child CPU':>12}{'Waiting':>12}{'Waiting %':>10}\n"
+        for stage_stats in self.stages.values():
+            waiting_pct = 100 * stage_stats.waiting_secs / stage_stats.wall_secs if stage_stats.wall_secs > 0 else 0
+            text += f"{stage_stats.stage_name:<28}{stage_stats.entries:>8}{stage_stats.wall_secs:>12.2f}" + \
+                    f"{stage_stats.cpu_secs:>12.2f}{stage_stats.child_cpu_secs:>12.2f}" + \
+                    f"{stage_stats.waiting_secs:>12.2f}{waiting_pct:>9.0f}%\n"
+        outside = total_wall - sum([stage_stats.wall_secs for stage_stats in self.stages.values()])
+        text += f"{'(outside of stages)':<28}{'':>8}{outside:>12.2f}\n"
+        text += f"{'Total':<28}{'':>8}{total_wall:>12.2f}\n"
+        return text
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # in_profiled_thread
+    #--------------
+
+    def in_profiled_thread(self):
+        return os.getpid() == self.pid and threading.get_ident() == self.thread_id
+
+    #-------------------------
+    # clock
+    #--------------
+
+    @staticmethod
+    def clock():
+        '''
+        @return: wall clock seconds, CPU seconds of this
+            process, and CPU seconds of its finished children
+        @rtype: (float, float, float)
+        '''
+        times = os.times()
+        return (time.perf_counter(), time.process_time(), times.children_user + times.children_system)
+
+    #-------------------------
+    # collapsed_stacks
+    #--------------
+
+    @staticmethod
+    def collapsed_stacks(stacks):
+        '''
+        Sampled stacks in the format of flamegraph.pl's
+        stackcollapse scripts, most frequent first:
+
+            canvas_prep.py:run;canvas_prep.py:create_tables;... 1234
+        '''
+        collapsed = Counter()
+        for (stack, count) in stacks.items():
+            frames = [f"{os.path.basename(file_name)}:{func_name}".replace(' ', '_').replace(';', ':')
+                      for (file_name, _line, func_name) in stack]
+            collapsed[';'.join(frames)] += count
+        return ''.join([f"{frames} {count}\n" for (frames, count) in collapsed.most_common()])
+
+    #-------------------------
+    # stats_from_samples
+    #--------------
+
+    @staticmethod
+    def stats_from_samples(stage_stats):
+        '''
+        Profile in the format that pstats.Stats loads, derived
+        from a stage's sampled stacks: a function's own time is
+        the time of the samples in which it was innermost, its
+        cumulative time that of the samples in which it appears
+        at all.
+
+        @return: {(file, line, function) :
+                     (calls, primitive calls, own secs, cumulative secs,
+                      {caller : (calls, primitive calls, own secs, cumulative secs)})}
+        @rtype: {(str, int, str) : (int, int, float, float, {(str, int, str) : (int, int, float, float)})}
+        '''
+        num_samples = sum(stage_stats.stacks.values())
+        secs_per_sample = stage_stats.sampled_secs / num_samples if num_samples > 0 else 0.0
+        stats = {}
+        for (stack, count) in stage_stats.stacks.items():
+            secs = count * secs_per_sample
+            seen = set()
+            for (depth, func) in enumerate(stack):
+                entry = stats.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                is_leaf = depth == len(stack) - 1
+                if func not in seen:
+                    seen.add(func)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += secs
+                if is_leaf:
+                    entry[2] += secs
+                if depth > 0:
+                    edge = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                    edge[0] += count
+                    edge[1] += count
+                    edge[2] += secs if is_leaf else 0.0
+                    edge[3] += secs
+        return {func : (entry[0], entry[1], entry[2], entry[3],
+                        {caller : tuple(edge) for (caller, edge) in entry[4].items()})
+                for (func, entry) in stats.items()}
@@ -0,0 +1,86 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from atomic_file import atomic_write
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class AtomicFileTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tmp_dir = tempfile.mkdtemp(prefix='atomic_file_test')
+        self.path    = os.path.join(self.tmp_dir, 'export_manifest.json')
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tmp_dir)
+
+    #-------------------------
+    # testReplace
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testReplace(self):
+        atomic_write(self.path, 'old')
+        atomic_write(self.path, 'new\n')
+        with open(self.path, 'r') as fd:
+            self.assertEqual(fd.read(), 'new\n')
+        # No temporary file is left behind:
+        self.assertEqual(os.listdir(self.tmp_dir), ['export_manifest.json'])
+
+    #-------------------------
+    # testFailedWrite
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testFailedWrite(self):
+        atomic_write(self.path, 'old')
+        with self.assertRaises(TypeError):
+            atomic_write(self.path, None)
+        # The old content survives, and the partial file is gone:
+        with open(self.path, 'r') as fd:
+            self.assertEqual(fd.read(), 'old')
+        self.assertEqual(os.listdir(self.tmp_dir), ['export_manifest.json'])
+
+        with self.assertRaises(IOError):
+            atomic_write(os.path.join(self.tmp_dir, 'no_such_dir', 'file.json'), 'text')
+
+    #-------------------------
+    # testConcurrentWriters
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testConcurrentWriters(self):
+        texts = [str(num) * 100000 for num in range(8)]
+        writers = [threading.Thread(target=atomic_write, args=(self.path, text)) for text in texts]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        # One writer's complete content, not a mix:
+        with open(self.path, 'r') as fd:
+            self.assertIn(fd.read(), texts)
+        self.assertEqual(os.listdir(self.tmp_dir), ['export_manifest.json'])
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,175 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from backup_archive import BackupArchive
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class BackupArchiveTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp(prefix='backup_archive_test')
+        self.table_name  = 'Terms_2019_01_10_14_14_40_123456'
+        self.create_stmt = f"CREATE TABLE `{self.table_name}` (\n  `term_id` bigint DEFAULT NULL,\n  `term_name` varchar(255)\n) ENGINE=MyISAM"
+        self.col_names   = ['term_id', 'term_name', 'start_date']
+        self.col_types   = ['bigint', 'varchar', 'datetime']
+        self.rows = [(1, 'Fall 2019', datetime.datetime(2019, 9, 23, 8, 0)),
+                     (2, 'Tab\there', None),
+                     (3, None, datetime.datetime(2020, 1, 6))
+                     ]
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    #-------------------------
+    # testWriteAndRead
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testWriteAndRead(self):
+        archive = BackupArchive.write(self.archive_dir,
+                                      self.table_name,
+                                      self.create_stmt,
+                                      self.col_names,
+                                      self.col_types,
+                                      iter(self.rows),
+                                      db_schema='canvasdata_aux')
+        self.assertEqual(archive.archive_path, os.path.join(self.archive_dir, self.table_name))
+        self.assertEqual(archive.num_rows, 3)
+        self.assertTrue(archive.verify())
+
+        # Re-open from disk:
+        archive = BackupArchive(archive.archive_path)
+        self.assertEqual(archive.table_name, self.table_name)
+        self.assertEqual(archive.col_names, self.col_names)
+        self.assertEqual(archive.manifest['db_schema'], 'canvasdata_aux')
+
+        # NULL as \N, escapes as LOAD DATA expects them:
+        with archive.data_stream() as fd:
+            self.assertEqual(fd.read(),
+                             b'1\tFall 2019\t2019-09-23 08:00:00\n' +
+                             b'2\tTab\\there\t\\N\n' +
+                             b'3\t\\N\t2020-01-06 00:00:00\n')
+
+        self.assertEqual(archive.create_statement(),
+                         self.create_stmt + ';\n')
+        self.assertTrue(archive.create_statement('Unittest').startswith(
+            f"CREATE TABLE `Unittest`.`{self.table_name}` ("))
+
+        self.assertEqual(BackupArchive.list_archives(self.archive_dir), [archive.archive_path])
+
+    #-------------------------
+    # testRefuseOverwrite
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRefuseOverwrite(self):
+        BackupArchive.write(self.archive_dir, self.table_name, self.create_stmt,
+                            self.col_names, self.col_types, self.rows)
+        with self.assertRaises(FileExistsError):
+            BackupArchive.write(self.archive_dir, self.table_name, self.create_stmt,
+                                self.col_names, self.col_types, self.rows)
+
+    #-------------------------
+    # testFailedWriteLeavesNoArchive
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testFailedWriteLeavesNoArchive(self):
+        def failing_rows():
+            yield self.rows[0]
+            raise RuntimeError("Connection lost")
+        with self.assertRaises(RuntimeError):
+            BackupArchive.write(self.archive_dir, self.table_name, self.create_stmt,
+                                self.col_names, self.col_types, failing_rows())
+        self.assertEqual(os.listdir(self.archive_dir), [])
+        with self.assertRaises(ValueError):
+            BackupArchive(os.path.join(self.archive_dir, self.table_name))
+
+    #-------------------------
+    # testVerify
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testVerify(self):
+        archive = BackupArchive.write(self.archive_dir, self.table_name, self.create_stmt,
+                                      self.col_names, self.col_types, self.rows)
+        with gzip.open(archive.data_path, 'wb') as fd:
+            fd.write(b'1\tTampered\t\\N\n')
+        self.assertFalse(archive.verify())
+
+    #-------------------------
+    # testLoadStatement
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testLoadStatement(self):
+        archive = BackupArchive.write(self.archive_dir, self.table_name, self.create_stmt,
+                                      self.col_names, self.col_types, self.rows)
+        self.assertEqual(archive.load_statement('Unittest'),
+                         f"LOAD DATA LOCAL INFILE '/dev/stdin' " +
+                         f"INTO TABLE `Unittest`.`{self.table_name}` " +
+                         "CHARACTER SET utf8mb4 " +
+                         "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' " +
+                         "LINES TERMINATED BY '\\n' " +
+                         "(`term_id`, `term_name`, `start_date`);")
+
+    #-------------------------
+    # testBinaryAndSessionSettings
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testBinaryAndSessionSettings(self):
+        session_settings = ['SET @@session.time_zone = "+00:00"',
+                            'SET sql_mode="STRICT_TRANS_TABLES"'
+                            ]
+        rows = [(1, b'\x00\xff\t\n\\'),
+                (2, None),
+                (3, b'')
+                ]
+        archive = BackupArchive.write(self.archive_dir, self.table_name, self.create_stmt,
+                                      ['term_id', 'digest'], ['bigint', 'varbinary'], rows,
+                                      session_settings=session_settings)
+        self.assertEqual(archive.manifest['hex_columns'], ['digest'])
+        # Binary values as hex, so no byte is lost:
+        with archive.data_stream() as fd:
+            self.assertEqual(fd.read(),
+                             b'1\t00ff090a5c\n' +
+                             b'2\t\\N\n' +
+                             b'3\t\n')
+        self.assertEqual(bytes.fromhex('00ff090a5c'), rows[0][1])
+
+        self.assertEqual(archive.load_statement('Unittest'),
+                         'SET @@session.time_zone = "+00:00"; ' +
+                         'SET sql_mode="STRICT_TRANS_TABLES"; ' +
+                         f"LOAD DATA LOCAL INFILE '/dev/stdin' " +
+                         f"INTO TABLE `Unittest`.`{self.table_name}` " +
+                         "CHARACTER SET utf8mb4 " +
+                         "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' " +
+                         "LINES TERMINATED BY '\\n' " +
+                         "(`term_id`, @`digest`) SET `digest` = UNHEX(@`digest`);")
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,177 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import datetime
+import unittest
+
+from backup_catalog import BackupCatalog
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class BackupCatalogTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        self.roots = ['Terms', 'AssignmentSubmissions', 'Course_Sections']
+        self.table_names = ['Terms',
+                            'Terms_2019_01_10_14_14_40_123456',
+                            'Terms_2020_01_10_14_14_40_123456',
+                            'Terms_2018_01_10_14_14_40',
+                            'AssignmentSubmissions_2019_06_01_02_03_04_000001',
+                            'Course_Sections_2019_03_01_02_03_04_5',
+                            # Not an aux table:
+                            'Foo_2019_01_10_14_14_40_123456',
+                            # Not a date:
+                            'Terms_2019_13_10_14_14_40_123456',
+                            'LoadLog'
+                            ]
+        self.table_sizes = {table_name : 1000 for table_name in self.table_names}
+        self.table_sizes['Terms_2020_01_10_14_14_40_123456'] = 3000
+        self.catalog = BackupCatalog(self.roots, self.table_names, self.table_sizes)
+
+    #-------------------------
+    # testParseBackupName
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testParseBackupName(self):
+        self.assertEqual(BackupCatalog.parse_backup_name('Terms_2019_01_10_14_14_40_123456'),
+                         ('Terms', '2019_01_10_14_14_40_123456',
+                          datetime.datetime(2019, 1, 10, 14, 14, 40, 123456)))
+        # No sub-seconds:
+        self.assertEqual(BackupCatalog.parse_backup_name('Terms_2019_01_10_14_14_40'),
+                         ('Terms', '2019_01_10_14_14_40',
+                          datetime.datetime(2019, 1, 10, 14, 14, 40)))
+        # Short sub-seconds are read like strptime's %f:
+        self.assertEqual(BackupCatalog.parse_backup_name('Course_Sections_2019_03_01_02_03_04_5')[2],
+                         datetime.datetime(2019, 3, 1, 2, 3, 4, 500000))
+        self.assertIsNone(BackupCatalog.parse_backup_name('Terms'))
+        self.assertIsNone(BackupCatalog.parse_backup_name('Terms_2019_13_10_14_14_40'))
+        self.assertIsNone(BackupCatalog.parse_backup_name('Foo_2019_01_10_14_14_40',
+                                                          root_names={'Terms'}))
+
+    #-------------------------
+    # testIndex
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testIndex(self):
+        self.assertEqual(len(self.catalog), 5)
+        self.assertEqual(sorted(self.catalog.roots),
+                         ['AssignmentSubmissions', 'Course_Sections', 'Terms'])
+        self.assertEqual(self.catalog.backups('Terms'),
+                         ['Terms_2020_01_10_14_14_40_123456',
+                          'Terms_2019_01_10_14_14_40_123456',
+                          'Terms_2018_01_10_14_14_40'])
+        self.assertEqual(self.catalog.backups('Courses'), [])
+        self.assertNotIn('Foo_2019_01_10_14_14_40_123456', self.catalog)
+        self.assertNotIn('Terms', self.catalog)
+
+    #-------------------------
+    # testLatest
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testLatest(self):
+        self.assertEqual(self.catalog.latest('Terms'), 'Terms_2020_01_10_14_14_40_123456')
+        self.assertEqual(self.catalog.latest('Course_Sections'), 'Course_Sections_2019_03_01_02_03_04_5')
+        self.assertIsNone(self.catalog.latest('Courses'))
+
+    #-------------------------
+    # testKeepN
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testKeepN(self):
+        self.assertEqual(self.catalog.keep_n('Terms', 1),
+                         (['Terms_2020_01_10_14_14_40_123456'],
+                          ['Terms_2019_01_10_14_14_40_123456',
+                           'Terms_2018_01_10_14_14_40']))
+        (keep, remove) = self.catalog.keep_n('Terms', 5)
+        self.assertEqual(len(keep), 3)
+        self.assertEqual(remove, [])
+        (keep, remove) = self.catalog.keep_n('Terms', 0)
+        self.assertEqual(keep, [])
+        self.assertEqual(len(remove), 3)
+
+    #-------------------------
+    # testOlderThan
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testOlderThan(self):
+        self.assertEqual(self.catalog.older_than(datetime.date(2019, 6, 1)),
+                         ['Terms_2018_01_10_14_14_40',
+                          'Terms_2019_01_10_14_14_40_123456',
+                          'Course_Sections_2019_03_01_02_03_04_5'])
+        # Cutoff is exclusive:
+        self.assertNotIn('AssignmentSubmissions_2019_06_01_02_03_04_000001',
+                         self.catalog.older_than(datetime.datetime(2019, 6, 1, 2, 3, 4, 1)))
+        self.assertEqual(self.catalog.older_than(datetime.date(2019, 6, 1), root='Terms'),
+                         ['Terms_2018_01_10_14_14_40',
+                          'Terms_2019_01_10_14_14_40_123456'])
+        self.assertEqual(self.catalog.older_than(datetime.date(2000, 1, 1)), [])
+
+    #-------------------------
+    # testRemove
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRemove(self):
+        self.catalog.remove('Terms_2020_01_10_14_14_40_123456')
+        self.assertEqual(self.catalog.latest('Terms'), 'Terms_2019_01_10_14_14_40_123456')
+        self.catalog.remove('Course_Sections_2019_03_01_02_03_04_5')
+        self.assertNotIn('Course_Sections', self.catalog.roots)
+        self.assertEqual(len(self.catalog), 3)
+        # Unknown names are ignored:
+        self.catalog.remove('Terms')
+
+    #-------------------------
+    # testSizes
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSizes(self):
+        self.assertEqual(self.catalog.size('Terms_2020_01_10_14_14_40_123456'), 3000)
+        self.assertEqual(self.catalog.size('NoSuchTable'), 0)
+        # Only backups count:
+        self.assertEqual(self.catalog.total_size(), 7000)
+        
+        # Newest Terms backup is 3000 bytes, others 1000:
+        self.assertEqual(self.catalog.keep_bytes('Terms', 4500),
+                         (['Terms_2020_01_10_14_14_40_123456',
+                           'Terms_2019_01_10_14_14_40_123456'],
+                          ['Terms_2018_01_10_14_14_40']))
+        self.assertEqual(self.catalog.keep_bytes('Terms', 10000)[1], [])
+        self.assertEqual(self.catalog.keep_bytes('Terms', 2000)[0], [])
+
+    #-------------------------
+    # testSchemaExcess
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSchemaExcess(self):
+        # Oldest go first, regardless of table:
+        self.assertEqual(self.catalog.schema_excess(5000),
+                         ['Terms_2018_01_10_14_14_40',
+                          'Terms_2019_01_10_14_14_40_123456'])
+        self.assertEqual(self.catalog.schema_excess(7000), [])
+        # Backups removed by other policies already free space:
+        self.assertEqual(self.catalog.schema_excess(5000, already_removed={'Terms_2020_01_10_14_14_40_123456'}),
+                         [])
+        self.assertEqual(self.catalog.schema_excess(4000, already_removed={'Terms_2018_01_10_14_14_40'}),
+                         ['Terms_2019_01_10_14_14_40_123456',
+                          'Course_Sections_2019_03_01_02_03_04_5'])
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
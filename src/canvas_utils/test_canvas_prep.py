@@ -453,6 +453,34 @@ class CanvasUtilsTests(unittest.TestCase):
         self.assertTrue(load_date == date_str_before or load_date == date_str_after)
         
         self.assertEqual(num_rows, 3)
+
+    #-------------------------
+    # testLoggedSizesCurrent 
+    #--------------
+        
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testLoggedSizesCurrent(self):
+        test_table_name = 'Terms'
+        db = self.prep_obj.db
+        self.removeAllUnittestTables(db)
+        (err, _warn) = db.execute(f"CREATE TABLE {test_table_name} (col1 varchar(100)) ENGINE=MyISAM;")
+        self.assertIsNone(err)
+        
+        # Have the server compute the statistics of the
+        # empty table, as a build's earlier look at it might:
+        stats_query = f'''SELECT data_length
+                           FROM information_schema.tables
+                          WHERE table_schema = '{self.db_schema}'
+                            AND table_name = '{test_table_name}'
+                       '''
+        self.assertEqual(db.query(stats_query).next(), 0)
+        
+        db.bulkInsert(test_table_name, ('col1',), [('x' * 100,) for _i in range(1000)])
+        (data_bytes, _index_bytes) = self.prep_obj.log_table_creation(test_table_name)
+        # Not the stale size of the empty table:
+        self.assertGreaterEqual(data_bytes, 100 * 1000)
+        res = db.query(f"SELECT data_bytes FROM {CanvasPrep.log_table_name} WHERE tbl_name = '{test_table_name}'")
+        self.assertEqual(res.next(), data_bytes)
                 
     
     # ------------------------------- Utilities -------------------------
@@ -548,6 +576,8 @@ class CanvasUtilsTests(unittest.TestCase):
         tbl_names = self.utils.get_tbl_names_in_schema(db, self.db_schema)
         for tbl_name in tbl_names:
             db.dropTable(tbl_name)
+        # Tables were dropped behind the metadata cache's back:
+        Utilities.schema_cache.invalidate(self.db_schema)
             
             
 if __name__ == "__main__":
@@ -5,6 +5,7 @@ Created on Aug 20, 2019
 '''
 import unittest
 
+from backup_catalog import BackupCatalog
 from clear_old_backups import BackupRemover
 from config_info import ConfigInfo
 from utilities import Utilities
@@ -132,6 +133,49 @@ class ClearBackupTablesTester(unittest.TestCase):
         table_names = self.utils.get_tbl_names_in_schema(self.db_obj, self.db_name)
         self.assertEqual(len(table_names), 4)
 
+    #-------------------------
+    # testPlanRemovals 
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testPlanRemovals(self):
+        all_tbls = ['Terms', 
+                    'Terms_2018_01_10_14_14_40_123456', 
+                    'Terms_2019_01_10_14_14_40_123456',
+                    'Terms_2020_01_10_14_14_40_123456',
+                    ]
+        sizes = {tbl_nm : 1000 for tbl_nm in all_tbls}
+        catalog = BackupCatalog(self.utils.tables, all_tbls, sizes)
+        try:
+            self.tbl_remover.num_to_keep = 2
+            self.tbl_remover.max_table_bytes  = None
+            self.tbl_remover.max_schema_bytes = 1000
+            removals = self.tbl_remover.plan_removals(catalog)
+            self.assertEqual(removals['count'], ['Terms_2018_01_10_14_14_40_123456'])
+            self.assertNotIn('table bytes', removals)
+            self.assertEqual(removals['schema bytes'], ['Terms_2018_01_10_14_14_40_123456',
+                                                        'Terms_2019_01_10_14_14_40_123456'])
+            # Oldest first:
+            self.assertEqual(removals['combined'], ['Terms_2018_01_10_14_14_40_123456',
+                                                    'Terms_2019_01_10_14_14_40_123456'])
+        finally:
+            self.tbl_remover.num_to_keep = ClearBackupTablesTester.num_to_keep
+            self.tbl_remover.max_schema_bytes = None
+
+    #-------------------------
+    # testBatchedDrop 
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testBatchedDrop(self):
+        self.removeAllUnittestTables(self.db_obj)
+        self.createTestDb()
+        num_dropped = self.tbl_remover.drop_tables(['Terms_2018_01_10_14_14_40_123456',
+                                                    'Terms_2019_01_10_14_14_40_123456'])
+        self.assertEqual(num_dropped, 2)
+        table_names = self.utils.get_tbl_names_in_schema(self.db_obj, self.db_name)
+        self.assertEqual(sorted(table_names), ['Terms', 'Terms_2020_01_10_14_14_40_123456'])
+
 # ------------------------- Utilities --------------------
 
     #-------------------------
@@ -149,6 +193,8 @@ class ClearBackupTablesTester(unittest.TestCase):
         tbl_names = self.get_tbl_names_in_schema(db, self.db_name)
         for tbl_name in tbl_names:
             db.dropTable(tbl_name)
+        # Tables were dropped behind the metadata cache's back:
+        Utilities.schema_cache.invalidate(self.db_name)
 
     #------------------------------------
     # get_tbl_names_in_schema 
@@ -6,7 +6,9 @@ TODO:
   o Add test for index on 'text'
 
 '''
+import argparse
 import os
+import queue
 import unittest
 
 from pymysql_utils.pymysql_utils import MySQLDB
@@ -14,6 +16,7 @@ from pymysql_utils.pymysql_utils import MySQLDB
 from config_info import ConfigInfo
 from copy_aux_tables import AuxTableCopier
 from copy_aux_tables import Schema
+from session_pool import SessionPool
 from unittest_db_finder import UnittestDbFinder
 from utilities import Utilities
 
@@ -429,6 +432,130 @@ class AuxTableCopyTester(unittest.TestCase):
 "'Text' galore","Lots of varchar","30.5"
 ''')
             
+    #-------------------------
+    # testCopyTablesAsBuilt 
+    #--------------
+    
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testCopyTablesAsBuilt(self):
+        
+        self.db.bulkInsert('Unittest', 
+                           ('var1', 'var2', 'var3'),
+                           [(10,20,'ten,twenty'),
+                            (30,40,'thirty/forty'),
+                            ]
+                           )
+        # Pretend a builder announced two tables, 
+        # and then the end of the build:
+        table_queue = queue.Queue()
+        table_queue.put('Unittest')
+        table_queue.put('Unittest1')
+        table_queue.put(None)
+        
+        copy_result = self.copier.copy_tables_as_built(table_queue)
+        self.assertEqual(copy_result.completed_tables, ['Unittest', 'Unittest1'])
+        self.assertIsNone(copy_result.errors)
+        self.assertTrue(table_queue.empty())
+        # The copier's own connection is still usable:
+        self.assertIs(self.copier.db, self.db)
+        self.assertEqual(self.copier.db.query("SELECT COUNT(*) FROM Unittest").next(), 2)
+
+    #-------------------------
+    # testSessionPoolFailure 
+    #--------------
+    
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSessionPoolFailure(self):
+        
+        def refuse_connection():
+            raise ConnectionRefusedError("Connection refused")
+        
+        pool = SessionPool(refuse_connection, size=1, max_retries=0)
+        one_result = self.copier.copy_with_session_pool(pool, 'Unittest')
+        self.assertEqual(one_result.completed_tables, [])
+        self.assertIn('Unittest', one_result.errors)
+        self.assertIn('Connection refused', one_result.errors['Unittest'])
+        self.assertIs(self.copier.db, self.db)
+        pool.close()
+
+    #-------------------------
+    # testTableBuiltAfterCacheLoad 
+    #--------------
+    
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTableBuiltAfterCacheLoad(self):
+        
+        # The exporter's cache is loaded while the builder
+        # is still working; Unittest2 does not exist yet:
+        self.assertEqual(len(self.utils.schema_cache.columns(self.db, self.db_name, 'Unittest')), 4)
+        self.db.execute("DROP TABLE IF EXISTS Unittest2")
+        self.db.execute("CREATE TABLE Unittest2 (var1 int, var2 varchar(30))")
+        
+        table_queue = queue.Queue()
+        table_queue.put('Unittest2')
+        table_queue.put(None)
+        copy_result = self.copier.copy_tables_as_built(table_queue)
+        self.assertEqual(copy_result.completed_tables, ['Unittest2'])
+        with open(os.path.join(self.copier.dest_dir, 'Unittest2.tsv'), 'r') as fd:
+            self.assertEqual(fd.readline(), 'var1\tvar2\n')
+        self.db.execute("DROP TABLE Unittest2")
+        self.utils.schema_cache.table_dropped(self.db_name, 'Unittest2')
+
+    #-------------------------
+    # testServerSideExport 
+    #--------------
+    
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testServerSideExport(self):
+        
+        if not self.copier.server_can_write_dest_dir():
+            self.skipTest(f"MySQL server cannot write to {self.copier.dest_dir}")
+            
+        self.db.bulkInsert('Unittest', 
+                           ('var1', 'var2', 'var3'),
+                           [(10,20,'ten,twenty'),
+                            (30,None,'thirty\tforty'),
+                            (50,60,'fifty\\sixty\nseventy'),
+                            ]
+                           )
+        schema = self.copier.populate_table_schema('Unittest')
+        dest_file = os.path.join(self.copier.dest_dir, 'Unittest.tsv')
+        self.assertEqual(self.copier.export_table_server_side(schema, dest_file), 3)
+        
+        with open(dest_file, 'r') as fd:
+            file_content = fd.read()
+        self.assertEqual(file_content,
+                         'id\tvar1\tvar2\tvar3\n' +
+                         '1\t10\t20\tten,twenty\n' +
+                         '2\t30\tNULL\tthirty\\tforty\n' +
+                         '3\t50\t60\tfifty\\\\sixty\\nseventy\n'
+                         )
+        # No raw newline splits a row:
+        self.assertEqual(len(file_content.splitlines()), 4)
+
+    #-------------------------
+    # testExportOptionsFromArgs 
+    #--------------
+    
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testExportOptionsFromArgs(self):
+        # As canvas_prep.py forwards them to its exporter:
+        parser = argparse.ArgumentParser()
+        parser.add_argument('-s', '--skipbackup', action='store_true')
+        AuxTableCopier.add_export_arguments(parser, short_options=False)
+        
+        args = parser.parse_args(['-s', '--serverexport', 'never', '--maxshardsize', '500M',
+                                  '--headerfirstonly', '--sanitize', '--nullas', ''])
+        self.assertEqual(AuxTableCopier.export_options_from_args(args),
+                         {'server_side_export'   : False,
+                          'python_export'        : False,
+                          'max_shard_size'       : '500M',
+                          'header_in_all_shards' : False,
+                          'sanitize_text'        : True,
+                          'null_replacement'     : ''
+                          })
+        self.assertIsNone(AuxTableCopier.export_options_from_args(parser.parse_args([]))['server_side_export'])
+
 # ----------------------------------- Utilities -------------
 
     #-------------------------
@@ -538,6 +665,8 @@ class AuxTableCopyTester(unittest.TestCase):
 						  KEY var2_idx (var2),
 						  KEY var3_idx (var3))       
                         ''')
+        # Tables are created behind the metadata cache's back:
+        self.utils.schema_cache.invalidate(self.db_name)
         
     #-------------------------
     # removeAllUnittestTables 
@@ -554,6 +683,8 @@ class AuxTableCopyTester(unittest.TestCase):
         tbl_names = self.utils.get_tbl_names_in_schema(db, self.db_name)
         for tbl_name in tbl_names:
             db.dropTable(tbl_name)
+        # Tables were dropped behind the metadata cache's back:
+        Utilities.schema_cache.invalidate(self.db_name)
             
 # --------------------------------------- Main -----------------        
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from cronlog_scanner import CronlogScanner
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class CronlogScannerTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.log_dir    = tempfile.mkdtemp(prefix='cronlog_scanner_test')
+        self.log_path   = os.path.join(self.log_dir, 'refresh.log')
+        self.state_path = os.path.join(self.log_dir, 'scan_state.json')
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.log_dir)
+
+    #-------------------------
+    # testErrorsAndTimings
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testErrorsAndTimings(self):
+        self.append_log('2026-10-19 02:00:00,000;INFO: Working on table Terms...\n' +
+                        '2026-10-19 02:00:05,500;INFO: Done working on table Terms\n' +
+                        '2026-10-19 02:00:06,000;INFO: Working on table Courses...\n' +
+                        '2026-10-19 02:00:07,000;ERROR: *****Duplicate key in temp table\n' +
+                        'Traceback (most recent call last):\n' +
+                        '  File "canvas_prep.py", line 42\n' +
+                        'canvas_prep.py: 2026-10-19 02:00:08,000;ERROR: *****Error copying table Terms: timeout\n' +
+                        'ERROR 1064 (42000) at line 3: You have an error in your SQL syntax\n')
+        scan = CronlogScanner(self.state_path).scan(self.log_path)
+
+        self.assertEqual([(timing.stage, timing.table, timing.secs) for timing in scan.timings],
+                         [('build', 'Terms', 5.5)])
+        grouped = scan.errors_by_table_and_stage()
+        self.assertEqual(list(grouped.keys()), [('Courses', 'build'), ('Terms', 'build')])
+        (dup_key_error, mysql_error) = grouped[('Courses', 'build')]
+        self.assertEqual(dup_key_error.message, '*****Duplicate key in temp table')
+        self.assertEqual(dup_key_error.context, ['Traceback (most recent call last):',
+                                                 '  File "canvas_prep.py", line 42'])
+        # Line without log prefix:
+        self.assertIsNone(mysql_error.time)
+        self.assertEqual(mysql_error.line, 'ERROR 1064 (42000) at line 3: You have an error in your SQL syntax\n')
+        self.assertIn('Courses, build:\n   *****Duplicate key', scan.error_report())
+
+    #-------------------------
+    # testIncremental
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testIncremental(self):
+        first_part = ('2026-10-19 03:00:00,000;INFO: Copying Terms to /tmp/Terms.tsv...\n' +
+                      '2026-10-19 03:00:01,000;ERROR: *****Error copying table Terms: gone\n')
+        # Incomplete last line is left for later:
+        self.append_log(first_part + '2026-10-19 03:00:')
+        scan = CronlogScanner(self.state_path).scan(self.log_path)
+        self.assertEqual((scan.start_offset, scan.end_offset), (0, len(first_part)))
+        self.assertEqual([(error.table, error.stage) for error in scan.errors], [('Terms', 'export')])
+
+        # New scanner, as in the next sanity check run;
+        # the open export stage is completed:
+        self.append_log('02,000;INFO: Done copying Terms.\n')
+        scan = CronlogScanner(self.state_path).scan(self.log_path)
+        self.assertEqual(scan.start_offset, len(first_part))
+        self.assertEqual(scan.errors, [])
+        self.assertEqual([(timing.stage, timing.table, timing.secs) for timing in scan.timings],
+                         [('export', 'Terms', 2.0)])
+
+        # Nothing new:
+        scan = CronlogScanner(self.state_path).scan(self.log_path)
+        self.assertEqual(scan.start_offset, scan.end_offset)
+
+    #-------------------------
+    # testRewrittenLog
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRewrittenLog(self):
+        self.append_log('2026-10-19 02:00:00,000;INFO: Working on table Terms...\n')
+        CronlogScanner(self.state_path).scan(self.log_path)
+        # Same inode, longer, but different content:
+        with open(self.log_path, 'w') as fd:
+            fd.write('2026-10-20 02:00:00,000;ERROR: *****Cannot connect\n' +
+                     '2026-10-20 02:00:00,000;INFO: Working on table Terms...\n')
+        scan = CronlogScanner(self.state_path).scan(self.log_path)
+        self.assertEqual(scan.start_offset, 0)
+        self.assertEqual(len(scan.errors), 1)
+        # Replaced log:
+        os.remove(self.log_path)
+        self.append_log('2026-10-21 02:00:00,000;INFO: Working on table Terms...\n')
+        self.assertEqual(CronlogScanner(self.state_path).scan(self.log_path).start_offset, 0)
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # append_log
+    #--------------
+
+    def append_log(self, content):
+        with open(self.log_path, 'a') as fd:
+            fd.write(content)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,168 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from export_manifest import ExportManifest, TsvSharder
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class ExportManifestTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.export_dir = tempfile.mkdtemp(prefix='manifest_test')
+        self.tsv_path   = os.path.join(self.export_dir, 'Unittest.tsv')
+        self.header     = 'col1\tcol2\n'
+        self.rows       = [f"{i}\tval{i}\n" for i in range(10)]
+        with open(self.tsv_path, 'w') as fd:
+            fd.write(self.header)
+            fd.writelines(self.rows)
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.export_dir)
+
+    #-------------------------
+    # testFromSpec
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testFromSpec(self):
+        sharder = TsvSharder.from_spec('500M')
+        self.assertEqual(sharder.max_size, 500 * 1024**2)
+        self.assertEqual(sharder.unit, 'bytes')
+
+        sharder = TsvSharder.from_spec('2G')
+        self.assertEqual(sharder.max_size, 2 * 1024**3)
+
+        sharder = TsvSharder.from_spec('1000000')
+        self.assertEqual(sharder.max_size, 1000000)
+
+        sharder = TsvSharder.from_spec('200000rows')
+        self.assertEqual(sharder.max_size, 200000)
+        self.assertEqual(sharder.unit, 'rows')
+
+        with self.assertRaises(ValueError):
+            TsvSharder.from_spec('lots')
+        with self.assertRaises(ValueError):
+            TsvSharder.from_spec('0')
+
+    #-------------------------
+    # testTableNameFromFile
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTableNameFromFile(self):
+        self.assertEqual(TsvSharder.table_name_from_file('Terms.tsv'), 'Terms')
+        self.assertEqual(TsvSharder.table_name_from_file('Terms.part-00003.tsv'), 'Terms')
+        self.assertEqual(TsvSharder.part_file_name('Terms', 3), 'Terms.part-00003.tsv')
+
+    #-------------------------
+    # testShardByRows
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testShardByRows(self):
+        sharder = TsvSharder(4, unit='rows')
+        parts = sharder.shard(self.tsv_path, 'Unittest')
+        self.assertEqual([part['file'] for part in parts],
+                         ['Unittest.part-00001.tsv',
+                          'Unittest.part-00002.tsv',
+                          'Unittest.part-00003.tsv'])
+        self.assertEqual([part['rows'] for part in parts], [4,4,2])
+        self.assertFalse(os.path.exists(self.tsv_path))
+
+        # Every part has the header, and all rows
+        # arrive in order:
+        all_rows = []
+        for part in parts:
+            with open(os.path.join(self.export_dir, part['file'])) as fd:
+                lines = fd.readlines()
+            self.assertEqual(lines[0], self.header)
+            self.assertEqual(os.path.getsize(os.path.join(self.export_dir, part['file'])),
+                             part['bytes'])
+            all_rows.extend(lines[1:])
+        self.assertEqual(all_rows, self.rows)
+
+    #-------------------------
+    # testShardHeaderFirstOnly
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testShardHeaderFirstOnly(self):
+        # Header plus three rows make up the first part:
+        max_bytes = len(self.header) + sum(len(row) for row in self.rows[:3])
+        sharder = TsvSharder(max_bytes, header_in_all_parts=False)
+        parts = sharder.shard(self.tsv_path, 'Unittest')
+        self.assertEqual(parts[0]['rows'], 3)
+        self.assertEqual([part['has_header'] for part in parts],
+                         [True] + [False] * (len(parts) - 1))
+        self.assertEqual(sum(part['rows'] for part in parts), len(self.rows))
+        with open(os.path.join(self.export_dir, parts[1]['file'])) as fd:
+            self.assertEqual(fd.readline(), self.rows[3])
+
+    #-------------------------
+    # testSmallFileUntouched
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSmallFileUntouched(self):
+        parts = TsvSharder.from_spec('1M').shard(self.tsv_path, 'Unittest')
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(parts[0]['file'], 'Unittest.tsv')
+        self.assertTrue(os.path.exists(self.tsv_path))
+
+        parts = TsvSharder.from_spec('100rows').shard(self.tsv_path, 'Unittest')
+        self.assertEqual(parts[0]['file'], 'Unittest.tsv')
+        self.assertEqual(os.listdir(self.export_dir), ['Unittest.tsv'])
+
+    #-------------------------
+    # testManifestRoundTrip
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testManifestRoundTrip(self):
+        parts = TsvSharder(5, unit='rows').shard(self.tsv_path, 'Unittest')
+        manifest = ExportManifest(self.export_dir)
+        manifest.record_table('Unittest', parts, header='all')
+
+        reloaded = ExportManifest(self.export_dir)
+        self.assertEqual(reloaded.table_names, ['Unittest'])
+        self.assertEqual(reloaded.parts('Unittest'), parts)
+        self.assertEqual(reloaded.part_paths('Unittest'),
+                         [os.path.join(self.export_dir, part['file']) for part in parts])
+        self.assertEqual(reloaded.parts('NoSuchTable'), [])
+        self.assertFalse(os.path.exists(reloaded.manifest_path + '.tmp'))
+        self.assertIsNone(reloaded.source_rows('Unittest'))
+
+    #-------------------------
+    # testSourceRows
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSourceRows(self):
+        parts = [TsvSharder.single_part(self.tsv_path)]
+        ExportManifest(self.export_dir).record_table('Unittest', parts, source_rows=10)
+        reloaded = ExportManifest(self.export_dir)
+        self.assertEqual(reloaded.source_rows('Unittest'), 10)
+        self.assertIsNone(reloaded.source_rows('NoSuchTable'))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -3,6 +3,7 @@ Created on Sep 12, 2019
 
 @author: paepcke
 '''
+from datetime import datetime
 import os
 from pathlib import Path
 import socket
@@ -10,7 +11,9 @@ import tempfile
 import unittest
 
 from canvas_utils_exceptions import TableExportError
+from export_manifest import ExportManifest, TsvSharder
 from final_sanity_check import SanityChecker
+from run_stats import RunStats
 
 TEST_ALL = True
 #TEST_ALL = False
@@ -134,6 +137,70 @@ class SanityCheckTester(unittest.TestCase):
             self.assertEqual(e.table_list, [self.all_table_names[-1]])
 
 
+    #-------------------------
+    # testExportedRowCounts
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skipped')
+    def testExportedRowCounts(self):
+        # Header plus two rows:
+        file_path = os.path.join(self.test_tmpdir_path, 'Terms.tsv')
+        with open(file_path, 'wb') as fd:
+            fd.write(b'term_id\tname\n1\tFall\n2\tWin\\\nter\n')
+        manifest = ExportManifest(self.test_tmpdir_path)
+        manifest.record_table('Terms', [TsvSharder.single_part(file_path)], source_rows=2)
+        self.assertEqual(self.sanity_checker.check_exported_row_counts(), {'Terms' : (2, 2)})
+        
+        manifest.record_table('Terms', [TsvSharder.single_part(file_path)], source_rows=3)
+        try:
+            self.sanity_checker.check_exported_row_counts()
+            self.fail('Should have seen a row count mismatch for Terms')
+        except TableExportError as e:
+            self.assertEqual(e.table_list, ['Terms: 2 rows exported, 3 recorded'])
+
+    #-------------------------
+    # testTsvStructure
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skipped')
+    def testTsvStructure(self):
+        with open(os.path.join(self.test_tmpdir_path, 'Terms_schema.sql'), 'w') as fd:
+            fd.write('CREATE TABLE Terms (\n\tterm_id  bigint,\n\tname  varchar(255));')
+        file_path = os.path.join(self.test_tmpdir_path, 'Terms.tsv')
+        with open(file_path, 'wb') as fd:
+            fd.write(b'term_id\tname\n1\tFall\n2\tWin\tter\n')
+        try:
+            self.sanity_checker.check_tsv_structure()
+            self.fail('Should have seen an unescaped tab in Terms.tsv')
+        except TableExportError as e:
+            self.assertEqual(e.table_list, ['Terms.tsv line 3 (byte 20): 3 fields, expected 2'])
+            
+        with open(file_path, 'wb') as fd:
+            fd.write(b'term_id\tname\n1\tFall\n2\tWin\\tter\n')
+        self.assertTrue(self.sanity_checker.check_tsv_structure())
+
+    #-------------------------
+    # testRunStats
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skipped')
+    def testRunStats(self):
+        run_stats = RunStats(self.test_tmpdir_path)
+        table_name = self.all_table_names[0]
+        for day in range(6):
+            run_stats.record_run(table_name, datetime(2026, 10, 1 + day), rows=1000 + day, num_bytes=50000)
+        self.assertTrue(self.sanity_checker.check_run_stats())
+        self.assertNotIn(table_name, self.sanity_checker.tables_without_history())
+        
+        # Export shrinks to a tenth:
+        run_stats.record_run(table_name, datetime(2026, 10, 7), rows=100, num_bytes=5000)
+        try:
+            self.sanity_checker.check_run_stats()
+            self.fail(f'Should have seen anomalies of {table_name}')
+        except TableExportError as e:
+            self.assertEqual(len(e.table_list), 2)
+            self.assertTrue(e.table_list[0].startswith(f"{table_name} rows: 100 (median 1002.5, z="))
+
     #-------------------------
     # test_error_log_analysis
     #--------------
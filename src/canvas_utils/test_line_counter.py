@@ -0,0 +1,87 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from line_counter import LineCounter
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class LineCounterTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tmp_dir = tempfile.mkdtemp(prefix='line_counter_test')
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tmp_dir)
+
+    #-------------------------
+    # testManyBlocks
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testManyBlocks(self):
+        path = self.make_file('Unittest.tsv', b''.join([b'%d\tval%d\n' % (i, i) for i in range(1000)]))
+        # Tiny blocks force the worker pool:
+        counter = LineCounter(num_workers=2, block_size=100)
+        self.assertEqual(counter.count_lines(path), 1000)
+        self.assertEqual(LineCounter(num_workers=1).count_lines(path), 1000)
+
+    #-------------------------
+    # testEscapedNewlines
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testEscapedNewlines(self):
+        # Escaped newline in a value, an escaped backslash
+        # at the end of a value, and an escaped newline that
+        # straddles a block boundary (offset 3 and 4):
+        content = b'ab\\\ncd\n' + b'x\\\\\n' + b'ab\\\n\n'
+        path = self.make_file('Escaped.tsv', content)
+        for block_size in (3, 4, 5, 100):
+            counter = LineCounter(num_workers=1, block_size=block_size)
+            self.assertEqual(counter.count_lines(path), 3, f"Block size {block_size}")
+
+    #-------------------------
+    # testLastLineAndEmpty
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testLastLineAndEmpty(self):
+        no_newline = self.make_file('NoNewline.tsv', b'a\nb')
+        empty      = self.make_file('Empty.tsv', b'')
+        counts = LineCounter().count_lines_in_files([no_newline, empty])
+        self.assertEqual(counts, {no_newline : 2, empty : 0})
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # make_file
+    #--------------
+
+    def make_file(self, file_name, content):
+        path = os.path.join(self.tmp_dir, file_name)
+        with open(path, 'wb') as fd:
+            fd.write(content)
+        return path
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,114 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import unittest
+
+from load_log import LoadLog
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class LoadLogTester(unittest.TestCase):
+
+    #-------------------------
+    # testCreateAndUpgrade
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testCreateAndUpgrade(self):
+        create_cmd = LoadLog.create_cmd('canvasdata_aux')
+        self.assertTrue(create_cmd.startswith('CREATE TABLE IF NOT EXISTS canvasdata_aux.LoadLog ('))
+        self.assertIn('duration_secs double', create_cmd)
+        self.assertIn('INDEX tbl_time_idx (tbl_name, time_refreshed)', create_cmd)
+
+        # Log table from before the new columns:
+        self.assertEqual(LoadLog.upgrade_cmds('canvasdata_aux',
+                                              ['tbl_name', 'time_refreshed', 'num_rows'],
+                                              []),
+                         ['ALTER TABLE canvasdata_aux.LoadLog ' +
+                          'ADD COLUMN duration_secs double, ' +
+                          'ADD COLUMN data_bytes bigint, ' +
+                          'ADD COLUMN index_bytes bigint, ' +
+                          'ADD COLUMN run_id varchar(40), ' +
+                          'ADD COLUMN export_secs double, ' +
+                          'ADD INDEX tbl_time_idx (tbl_name, time_refreshed)'])
+        # Current log table:
+        self.assertEqual(LoadLog.upgrade_cmds('canvasdata_aux',
+                                              [col_name for (col_name, _col_type) in LoadLog.columns],
+                                              ['TBL_TIME_IDX']),
+                         [])
+
+    #-------------------------
+    # testInsertCmd
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testInsertCmd(self):
+        self.assertEqual(LoadLog.insert_cmd('canvasdata_aux', 'Terms', 42,
+                                            duration_secs=1.5, data_bytes=1024,
+                                            run_id='2026_10_19_02_00_00'),
+                         "INSERT INTO canvasdata_aux.LoadLog " +
+                         "(tbl_name, num_rows, duration_secs, data_bytes, index_bytes, run_id) " +
+                         "VALUES ('Terms', 42, 1.5, 1024, NULL, '2026_10_19_02_00_00')")
+
+    #-------------------------
+    # testExportUpdateCmd
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testExportUpdateCmd(self):
+        self.assertEqual(LoadLog.export_update_cmd('canvasdata_aux', 'Terms', 12.5),
+                         "UPDATE canvasdata_aux.LoadLog " +
+                         "SET export_secs = 12.5, time_refreshed = time_refreshed " +
+                         "WHERE tbl_name = 'Terms' ORDER BY time_refreshed DESC LIMIT 1")
+
+    #-------------------------
+    # testRollupCmds
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRollupCmds(self):
+        (create_cmd, summarize_cmd, delete_cmd) = LoadLog.rollup_cmds('canvasdata_aux', days=30)
+        self.assertIn('canvasdata_aux.LoadLogDaily', create_cmd)
+        self.assertIn('GROUP BY DATE(time_refreshed), tbl_name', summarize_cmd)
+        self.assertIn('ON DUPLICATE KEY UPDATE', summarize_cmd)
+        # Same cutoff for summarizing and deleting:
+        self.assertIn('WHERE time_refreshed < UTC_DATE() - INTERVAL 30 DAY', summarize_cmd)
+        self.assertEqual(delete_cmd,
+                         'DELETE FROM canvasdata_aux.LoadLog WHERE time_refreshed < UTC_DATE() - INTERVAL 30 DAY')
+
+    #-------------------------
+    # testRowChangeSign
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRowChangeSign(self):
+        sign = LoadLog.row_change_sign
+        self.assertEqual(sign('INSERT INTO Courses SELECT * FROM canvasdata_prd.course_dim',
+                              'Courses', 'canvasdata_aux'), 1)
+        # Qualified name after USE of the raw data db:
+        self.assertEqual(sign('INSERT into canvasdata_aux.Modules SELECT id FROM module_dim',
+                              'Modules', 'canvasdata_aux', 'canvasdata_prd'), 1)
+        self.assertEqual(sign('INSERT INTO Modules SELECT id FROM module_dim',
+                              'Modules', 'canvasdata_aux', 'canvasdata_prd'), 0)
+        self.assertEqual(sign('DELETE CourseAssignments FROM CourseAssignments LEFT JOIN canvasdata_prd.course_dim ON course_id = id',
+                              'CourseAssignments', 'canvasdata_aux'), -1)
+        self.assertEqual(sign("LOAD DATA LOCAL INFILE '/tmp/explore_courses.csv' INTO TABLE ExploreCourses",
+                              'ExploreCourses', 'canvasdata_aux'), 1)
+        self.assertEqual(sign('CREATE TABLE Terms AS SELECT * FROM canvasdata_prd.enrollment_term_dim',
+                              'Terms', 'canvasdata_aux'), 1)
+        # Row count unchanged:
+        self.assertEqual(sign('CREATE TABLE Terms (term_id bigint)', 'Terms', 'canvasdata_aux'), 0)
+        self.assertEqual(sign('UPDATE Courses SET term_name = NULL', 'Courses', 'canvasdata_aux'), 0)
+        # Other tables:
+        self.assertEqual(sign('INSERT INTO RequirementsFillUniq SELECT * FROM RequirementsFill',
+                              'RequirementsFill', 'canvasdata_aux'), 0)
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
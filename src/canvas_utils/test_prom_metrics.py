@@ -0,0 +1,179 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime, timedelta
+import os
+import shutil
+import tempfile
+import unittest
+
+from prom_metrics import MetricsFile
+from run_record import StageRecord
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class PromMetricsTester(unittest.TestCase):
+
+    table_metrics = {'build_secs' : ('canvas_utils_table_build_seconds', 'Seconds it took to build the table.'),
+                     'rows'       : ('canvas_utils_table_rows', 'Rows in the table.')
+                     }
+    table_success_metric = ('canvas_utils_table_build_last_success_timestamp_seconds',
+                            'When the table was last built successfully.')
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tmp_dir     = tempfile.mkdtemp(prefix='prom_metrics_test')
+        self.metrics_dir = os.path.join(self.tmp_dir, 'textfile_collector')
+        self.run_start   = datetime(2026, 10, 19, 2, 0, 0)
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tmp_dir)
+
+    #-------------------------
+    # testTextFormat
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTextFormat(self):
+        metrics = MetricsFile('clear_old_backups', metrics_dir=self.metrics_dir)
+        metrics.add('canvas_utils_backup_tables', 3, 'Backups kept of the table.', table='Terms')
+        metrics.add('canvas_utils_backup_tables', 1, 'Backups kept of the table.', table='My "odd"\\name')
+        metrics.add('canvas_utils_backup_bytes', 1.5, 'Bytes of backups.', table='Terms')
+        # Unknown values are left out:
+        metrics.add('canvas_utils_backup_bytes', None, 'Bytes of backups.', table='Courses')
+        self.assertEqual(metrics.to_text(),
+                         '# HELP canvas_utils_backup_tables Backups kept of the table.\n'
+                         '# TYPE canvas_utils_backup_tables gauge\n'
+                         'canvas_utils_backup_tables{stage="clear_old_backups",table="Terms"} 3\n'
+                         'canvas_utils_backup_tables{stage="clear_old_backups",table="My \\"odd\\"\\\\name"} 1\n'
+                         '# HELP canvas_utils_backup_bytes Bytes of backups.\n'
+                         '# TYPE canvas_utils_backup_bytes gauge\n'
+                         'canvas_utils_backup_bytes{stage="clear_old_backups",table="Terms"} 1.5\n'
+                         )
+        self.assertEqual(MetricsFile.format_value(float('inf')), '+Inf')
+
+        path = metrics.write()
+        self.assertEqual(path, os.path.join(self.metrics_dir, 'canvas_utils_clear_old_backups.prom'))
+        # No temporary file is left behind:
+        self.assertEqual(os.listdir(self.metrics_dir), ['canvas_utils_clear_old_backups.prom'])
+        (help_texts, samples) = MetricsFile.read_file(path)
+        self.assertEqual(help_texts['canvas_utils_backup_bytes'], 'Bytes of backups.')
+        self.assertIn(('canvas_utils_backup_tables',
+                       (('stage', 'clear_old_backups'), ('table', 'My "odd"\\name')),
+                       1.0),
+                      samples)
+
+    #-------------------------
+    # testFromStageRecord
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testFromStageRecord(self):
+        record = self.make_record()
+        record.note_table('Terms',   build_secs=1.5, rows=2104)
+        record.note_table('Courses', build_secs=600.0)
+        record.finish(end_time=self.run_start + timedelta(hours=2), resources={'cpu_secs' : 30.0})
+        metrics = MetricsFile.from_stage_record(record,
+                                                self.table_metrics,
+                                                self.table_success_metric,
+                                                metrics_dir=self.metrics_dir)
+        samples = self.samples_of(metrics)
+        end_time = (self.run_start + timedelta(hours=2)).timestamp()
+        self.assertEqual(samples[('canvas_utils_stage_duration_seconds', ())], 7200.0)
+        self.assertEqual(samples[('canvas_utils_stage_cpu_seconds', ())], 30.0)
+        self.assertEqual(samples[('canvas_utils_stage_errors', ())], 0)
+        self.assertEqual(samples[('canvas_utils_stage_last_success_timestamp_seconds', ())], end_time)
+        self.assertEqual(samples[('canvas_utils_table_rows', (('table', 'Terms'),))], 2104)
+        self.assertNotIn(('canvas_utils_table_rows', (('table', 'Courses'),)), samples)
+        self.assertEqual(samples[('canvas_utils_table_build_last_success_timestamp_seconds', (('table', 'Courses'),))],
+                         end_time)
+
+    #-------------------------
+    # testLastSuccessCarriedOver
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testLastSuccessCarriedOver(self):
+        # A good night:
+        record = self.make_record()
+        record.note_table('Terms',   build_secs=1.5, rows=2104)
+        record.note_table('Courses', build_secs=600.0, rows=90000)
+        record.finish(end_time=self.run_start + timedelta(hours=2), resources={})
+        MetricsFile.from_stage_record(record, self.table_metrics, self.table_success_metric,
+                                      metrics_dir=self.metrics_dir).write()
+        first_end = (self.run_start + timedelta(hours=2)).timestamp()
+
+        # Next night, Courses fails:
+        record = self.make_record(self.run_start + timedelta(days=1))
+        record.note_table('Terms', build_secs=1.4, rows=2104)
+        record.note_error('Could not create table Courses', table='Courses')
+        record.finish(end_time=self.run_start + timedelta(days=1, hours=1), resources={})
+        metrics = MetricsFile.from_stage_record(record, self.table_metrics, self.table_success_metric,
+                                                metrics_dir=self.metrics_dir)
+        (_help_texts, prev_samples) = MetricsFile.read_file(metrics.write())
+        samples = {(name, labels[1:]) : value for (name, labels, value) in prev_samples}
+        second_end = (self.run_start + timedelta(days=1, hours=1)).timestamp()
+
+        self.assertEqual(samples[('canvas_utils_stage_errors', ())], 1)
+        self.assertEqual(samples[('canvas_utils_stage_last_success_timestamp_seconds', ())], first_end)
+        self.assertEqual(samples[('canvas_utils_table_build_last_success_timestamp_seconds', (('table', 'Terms'),))],
+                         second_end)
+        self.assertEqual(samples[('canvas_utils_table_build_last_success_timestamp_seconds', (('table', 'Courses'),))],
+                         first_end)
+        # Other values of the failed table are gone:
+        self.assertNotIn(('canvas_utils_table_rows', (('table', 'Courses'),)), samples)
+
+    #-------------------------
+    # testNoMetricsDir
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testNoMetricsDir(self):
+        metrics = MetricsFile('canvas_prep', metrics_dir=self.metrics_dir)
+        metrics.metrics_dir = None
+        metrics.add('canvas_utils_stage_errors', 0, 'Errors noted by the stage.')
+        self.assertIsNone(metrics.write())
+        self.assertFalse(os.path.exists(self.metrics_dir))
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # make_record
+    #--------------
+
+    def make_record(self, start_time=None):
+        record = StageRecord('canvas_prep', run_id='run1', report_root=os.path.join(self.tmp_dir, 'reports'))
+        record.start(self.run_start if start_time is None else start_time)
+        return record
+
+    #-------------------------
+    # samples_of
+    #--------------
+
+    def samples_of(self, metrics):
+        '''
+        Map from (metric name, labels other than stage)
+        to value.
+        '''
+        samples = {}
+        for (name, (_help_text, _metric_type, values)) in metrics.metrics.items():
+            for (labels, value) in values.items():
+                samples[(name, labels[1:])] = value
+        return samples
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -3,7 +3,12 @@ Created on Aug 15, 2019
 
 @author: paepcke
 '''
+import json
+import os
+import shutil
+import tempfile
 import unittest
+
 from query_sorter import QuerySorter, TableError
 
 TEST_ALL = True
@@ -18,8 +23,22 @@ class QuerySorterTester(unittest.TestCase):
 
     def setUp(self):
         unittest.TestCase.setUp(self)
+        # Never touch the cache file of the package:
+        self.cache_dir = tempfile.mkdtemp(prefix='query_sorter_test')
+        QuerySorter.cache_dir = self.cache_dir
+        QuerySorter._graph_cache.clear()
         self.sorter = QuerySorter(unittests=True)
         
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        QuerySorter.cache_dir = None
+        QuerySorter._graph_cache.clear()
+        shutil.rmtree(self.cache_dir)
+        
     #-------------------------
     # testBuildPrecedenceList 
     #--------------
@@ -52,9 +71,10 @@ class QuerySorterTester(unittest.TestCase):
 
         try:
             ordered_list = self.sorter.detect_mutual_table_dependencies(precedence_dict)
+            self.fail("Expected TableError, which was not raised.")
         except TableError as e:
             #print(e.message())
-            self.assertEqual(e.message, "('CourseEnrollment', 'Terms', 'CourseEnrollment'): Missing table file Student.sql in Queries directory")
+            self.assertEqual(e.message, "('Terms', 'Student'): Missing table file Student.sql in Queries directory")
 
 
     #-------------------------
@@ -108,6 +128,138 @@ class QuerySorterTester(unittest.TestCase):
             # Ensure there is an explanatory error text:
             self.assertCountEqual(e.table_tuple, ('Student', 'Terms', 'CourseEnrollment', 'Student'))
             
+    #-------------------------
+    # testGenerations
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testGenerations(self):
+        precedence_dict = {'CourseEnrollment' : ['Terms', 'Courses'],
+                           'Courses' : ['Terms'],
+                           'Terms' : [],
+                           'Accounts' : [],
+                           'Students' : ['Accounts']
+                           }
+        self.assertEqual(self.sorter.compute_generations(precedence_dict),
+                         [['Accounts', 'Terms'],
+                          ['Courses', 'Students'],
+                          ['CourseEnrollment']])
+        
+        # Only the tables on the cycle are reported, not
+        # those that merely wait for it:
+        precedence_dict = {'Terms' : [],
+                           'Courses' : ['Terms', 'Modules'],
+                           'Modules' : ['Wikis'],
+                           'Wikis' : ['Courses'],
+                           'WikiPages' : ['Wikis']
+                           }
+        with self.assertRaises(TableError) as context:
+            self.sorter.compute_generations(precedence_dict)
+        self.assertCountEqual(context.exception.table_tuple[:-1], ('Courses', 'Modules', 'Wikis'))
+        self.assertEqual(context.exception.table_tuple[0], context.exception.table_tuple[-1])
+
+    #-------------------------
+    # testGraphCache
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testGraphCache(self):
+        sorter1 = QuerySorter()
+        sorter2 = QuerySorter()
+        self.assertEqual(sorter1.generations, sorter2.generations)
+        self.assertEqual(sorter1.sorted_table_names,
+                         [table_name for generation in sorter1.generations for table_name in generation])
+        # Instances don't share mutable state:
+        sorter1.sorted_table_names.clear()
+        sorter1.generations[0].clear()
+        self.assertNotEqual(QuerySorter().generations[0], [])
+
+    #-------------------------
+    # testGraphCacheOfOtherCode
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testGraphCacheOfOtherCode(self):
+        sorter = QuerySorter()
+        cache_path = os.path.join(self.cache_dir, QuerySorter.CACHE_FILE_NAME)
+        with open(cache_path, 'r') as fd:
+            cache = json.load(fd)
+        self.assertEqual(cache['analyzer'], QuerySorter.analyzer_hash())
+        
+        # A cache file with a bogus graph is used if 
+        # written by this code...
+        cache['generations'] = [['Bogus']]
+        self.write_cache(cache_path, cache)
+        self.assertEqual(QuerySorter().generations, [['Bogus']])
+        
+        # ...but not if written by another version:
+        cache['analyzer'] = 'other'
+        self.write_cache(cache_path, cache)
+        self.assertEqual(QuerySorter().generations, sorter.generations)
+        with open(cache_path, 'r') as fd:
+            self.assertEqual(json.load(fd)['analyzer'], QuerySorter.analyzer_hash())
+        # No temporary file is left behind:
+        self.assertEqual(os.listdir(self.cache_dir), [QuerySorter.CACHE_FILE_NAME])
+
+    #-------------------------
+    # testLineage
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testLineage(self):
+        text_dict = {'Terms' : """CREATE TABLE Terms (term_id bigint);
+                                  INSERT INTO Terms
+                                  SELECT etd.id FROM canvasdata_prd.enrollment_term_dim etd;
+                               """,
+                     'Courses' : """USE canvasdata_prd;
+                                    CREATE TABLE IF NOT EXISTS Helper (id bigint);
+                                    INSERT INTO canvasdata_aux.Courses
+                                    SELECT course_dim.id, Terms.term_id
+                                      FROM course_dim LEFT JOIN canvasdata_aux.Terms
+                                        ON canvasdata_prd.course_dim.enrollment_term_id = Terms.term_id
+                                      JOIN Helper USING(id);
+                                 """
+                     }
+        (precedence_dict, raw_tables, lineage) = self.sorter.analyze_queries(text_dict)
+        self.assertEqual(precedence_dict, {'Terms' : [], 'Courses' : ['Terms']})
+        self.assertEqual(raw_tables, {'Terms' : ['enrollment_term_dim'], 'Courses' : ['course_dim']})
+        self.assertEqual(lineage, 
+                         {'enrollment_term_dim' : {'aux_tables' : {'Terms' : [1]},
+                                                   'columns'    : {'id' : ['Terms']}},
+                          'course_dim' : {'aux_tables' : {'Courses' : [2]},
+                                          'columns'    : {'id' : ['Courses'],
+                                                          'enrollment_term_id' : ['Courses']}}
+                          })
+        
+    #-------------------------
+    # testTablesImpactedBy
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTablesImpactedBy(self):
+        sorter = QuerySorter()
+        (impacted, direct) = sorter.tables_impacted_by('discussion_entry_fact')
+        self.assertTrue(len(direct) > 0)
+        self.assertTrue(direct.issubset(set(impacted)))
+        # Build order is preserved:
+        self.assertEqual(impacted, [table_name for table_name in sorter.sorted_table_names
+                                    if table_name in impacted])
+        self.assertEqual(sorter.tables_impacted_by('canvasdata_prd.' + 'discussion_entry_fact'),
+                         (impacted, direct))
+        self.assertEqual(sorter.tables_impacted_by('no_such_table'), ([], set()))
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # write_cache
+    #--------------
+
+    def write_cache(self, cache_path, cache):
+        with open(cache_path, 'w') as fd:
+            json.dump(cache, fd)
+        # Make the next instance read the file:
+        QuerySorter._graph_cache.clear()
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
@@ -4,10 +4,11 @@ Created on Aug 27, 2019
 @author: paepcke
 '''
 from _datetime import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
 import unittest
 from io import StringIO
 
+from backup_catalog import BackupCatalog
 from refresh_history import LoadHistoryLister
 
 
@@ -102,6 +103,83 @@ Aux tables in Unittest:
         
 # ----------------------- Utilities ---------------
 
+    #-------------------------
+    # testEstimateTableDurations
+    #--------------
+        
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skipped')
+    def testEstimateTableDurations(self):
+        run1 = datetime(2019, 10, 1, 2, 0, 0)
+        run2 = datetime(2019, 10, 2, 2, 0, 0)
+        load_log_content = [
+            {'tbl_name' : 'Terms',   'time_refreshed' : run1},
+            {'tbl_name' : 'Courses', 'time_refreshed' : run1 + timedelta(minutes=10)},
+            {'tbl_name' : 'Modules', 'time_refreshed' : run1 + timedelta(minutes=15)},
+            {'tbl_name' : 'Terms',   'time_refreshed' : run2},
+            {'tbl_name' : 'Courses', 'time_refreshed' : run2 + timedelta(minutes=20)},
+            ]
+        estimates = LoadHistoryLister.estimate_table_durations(load_log_content)
+        # Terms is always the first table of a run, so has no estimate:
+        self.assertEqual(estimates, {'Courses' : 900.0, 'Modules' : 300.0})
+
+        # Recorded durations are preferred, also for
+        # the first table of a run:
+        run3 = datetime(2019, 10, 3, 2, 0, 0)
+        load_log_content.extend([
+            {'tbl_name' : 'Terms',   'time_refreshed' : run3, 'duration_secs' : 60.0},
+            {'tbl_name' : 'Courses', 'time_refreshed' : run3 + timedelta(minutes=30), 'duration_secs' : 1200.0},
+            ])
+        estimates = LoadHistoryLister.estimate_table_durations(load_log_content)
+        self.assertEqual(estimates, {'Terms' : 60.0, 'Courses' : 1200.0, 'Modules' : 300.0})
+
+    #-------------------------
+    # testBackupAvailability
+    #--------------
+        
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skipped')
+    def testBackupAvailability(self):
+        out_fd = StringIO()
+        self.refresh_lister = LoadHistoryLister(unittests=True)
+        catalog = BackupCatalog(['Terms', 'Courses'],
+                                ['Terms',
+                                 'Terms_2019_01_10_14_14_40_123456',
+                                 'Terms_2020_01_10_14_14_40_123456',
+                                 'Courses_2019_06_01_02_03_04'
+                                 ])
+        self.refresh_lister.backup_availability(out_fd=out_fd, catalog=catalog)
+        res = out_fd.getvalue()
+        self.assertEqual(res, '''
+Backups in Unittest:
+
+Table Name  Backups  Latest Backup
+   Courses        1  2019-06-01 02:03:04
+     Terms        2  2020-01-10 14:14:40
+''')
+
+    #-------------------------
+    # testTrends
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skipped')
+    def testTrends(self):
+        out_fd = StringIO()
+        self.refresh_lister = LoadHistoryLister(unittests=True)
+        run1 = datetime(2019, 10, 1, 2, 0, 0)
+        load_log_content = [
+            {'tbl_name' : 'AssignmentSubmissions', 'time_refreshed' : run1 + timedelta(days=day),
+             'num_rows' : 10000 + 100 * day, 'duration_secs' : 600.0}
+            for day in range(3)
+            ]
+        trends = self.refresh_lister.print_trends(out_fd=out_fd,
+                                                  budget_hours=1,
+                                                  load_log_content=load_log_content,
+                                                  account_volumes={'AssignmentSubmissions' : [8000, 900, 1300]})
+        # The 900-row account reaches 1000 rows when the
+        # table has grown by 1/9th:
+        trend = trends.trends['AssignmentSubmissions']
+        self.assertEqual(trend.threshold_date.date(), datetime(2019, 10, 14).date())
+        self.assertIn('Not forecast to exceed the budget.', out_fd.getvalue())
+
     #-------------------------
     # buildEventDicts 
     #--------------
@@ -0,0 +1,133 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime, timedelta
+from io import StringIO
+import unittest
+
+from refresh_trends import RefreshTrends
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class RefreshTrendsTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        self.run1 = datetime(2026, 10, 1, 2, 0, 0)
+        # Three nightly runs. AllUsers grows by 1000
+        # rows per day; its build by 60 seconds per day:
+        self.load_log_content = []
+        for day in range(3):
+            when = self.run1 + timedelta(days=day)
+            self.load_log_content.extend([
+                {'tbl_name' : 'AllUsers', 'time_refreshed' : when,
+                 'num_rows' : 98000 + 1000 * day, 'data_bytes' : 1000000 * (day + 1), 'index_bytes' : 0,
+                 'duration_secs' : 600.0 + 60 * day, 'export_secs' : 100.0},
+                {'tbl_name' : 'Terms', 'time_refreshed' : when + timedelta(minutes=20),
+                 'num_rows' : 100, 'duration_secs' : 5.0}
+                ])
+        self.trends = RefreshTrends(self.load_log_content)
+
+    #-------------------------
+    # testRates
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRates(self):
+        all_users = self.trends.trends['AllUsers']
+        self.assertEqual(all_users.num_runs, 3)
+        self.assertEqual(all_users.rows, 100000)
+        self.assertAlmostEqual(all_users.rows_per_day, 1000.0)
+        self.assertAlmostEqual(all_users.bytes_per_day, 1000000.0)
+        self.assertAlmostEqual(all_users.build_secs_per_day, 60.0)
+        self.assertAlmostEqual(all_users.export_secs_per_day, 0.0)
+
+        terms = self.trends.trends['Terms']
+        self.assertAlmostEqual(terms.rows_per_day, 0.0)
+        # Never recorded:
+        self.assertIsNone(terms.bytes)
+        self.assertIsNone(terms.export_secs_per_day)
+        self.assertEqual(self.trends.now, self.run1 + timedelta(days=2, minutes=20))
+
+    #-------------------------
+    # testThresholds
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testThresholds(self):
+        # 100000 rows take three batches of 40000; the
+        # 120001st row needs a fourth, 20 days away:
+        crossing = self.trends.forecast_batches('AllUsers', 40000)
+        self.assertEqual(crossing, self.trends.now + timedelta(days=20.001))
+        self.assertEqual(self.trends.trends['AllUsers'].threshold_name, '4 batches of 40000')
+
+        # Largest small account has 500 rows; reaches 1000 when
+        # the table doubles, which is 100 days out. The batch
+        # forecast is earlier, so it stays:
+        self.assertEqual(self.trends.forecast_accounts('AllUsers', [5000, 500, 20], 1000),
+                         self.trends.now + timedelta(days=100))
+        self.assertEqual(self.trends.trends['AllUsers'].threshold_date, crossing)
+
+        # Terms does not grow:
+        self.assertIsNone(self.trends.forecast_rows('Terms', '1000 terms', 1000))
+        self.assertIsNone(self.trends.forecast_rows('Accounts', '1000 accounts', 1000))
+
+    #-------------------------
+    # testExactBatches
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testExactBatches(self):
+        # 100000 rows fill two batches of 50000 exactly; the
+        # next row already needs a third:
+        crossing = self.trends.forecast_batches('AllUsers', 50000)
+        self.assertEqual(crossing, self.trends.now + timedelta(days=0.001))
+        self.assertEqual(self.trends.trends['AllUsers'].threshold_name, '3 batches of 50000')
+
+    #-------------------------
+    # testBudget
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testBudget(self):
+        # Now: 720 + 100 + 5 seconds, growing by 60 per day:
+        (total_secs, secs_per_day, crossing) = self.trends.forecast_budget(3600)
+        self.assertAlmostEqual(total_secs, 825.0)
+        self.assertAlmostEqual(secs_per_day, 60.0)
+        self.assertEqual(crossing, self.trends.now + timedelta(days=(3600 - 825) / 60.))
+        self.assertEqual(self.trends.forecast_budget(600)[2], self.trends.now)
+
+    #-------------------------
+    # testReports
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testReports(self):
+        self.trends.forecast_batches('AllUsers', 40000)
+        out_fd = StringIO()
+        self.trends.write_text(out_fd, budget_secs=3600)
+        report = out_fd.getvalue()
+        self.assertIn('Refresh trends as of 2026-10-03:', report)
+        self.assertIn('4 batches of 40000: 2026-10-23', report)
+        self.assertIn('Forecast to exceed the budget around 2026-11-18.', report)
+
+        csv_fd = StringIO()
+        self.trends.write_csv(csv_fd)
+        lines = csv_fd.getvalue().splitlines()
+        self.assertEqual(lines[0].split(','), RefreshTrends.csv_header)
+        self.assertEqual(lines[1],
+                         'AllUsers,3,100000,1000.0,3000000,1000000.0,720.0,60.0,100.0,0.0,4 batches of 40000,2026-10-23')
+        self.assertEqual(lines[2], 'Terms,3,100,0.0,,,5.0,0.0,,,,')
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
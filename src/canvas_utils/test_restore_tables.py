@@ -8,6 +8,7 @@ import unittest
 
 from pymysql_utils.pymysql_utils import MySQLDB
 
+from backup_catalog import BackupCatalog
 from config_info import ConfigInfo
 from restore_tables import TableRestorer
 from unittest_db_finder import UnittestDbFinder
@@ -200,6 +201,8 @@ class CanvasRestoreTablesTests(unittest.TestCase):
         self.removeAllUnittestTables()
         
         self.db.createTable('Table1', {'foo': 'int'})
+        # Tables are created behind the metadata cache's back:
+        self.utils.schema_cache.invalidate(self.db_name)
         tbl_names = self.utils.get_existing_tables_in_dir(self.db, return_all=True, target_db=self.db_name)
         self.assertEqual(tbl_names, ['Table1'])
         
@@ -209,12 +212,14 @@ class CanvasRestoreTablesTests(unittest.TestCase):
         
         # Add a second table:
         self.db.createTable('Table2', {'bar': 'int'})
+        self.utils.schema_cache.invalidate(self.db_name)
 
         tbl_names = self.utils.get_existing_tables_in_dir(self.db, return_all=True, target_db=self.db_name)
         self.assertEqual(tbl_names, ['Table1', 'Table2'])
         
         # Add a legitimate aux table:
         self.db.createTable('Terms', {'fum': 'int'})
+        self.utils.schema_cache.invalidate(self.db_name)
         
         tbl_names = self.utils.get_existing_tables_in_dir(self.db, return_all=False, target_db=self.db_name)
         self.assertEqual(tbl_names, ['Terms'])
@@ -228,6 +233,7 @@ class CanvasRestoreTablesTests(unittest.TestCase):
         
         self.db.dropTable('Table1')
         self.db.dropTable('Table2')
+        self.utils.schema_cache.invalidate(self.db_name)
         tbl_names = self.utils.get_existing_tables_in_dir(self.db, return_all=True, target_db=self.db_name)
         self.assertCountEqual(tbl_names, ['Terms', 'ModuleItems'])
                 
@@ -309,6 +315,8 @@ class CanvasRestoreTablesTests(unittest.TestCase):
 
             self.db.createTable(f'Terms_{date_str2}', {'foo' : 'int'})
             self.db.insert(f'Terms_{date_str2}', {'foo' : 30})
+            # Tables are created behind the metadata cache's back:
+            self.utils.schema_cache.invalidate(self.db_name)
 
             # Restore the newest backup tbl with foo=30 to overwrite
             # the Terms table that currently has foo==20
@@ -319,6 +327,53 @@ class CanvasRestoreTablesTests(unittest.TestCase):
         finally:
             pass
         
+    #------------------------------------
+    # testPlanRestore 
+    #-------------------    
+    
+    @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
+    def testPlanRestore(self):
+        existing = ['Terms', 
+                    'Terms_2019_01_10_14_14_40_123456',
+                    'Terms_2020_01_10_14_14_40_123456',
+                    'Courses_2019_01_10_14_14_40_123456'
+                    ]
+        catalog = BackupCatalog(self.utils.tables, existing)
+        
+        plan = self.restore_obj.plan_restore(['Terms', 'Courses', 'Accounts'], catalog)
+        self.assertEqual(plan, [('Terms_2020_01_10_14_14_40_123456', 'Terms'),
+                                ('Courses_2019_01_10_14_14_40_123456', 'Courses')])
+        
+        # Explicitly named backup:
+        plan = self.restore_obj.plan_restore(['Terms_2019_01_10_14_14_40_123456'], catalog)
+        self.assertEqual(plan, [('Terms_2019_01_10_14_14_40_123456', 'Terms')])
+        
+        with self.assertRaises(ValueError):
+            self.restore_obj.plan_restore(['Terms_2018_01_10_14_14_40_123456'], catalog)
+        with self.assertRaises(ValueError):
+            self.restore_obj.plan_restore(['Terms', 'Terms_2019_01_10_14_14_40_123456'], catalog)
+            
+        # Only existing tables are moved aside, all in one statement:
+        (rename_cmd, replaced) = self.restore_obj.restore_rename_cmd(
+            [('Terms_2020_01_10_14_14_40_123456', 'Terms'),
+             ('Courses_2019_01_10_14_14_40_123456', 'Courses')],
+            existing)
+        self.assertEqual(rename_cmd, 
+                         "RENAME TABLE Terms TO Terms_replaced_by_restore, " +
+                         "Terms_2020_01_10_14_14_40_123456 TO Terms, " +
+                         "Courses_2019_01_10_14_14_40_123456 TO Courses;")
+        self.assertEqual(replaced, ['Terms_replaced_by_restore'])
+        
+        # Backups in their own schema are moved into the aux db:
+        (rename_cmd, replaced) = self.restore_obj.restore_rename_cmd(
+            [('Terms_2020_01_10_14_14_40_123456', 'Terms')],
+            existing,
+            db_schema='canvasdata_aux',
+            backup_db='canvasdata_aux_backups')
+        self.assertEqual(rename_cmd, 
+                         "RENAME TABLE canvasdata_aux.Terms TO canvasdata_aux.Terms_replaced_by_restore, " +
+                         "canvasdata_aux_backups.Terms_2020_01_10_14_14_40_123456 TO canvasdata_aux.Terms;")
+
     # ------------------------------- Utilities -------------------------
 
     #------------------------------------
@@ -343,6 +398,8 @@ class CanvasRestoreTablesTests(unittest.TestCase):
         tbl_names = self.utils.get_tbl_names_in_schema(self.db, self.db_name)
         for tbl_name in tbl_names:
             self.db.dropTable(tbl_name)
+        # Tables were dropped behind the metadata cache's back:
+        Utilities.schema_cache.invalidate(self.db_name)
     
     #------------------------------------
     # find_backup_table_names 
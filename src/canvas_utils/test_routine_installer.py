@@ -0,0 +1,157 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import tempfile
+import unittest
+
+from canvas_utils_exceptions import DatabaseError
+from routine_installer import RoutineInstaller
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class RoutineInstallerTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        self.curr_dir = os.path.dirname(__file__)
+        self.script   = '''
+# Header comment; with a semicolon
+DELIMITER //
+DROP FUNCTION IF EXISTS greet;
+CREATE FUNCTION greet(name varchar(40))
+       RETURNS varchar(60)
+DETERMINISTIC
+BEGIN
+/*
+    Quote chars in comments don't count: it's
+*/
+    -- Nor delimiters: //
+    RETURN CONCAT('Hi; ', name, '//');
+END// # greet
+
+DROP PROCEDURE IF EXISTS noop//
+CREATE PROCEDURE `noop`()
+BEGIN
+    SELECT "It's a no-op";
+END//
+DELIMITER ;
+'''
+        (fd, self.script_path) = tempfile.mkstemp(suffix='.sql')
+        with os.fdopen(fd, 'w') as script_fd:
+            script_fd.write(self.script)
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        os.remove(self.script_path)
+
+    #-------------------------
+    # testSplitStatements
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSplitStatements(self):
+        statements = RoutineInstaller.split_statements(self.script)
+        self.assertEqual(len(statements), 4)
+        self.assertEqual(statements[0], 'DROP FUNCTION IF EXISTS greet')
+        self.assertTrue(statements[1].startswith('CREATE FUNCTION greet('))
+        self.assertTrue(statements[1].endswith("RETURN CONCAT('Hi; ', name, '//');\nEND"))
+        self.assertEqual(statements[2], 'DROP PROCEDURE IF EXISTS noop')
+        self.assertEqual(RoutineInstaller.routine_names(statements), ['greet', 'noop'])
+
+    #-------------------------
+    # testSplitProcsFile
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSplitProcsFile(self):
+        with open(os.path.join(self.curr_dir, 'canvasMysqlProcs.sql'), 'r') as fd:
+            statements = RoutineInstaller.split_statements(fd.read())
+        routines = RoutineInstaller.routine_names(statements)
+        self.assertEqual(len(routines), 17)
+        self.assertEqual(routines[0], 'createIndexIfNotExists')
+        self.assertEqual(routines[-3:], ['DATABASE_NAME', 'TABLE_BASENAME', 'desca'])
+        # Each routine is preceded by its DROP:
+        self.assertEqual(len(statements), 2 * len(routines))
+
+    #-------------------------
+    # testInstallOnlyWhenChanged
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testInstallOnlyWhenChanged(self):
+        db = RoutineDb()
+        installer = RoutineInstaller(db, 'canvasdata_aux', self.script_path)
+        self.assertTrue(installer.install())
+        self.assertEqual(len(db.executed), 6)
+        self.assertIn('REPLACE INTO canvasdata_aux.RoutineVersions', db.executed[-1])
+
+        # Nothing changed; one query, no statements:
+        db.executed = []
+        self.assertFalse(installer.install())
+        self.assertEqual(db.executed, [])
+        self.assertTrue(installer.install(force=True))
+
+        # A routine disappeared:
+        db.routines.remove('noop')
+        self.assertFalse(installer.is_current())
+
+        db.fail_on = 'CREATE PROCEDURE'
+        with self.assertRaises(DatabaseError):
+            installer.install()
+
+# ------------------------- Utilities --------------------
+
+class RoutineDb(object):
+    '''
+    Stands in for a MySQLDB connection. Remembers executed
+    statements, and the routines and version they install.
+    '''
+
+    def __init__(self):
+        self.executed = []
+        self.routines = set()
+        self.digest   = None
+        self.fail_on  = None
+
+    def execute(self, statement):
+        if self.fail_on is not None and self.fail_on in statement:
+            return ("OperationalError(1064, 'You have an error in your SQL syntax')", None)
+        self.executed.append(statement)
+        match = RoutineInstaller.create_routine_pat.match(statement)
+        if match is not None:
+            self.routines.add(match.group(2))
+        if statement.strip().startswith('REPLACE INTO'):
+            self.digest = statement.split("', '")[1].split("'")[0]
+        return (None, None)
+
+    def query(self, _query_str):
+        if self.digest is None:
+            raise ValueError("ProgrammingError(1146, \"Table 'canvasdata_aux.RoutineVersions' doesn't exist\")")
+        return QueryResult((self.digest, len(self.routines)))
+
+class QueryResult(object):
+    '''
+    MySQLDB results have next().
+    '''
+    def __init__(self, row):
+        self.row = row
+
+    def next(self):
+        return self.row
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,104 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import datetime
+from decimal import Decimal
+import io
+import unittest
+
+from row_encoder import RowEncoder
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class RowEncoderTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.encoder = RowEncoder(['bigint', 'varchar', 'double', 'decimal',
+                                   'datetime', 'date', 'time', 'blob'])
+
+    #-------------------------
+    # testEncodeRow
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testEncodeRow(self):
+        row = (35910000000000030,
+               'Hello',
+               3.0,
+               Decimal('1.50'),
+               datetime.datetime(2019, 10, 1, 13, 45, 10),
+               datetime.date(2019, 10, 1),
+               datetime.timedelta(hours=26, minutes=3, seconds=4),
+               b'bin')
+        self.assertEqual(self.encoder.encode_row(row),
+                         '35910000000000030\tHello\t3\t1.50\t2019-10-01 13:45:10\t2019-10-01\t26:03:04\tbin')
+
+    #-------------------------
+    # testNullsAndEscapes
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testNullsAndEscapes(self):
+        row = (None, 'a\tb\nc\\d', 92.5, None, None, None, datetime.timedelta(seconds=-61), None)
+        self.assertEqual(self.encoder.encode_row(row),
+                         'NULL\ta\\tb\\nc\\\\d\t92.5\tNULL\tNULL\tNULL\t-00:01:01\tNULL')
+
+    #-------------------------
+    # testWriteRows
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testWriteRows(self):
+        encoder = RowEncoder(['int', 'text'], batch_size=2)
+        out_fd  = io.BytesIO()
+        rows    = [(i, f"row{i}") for i in range(5)]
+        self.assertEqual(encoder.write_rows(rows, out_fd), 5)
+        self.assertEqual(out_fd.getvalue(),
+                         b'0\trow0\n1\trow1\n2\trow2\n3\trow3\n4\trow4\n')
+        # Buffer is reused, and empty after writing:
+        self.assertEqual(encoder._buffer, [])
+        
+        # No rows, no output:
+        out_fd = io.BytesIO()
+        self.assertEqual(encoder.write_rows([], out_fd), 0)
+        self.assertEqual(out_fd.getvalue(), b'')
+
+    #-------------------------
+    # testSingleColumn
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSingleColumn(self):
+        encoder = RowEncoder(['bigint'])
+        self.assertEqual(encoder.encode_row((10,)), '10')
+        self.assertEqual(encoder.encode_row((None,)), 'NULL')
+
+        # Single column query results are bare values,
+        # not one-element tuples:
+        out_fd = io.BytesIO()
+        self.assertEqual(encoder.write_rows([10, None, 35910000000000030], out_fd), 3)
+        self.assertEqual(out_fd.getvalue(), b'10\nNULL\n35910000000000030\n')
+
+    #-------------------------
+    # testNullStr
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testNullStr(self):
+        # As expected by LOAD DATA INFILE:
+        encoder = RowEncoder(['bigint', 'varchar'], null_str='\\N')
+        self.assertEqual(encoder.encode_row((None, None)), '\\N\t\\N')
+        self.assertEqual(encoder.encode_row((1, 'NULL')), '1\tNULL')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,117 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from run_record import ResourceUsage, RunReport, StageRecord
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class RunRecordTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.report_root = tempfile.mkdtemp(prefix='run_record_test')
+        self.run_start   = datetime(2026, 10, 19, 2, 0, 0)
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.report_root)
+
+    #-------------------------
+    # testResourceUsage
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testResourceUsage(self):
+        start_usage = ResourceUsage.snapshot()
+        sum(range(100000))
+        used = ResourceUsage.difference(start_usage, ResourceUsage.snapshot())
+        self.assertGreaterEqual(used['cpu_secs'], 0)
+        if os.path.exists('/proc/self/status'):
+            self.assertGreater(used['peak_rss_kb'], 0)
+        # Unreadable values stay None:
+        self.assertIsNone(ResourceUsage.difference({'read_bytes' : None}, {'read_bytes' : 10})['read_bytes'])
+
+    #-------------------------
+    # testRunReport
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRunReport(self):
+        prep = self.make_record('canvas_prep', self.run_start)
+        prep.note_table('Terms',   build_secs=1.5, rows=2104)
+        prep.note_table('Courses', build_secs=600.0, rows=90000)
+        prep.finish(end_time=self.run_start + timedelta(hours=2))
+
+        # Earlier stage, finished later:
+        raw_import = self.make_record('raw_import', self.run_start - timedelta(hours=3))
+        raw_import.note_error('raw_import exited with code 2')
+        raw_import.finish(end_time=self.run_start, resources={})
+
+        run_dir = os.path.join(self.report_root, 'run1')
+        with open(os.path.join(run_dir, 'run_report.json'), 'r') as fd:
+            report = json.load(fd)
+        self.assertEqual([stage['stage'] for stage in report['stages']], ['raw_import', 'canvas_prep'])
+        self.assertEqual(report['start'], '2026-10-18T23:00:00')
+        self.assertEqual(report['end'], '2026-10-19T04:00:00')
+        self.assertEqual(report['num_errors'], 1)
+        canvas_prep = report['stages'][1]
+        self.assertEqual(canvas_prep['status'], 'ok')
+        self.assertEqual(canvas_prep['wall_secs'], 7200.0)
+        self.assertEqual(canvas_prep['tables']['Courses'], {'build_secs' : 600.0, 'rows' : 90000})
+        self.assertEqual(report['stages'][0]['status'], 'failed')
+
+        with open(os.path.join(run_dir, 'run_report.html'), 'r') as fd:
+            page = fd.read()
+        # Slowest table first:
+        self.assertLess(page.index('<td>Courses</td>'), page.index('<td>Terms</td>'))
+        self.assertIn('raw_import exited with code 2', page)
+
+    #-------------------------
+    # testIndex
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testIndex(self):
+        for (run_id, hours) in (('run1', 2), ('run2', 3)):
+            record = self.make_record('canvas_prep', self.run_start, run_id)
+            record.finish(end_time=self.run_start + timedelta(hours=hours))
+        with open(os.path.join(self.report_root, RunReport.index_name), 'r') as fd:
+            index = fd.read()
+        # Newest run first:
+        self.assertLess(index.index('<a href="run2/run_report.html">run2</a>'),
+                        index.index('<a href="run1/run_report.html">run1</a>'))
+        self.assertIn('<td>10800.0</td>', index)
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # make_record
+    #--------------
+
+    def make_record(self, stage, start_time, run_id='run1'):
+        record = StageRecord(stage, run_id=run_id, report_root=self.report_root)
+        record.start(start_time)
+        return record
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,137 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime, timedelta
+import math
+import shutil
+import tempfile
+import unittest
+
+from run_stats import AnomalyDetector, RunStats
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class RunStatsTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.export_dir = tempfile.mkdtemp(prefix='run_stats_test')
+        self.detector   = AnomalyDetector()
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.export_dir)
+
+    #-------------------------
+    # testStore
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testStore(self):
+        run_stats = RunStats(self.export_dir)
+        when = datetime(2026, 10, 1, 2, 0, 0)
+        for day in range(RunStats.MAX_SAMPLES + 2):
+            run_stats.record_run('Terms', when + timedelta(days=day), rows=day, num_bytes=10 * day)
+        reloaded = RunStats(self.export_dir)
+        self.assertEqual(reloaded.table_names, ['Terms'])
+        samples = reloaded.samples('Terms')
+        self.assertEqual(len(samples), RunStats.MAX_SAMPLES)
+        # Oldest two were dropped:
+        self.assertEqual(samples[0], {'time' : '2026-10-03T02:00:00',
+                                      'rows' : 2, 'bytes' : 20, 'build_secs' : None})
+        self.assertEqual(reloaded.samples('NoSuchTable'), [])
+
+    #-------------------------
+    # testOutlierInBaseline
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testOutlierInBaseline(self):
+        # One unusually large export among normal ones:
+        sizes = [1000, 1010, 990, 5000, 1005, 995, 1002]
+        samples = self.make_samples('bytes', sizes)
+        (value, median, z) = self.detector.score(samples, 'bytes')
+        self.assertEqual((value, median), (1002, 1002.5))
+        self.assertFalse(self.detector.is_anomaly(value, median, z))
+
+        # Shrinkage is caught:
+        samples = self.make_samples('bytes', sizes[:-1] + [600])
+        (value, median, z) = self.detector.score(samples, 'bytes')
+        self.assertLess(z, -AnomalyDetector.Z_THRESHOLD)
+        self.assertTrue(self.detector.is_anomaly(value, median, z))
+
+    #-------------------------
+    # testConstantSeries
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testConstantSeries(self):
+        # MAD and mean deviation are zero:
+        (value, median, z) = self.detector.score(self.make_samples('rows', [100] * 6 + [101]), 'rows')
+        self.assertEqual(z, math.inf)
+        # But one more row is not worth an email:
+        self.assertFalse(self.detector.is_anomaly(value, median, z))
+        (value, median, z) = self.detector.score(self.make_samples('rows', [100] * 6 + [0]), 'rows')
+        self.assertTrue(self.detector.is_anomaly(value, median, z))
+
+    #-------------------------
+    # testTooLittleHistory
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTooLittleHistory(self):
+        self.assertIsNone(self.detector.score([], 'rows'))
+        self.assertIsNone(self.detector.score(self.make_samples('rows', [1, 2, 3]), 'rows'))
+        # Latest sample lacks the value:
+        samples = self.make_samples('rows', [1] * 6 + [None])
+        self.assertIsNone(self.detector.score(samples, 'rows'))
+
+    #-------------------------
+    # testTermBaseline
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTermBaseline(self):
+        # Summer sizes, then a jump when Autumn starts:
+        summer = self.make_samples('rows', [500] * 10, datetime(2026, 8, 20))
+        autumn = self.make_samples('rows', [900, 910, 905, 895, 900, 903], datetime(2026, 9, 20))
+        (_value, median, z) = self.detector.score(summer + autumn, 'rows')
+        self.assertEqual(median, 900)
+        self.assertLess(abs(z), AnomalyDetector.Z_THRESHOLD)
+        # Too few Autumn samples yet: all earlier samples count:
+        (_value, median, _z) = self.detector.score(summer + autumn[:3], 'rows')
+        self.assertEqual(median, 500)
+        self.assertEqual(AnomalyDetector.academic_term('2026-01-05T02:00:00'), (2026, 'Winter'))
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # make_samples
+    #--------------
+
+    def make_samples(self, metric, values, start=None):
+        if start is None:
+            start = datetime(2026, 10, 1, 2, 0, 0)
+        samples = []
+        for (day, value) in enumerate(values):
+            sample = {'time' : (start + timedelta(days=day)).isoformat(timespec='seconds'),
+                      'rows' : None, 'bytes' : None, 'build_secs' : None}
+            sample[metric] = value
+            samples.append(sample)
+        return samples
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,167 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import unittest
+
+from schema_cache import SchemaCache
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class SchemaCacheTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        self.db = InfoSchemaDb(
+            tables={'canvasdata_aux' : ['Terms', 'Courses', 'LoadLog'],
+                    'canvasdata_aux_backups' : ['Terms_2019_01_10_14_14_40_123456']
+                    },
+            columns={('canvasdata_aux', 'Terms') : [('term_id', 'bigint', None, None, 1, ''),
+                                                    ('term_name', 'varchar', 255, None, 2, '')],
+                     ('canvasdata_aux', 'Courses') : [('course_id', 'bigint', None, None, 1, '')]
+                     },
+            indexes={('canvasdata_aux', 'Terms') : [('term_id_idx', 'term_id', 1, None)]}
+            )
+        self.cache = SchemaCache()
+
+    #-------------------------
+    # testBulkLoad
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testBulkLoad(self):
+        self.assertEqual(self.cache.table_names(self.db, 'canvasdata_aux'),
+                         ['Terms', 'Courses', 'LoadLog'])
+        self.assertTrue(self.cache.table_exists(self.db, 'canvasdata_aux', 'loadlog'))
+        self.assertFalse(self.cache.table_exists(self.db, 'canvasdata_aux', 'Accounts'))
+        self.assertEqual(self.db.num_queries, 1)
+
+        self.assertEqual([col[0] for col in self.cache.columns(self.db, 'canvasdata_aux', 'Terms')],
+                         ['term_id', 'term_name'])
+        self.assertEqual(self.cache.indexes(self.db, 'canvasdata_aux', 'Terms'),
+                         [('term_id_idx', 'term_id', 1, None)])
+        self.assertEqual(self.cache.indexes(self.db, 'canvasdata_aux', 'Courses'), [])
+        self.assertEqual(self.cache.columns(self.db, 'canvasdata_aux', 'Accounts'), [])
+        # One query for columns, one for indexes of all tables:
+        self.assertEqual(self.db.num_queries, 3)
+
+    #-------------------------
+    # testNoteStatement
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testNoteStatement(self):
+        self.cache.table_names(self.db, 'canvasdata_aux')
+        self.cache.table_names(self.db, 'canvasdata_aux_backups')
+        self.cache.columns(self.db, 'canvasdata_aux', 'Terms')
+
+        curr_db = self.cache.note_statement('''
+            # Make the table anew:
+            DROP TABLE IF EXISTS Courses, `canvasdata_aux`.`LoadLog`;
+            CREATE TEMPORARY TABLE Scratch (id int);
+            CREATE TABLE IF NOT EXISTS Accounts (account_id bigint);
+            USE canvasdata_prd;
+            CREATE TABLE canvasdata_aux.Modules AS SELECT * FROM module_dim;
+            ''', 'canvasdata_aux')
+        self.assertEqual(curr_db, 'canvasdata_prd')
+        self.assertEqual(sorted(self.cache.table_names(self.db, 'canvasdata_aux')),
+                         ['Accounts', 'Modules', 'Terms'])
+
+        num_queries = self.db.num_queries
+        self.cache.note_statement("RENAME TABLE canvasdata_aux.Terms TO canvasdata_aux_backups.Terms_2020_01_10_14_14_40_123456",
+                                  'canvasdata_aux')
+        self.assertFalse(self.cache.table_exists(self.db, 'canvasdata_aux', 'Terms'))
+        self.assertEqual(self.cache.table_names(self.db, 'canvasdata_aux_backups'),
+                         ['Terms_2019_01_10_14_14_40_123456', 'Terms_2020_01_10_14_14_40_123456'])
+        # All answered from memory:
+        self.assertEqual(self.db.num_queries, num_queries)
+
+    #-------------------------
+    # testInvalidate
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testInvalidate(self):
+        self.cache.table_names(self.db, 'canvasdata_aux')
+        self.db.tables['canvasdata_aux'].append('Accounts')
+        self.assertFalse(self.cache.table_exists(self.db, 'canvasdata_aux', 'Accounts'))
+        self.cache.invalidate('canvasdata_aux')
+        self.assertTrue(self.cache.table_exists(self.db, 'canvasdata_aux', 'Accounts'))
+
+        # A created table's columns are fetched on their own:
+        self.cache.columns(self.db, 'canvasdata_aux', 'Terms')
+        self.db.columns[('canvasdata_aux', 'Accounts')] = [('account_id', 'bigint', None, None, 1, '')]
+        self.cache.table_created('canvasdata_aux', 'Accounts')
+        self.assertEqual(self.cache.columns(self.db, 'canvasdata_aux', 'Accounts')[0][0], 'account_id')
+        self.assertIn("AND table_name = 'Accounts'", self.db.last_query)
+
+    #-------------------------
+    # testTableCreatedAfterLoad
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTableCreatedAfterLoad(self):
+        # Like the pipeline exporter, which loads the schema
+        # while another process is still building tables:
+        self.cache.table_names(self.db, 'canvasdata_aux')
+        self.cache.columns(self.db, 'canvasdata_aux', 'Terms')
+        self.db.tables['canvasdata_aux'].append('Accounts')
+        self.db.columns[('canvasdata_aux', 'Accounts')] = [('account_id', 'bigint', None, None, 1, '')]
+        # Unannounced, the table is unknown:
+        self.assertEqual(self.cache.columns(self.db, 'canvasdata_aux', 'Accounts'), [])
+
+        self.cache.table_created('canvasdata_aux', 'Accounts')
+        self.assertEqual([col[0] for col in self.cache.columns(self.db, 'canvasdata_aux', 'Accounts')],
+                         ['account_id'])
+        # A rebuilt table's columns are fetched anew:
+        self.db.columns[('canvasdata_aux', 'Terms')] = [('term_id', 'bigint', None, None, 1, '')]
+        self.cache.table_created('canvasdata_aux', 'Terms')
+        self.assertEqual([col[0] for col in self.cache.columns(self.db, 'canvasdata_aux', 'Terms')],
+                         ['term_id'])
+
+# ------------------------- Utilities --------------------
+
+class InfoSchemaDb(object):
+    '''
+    Stands in for a MySQLDB connection. Answers the
+    information_schema queries SchemaCache issues,
+    and counts them.
+    '''
+
+    def __init__(self, tables, columns, indexes):
+        self.tables  = tables
+        self.columns = columns
+        self.indexes = indexes
+        self.num_queries = 0
+        self.last_query  = None
+
+    def query(self, query_str):
+        self.num_queries += 1
+        self.last_query = query_str
+        db_schema  = query_str.split("table_schema = '")[1].split("'")[0]
+        table_name = None
+        if "AND table_name = '" in query_str:
+            table_name = query_str.split("AND table_name = '")[1].split("'")[0]
+
+        if 'information_schema.tables' in query_str:
+            # Single column results are bare values:
+            return iter(self.tables.get(db_schema, []))
+
+        metadata = self.columns if 'information_schema.columns' in query_str else self.indexes
+        rows = []
+        for ((schema, table), table_rows) in metadata.items():
+            if schema == db_schema and table_name in (None, table):
+                rows.extend([(table,) + row for row in table_rows])
+        return iter(rows)
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,172 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import threading
+import time
+import unittest
+
+from session_pool import SessionPool
+
+
+TEST_ALL = True
+#TEST_ALL = False
+
+class SessionPoolTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        self.sessions = []
+
+    #-------------------------
+    # testIsTransientError
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testIsTransientError(self):
+        self.assertTrue(SessionPool.is_transient_error(
+            ValueError("OperationalError(2013, 'Lost connection to MySQL server during query')")))
+        self.assertTrue(SessionPool.is_transient_error(
+            "Query 'SELECT * FROM Terms...' failed: OperationalError(2006, 'MySQL server has gone away')"))
+        # Unknown database is not going to heal:
+        self.assertFalse(SessionPool.is_transient_error(ValueError("OperationalError(1049, \"Unknown database 'foo'\")")))
+        self.assertFalse(SessionPool.is_transient_error(KeyError('foo')))
+
+    #-------------------------
+    # testCallWithRetries
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testCallWithRetries(self):
+        self.assertEqual(SessionPool.backoff_delays(5, 1.0, 4.0), [1.0, 2.0, 4.0, 4.0, 4.0])
+
+        failures = [ValueError("OperationalError(2003, \"Can't connect\")")] * 2
+        def flaky():
+            if len(failures) > 0:
+                raise failures.pop()
+            return 'connected'
+        waits = []
+        self.assertEqual(SessionPool.call_with_retries(flaky, 3, 1.0, 30.0, sleep=waits.append),
+                         'connected')
+        self.assertEqual(waits, [1.0, 2.0])
+
+        # Retries exhausted:
+        failures.extend([ValueError("OperationalError(2003, \"Can't connect\")")] * 3)
+        with self.assertRaises(ValueError):
+            SessionPool.call_with_retries(flaky, 2, 1.0, 30.0, sleep=waits.append)
+
+        # Other errors are raised right away:
+        failures.append(KeyError('foo'))
+        waits.clear()
+        with self.assertRaises(KeyError):
+            SessionPool.call_with_retries(flaky, 3, 1.0, 30.0, sleep=waits.append)
+        self.assertEqual(waits, [])
+
+    #-------------------------
+    # testReuseAndBound
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testReuseAndBound(self):
+        pool = SessionPool(self.connect, size=2)
+        with pool.session() as session1:
+            with pool.session() as session2:
+                self.assertIsNot(session1, session2)
+                # Both sessions in use:
+                with self.assertRaises(TimeoutError):
+                    pool.acquire(timeout=0.05)
+        with pool.session() as session3:
+            self.assertIn(session3, [session1, session2])
+        self.assertEqual(len(self.sessions), 2)
+
+        # A waiting caller gets the session once it is released:
+        session = pool.acquire()
+        other   = pool.acquire()
+        releaser = threading.Timer(0.1, pool.release, [session])
+        releaser.start()
+        self.assertIs(pool.acquire(timeout=5), session)
+        stats = pool.wait_stats()
+        self.assertEqual(stats['acquired'], 6)
+        self.assertGreater(stats['max_wait'], 0.05)
+        pool.release(other)
+        pool.close()
+        self.assertTrue(other.closed)
+
+    #-------------------------
+    # testRunRetriesOnFreshSession
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRunRetriesOnFreshSession(self):
+        pool = SessionPool(self.connect, size=1, backoff_secs=0.001)
+        used = []
+        def work(session):
+            used.append(session)
+            if len(used) == 1:
+                raise ValueError("OperationalError(2013, 'Lost connection to MySQL server during query')")
+            return 'done'
+        self.assertEqual(pool.run(work), 'done')
+        # The broken session was closed and replaced:
+        self.assertTrue(used[0].closed)
+        self.assertIsNot(used[0], used[1])
+        self.assertEqual(pool.wait_stats()['retries'], 1)
+
+    #-------------------------
+    # testHealthCheck
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testHealthCheck(self):
+        pool = SessionPool(self.connect, size=1, check_after_secs=0)
+        with pool.session() as session:
+            pass
+        time.sleep(0.01)
+        # Healthy sessions are reused:
+        with pool.session() as same_session:
+            self.assertIs(same_session, session)
+        # Server dropped the idle session:
+        session.closed = True
+        time.sleep(0.01)
+        with pool.session() as new_session:
+            self.assertIsNot(new_session, session)
+        self.assertEqual(pool.wait_stats()['reconnects'], 1)
+
+    # ------------------------- Utilities --------------------
+
+    def connect(self):
+        session = FakeSession()
+        self.sessions.append(session)
+        return session
+
+class FakeSession(object):
+    '''
+    Stands in for a MySQLDB session.
+    '''
+    def __init__(self):
+        self.closed = False
+
+    def isOpen(self):
+        return not self.closed
+
+    def query(self, _query_str):
+        if self.closed:
+            raise ValueError("OperationalError(2006, 'MySQL server has gone away')")
+        # MySQLDB results have next():
+        return FakeResult()
+
+    def close(self):
+        self.closed = True
+
+class FakeResult(object):
+    def next(self):
+        return 1
+
+# ------------------------- Main --------------------
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
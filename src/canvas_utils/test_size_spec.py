@@ -0,0 +1,44 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import unittest
+
+from size_spec import SizeSpec
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class SizeSpecTester(unittest.TestCase):
+
+    #-------------------------
+    # testParse
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testParse(self):
+        self.assertEqual(SizeSpec.parse('1000000'), 1000000)
+        self.assertEqual(SizeSpec.parse('500M'), 500 * 1024**2)
+        self.assertEqual(SizeSpec.parse('20gb'), 20 * 1024**3)
+        self.assertEqual(SizeSpec.parse(' 1.5K '), 1536)
+        self.assertEqual(SizeSpec.parse('2T'), 2 * 1024**4)
+        for bad_spec in ['lots', '', '5X', '-1G']:
+            with self.assertRaises(ValueError):
+                SizeSpec.parse(bad_spec)
+
+    #-------------------------
+    # testHumanReadable
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testHumanReadable(self):
+        self.assertEqual(SizeSpec.human_readable(1000), '1000')
+        self.assertEqual(SizeSpec.human_readable(1536), '1.5K')
+        self.assertEqual(SizeSpec.human_readable(SizeSpec.parse('20G')), '20.0G')
+        self.assertEqual(SizeSpec.human_readable(3 * 1024**4), '3.0T')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,117 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import unittest
+
+from sql_dependencies import SqlDependencyExtractor, SqlTokenizer
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class SqlDependencyTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.extractor = SqlDependencyExtractor()
+        
+    #-------------------------
+    # refs
+    #--------------
+    
+    def refs(self, sql_text):
+        '''
+        Return set of (db, table, role) in sql_text
+        '''
+        return {(ref.db, ref.table, ref.role) for ref in self.extractor.extract_refs(sql_text)}
+
+    #-------------------------
+    # testTokenizer
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testTokenizer(self):
+        tokens = list(SqlTokenizer.tokenize("SELECT `a`.b, 'it''s' # Terms\n-- Courses\n/* x */ FROM t;"))
+        self.assertEqual(tokens, [('name', ['SELECT']),
+                                  ('name', ['a', 'b']),
+                                  ('punct', ','),
+                                  ('string', "it''s"),
+                                  ('name', ['FROM']),
+                                  ('name', ['t']),
+                                  ('punct', ';')
+                                  ])
+
+    #-------------------------
+    # testCommentsAndLiterals
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testCommentsAndLiterals(self):
+        sql = '''# Depends on Terms
+                 INSERT INTO Courses
+                 SELECT 'FROM Terms', TermsOld.id  -- JOIN Students
+                   FROM TermsOld;
+              '''
+        self.assertEqual(self.refs(sql), {(None, 'Courses', 'written'),
+                                          (None, 'TermsOld', 'read')})
+
+    #-------------------------
+    # testRoles
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testRoles(self):
+        sql = '''USE canvasdata_aux;
+                 DROP TABLE IF EXISTS Courses, Tmp;
+                 CREATE TABLE Courses (id bigint, name varchar(40)) engine=MyISAM;
+                 UPDATE Courses c
+                   LEFT JOIN canvasdata_prd.course_dim AS cd ON c.id = cd.id
+                    SET c.name = cd.name;
+                 CREATE INDEX crs_idx ON Courses(id);
+                 USE canvasdata_prd;
+                 CALL createIndexIfNotExists('acc_idx', 'account_dim', 'id', NULL);
+                 DELETE Terms FROM canvasdata_aux.Terms, enrollment_term_dim
+                  WHERE EXTRACT(YEAR FROM date_end) < 2010;
+              '''
+        self.assertEqual(self.refs(sql), {('canvasdata_aux', 'Courses', 'written'),
+                                          ('canvasdata_aux', 'Tmp', 'written'),
+                                          ('canvasdata_prd', 'course_dim', 'read'),
+                                          ('canvasdata_aux', 'Courses', 'index_target'),
+                                          ('canvasdata_prd', 'account_dim', 'index_target'),
+                                          ('canvasdata_prd', 'Terms', 'written'),
+                                          ('canvasdata_aux', 'Terms', 'read'),
+                                          ('canvasdata_prd', 'enrollment_term_dim', 'read'),
+                                          })
+
+    #-------------------------
+    # testSubqueriesAndAliases
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSubqueriesAndAliases(self):
+        sql = '''INSERT INTO CourseEnrollment
+                 SELECT CrseEnrl.*
+                   FROM (SELECT canvasdata_prd.course_dim.id
+                           FROM canvasdata_prd.course_dim cd
+                          WHERE cd.id IN (SELECT course_id FROM Courses)
+                        ) AS CrseEnrl;
+              '''
+        statements = self.extractor.extract(sql)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual({(ref.db, ref.table, ref.role) for ref in statements[0].refs},
+                         {(None, 'CourseEnrollment', 'written'),
+                          ('canvasdata_prd', 'course_dim', 'read'),
+                          (None, 'Courses', 'read')})
+        self.assertEqual(statements[0].aliases, {'cd' : ('canvasdata_prd', 'course_dim')})
+        self.assertIn(['canvasdata_prd', 'course_dim', 'id'], statements[0].qualified_names)
+        self.assertIn(['cd', 'id'], statements[0].qualified_names)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,153 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import argparse
+from collections import Counter
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+from stage_profiler import StageProfiler, StageStats
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class StageProfilerTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.profile_root = tempfile.mkdtemp(prefix='stage_profiler_test')
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        # A failed test may leave its profiler active:
+        if StageProfiler._active is not None:
+            StageProfiler._active.finish(out_fd=io.StringIO())
+        shutil.rmtree(self.profile_root)
+
+    #-------------------------
+    # testNotProfiling
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testNotProfiling(self):
+        parser = argparse.ArgumentParser()
+        StageProfiler.add_arguments(parser)
+        self.assertIsNone(StageProfiler.from_args('canvas_prep.py', parser.parse_args([])))
+        # Stages do nothing:
+        with StageProfiler.stage('create_tables'):
+            pass
+        self.assertIsNone(StageProfiler._active)
+
+        args = parser.parse_args(['--profile', '--profiler', 'sample', '--profiledir', self.profile_root])
+        profiler = StageProfiler.from_args('canvas_prep.py', args)
+        self.assertEqual(profiler.profiler, 'sample')
+        self.assertTrue(profiler.out_dir.startswith(os.path.join(self.profile_root, 'canvas_prep_')))
+        profiler.finish(out_fd=io.StringIO())
+
+    #-------------------------
+    # testStages
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testStages(self):
+        profiler = StageProfiler('copy_aux_tables.py', profile_root=self.profile_root)
+        for _table in range(2):
+            with StageProfiler.stage('export'):
+                self.compute()
+                # Time of nested stages is theirs only:
+                with StageProfiler.stage('wait'):
+                    time.sleep(0.05)
+        summary = io.StringIO()
+        out_dir = profiler.finish(out_fd=summary)
+        self.assertIsNone(StageProfiler._active)
+
+        (export, wait) = profiler.stages.values()
+        self.assertEqual(export.entries, 2)
+        self.assertGreater(export.cpu_secs, 0)
+        self.assertGreaterEqual(wait.wall_secs, 0.1)
+        self.assertLess(wait.cpu_secs, wait.wall_secs / 2)
+        self.assertGreater(wait.waiting_secs, 0.05)
+        self.assertIn('export', summary.getvalue())
+
+        self.assertEqual(sorted(os.listdir(out_dir)),
+                         ['export.collapsed', 'export.pstats', 'summary.txt', 'wait.collapsed', 'wait.pstats'])
+        stats = pstats.Stats(os.path.join(out_dir, 'export.pstats'))
+        self.assertIn('compute', [func_name for (_file, _line, func_name) in stats.stats.keys()])
+        # The sleeping stage has no Python calls of its own:
+        stats = pstats.Stats(os.path.join(out_dir, 'wait.pstats'))
+        self.assertNotIn('compute', [func_name for (_file, _line, func_name) in stats.stats.keys()])
+
+    #-------------------------
+    # testSampleProfiler
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSampleProfiler(self):
+        profiler = StageProfiler('prepare_text_for_viz.py',
+                                 profiler='sample',
+                                 profile_root=self.profile_root,
+                                 sample_interval=0.001)
+        with StageProfiler.stage('count_words'):
+            self.compute(0.2)
+        out_dir = profiler.finish(out_fd=io.StringIO())
+        with open(os.path.join(out_dir, 'count_words.collapsed'), 'r') as fd:
+            collapsed = fd.read()
+        self.assertIn('test_stage_profiler.py:testSampleProfiler;test_stage_profiler.py:compute', collapsed)
+        stats = pstats.Stats(os.path.join(out_dir, 'count_words.pstats'))
+        self.assertGreater(stats.total_tt, 0)
+
+    #-------------------------
+    # testStatsFromSamples
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testStatsFromSamples(self):
+        main    = ('prog.py', 1, 'main')
+        build   = ('prog.py', 10, 'build')
+        execute = ('db.py', 5, 'execute')
+        stage_stats = StageStats('create_tables')
+        stage_stats.stacks = Counter({(main, build, execute) : 3,
+                                      (main, build) : 1
+                                      })
+        stage_stats.sampled_secs = 2.0
+        stats = StageProfiler.stats_from_samples(stage_stats)
+        # (calls, primitive calls, own secs, cumulative secs, callers):
+        self.assertEqual(stats[main][:4], (4, 4, 0.0, 2.0))
+        self.assertEqual(stats[build][:4], (4, 4, 0.5, 2.0))
+        self.assertEqual(stats[execute], (3, 3, 1.5, 1.5, {build : (3, 3, 1.5, 1.5)}))
+        self.assertEqual(StageProfiler.collapsed_stacks(stage_stats.stacks),
+                         'prog.py:main;prog.py:build;db.py:execute 3\n'
+                         'prog.py:main;prog.py:build 1\n')
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # compute
+    #--------------
+
+    def compute(self, secs=0.05):
+        end_time = time.perf_counter() + secs
+        total = 0
+        while time.perf_counter() < end_time:
+            total += sum([num * num for num in range(1000)])
+        return total
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,116 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from collections import namedtuple, OrderedDict
+import os
+import tempfile
+import unittest
+
+from tsv_sanitizer import TsvSanitizer
+
+TEST_ALL = True
+#TEST_ALL = False
+
+# Just enough of a copy_aux_tables.Schema for from_schema():
+ColInfo = namedtuple('ColInfo', 'col_type')
+
+class SchemaLike(OrderedDict):
+    def col_names(self, quoted=True):
+        return list(self.keys())
+
+
+class TsvSanitizerTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        # Columns 1 and 3 hold text:
+        self.sanitizer = TsvSanitizer([3, 1])
+        
+    #-------------------------
+    # testFromSchema
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testFromSchema(self):
+        schema = SchemaLike([('id', ColInfo('int')),
+                             ('title', ColInfo('varchar')),
+                             ('due', ColInfo('datetime')),
+                             ('body', ColInfo('mediumtext'))
+                             ])
+        sanitizer = TsvSanitizer.from_schema(schema)
+        self.assertEqual(sanitizer.text_col_indexes, [1,3])
+
+        schema = SchemaLike([('id', ColInfo('int'))])
+        self.assertIsNone(TsvSanitizer.from_schema(schema))
+
+    #-------------------------
+    # testFastPath
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testFastPath(self):
+        line = b'10\tHello\t2019-10-01\tNULL\n'
+        self.assertIs(self.sanitizer.sanitize_line(line), line)
+        # Escapes in non-text columns are not touched:
+        line = b'10\tHello\t2019\\t10\tWorld\n'
+        self.assertIs(self.sanitizer.sanitize_line(line), line)
+
+    #-------------------------
+    # testEscapes
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testEscapes(self):
+        line = b'10\tHello\\tthere\t2019\tline1\\nline2\n'
+        self.assertEqual(self.sanitizer.sanitize_line(line),
+                         b'10\tHello        there\t2019\tline1 line2\n')
+        
+        # Escaped backslash followed by 't' is not a tab,
+        # but an escaped backslash followed by an escaped
+        # tab is:
+        line = b'10\tC:\\\\tmp\t2019\ta\\\\\\tb'
+        self.assertEqual(self.sanitizer.sanitize_line(line),
+                         b'10\tC:\\\\tmp\t2019\ta\\\\        b')
+
+    #-------------------------
+    # testNullReplacement
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testNullReplacement(self):
+        sanitizer = TsvSanitizer([1,3], null_replacement='')
+        line = b'NULL\tNULL\tNULL\tNULLified\n'
+        self.assertEqual(sanitizer.sanitize_line(line),
+                         b'NULL\t\tNULL\tNULLified\n')
+
+    #-------------------------
+    # testSanitizeFile
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSanitizeFile(self):
+        (fd, tsv_path) = tempfile.mkstemp(suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'wb') as out_fd:
+                out_fd.write(b'id\ttitle\\t\tdue\tbody\n')
+                out_fd.write(b'1\tA\\tB\t2019\tC\n')
+                out_fd.write(b'2\tA\t2019\tC\n')
+            self.assertEqual(self.sanitizer.sanitize_file(tsv_path), 1)
+            with open(tsv_path, 'rb') as in_fd:
+                self.assertEqual(in_fd.read(),
+                                 b'id\ttitle\\t\tdue\tbody\n' +
+                                 b'1\tA        B\t2019\tC\n' +
+                                 b'2\tA\t2019\tC\n')
+            self.assertFalse(os.path.exists(tsv_path + '.sanitizing'))
+        finally:
+            os.remove(tsv_path)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
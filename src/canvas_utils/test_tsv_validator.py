@@ -0,0 +1,134 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from tsv_validator import TableLayout, TsvValidator
+
+TEST_ALL = True
+#TEST_ALL = False
+
+
+class TsvValidatorTester(unittest.TestCase):
+
+    #-------------------------
+    # setUp
+    #--------------
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.export_dir = tempfile.mkdtemp(prefix='tsv_validator_test')
+        self.layout = TableLayout('Unittest',
+                                  ['id', 'name', 'created_at'],
+                                  ['bigint', 'varchar', 'datetime'])
+
+    #-------------------------
+    # tearDown
+    #--------------
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.export_dir)
+
+    #-------------------------
+    # testSchemaFile
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testSchemaFile(self):
+        schema_path = self.make_file('Unittest_schema.sql',
+                                     b'CREATE TABLE Unittest (\n' +
+                                     b'\tid  bigint AUTO_INCREMENT,\n' +
+                                     b'\tname  varchar(40) DEFAULT NULL,\n' +
+                                     b'\tcreated_at  datetime,\n' +
+                                     b'\tPRIMARY KEY (id),\n' +
+                                     b'\tKEY name_idx (name));')
+        layout = TableLayout.from_schema_file(schema_path)
+        self.assertEqual(layout.table_name, 'Unittest')
+        self.assertEqual(layout.col_names, self.layout.col_names)
+        self.assertEqual(layout.col_types, self.layout.col_types)
+
+    #-------------------------
+    # testGoodFile
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testGoodFile(self):
+        # Escaped tabs and newlines in both styles, NULLs,
+        # and MySQL's zero date:
+        path = self.make_file('Unittest.tsv',
+                              b'id\tname\tcreated_at\n' +
+                              b'1\tplain\t2026-10-19 02:00:00\n' +
+                              b'2\ttab\\there\t2026-10-19\n' +
+                              b'3\traw\\\ttab and raw\\\nnewline\tNULL\n' +
+                              b'NULL\tends in backslash\\\\\t0000-00-00 00:00:00\n')
+        for block_size in (7, 1000):
+            validator = TsvValidator(num_workers=2, block_size=block_size)
+            self.assertEqual(validator.validate([(path, self.layout, True)]), {path : []})
+
+    #-------------------------
+    # testBadLines
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testBadLines(self):
+        lines = [b'%d\tname %d\t2026-10-19 02:00:00\n' % (i, i) for i in range(100)]
+        # Unescaped tab, and unescaped newline:
+        lines[10] = b'10\tname\t10\t2026-10-19 02:00:00\n'
+        lines[20] = b'20\tname\n20\t2026-10-19 02:00:00\n'
+        # Not a number, not a time; type checks
+        # only look at a sample of lines:
+        bad_types = [b'x1\tname\t2026-10-19\n', b'1\tname\tyesterday\n']
+        path = self.make_file('Unittest.part-00002.tsv', b''.join(lines + bad_types))
+        # Without header; small blocks to use the pool:
+        problems = TsvValidator(num_workers=2, block_size=500).validate([(path, self.layout, False)])[path]
+        self.assertEqual(problems[0], f"Unittest.part-00002.tsv line 11 (byte {len(b''.join(lines[:10]))}): " +
+                                      "4 fields, expected 3")
+        self.assertEqual(problems[1], f"Unittest.part-00002.tsv line 21 (byte {len(b''.join(lines[:20]))}): " +
+                                      "2 fields, expected 3")
+        self.assertTrue(problems[2].startswith('Unittest.part-00002.tsv line 22 '))
+        self.assertTrue(problems[-2].endswith("column 1 (bigint) holds b'x1'"))
+        self.assertTrue(problems[-1].endswith("column 3 (datetime) holds b'yesterday'"))
+
+    #-------------------------
+    # testHeader
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testHeader(self):
+        path = self.make_file('Unittest.tsv', b'id\tcreated_at\tname\n1\tname\t2026-10-19\n')
+        problems = TsvValidator().validate([(path, self.layout, True)])[path]
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("Unittest.tsv header: columns ['id', 'created_at', 'name']"))
+
+    #-------------------------
+    # testMaxReported
+    #--------------
+
+    @unittest.skipIf(not TEST_ALL, 'Temporarily skip this test.')
+    def testMaxReported(self):
+        path = self.make_file('Unittest.tsv', b'1\t2\n' * 25)
+        problems = TsvValidator().validate([(path, self.layout, False)])[path]
+        self.assertEqual(len(problems), TsvValidator.MAX_REPORTED + 1)
+        self.assertEqual(problems[-1], 'Unittest.tsv: 15 more problem line(s)')
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # make_file
+    #--------------
+
+    def make_file(self, file_name, content):
+        path = os.path.join(self.export_dir, file_name)
+        with open(path, 'wb') as fd:
+            fd.write(content)
+        return path
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
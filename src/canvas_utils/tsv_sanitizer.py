@@ -0,0 +1,178 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+import os
+
+class TsvSanitizer(object):
+    '''
+    Normalizes free-text fields in .tsv files written by
+    the mysql client in --batch mode, or by the copier's
+    SELECT ... INTO OUTFILE, which escapes values the same way
+    in its SELECT. Both escape tabs and newlines inside of values
+    as the two characters '\\t' and '\\n', and write SQL NULL as
+    'NULL'.
+    Some consumers, such as Informatica, trip over those
+    escapes. The sanitizer replaces:
+
+       o Escaped tabs with eight spaces
+       o Escaped newlines with one space
+       o Optionally: NULL with a given string, such as ''
+
+    Only columns of text types are touched; their positions
+    are computed once per table from the table's Schema
+    instance. Lines without any backslash (and, if NULLs are
+    replaced, without 'NULL') are copied unchanged without
+    being split into fields. Escaped backslashes ('\\\\') are
+    preserved, so '\\\\t' (a backslash followed by 't') is not
+    mistaken for a tab.
+    '''
+
+    # Data types as reported by information_schema.COLUMNS:
+    TEXT_COL_TYPES = ['char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext']
+
+    TAB_REPLACEMENT     = b' ' * 8
+    NEWLINE_REPLACEMENT = b' '
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, text_col_indexes, null_replacement=None):
+        '''
+        @param text_col_indexes: zero-based positions of the
+            text columns within each line
+        @type text_col_indexes: [int]
+        @param null_replacement: if not None, NULL values in
+            text columns are replaced with this string
+        @type null_replacement: {None | str}
+        '''
+        self.text_col_indexes = sorted(text_col_indexes)
+        if null_replacement is None:
+            self.null_replacement = None
+        else:
+            self.null_replacement = null_replacement.encode('utf-8')
+
+    #-------------------------
+    # from_schema
+    #--------------
+
+    @classmethod
+    def from_schema(cls, table_schema, null_replacement=None):
+        '''
+        Create a sanitizer for the table described by
+        table_schema. Returns None if the table has no
+        text columns, so nothing would ever need sanitizing.
+
+        @param table_schema: Schema instance of an exported table
+        @type table_schema: Schema
+        @param null_replacement: see constructor
+        @type null_replacement: {None | str}
+        @return: new TsvSanitizer, or None
+        @rtype: {None | TsvSanitizer}
+        '''
+        col_names = table_schema.col_names(quoted=False)
+        text_col_indexes = [idx for (idx, col_name) in enumerate(col_names)
+                            if table_schema[col_name].col_type.lower() in TsvSanitizer.TEXT_COL_TYPES]
+        if len(text_col_indexes) == 0:
+            return None
+        return cls(text_col_indexes, null_replacement=null_replacement)
+
+    #-------------------------
+    # sanitize_file
+    #--------------
+
+    def sanitize_file(self, tsv_path):
+        '''
+        Sanitize the given .tsv file in place. The header
+        line is left alone. The result is streamed to a
+        temporary file, which then replaces the original.
+
+        @param tsv_path: path to .tsv file, header line first
+        @type tsv_path: str
+        @return: number of data lines that were changed
+        @rtype: int
+        '''
+        tmp_path = tsv_path + '.sanitizing'
+        num_changed = 0
+        try:
+            with open(tsv_path, 'rb') as in_fd, open(tmp_path, 'wb') as out_fd:
+                out_fd.write(in_fd.readline())
+                for line in in_fd:
+                    new_line = self.sanitize_line(line)
+                    if new_line is not line:
+                        num_changed += 1
+                    out_fd.write(new_line)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, tsv_path)
+        return num_changed
+
+    #-------------------------
+    # sanitize_line
+    #--------------
+
+    def sanitize_line(self, line):
+        '''
+        Sanitize the text fields of one line. Returns
+        the very same bytes object if nothing needed
+        to change.
+
+        @param line: one data line, including its trailing newline
+        @type line: bytes
+        @return: sanitized line
+        @rtype: bytes
+        '''
+        # Fast path, checked at C speed:
+        if b'\\' not in line and (self.null_replacement is None or b'NULL' not in line):
+            return line
+
+        if line.endswith(b'\n'):
+            fields = line[:-1].split(b'\t')
+            line_end = b'\n'
+        else:
+            fields = line.split(b'\t')
+            line_end = b''
+
+        num_fields = len(fields)
+        changed = False
+        for idx in self.text_col_indexes:
+            if idx >= num_fields:
+                break
+            field = fields[idx]
+            if field == b'NULL':
+                if self.null_replacement is not None:
+                    fields[idx] = self.null_replacement
+                    changed = True
+            elif b'\\' in field:
+                new_field = self.sanitize_field(field)
+                if new_field != field:
+                    fields[idx] = new_field
+                    changed = True
+
+        if not changed:
+            return line
+        return b'\t'.join(fields) + line_end
+
+    #-------------------------
+    # sanitize_field
+    #--------------
+
+    def sanitize_field(self, field):
+        '''
+        Replace escaped tabs and newlines in one field.
+        Splitting at escaped backslashes first ensures that
+        only true escape sequences are replaced.
+
+        @param field: one field value as written by MySQL
+        @type field: bytes
+        @return: field with tab and newline escapes replaced
+        @rtype: bytes
+        '''
+        pieces = field.split(b'\\\\')
+        pieces = [piece.replace(b'\\t', TsvSanitizer.TAB_REPLACEMENT).replace(b'\\n', TsvSanitizer.NEWLINE_REPLACEMENT)
+                  for piece in pieces]
+        return b'\\\\'.join(pieces)
@@ -0,0 +1,338 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+from datetime import datetime
+import mmap
+import multiprocessing
+import os
+import re
+
+from line_counter import LineCounter
+from row_encoder import RowEncoder
+
+class TableLayout(object):
+    '''
+    Column names and data types of one exported table,
+    as read from the <table>_schema.sql file that the
+    exporter writes next to the table's .tsv file(s).
+    '''
+
+    # Lines of the CREATE TABLE statement that
+    # declare indexes rather than columns:
+    index_line_pat = re.compile(r'^(PRIMARY\s+KEY|UNIQUE|KEY|INDEX)\b', re.IGNORECASE)
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, table_name, col_names, col_types):
+        '''
+        @param table_name: name of the table
+        @type table_name: str
+        @param col_names: column names in export order
+        @type col_names: [str]
+        @param col_types: data type of each column, as
+            in information_schema.COLUMNS
+        @type col_types: [str]
+        '''
+        self.table_name = table_name
+        self.col_names  = col_names
+        self.col_types  = [col_type.lower() for col_type in col_types]
+
+    #-------------------------
+    # from_schema_file
+    #--------------
+
+    @classmethod
+    def from_schema_file(cls, schema_path):
+        '''
+        Parse a CREATE TABLE statement as written by
+        Schema.construct_create_table(): one column
+        per line, followed by the index declarations.
+
+        @param schema_path: path to <table>_schema.sql
+        @type schema_path: str
+        @return: the table's layout
+        @rtype: TableLayout
+        '''
+        with open(schema_path, 'r') as fd:
+            lines = fd.read().splitlines()
+        table_name = lines[0].split()[2]
+        col_names  = []
+        col_types  = []
+        for line in lines[1:]:
+            line = line.strip()
+            if len(line) == 0 or cls.index_line_pat.match(line):
+                continue
+            (col_name, col_type) = line.split()[:2]
+            col_names.append(col_name.strip('`'))
+            # 'varchar(40),' ==> 'varchar':
+            col_types.append(re.match(r'\w+', col_type).group())
+        return TableLayout(table_name, col_names, col_types)
+
+
+# -------------------------- Class TsvValidator ---------------
+
+class TsvValidator(object):
+    '''
+    Checks that exported .tsv files can be parsed by
+    consumers such as Informatica:
+
+       o The header line names the columns of the table's
+         schema file, in order
+       o Every line has exactly one field per column
+       o In a sample of lines, numeric columns hold numbers,
+         and date and time columns hold parseable times
+
+    Tabs and newlines inside of values must be escaped
+    with a backslash, either as the two characters '\\t'
+    and '\\n' (mysql client, RowEncoder), or as a backslash
+    followed by the raw character (SELECT ... INTO OUTFILE).
+    An unescaped tab or newline inside a value shifts the
+    remaining columns, and is reported with the line number
+    and byte offset of the line.
+
+    As in LineCounter, files are memory mapped, and cut into
+    blocks that are checked by a pool of worker processes.
+    Each worker checks the lines that start inside its block.
+    Most lines are checked with one bytes.count(); only lines
+    with a wrong tab count, or with a backslash before a raw
+    tab, are split into fields.
+    '''
+
+    DEFAULT_BLOCK_SIZE = 64 * 1024 * 1024
+
+    # Lines per block whose values are type checked:
+    SAMPLE_LINES_PER_BLOCK = 200
+
+    # Problems reported per file; the rest are only counted:
+    MAX_REPORTED = 10
+
+    NUMERIC_TYPES = RowEncoder.INT_TYPES + RowEncoder.FLOAT_TYPES + RowEncoder.DECIMAL_TYPES
+    TIME_TYPES    = RowEncoder.DATETIME_TYPES + ['date']
+
+    # Values that stand for SQL NULL, or for a NULL that
+    # the sanitizer replaced with the empty string:
+    NULL_VALUES = [b'NULL', b'\\N', b'']
+
+    # MySQL's zero date, which Python cannot parse:
+    ZERO_DATE = b'0000-00-00'
+
+    #-------------------------
+    # Constructor
+    #--------------
+
+    def __init__(self, num_workers=None, block_size=None):
+        '''
+        @param num_workers: number of processes to use for
+            large files. Default: number of CPUs
+        @type num_workers: int
+        @param block_size: bytes checked in one piece
+        @type block_size: int
+        '''
+        self.num_workers = os.cpu_count() if num_workers is None else num_workers
+        self.block_size  = TsvValidator.DEFAULT_BLOCK_SIZE if block_size is None else block_size
+
+    #-------------------------
+    # validate
+    #--------------
+
+    def validate(self, files):
+        '''
+        Check several files, possibly of different tables,
+        using one pool of workers for all of them.
+
+        @param files: (path, layout, has_header) for each file
+        @type files: [(str, TableLayout, bool)]
+        @return: map from path to a list of problem descriptions.
+            Files without problems map to an empty list.
+        @rtype: {str : [str]}
+        '''
+        problems = {}
+        blocks   = []
+        for (path, layout, has_header) in files:
+            problems[path] = []
+            if has_header:
+                problems[path].extend(self.check_header(path, layout))
+            file_size = os.path.getsize(path)
+            for start in range(0, file_size, self.block_size):
+                blocks.append((path,
+                               start,
+                               min(start + self.block_size, file_size),
+                               layout.col_types,
+                               has_header and start == 0))
+
+        if len(blocks) > 1 and self.num_workers > 1:
+            with multiprocessing.Pool(min(self.num_workers, len(blocks))) as pool:
+                block_results = pool.starmap(TsvValidator.check_block, blocks)
+        else:
+            block_results = [TsvValidator.check_block(*block) for block in blocks]
+
+        # Turn line numbers within blocks into line
+        # numbers within files:
+        lines_before = {path : 0 for path in problems.keys()}
+        num_bad      = {path : 0 for path in problems.keys()}
+        for (block, (num_lines, block_problems)) in zip(blocks, block_results):
+            path = block[0]
+            for (line_idx, offset, description) in block_problems:
+                num_bad[path] += 1
+                if num_bad[path] <= TsvValidator.MAX_REPORTED:
+                    problems[path].append(f"{os.path.basename(path)} line {lines_before[path] + line_idx + 1} " +
+                                          f"(byte {offset}): {description}")
+            lines_before[path] += num_lines
+
+        for (path, num) in num_bad.items():
+            if num > TsvValidator.MAX_REPORTED:
+                problems[path].append(f"{os.path.basename(path)}: " +
+                                      f"{num - TsvValidator.MAX_REPORTED} more problem line(s)")
+        return problems
+
+    #-------------------------
+    # check_header
+    #--------------
+
+    def check_header(self, path, layout):
+        '''
+        Compare a file's header line with the column
+        names of the table's schema.
+
+        @return: list with one problem description, or empty list
+        @rtype: [str]
+        '''
+        with open(path, 'rb') as fd:
+            header = fd.readline().rstrip(b'\n').decode('utf-8', errors='replace').split('\t')
+        if header == layout.col_names:
+            return []
+        return [f"{os.path.basename(path)} header: columns {header}, " +
+                f"expected {layout.col_names} from {layout.table_name}'s schema"]
+
+    #-------------------------
+    # check_block
+    #--------------
+
+    @staticmethod
+    def check_block(path, start, end, col_types, skip_header):
+        '''
+        Check the lines that start between byte offsets start
+        and end of a file. Runs in worker processes.
+
+        @return: number of lines that start in the block, and a
+            list of (line index within block, byte offset, description)
+            for the lines with problems
+        @rtype: (int, [(int, int, str)])
+        '''
+        num_tabs = len(col_types) - 1
+        with open(path, 'rb') as fd:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mem:
+                first_line = 0 if start == 0 else TsvValidator.next_line_start(mem, start - 1)
+                data_end   = TsvValidator.next_line_start(mem, end - 1)
+                data = mem[first_line:data_end]
+
+        lines = TsvValidator.split_unescaped(data, b'\n')
+        if data.endswith(b'\n') or len(data) == 0:
+            # Nothing after the last newline:
+            lines.pop()
+
+        # Fast check of all lines, then a careful
+        # one of the few suspicious ones:
+        suspects = [line_idx for (line_idx, line) in enumerate(lines)
+                    if line.count(b'\t') != num_tabs or b'\\\t' in line]
+        bad_lines = {}
+        for line_idx in suspects:
+            num_fields = len(TsvValidator.split_unescaped(lines[line_idx], b'\t'))
+            if num_fields != len(col_types):
+                bad_lines[line_idx] = f"{num_fields} fields, expected {len(col_types)}"
+
+        # Type check a sample of the well formed lines:
+        step = max(1, len(lines) // TsvValidator.SAMPLE_LINES_PER_BLOCK)
+        for line_idx in range(1 if skip_header else 0, len(lines), step):
+            if line_idx in bad_lines:
+                continue
+            fields = TsvValidator.split_unescaped(lines[line_idx], b'\t')
+            description = TsvValidator.check_types(fields, col_types)
+            if description is not None:
+                bad_lines[line_idx] = description
+
+        if skip_header:
+            # The header was compared with the schema already:
+            bad_lines.pop(0, None)
+
+        block_problems = []
+        if len(bad_lines) > 0:
+            # Byte offsets of all lines, only
+            # needed when there are problems:
+            offsets = [first_line]
+            for line in lines[:-1]:
+                offsets.append(offsets[-1] + len(line) + 1)
+            block_problems = [(line_idx, offsets[line_idx], bad_lines[line_idx])
+                              for line_idx in sorted(bad_lines.keys())]
+        return (len(lines), block_problems)
+
+    #-------------------------
+    # check_types
+    #--------------
+
+    @staticmethod
+    def check_types(fields, col_types):
+        '''
+        Check that numeric fields hold numbers, and
+        time fields hold times.
+
+        @return: description of the first offending field,
+            or None if all fields conform
+        @rtype: {None | str}
+        '''
+        for (col_idx, (value, col_type)) in enumerate(zip(fields, col_types)):
+            if value in TsvValidator.NULL_VALUES:
+                continue
+            try:
+                if col_type in TsvValidator.NUMERIC_TYPES:
+                    float(value)
+                elif col_type in TsvValidator.TIME_TYPES and not value.startswith(TsvValidator.ZERO_DATE):
+                    datetime.fromisoformat(value.decode('ascii'))
+            except ValueError:
+                return f"column {col_idx + 1} ({col_type}) holds {value[:40]!r}"
+        return None
+
+    # ----------------------- Utilities ---------------
+
+    #-------------------------
+    # next_line_start
+    #--------------
+
+    @staticmethod
+    def next_line_start(mem, pos):
+        '''
+        Offset just after the first unescaped newline at
+        or after pos, or the end of mem if there is none.
+        '''
+        pos = mem.find(b'\n', pos)
+        while pos >= 0:
+            if LineCounter.num_backslashes_before(mem, pos) % 2 == 0:
+                return pos + 1
+            pos = mem.find(b'\n', pos + 1)
+        return len(mem)
+
+    #-------------------------
+    # split_unescaped
+    #--------------
+
+    @staticmethod
+    def split_unescaped(data, separator):
+        '''
+        Split data at separators that are not escaped by
+        an odd number of backslashes.
+        '''
+        pieces = data.split(separator)
+        if b'\\' + separator not in data:
+            return pieces
+        joined = [pieces[0]]
+        for piece in pieces[1:]:
+            prev = joined[-1]
+            if (len(prev) - len(prev.rstrip(b'\\'))) % 2 == 1:
+                joined[-1] = prev + separator + piece
+            else:
+                joined.append(piece)
+        return joined
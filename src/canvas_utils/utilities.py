@@ -16,9 +16,18 @@ import sys
 
 from pymysql_utils.pymysql_utils import MySQLDB
 
+# NOTE: the modules imported below, and the modules
+#       they import, must not import utilities: that
+#       would be a circular import. Most other helper
+#       modules avoid it as well, so that they can be
+#       used and tested without a database.
+from backup_catalog import BackupCatalog
 from canvas_utils_exceptions import DatabaseError
 from config_info import ConfigInfo
+from load_log import LoadLog
 from query_sorter import QuerySorter
+from schema_cache import SchemaCache
+from session_pool import SessionPool
 
 
 class Utilities(object):
@@ -36,6 +45,31 @@ class Utilities(object):
     
     datetime_pat = None # Will be set in __init__() to re.compile(CanvasPrep.datetime_regx)
 
+    # Accounts with at least this many rows in a table
+    # are pulled by themselves when exporting the table
+    # (see get_account_ids_from_table()):
+    SINGLE_ACCOUNT_CHUNK_ROWS = 1000
+    
+    # information_schema metadata, shared by all
+    # Utilities instances in this process:
+    schema_cache = SchemaCache()
+    
+    # Settings for every MySQL session. Work in UTC, b/c 
+    # default on Mac MySQL 8 is local time, on Centos MySQL 5.7 
+    # is UTC; it's a mess. At least for MySQL 8.x we need to 
+    # allow zero dates, like '0000-00-00 00:00:00', which 
+    # is found in the Canvas db:
+    session_settings = ['SET @@session.time_zone = "+00:00"',
+                        'SET sql_mode="ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES,ERROR_FOR_DIVISION_BY_ZERO,NO_ENGINE_SUBSTITUTION"'
+                        ]
+    
+    # Settings that not all servers know. MySQL 8 caches table
+    # statistics in information_schema.tables, such as data_length,
+    # for a day by default. The LoadLog sizes are read right after
+    # each build, so turn the cache off. MySQL 5.7 always reports 
+    # current statistics, and does not know the variable:
+    optional_session_settings = ['SET @@session.information_schema_stats_expiry = 0']
+
 
     def __init__(self):
         '''
@@ -65,6 +99,8 @@ class Utilities(object):
     @tables.setter
     def tables(self, table_arr):
         self._table_arr = table_arr
+        # For fast membership tests when parsing backup names:
+        self._table_set = frozenset(table_arr) if table_arr is not None else frozenset()
         
     #-------------------------
     # get_existing_tables_in_dir 
@@ -94,13 +130,9 @@ class Utilities(object):
         if target_db is None:
             target_db = self.config_info.canvas_db_aux
         
-        tbl_names_query = f'''
-                          SELECT table_name 
-                            FROM information_schema.tables 
-                           WHERE table_schema = '{target_db}';
-                         '''
-        # Pull all table names from the result iterator:
-        table_names = [tbl_nm for tbl_nm in db_obj.query(tbl_names_query)]
+        # Answered from the metadata cache after the
+        # first call for target_db:
+        table_names = self.schema_cache.table_names(db_obj, target_db)
         
         if return_all:
             return table_names
@@ -118,6 +150,28 @@ class Utilities(object):
                 
         return existing_tbls
 
+    #-------------------------
+    # get_backup_db 
+    #--------------
+    
+    def get_backup_db(self, target_db=None):
+        '''
+        Return the name of the schema that holds the 
+        backups of the tables in target_db. Backups of 
+        the configured aux db live in the configured 
+        backup db. Other schemas, such as the one for
+        unittests, keep their backups next to their tables.
+        
+        @param target_db: schema of the aux tables. Default:
+            the configured aux db
+        @type target_db: str
+        @return: schema where backups reside
+        @rtype: str
+        '''
+        if target_db is None or target_db == self.config_info.canvas_db_aux:
+            return self.config_info.canvas_db_backup
+        return target_db
+
     #------------------------------------
     # backup_table_name_components
     #-------------------
@@ -137,50 +191,12 @@ class Utilities(object):
         @rtype: (str, str, datetime.datetime)
         @raise ValueError: if table_backup_name is ill-formed.
         '''
-        try:
-            # Length of a backup table datetime string is
-            # 19: 'foo_bar_2019_09_03_23_04_10' without the
-            # underscore that separates the table name from
-            # the datetime. First ensure that the end of the
-            # table name is a proper datetime string:
-            try:
-                # Construct regexp to find <aux_table>_<datestr>.
-                # Will find: 'Terms_2019_08_10_09_01_08_387662',
-                # but not:   'Foo_2019_08_10_09_01_08_387662'.
-                # The regex will look like "Terms|Courses|..._<regex for datetime strings>"
-                
-                aux_backup_tbl_regex = f"({'|'.join(self.tables)})_{Utilities.datetime_regx}"
-                
-                # The findall returns an empty array if no match is found. Else
-                # it will return an array with the table name. E.g. ['Terms']:
-                
-                tbl_name = re.findall(aux_backup_tbl_regex, backup_tbl_name)[0]
-            except Exception as _e:
-                raise ValueError(f"Table name {backup_tbl_name} is not a valid backup name.")
-            
-                
-            # Get a datetime obj from just the backup name's date string part:
-            dt_str_part_match_obj = re.search(Utilities.datetime_regx, backup_tbl_name)
-            if dt_str_part_match_obj is None:
-                # Datetime matches the aux_backup_tbl_regex, but is still not a proper datetime:
-                raise ValueError(f"Table name {backup_tbl_name} is not a valid backup name.")
-                
-            # The date str part of the backup name is between the match's start and end: 
-            dt_str = backup_tbl_name[dt_str_part_match_obj.start():dt_str_part_match_obj.end()]
-            try:
-                dt_obj = datetime.datetime.strptime(dt_str, Utilities.datetime_format)
-            except ValueError:
-                # Maybe the date string had no sub-second component? Try
-                # again to get a datatime obj using a no-subsecond datetime format.
-                # if this fails, it will throw a value error:
-                try:
-                    dt_obj = datetime.datetime.strptime(dt_str, Utilities.datetime_format_no_subsecond)
-                except ValueError:
-                    raise ValueError(f"Unrecognized datatime part of name '{backup_tbl_name}'")
-
-            return(tbl_name, dt_str, dt_obj) 
-        except IndexError:
+        # One precompiled pattern, and a set lookup
+        # for the root name; no per-call regex building:
+        components = BackupCatalog.parse_backup_name(backup_tbl_name, self._table_set)
+        if components is None:
             raise ValueError(f"Non-conformant backup table name '{backup_tbl_name}'")
+        return components
         
     #------------------------------------
     # is_aux_table 
@@ -307,7 +323,47 @@ class Utilities(object):
     # log_into_mysql 
     #--------------
             
-    def log_into_mysql(self, user, db_pwd, db=None, host='localhost', **kwargs):
+    def log_into_mysql(self, user, db_pwd, db=None, host='localhost', max_retries=None, **kwargs):
+        '''
+        Open a MySQL session, and apply Utilities.session_settings.
+        If the server is unreachable, or turns the connection away
+        for other transient reasons, wait with exponential backoff, 
+        and try again.
+        
+        @param user: MySQL user
+        @type user: str
+        @param db_pwd: the user's password
+        @type db_pwd: str
+        @param db: database to USE
+        @type db: str
+        @param host: MySQL server
+        @type host: str
+        @param max_retries: retries after transient errors. 
+            Default: SessionPool.default_max_retries
+        @type max_retries: int
+        @return: the open session
+        @rtype: MySQLDB
+        @raise DatabaseError: if the session cannot be opened
+        '''
+        if max_retries is None:
+            max_retries = SessionPool.default_max_retries
+            
+        def on_retry(exc, delay):
+            self.log_warn(f"Cannot reach MySQL at {host} ({repr(exc)}); trying again in {delay:.1f}s")
+        
+        db_obj = SessionPool.call_with_retries(lambda: self.open_mysql_session(user, db_pwd, db, host, **kwargs),
+                                               max_retries,
+                                               SessionPool.default_backoff_secs,
+                                               SessionPool.default_max_backoff_secs,
+                                               on_retry=on_retry)
+        self.configure_session(db_obj)
+        return db_obj
+
+    #-------------------------
+    # open_mysql_session 
+    #--------------
+
+    def open_mysql_session(self, user, db_pwd, db=None, host='localhost', **kwargs):
         
         try:
             # Try logging in, specifying the database in which all the tables
@@ -325,14 +381,49 @@ class Utilities(object):
         except Exception as e:
             raise DatabaseError(f"Cannot open Canvas database:\n{repr(e)}")
         
-        # Work in UTC, b/c default on Mac MySQL 8 is local time,
-        # on Centos MySQL 5.7 is UTC; it's a mess:
+        return db
+
+    #-------------------------
+    # configure_session 
+    #--------------
+
+    def configure_session(self, db):
+        '''
+        Apply Utilities.session_settings to an open session,
+        and those of Utilities.optional_session_settings that
+        the server knows.
         
-        (err, _warn) = db.execute('SET @@session.time_zone = "+00:00"')
-        if err is not None:
-            self.log_warn(f"Cannot set session time zone to UTC: {repr(err)}")
+        @param db: the session
+        @type db: MySQLDB
+        '''
+        for setting in Utilities.session_settings:
+            (err, _warn) = db.execute(setting)
+            if err is not None:
+                self.log_warn(f"Cannot apply session setting '{setting}': {repr(err)}")
+        for setting in Utilities.optional_session_settings:
+            (err, _warn) = db.execute(setting)
+            if err is not None:
+                self.log_debug(f"Server does not support session setting '{setting}': {repr(err)}")
+
+    #-------------------------
+    # session_pool 
+    #--------------
+
+    def session_pool(self, user, db_pwd, db=None, host='localhost', size=None, **kwargs):
+        '''
+        Return a pool of sessions, each opened like 
+        log_into_mysql() does. The pool does its own 
+        retrying. See SessionPool.
         
-        return db
+        @param size: maximum number of open sessions.
+            Default: SessionPool.default_size
+        @type size: int
+        @return: a new pool
+        @rtype: SessionPool
+        '''
+        return SessionPool(lambda: self.log_into_mysql(user, db_pwd, db=db, host=host, max_retries=0, **kwargs),
+                           size=size,
+                           log_warn=self.log_warn)
 
     #-------------------------
     # create_table_name_array 
@@ -363,7 +454,8 @@ class Utilities(object):
     def get_tbl_names_in_schema(self, db, db_schema_name):
         '''
         Given a db schema ('database name' in MySQL parlance),
-        return a list of all tables in that db.
+        return a list of all tables in that db. Unlike
+        get_existing_tables_in_dir(), always asks the server.
         
         @param db: pymysql_utils database object
         @type db: MySQLDB
@@ -419,7 +511,7 @@ class Utilities(object):
         account_objs = []
         for i in range(len(account_id_volumes)):
             (account_id, volume) = account_id_volumes[i]
-            if volume >= 1000:
+            if volume >= Utilities.SINGLE_ACCOUNT_CHUNK_ROWS:
                 account_objs.append(AccountIdCollection([account_id], volume))
             else:
                 # Combine all remaining account ids into one list:
@@ -447,21 +539,29 @@ class Utilities(object):
         @type db_obj: MySQLDB
         '''
 
+        db_schema = db_obj.dbName()
+
         # Does the table exist?
 
         if self.table_exists(load_log_tbl_nm, db_obj):
+            # Load logs from before duration, size, and run id
+            # were recorded, and before the log was indexed,
+            # get the new columns and index:
+            col_names   = [col[0] for col in self.schema_cache.columns(db_obj, db_schema, load_log_tbl_nm)]
+            index_names = [index[0] for index in self.schema_cache.indexes(db_obj, db_schema, load_log_tbl_nm)]
+            for upgrade_cmd in LoadLog.upgrade_cmds(db_schema, col_names, index_names, load_log_tbl_nm):
+                (err, _warn) = db_obj.execute(upgrade_cmd)
+                if err is not None:
+                    raise DatabaseError(f"Cannot upgrade load log table {load_log_tbl_nm}: {repr(err)}")
+                self.schema_cache.invalidate(db_schema, load_log_tbl_nm)
             return
 
         # Log table doesn't exist yet.
         # Create it:
-        (err, _warn) = db_obj.execute(f'''CREATE TABLE {load_log_tbl_nm} (
-                                         		tbl_name varchar(255),
-                                    		    time_refreshed DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                                        		num_rows int
-                                          )
-                                         ''')
+        (err, _warn) = db_obj.execute(LoadLog.create_cmd(db_schema, load_log_tbl_nm))
         if err is not None:
             raise DatabaseError(f"Cannot create load log table {load_log_tbl_nm}: {repr(err)}")
+        self.schema_cache.table_created(db_schema, load_log_tbl_nm)
 
     #------------------------------------
     # table_exists 
@@ -480,14 +580,7 @@ class Utilities(object):
         @rtype: bool
         '''
         
-        res = db_obj.query(f'''
-                             SELECT table_name 
-                               FROM information_schema.tables
-                              WHERE table_name = '{table_name}'
-                                AND table_schema = '{db_obj.dbName()}';
-                             '''
-                             )
-        return res.result_count() > 0
+        return self.schema_cache.table_exists(db_obj, db_obj.dbName(), table_name)
         
     #------------------------------------
     # sort_backup_table_names 
@@ -504,13 +597,14 @@ class Utilities(object):
         @rtype: [str]
         '''
         
-        # Sort the backups by age, most recent first:
-        # Method backup_table_name_components() returns a triplet:
-        # (root_table_name, datetime_str, datetime_obj). Sort
-        # using datetime obj by using sorted()'s 'key' function: 
-        backup_table_names_sorted = sorted(backup_table_names,
-                                           reverse=True,
-                                           key=lambda tbl_name: self.backup_table_name_components(tbl_name)[2])
+        # Sort the backups by age, most recent first.
+        # Parse each name once, rather than from within
+        # a sort key function. Method backup_table_name_components() 
+        # returns a triplet: (root_table_name, datetime_str, datetime_obj):
+        dated_names = [(self.backup_table_name_components(tbl_name)[2], tbl_name)
+                       for tbl_name in backup_table_names]
+        dated_names.sort(reverse=True)
+        backup_table_names_sorted = [tbl_name for (_dt_obj, tbl_name) in dated_names]
         return backup_table_names_sorted
 
     #-------------------------